@@ -1,7 +1,13 @@
+import sys
 import eventlet  # ¡NUEVA IMPORTACIÓN!
-eventlet.monkey_patch()  # ¡NUEVA LÍNEA! Esto debe ir al principio
-
-from flask import Flask, send_from_directory, request, jsonify
+# Esto debe ir al principio. En el master de gunicorn (preload_app, ver gunicorn.conf.py) no se
+# parchea 'os': el árbitro vacía su pipe de señales con os.read no bloqueante y la versión verde
+# se queda esperando en lugar de devolver EAGAIN, así que el master ya no atiende SIGTERM. Los
+# workers eventlet parchean 'os' ellos mismos al arrancar.
+eventlet.monkey_patch(os='gunicorn.arbiter' not in sys.modules)
+
+import logging
+from flask import Flask, request, jsonify
 from flask_cors import CORS
 # ❌ CAMBIO: Se remueve 'mysql' de la importación.
 from extensions import bcrypt, socketio, init_app as inicializar_extensiones 
@@ -10,156 +16,344 @@ from datetime import timedelta
 from flask_jwt_extended import JWTManager
 from jwt.exceptions import InvalidTokenError, ExpiredSignatureError as JWTExpiredSignatureError, DecodeError
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, exceptions as jwt_exceptions 
-import sys
-import traceback
 from dotenv import load_dotenv
 from threading import Timer, Lock
 from flask_socketio import join_room, leave_room, emit
+import realtime
+import presence
+import quiz_state
+import static_delivery
+import image_pipeline
+import upload_ingest
+import storage
+import asset_gc
+import pdf_export
+import metrics
+import sql_profiler
+import search
+import trending
+import author_timeline
+import post_counters
+import maintenance
+import replicas
+import http_cache
+import json_provider
+import reference_data
+import app_logging
+import redis_store
+from redis_store import RedisNoDisponible
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-app = Flask(__name__)
-
-CORS(app, resources={r"/*": {"origins": "*"}})
-
-# ================== MYSQL (SIN CAMBIOS EN CREDENCIALES) ==================
-app.config['MYSQL_HOST'] = os.getenv('MYSQL_HOST', 'localhost')
-app.config['MYSQL_USER'] = os.getenv('MYSQL_USER', 'root')
-app.config['MYSQL_PASSWORD'] = os.getenv('MYSQL_PASSWORD', '')
-app.config['MYSQL_DB'] = os.getenv('MYSQL_DB', 'flask_api')
-app.config['MYSQL_CHARSET'] = 'utf8mb4'
-
-basedir = os.path.abspath(os.path.dirname(__file__))
-
-# ❌ REMOVER: La configuración SSL es ahora manejada dentro de extensions.py:get_db()
-# if "tidbcloud.com" in app.config['MYSQL_HOST']:
-#     app.config['MYSQL_CLIENT_FLAGS'] = [2048]  
-#     app.config['MYSQL_SSL'] = {
-#         "ca": os.path.join(basedir, "certs", "isrgrootx1.pem")
-#     }
-
-# ================== EMAIL (SIN CAMBIOS) ==================
-app.config['MAIL_USERNAME'] = os.getenv('MAIL_USER')
-app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASS')
-app.config['MAIL_SERVER'] = 'smtp.gmail.com'
-app.config['MAIL_PORT'] = 587
-app.config['MAIL_USE_TLS'] = True
-app.config['MAIL_USE_SSL'] = False
-
-# ================== JWT (SIN CAMBIOS) ==================
-app.config["JWT_SECRET_KEY"] = os.getenv('JWT_SECRET_KEY', 'super-secreto-jwt')
-app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=1)
-app.config["JWT_REFRESH_TOKEN_EXPIRES"] = timedelta(days=30)
-
-jwt = JWTManager(app)
-
-# ====================================================================================================
-# Manejadores de Errores JWT (SIN CAMBIOS)
-# ====================================================================================================
-
-@app.errorhandler(jwt_exceptions.NoAuthorizationError)
-def handle_auth_error(e):
-    print(f"ERROR: Fallo de autorización - {e}", file=sys.stderr)
-    return jsonify({
-        "verificado": False,
-        "message": "Falta el encabezado de autorización o el token es inválido."
-    }), 401
-
-@app.errorhandler(JWTExpiredSignatureError)
-def handle_expired_error(e):
-    print(f"ERROR: Fallo de token expirado - {e}", file=sys.stderr)
-    return jsonify({
-        "verificado": False,
-        "message": "El token ha expirado."
-    }), 401
-
-@app.errorhandler(500)
-def handle_500_error(e):
-    print(f"ERROR: Un error interno del servidor ocurrió: {e}", file=sys.stderr)
-    traceback.print_exc(file=sys.stderr)
-    return jsonify({
-        "verificado": False,
-        "message": "Un error interno del servidor ha ocurrido. Por favor, inténtelo de nuevo más tarde."
-    }), 500
-
-# ====================================================================================================
-
-@app.before_request
-def handle_options_requests():
-    if request.method == 'OPTIONS':
-        return '', 200
-
-# ================== RUTAS PARA UPLOADS (SIN CAMBIOS) ==================
-UPLOAD_FOLDER = 'uploads'
-app.config['UPLOAD_FOLDER'] = os.path.join(basedir, UPLOAD_FOLDER)
-
-os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'fotos_perfil'), exist_ok=True)
-os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'publicaciones'), exist_ok=True)
-
-PDF_FOLDER = 'pdfs'
-app.config['PDF_FOLDER'] = os.path.join(basedir, PDF_FOLDER)
-
-os.makedirs(app.config['PDF_FOLDER'], exist_ok=True)
-
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
-app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'gif'}
-
-app.config['API_BASE_URL'] = os.getenv('API_BASE_URL', 'http://localhost:5000')
-app.config['REDIS_URL'] = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
-
-# ================== INICIALIZAR EXTENSIONES (SIN CAMBIOS) ==================
-inicializar_extensiones(app)
-
-# ================== RUTAS PARA ARCHIVOS (SIN CAMBIOS) ==================
-@app.route('/uploads/fotos_perfil/<username>/<filename>')
-def uploaded_profile_picture(username, filename):
-    profile_picture_folder = os.path.join(app.config['UPLOAD_FOLDER'], 'fotos_perfil', username)
-    return send_from_directory(profile_picture_folder, filename)
-
-@app.route('/uploads/publicaciones/<int:publicacion_id>/<filename>')
-def uploaded_publication_image(publicacion_id, filename):
-    publication_images_folder = os.path.join(app.config['UPLOAD_FOLDER'], 'publicaciones', str(publicacion_id))
-    try:
-        return send_from_directory(publication_images_folder, filename)
-    except Exception as e:
-        print(f"ERROR: No se pudo servir la imagen '{filename}' de la publicación '{publicacion_id}': {e}", file=sys.stderr)
-        return jsonify({"error": "Imagen no encontrada."}), 404
-
-@app.route('/uploads/<username>/<filename>')
-def uploaded_file_legacy(username, filename):
-    user_upload_folder = os.path.join(app.config['UPLOAD_FOLDER'], username)
-    return send_from_directory(user_upload_folder, filename)
-
-@app.route('/uploads/<filename>')
-def uploaded_general_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
-
-# ================== BLUEPRINTS (SIN CAMBIOS) ==================
-from routes.auth import auth_bp
-from routes.user import user_bp
-from support import support_bp
-from pdf_routes import pdf_bp
-from routes.blog import blog_bp
-from routes.auth_juego import auth_juego_bp
-
-app.register_blueprint(auth_bp)
-app.register_blueprint(user_bp, url_prefix='/user')
-app.register_blueprint(support_bp)
-app.register_blueprint(pdf_bp)
-app.register_blueprint(blog_bp, url_prefix='/blog')
-app.register_blueprint(auth_juego_bp, url_prefix='/auth_juego')
+
+def create_app(config=None):
+    app = Flask(__name__)
+
+    # ================== LOGGING (app_logging.py) ==================
+    # 'json' (producción) o 'texto'; niveles por logger: LOG_LEVELS='routes.blog=DEBUG,sql_profiler=WARNING'
+    app.config['LOG_FORMAT'] = os.getenv('LOG_FORMAT', 'json')
+    app.config['LOG_LEVEL'] = os.getenv('LOG_LEVEL', 'INFO')
+    app.config['LOG_LEVELS'] = os.getenv('LOG_LEVELS', '')
+    app.config['LOG_QUEUE_SIZE'] = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+    # Fracción de registros DEBUG que se emiten y máximo por segundo de un mismo mensaje
+    app.config['LOG_DEBUG_SAMPLE'] = float(os.getenv('LOG_DEBUG_SAMPLE', 1.0))
+    app.config['LOG_RATE_LIMIT'] = int(os.getenv('LOG_RATE_LIMIT', 50))
+    app_logging.init_app(app)
+
+    # jsonify con orjson (si está instalado), fechas ISO 8601 y Decimal como número (json_provider.py)
+    json_provider.init_app(app)
+
+    CORS(app, resources={r"/*": {"origins": "*"}})
+
+    # ================== MYSQL (SIN CAMBIOS EN CREDENCIALES) ==================
+    app.config['MYSQL_HOST'] = os.getenv('MYSQL_HOST', 'localhost')
+    app.config['MYSQL_PORT'] = int(os.getenv('MYSQL_PORT', 3306))
+    app.config['MYSQL_USER'] = os.getenv('MYSQL_USER', 'root')
+    app.config['MYSQL_PASSWORD'] = os.getenv('MYSQL_PASSWORD', '')
+    app.config['MYSQL_DB'] = os.getenv('MYSQL_DB', 'flask_api')
+    app.config['MYSQL_CHARSET'] = 'utf8mb4'
+    # Réplicas de solo lectura para los GET (replicas.py): "host1:3306,host2". Vacío: todo al primario
+    app.config['MYSQL_REPLICAS'] = os.getenv('MYSQL_REPLICAS', '')
+    app.config['DB_REPLICA_MAX_LAG'] = float(os.getenv('DB_REPLICA_MAX_LAG', 2))
+    app.config['DB_REPLICA_CHECK_INTERVAL'] = float(os.getenv('DB_REPLICA_CHECK_INTERVAL', 5))
+    # Tras escribir, las lecturas de ese cliente van al primario durante estos segundos
+    app.config['DB_STICKY_SECONDS'] = float(os.getenv('DB_STICKY_SECONDS', 5))
+
+    # ================== RESPUESTAS HTTP (http_cache.py) ==================
+    # JSON desde este tamaño se comprime (brotli si está instalado, si no gzip); 0 = nunca
+    app.config['HTTP_COMPRESS_MIN_BYTES'] = int(os.getenv('HTTP_COMPRESS_MIN_BYTES', 1024))
+    app.config['HTTP_GZIP_LEVEL'] = int(os.getenv('HTTP_GZIP_LEVEL', 6))
+    app.config['HTTP_BROTLI_QUALITY'] = int(os.getenv('HTTP_BROTLI_QUALITY', 5))
+    # Cambiarlo en un despliegue que cambie el formato de las respuestas invalida todos los ETag
+    app.config['HTTP_ETAG_SALT'] = os.getenv('HTTP_ETAG_SALT', '')
+
+    # ================== DATOS DE REFERENCIA (reference_data.py) ==================
+    # Categorías y dificultades en memoria; se invalidan por Redis pub/sub. Sin Redis, edad máxima (s)
+    app.config['REFERENCE_DATA_MAX_AGE'] = float(os.getenv('REFERENCE_DATA_MAX_AGE', 3600))
+
+    basedir = os.path.abspath(os.path.dirname(__file__))
+
+    # ❌ REMOVER: La configuración SSL es ahora manejada dentro de extensions.py:get_db()
+    # if "tidbcloud.com" in app.config['MYSQL_HOST']:
+    #     app.config['MYSQL_CLIENT_FLAGS'] = [2048]  
+    #     app.config['MYSQL_SSL'] = {
+    #         "ca": os.path.join(basedir, "certs", "isrgrootx1.pem")
+    #     }
+
+    # ================== EMAIL (SIN CAMBIOS) ==================
+    app.config['MAIL_USERNAME'] = os.getenv('MAIL_USER')
+    app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASS')
+    app.config['MAIL_SERVER'] = 'smtp.gmail.com'
+    app.config['MAIL_PORT'] = 587
+    app.config['MAIL_USE_TLS'] = True
+    app.config['MAIL_USE_SSL'] = False
+
+    # ================== JWT (SIN CAMBIOS) ==================
+    app.config["JWT_SECRET_KEY"] = os.getenv('JWT_SECRET_KEY', 'super-secreto-jwt')
+    app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=1)
+    app.config["JWT_REFRESH_TOKEN_EXPIRES"] = timedelta(days=30)
+
+    jwt = JWTManager(app)
+
+    # ====================================================================================================
+    # Manejadores de Errores JWT (SIN CAMBIOS)
+    # ====================================================================================================
+
+    @app.errorhandler(jwt_exceptions.NoAuthorizationError)
+    def handle_auth_error(e):
+        logger.warning("Fallo de autorización - %s", e)
+        return jsonify({
+            "verificado": False,
+            "message": "Falta el encabezado de autorización o el token es inválido."
+        }), 401
+
+    @app.errorhandler(JWTExpiredSignatureError)
+    def handle_expired_error(e):
+        logger.info("Fallo de token expirado - %s", e)
+        return jsonify({
+            "verificado": False,
+            "message": "El token ha expirado."
+        }), 401
+
+    @app.errorhandler(RedisNoDisponible)
+    def handle_redis_unavailable(e):
+        logger.error("Redis no disponible - %s", e)
+        return jsonify({
+            "message": "Servicio temporalmente no disponible. Por favor, inténtelo de nuevo más tarde."
+        }), 503
+
+    @app.errorhandler(413)
+    def handle_payload_too_large(e):
+        return jsonify({
+            "error": "El archivo enviado supera el tamaño máximo permitido."
+        }), 413
+
+    @app.errorhandler(500)
+    def handle_500_error(e):
+        logger.exception("Un error interno del servidor ocurrió: %s", e)
+        return jsonify({
+            "verificado": False,
+            "message": "Un error interno del servidor ha ocurrido. Por favor, inténtelo de nuevo más tarde."
+        }), 500
+
+    # ====================================================================================================
+
+    @app.before_request
+    def handle_options_requests():
+        if request.method == 'OPTIONS':
+            return '', 200
+
+    # ================== RUTAS PARA UPLOADS (SIN CAMBIOS) ==================
+    UPLOAD_FOLDER = 'uploads'
+    app.config['UPLOAD_FOLDER'] = os.path.join(basedir, UPLOAD_FOLDER)
+
+    os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'fotos_perfil'), exist_ok=True)
+    os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'publicaciones'), exist_ok=True)
+
+    PDF_FOLDER = 'pdfs'
+    app.config['PDF_FOLDER'] = os.path.join(basedir, PDF_FOLDER)
+
+    os.makedirs(app.config['PDF_FOLDER'], exist_ok=True)
+    # Exportación de PDFs (pdf_export.py): procesos generadores, tope de la caché en disco y segundos
+    # que un trabajo cuenta como 'en curso' (la marca de Redis caduca poco después)
+    app.config['PDF_WORKERS'] = int(os.getenv('PDF_WORKERS', 1))
+    app.config['PDF_CACHE_MAX_BYTES'] = int(os.getenv('PDF_CACHE_MAX_BYTES', 500 * 1024 * 1024))
+    app.config['PDF_RENDER_TIMEOUT'] = float(os.getenv('PDF_RENDER_TIMEOUT', 60))
+
+    # Entrega de /uploads y /pdfs: 'python' (Flask envía los bytes), 'x-accel' (nginx) o 'x-sendfile'
+    app.config['STATIC_DELIVERY_MODE'] = os.getenv('STATIC_DELIVERY_MODE', 'python')
+    app.config['STATIC_ACCEL_PREFIX'] = os.getenv('STATIC_ACCEL_PREFIX', '/_protegido')
+    # Rutas cuyo ETag (SHA-256) se recuerda por worker; las menos usadas se olvidan
+    app.config['STATIC_ETAG_CACHE_SIZE'] = int(os.getenv('STATIC_ETAG_CACHE_SIZE', 10000))
+
+    # Procesos dedicados a decodificar/re-escalar imágenes (image_pipeline.py)
+    app.config['IMAGE_WORKERS'] = int(os.getenv('IMAGE_WORKERS', 2))
+    app.config['IMAGE_PROCESS_TIMEOUT'] = float(os.getenv('IMAGE_PROCESS_TIMEOUT', 30))
+
+    # Almacenamiento de archivos: 'cloudinary' o 'local' (direccionado por contenido, ver storage.py)
+    app.config['STORAGE_BACKEND'] = os.getenv('STORAGE_BACKEND', 'cloudinary')
+    app.config['STORAGE_LOCAL_ROOT'] = os.getenv('STORAGE_LOCAL_ROOT') or None
+    # Borrado diferido de archivos (asset_gc.py): frecuencia, tamaño de lote, reintentos y escaneo de huérfanos
+    app.config['ASSET_GC_INTERVAL'] = float(os.getenv('ASSET_GC_INTERVAL', 60))
+    app.config['ASSET_GC_BATCH'] = int(os.getenv('ASSET_GC_BATCH', 200))
+    app.config['ASSET_GC_MAX_ATTEMPTS'] = int(os.getenv('ASSET_GC_MAX_ATTEMPTS', 8))
+    app.config['ASSET_GC_ORPHAN_SCAN_INTERVAL'] = float(os.getenv('ASSET_GC_ORPHAN_SCAN_INTERVAL', 6 * 3600))
+    app.config['ASSET_GC_ORPHAN_GRACE'] = float(os.getenv('ASSET_GC_ORPHAN_GRACE', 24 * 3600))
+
+    # Subidas: temporales en disco (no en RAM) y límites por endpoint, ver upload_ingest.py
+    app.config['UPLOAD_SPOOL_DIR'] = os.getenv('UPLOAD_SPOOL_DIR') or None
+    app.config['UPLOAD_PUBLICACION_MAX_BYTES'] = int(os.getenv('UPLOAD_PUBLICACION_MAX_BYTES', 10 * 1024 * 1024))
+    app.config['UPLOAD_PERFIL_MAX_BYTES'] = int(os.getenv('UPLOAD_PERFIL_MAX_BYTES', 5 * 1024 * 1024))
+
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+    app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'gif'}
+
+    app.config['API_BASE_URL'] = os.getenv('API_BASE_URL', 'http://localhost:5000')
+    app.config['REDIS_URL'] = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    # Pool de Redis dimensionado para eventlet (muchos greenlets por worker), ver redis_store.py
+    app.config['REDIS_POOL_SIZE'] = int(os.getenv('REDIS_POOL_SIZE', 64))
+    app.config['REDIS_POOL_TIMEOUT'] = float(os.getenv('REDIS_POOL_TIMEOUT', 5))
+    app.config['REDIS_NAMESPACE'] = os.getenv('REDIS_NAMESPACE', 'goe')
+    # Cada cuántos segundos se persiste en MySQL el estado de las sesiones de preguntas
+    app.config['QUIZ_FLUSH_INTERVAL'] = float(os.getenv('QUIZ_FLUSH_INTERVAL', 30))
+
+    # ================== TIEMPO REAL ==================
+    # Ventana de coalescencia de likes/comentarios por sala (clientes con protocolo 2).
+    app.config['REALTIME_COALESCE_MS'] = int(os.getenv('REALTIME_COALESCE_MS', 200))
+    # Mantener el flujo evento-por-evento para los clientes antiguos (protocolo 1).
+    app.config['REALTIME_LEGACY_STREAM'] = os.getenv('REALTIME_LEGACY_STREAM', '1') != '0'
+    # MessagePack opt-in: para clientes Socket.IO que lo negocien y para valores propios en Redis.
+    app.config['SOCKETIO_MSGPACK'] = os.getenv('SOCKETIO_MSGPACK', '0') == '1'
+    app.config['REDIS_VALUE_CODEC'] = os.getenv('REDIS_VALUE_CODEC', 'json')
+    # Presencia en salas: expiración de cada conexión (si el worker muere) y caché local de ocupación.
+    app.config['PRESENCE_TTL'] = int(os.getenv('PRESENCE_TTL', 60))
+    app.config['PRESENCE_CACHE_TTL'] = float(os.getenv('PRESENCE_CACHE_TTL', 1.0))
+
+    # ================== BÚSQUEDA (/blog/buscar, search.py) ==================
+    # 'mysql' (índice FULLTEXT) o 'redis' (índice invertido propio; reconstruir con 'flask reindexar-busqueda')
+    app.config['SEARCH_ENGINE'] = os.getenv('SEARCH_ENGINE', 'mysql')
+    app.config['SEARCH_PAGE_SIZE'] = int(os.getenv('SEARCH_PAGE_SIZE', 20))
+
+    # ================== TRENDING (/blog/publicaciones?orden=trending, trending.py) ==================
+    # Vida media (horas) del peso de cada like/comentario, cada cuánto se reescalan las puntuaciones
+    # y cuántas publicaciones se conservan por ranking
+    app.config['TRENDING_HALF_LIFE'] = float(os.getenv('TRENDING_HALF_LIFE', 24))
+    app.config['TRENDING_RENORM_INTERVAL'] = float(os.getenv('TRENDING_RENORM_INTERVAL', 3600))
+    app.config['TRENDING_MAX'] = int(os.getenv('TRENDING_MAX', 5000))
+
+    # ================== PUBLICACIONES POR AUTOR (/blog/autores/<id|username>/publicaciones) ==================
+    app.config['AUTHOR_TIMELINE_PAGE_SIZE'] = int(os.getenv('AUTHOR_TIMELINE_PAGE_SIZE', 20))
+
+    # ================== CONTADORES DE PUBLICACIONES (post_counters.py) ==================
+    # Cada cuánto se corrigen likes_count / comments_count / images_count y autores_contadores desviados (0 = nunca)
+    app.config['COUNTERS_RECONCILE_INTERVAL'] = float(os.getenv('COUNTERS_RECONCILE_INTERVAL', 3600))
+    app.config['COUNTERS_RECONCILE_BATCH'] = int(os.getenv('COUNTERS_RECONCILE_BATCH', 1000))
+
+    # ================== MÉTRICAS (/metrics) ==================
+    # Directorio compartido por los workers de gunicorn para agregar las métricas (vacío: solo el worker que responde)
+    app.config['METRICS_DIR'] = os.getenv('METRICS_DIR') or None
+    app.config['METRICS_FLUSH_INTERVAL'] = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+    # Si se define, /metrics exige 'Authorization: Bearer <METRICS_TOKEN>'
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN') or None
+    # Perfilador SQL (sql_profiler.py): N+1 ('off' | 'warn' | 'raise'), consultas lentas y /debug/sql
+    app.config['SQL_PROFILER_ENABLED'] = os.getenv('SQL_PROFILER_ENABLED', '1') != '0'
+    app.config['SQL_N1_THRESHOLD'] = int(os.getenv('SQL_N1_THRESHOLD', 10))
+    app.config['SQL_N1_MODE'] = os.getenv('SQL_N1_MODE', 'warn')
+    app.config['SQL_SLOW_MS'] = float(os.getenv('SQL_SLOW_MS', 500))
+    app.config['SQL_PROFILER_DEBUG'] = os.getenv('SQL_PROFILER_DEBUG', '0') == '1'
+
+    if config:
+        app.config.update(config)
+
+    # ================== INICIALIZAR EXTENSIONES (SIN CAMBIOS) ==================
+    inicializar_extensiones(app)
+    replicas.init_app(app)
+    realtime.init_app(app, socketio)
+    presence.init_app(app)
+    storage.init_app(app)
+    static_delivery.init_app(app, raices_extra={'objetos': storage.directorio_objetos()} if storage.directorio_objetos() else None)
+    image_pipeline.init_app(app)
+    upload_ingest.init_app(app)
+    asset_gc.init_app(app)
+    pdf_export.init_app(app)
+    metrics.init_app(app)
+    sql_profiler.init_app(app)
+    search.init_app(app)
+    trending.init_app(app)
+    author_timeline.init_app(app)
+    post_counters.init_app(app)
+    maintenance.init_app(app)
+    http_cache.init_app(app)
+    reference_data.init_app(app)
+
+    # ================== RUTAS PARA ARCHIVOS ==================
+    # static_delivery añade ETag, Cache-Control, 304/Range y el modo X-Accel-Redirect / X-Sendfile.
+    @app.route('/uploads/fotos_perfil/<username>/<filename>')
+    def uploaded_profile_picture(username, filename):
+        return static_delivery.servir_archivo('uploads', 'fotos_perfil', username, filename)
+
+    @app.route('/uploads/publicaciones/<int:publicacion_id>/<filename>')
+    def uploaded_publication_image(publicacion_id, filename):
+        try:
+            return static_delivery.servir_archivo('uploads', 'publicaciones', publicacion_id, filename)
+        except Exception as e:
+            logger.error("No se pudo servir la imagen '%s' de la publicación '%s': %s", filename, publicacion_id, e)
+            return jsonify({"error": "Imagen no encontrada."}), 404
+
+    @app.route('/uploads/objetos/<shard1>/<shard2>/<filename>')
+    def uploaded_object(shard1, shard2, filename):
+        # Objetos del almacén local (STORAGE_BACKEND=local); el nombre es su SHA-256
+        if not storage.es_objeto(filename):
+            return jsonify({"error": "Archivo no encontrado."}), 404
+        return static_delivery.servir_archivo('objetos', shard1, shard2, filename, inmutable=True)
+
+    @app.route('/uploads/<username>/<filename>')
+    def uploaded_file_legacy(username, filename):
+        return static_delivery.servir_archivo('uploads', username, filename)
+
+    @app.route('/uploads/<filename>')
+    def uploaded_general_file(filename):
+        return static_delivery.servir_archivo('uploads', filename)
+
+    # ================== BLUEPRINTS (SIN CAMBIOS) ==================
+    from routes.auth import auth_bp
+    from routes.user import user_bp
+    from support import support_bp
+    from pdf_routes import pdf_bp
+    from routes.blog import blog_bp
+    from routes.auth_juego import auth_juego_bp
+
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(user_bp, url_prefix='/user')
+    app.register_blueprint(support_bp)
+    app.register_blueprint(pdf_bp)
+    app.register_blueprint(blog_bp, url_prefix='/blog')
+    app.register_blueprint(auth_juego_bp, url_prefix='/auth_juego')
+
+    app.add_to_publication_batch = add_to_publication_batch
+
+    @app.before_request
+    def asegurar_servicios():
+        # Servidores sin el hook post_worker_init de gunicorn.conf.py (flask run, otros WSGI)
+        if _servicios_pid != os.getpid():
+            iniciar_servicios(app)
+
+    return app
 
 # ================== BATCH DE PUBLICACIONES (SIN CAMBIOS) ==================
 batched_publication_updates = {}
 batched_publication_updates_lock = Lock()
 BATCH_INTERVAL = 15
+batch_timer = None
 
 def emit_batched_updates():
     with batched_publication_updates_lock:
         if batched_publication_updates:
             updates_to_send = list(batched_publication_updates.values())
-            print(f"DEBUG APP: Emitiendo {len(updates_to_send)} actualizaciones de publicaciones por batch.", file=sys.stderr)
-            socketio.emit('batched_publication_updates', updates_to_send, namespace='/', room='/')
+            logger.debug("Emitiendo %s actualizaciones de publicaciones por batch.", len(updates_to_send))
+            realtime.emit_codificado(socketio, 'batched_publication_updates', updates_to_send, '/')
             batched_publication_updates.clear()
 
     global batch_timer
@@ -171,35 +365,75 @@ def add_to_publication_batch(publication_data):
     with batched_publication_updates_lock:
         batched_publication_updates[publication_data['id']] = publication_data
 
-app.add_to_publication_batch = add_to_publication_batch
+# ================== SERVICIOS POR PROCESO ==================
+# create_app() no abre sockets ni arranca hilos, así que el módulo se puede precargar en el
+# master de gunicorn (preload_app) y compartir su memoria con los workers. Las conexiones a Redis,
+# el listener de logs y los timers se crean aquí, una vez por proceso: desde post_worker_init
+# (gunicorn.conf.py), desde __main__ o, como último recurso, en la primera petición.
+_servicios_pid = None
+_servicios_lock = Lock()
+
+def iniciar_servicios(app):
+    global _servicios_pid, batch_timer
+    with _servicios_lock:
+        if _servicios_pid == os.getpid():
+            return
+        _servicios_pid = os.getpid()
+
+    app_logging.iniciar()
+    redis_store.conectar()
+
+    batch_timer = Timer(BATCH_INTERVAL, emit_batched_updates)
+    batch_timer.daemon = True
+    batch_timer.start()
+
+    presence.iniciar_heartbeat()
+    quiz_state.iniciar_flusher(app)
+    asset_gc.iniciar_colector(app)
+    metrics.iniciar_volcado()
+    trending.iniciar_renormalizador()
+    post_counters.iniciar_conciliador(app)
+    replicas.iniciar_monitor()
+    reference_data.iniciar(app)
+    logger.info("Servicios del worker iniciados (pid=%s).", _servicios_pid)
+
 
-global batch_timer
-batch_timer = Timer(BATCH_INTERVAL, emit_batched_updates)
-batch_timer.daemon = True
-batch_timer.start()
+app = create_app()
 
 # ================== SOCKET.IO EVENTS (SIN CAMBIOS) ==================
 @socketio.on('connect')
-def test_connect():
-    print('Cliente conectado a Socket.IO')
+def test_connect(auth=None):
+    # El cliente puede pedir MessagePack con {'codec': 'msgpack'} en auth o ?codec=msgpack
+    codec_pedido = (auth or {}).get('codec') or request.args.get('codec')
+    codec_cliente = realtime.registrar_codec(request.sid, codec_pedido)
+    join_room(realtime.sala_para_codec(realtime.SALA_GLOBAL, codec_cliente))
+    logger.debug("Cliente conectado a Socket.IO (codec=%s)", codec_cliente)
 
 @socketio.on('disconnect')
 def test_disconnect():
-    print('Cliente desconectado de Socket.IO')
+    realtime.olvidar_codec(request.sid)
+    presence.desconectar(request.sid)
+    logger.debug("Cliente desconectado de Socket.IO")
 
 @socketio.on('join_room')
 def on_join(data):
-    room = data['room']
+    # Los clientes que envían 'protocol': 2 reciben los eventos de la publicación agrupados
+    # ('publication_events'); el resto sigue recibiendo un evento por cambio. La sala se ajusta
+    # también al codec negociado en 'connect'.
+    room = realtime.sala_para_protocolo(data['room'], realtime.leer_protocolo(data), realtime.codec_de(request.sid))
     join_room(room)
-    print(f"Cliente unido a la sala: {room}")
+    presence.unirse(request.sid, room)
+    logger.debug("Cliente unido a la sala: %s", room)
 
 @socketio.on('leave_room')
 def on_leave(data):
-    room = data['room']
+    room = realtime.sala_para_protocolo(data['room'], realtime.leer_protocolo(data), realtime.codec_de(request.sid))
     leave_room(room)
-    print(f"Cliente salió de la sala: {room}")
+    presence.salir(request.sid, room)
+    logger.debug("Cliente salió de la sala: %s", room)
 
 # ================== RUN (SIN CAMBIOS) ==================
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 5000))  # Render asigna $PORT
+    iniciar_servicios(app)
     socketio.run(app, host='0.0.0.0', port=port, debug=True, allow_unsafe_werkzeug=True)
\ No newline at end of file
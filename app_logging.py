@@ -0,0 +1,284 @@
+import json
+import logging
+import logging.handlers
+import os
+import random
+import sys
+import time
+import traceback
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+# ====================================================================================================
+# Logging estructurado y no bloqueante
+# ====================================================================================================
+# - Cada módulo usa 'logger = logging.getLogger(__name__)'. La raíz tiene un único handler:
+#   un QueueHandler que solo encola el registro; un QueueListener en un hilo del sistema operativo
+#   (threading / queue ORIGINALES de eventlet, no los parcheados) es quien formatea y escribe en
+#   stderr. Si la tubería del log va lenta, se bloquea ese hilo, no el hub de eventlet.
+# - El hilo se arranca con iniciar(), una vez por proceso (iniciar_servicios en app.py). Antes
+#   (create_app en el master de gunicorn con preload_app, comandos 'flask ...') el handler escribe
+#   directamente en stderr y no hay hilos que un fork deje a medias.
+# - Cola acotada (LOG_QUEUE_SIZE): si se llena, los registros se descartan y se cuentan; el
+#   siguiente registro que entra lleva 'descartados'.
+# - LOG_FORMAT 'json' (un objeto por línea) o 'texto' (desarrollo). Cada registro lleva el
+#   request_id (cabecera X-Request-ID entrante o uno nuevo, devuelto en la respuesta), el método
+#   y la ruta, además de los campos pasados con extra={...}.
+# - Niveles: LOG_LEVEL para la raíz y LOG_LEVELS='routes.blog=DEBUG,sql_profiler=WARNING' por logger.
+# - DEBUG muestreado (LOG_DEBUG_SAMPLE, 0..1) y límite por mensaje (LOG_RATE_LIMIT registros por
+#   segundo y por plantilla de mensaje; lo suprimido se informa en 'suprimidos').
+
+try:
+    from eventlet import patcher as _patcher
+
+    _threading = _patcher.original('threading')
+    _queue = _patcher.original('queue')
+except ImportError:  # sin eventlet (scripts, benchmarks): los módulos normales
+    import queue as _queue
+    import threading as _threading
+
+# Atributos propios de LogRecord: el resto son campos 'extra' y van al JSON
+_ATRIBUTOS_ESTANDAR = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+_contexto = ContextVar('log_contexto', default=None)
+
+_listener = None
+_listener_pid = None
+_config = {
+    'formato': 'json',
+    'nivel': 'INFO',
+    'niveles': {},
+    'cola': 10000,
+    'muestreo_debug': 1.0,
+    'limite_por_segundo': 50,
+}
+
+
+# ================== CONTEXTO DE PETICIÓN ==================
+
+def _inicio_peticion():
+    from flask import request
+
+    request_id = (request.headers.get('X-Request-ID') or '')[:64] or uuid.uuid4().hex
+    _contexto.set({'request_id': request_id, 'metodo': request.method, 'ruta': request.path})
+
+
+def _despues_peticion(respuesta):
+    contexto = _contexto.get()
+    if contexto:
+        respuesta.headers['X-Request-ID'] = contexto['request_id']
+    return respuesta
+
+
+def _fin_peticion(exc=None):
+    _contexto.set(None)
+
+
+def request_id():
+    contexto = _contexto.get()
+    return contexto['request_id'] if contexto else None
+
+
+class FiltroContexto(logging.Filter):
+    """Copia el contexto de la petición al registro. Corre en el hilo que loguea (antes de encolar)."""
+
+    def filter(self, record):
+        contexto = _contexto.get()
+        if contexto:
+            for clave, valor in contexto.items():
+                if not hasattr(record, clave):
+                    setattr(record, clave, valor)
+        return True
+
+
+class FiltroMuestreo(logging.Filter):
+    """
+    DEBUG: pasa con probabilidad LOG_DEBUG_SAMPLE. Todos los niveles: como mucho LOG_RATE_LIMIT
+    registros por segundo con la misma plantilla (logger + msg sin formatear). ERROR y superiores
+    no se limitan.
+    """
+
+    def __init__(self, muestreo, limite):
+        super().__init__()
+        self.muestreo = muestreo
+        self.limite = limite
+        self._ventanas = {}  # (logger, plantilla) -> [segundo, emitidos, suprimidos]
+        self._lock = _threading.Lock()
+
+    def filter(self, record):
+        if record.levelno <= logging.DEBUG and self.muestreo < 1.0 and random.random() >= self.muestreo:
+            return False
+        if record.levelno >= logging.ERROR or self.limite <= 0:
+            return True
+        clave = (record.name, record.msg if isinstance(record.msg, str) else repr(type(record.msg)))
+        segundo = int(time.monotonic())
+        with self._lock:
+            ventana = self._ventanas.get(clave)
+            if ventana is None or ventana[0] != segundo:
+                suprimidos = ventana[2] if ventana else 0
+                if len(self._ventanas) > 10000:
+                    self._ventanas.clear()
+                ventana = self._ventanas[clave] = [segundo, 0, 0]
+                if suprimidos:
+                    record.suprimidos = suprimidos
+            if ventana[1] >= self.limite:
+                ventana[2] += 1
+                return False
+            ventana[1] += 1
+        return True
+
+
+# ================== FORMATO ==================
+
+class FormatoJSON(logging.Formatter):
+    def format(self, record):
+        datos = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'funcion': record.funcName,
+            'linea': record.lineno,
+        }
+        for clave, valor in vars(record).items():
+            if clave not in _ATRIBUTOS_ESTANDAR and not clave.startswith('_'):
+                datos[clave] = valor
+        if record.exc_info:
+            datos['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            datos['exc'] = record.exc_text
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+class FormatoTexto(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-8s %(name)s: %(message)s')
+
+    def format(self, record):
+        texto = super().format(record)
+        extra = {
+            k: v for k, v in vars(record).items()
+            if k not in _ATRIBUTOS_ESTANDAR and not k.startswith('_')
+        }
+        return f"{texto} {extra}" if extra else texto
+
+
+# ================== COLA ==================
+
+class _QueueHandlerAcotado(logging.handlers.QueueHandler):
+    def __init__(self, cola):
+        super().__init__(cola)
+        self.descartados = 0
+
+    def prepare(self, record):
+        # Se formatea el mensaje en el hilo que loguea (los argumentos pueden cambiar después)
+        # pero la traza de la excepción se deja para el listener.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = ''.join(traceback.format_exception(*record.exc_info)).rstrip()
+            record.exc_info = None
+        if self.descartados:
+            record.descartados, self.descartados = self.descartados, 0
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except _queue.Full:
+            self.descartados += 1
+
+
+class _ListenerHiloReal(logging.handlers.QueueListener):
+    """QueueListener cuyo hilo es un hilo real del sistema operativo aunque eventlet esté parcheado."""
+
+    def start(self):
+        self._thread = hilo = _threading.Thread(target=self._monitor, name='log-listener', daemon=True)
+        hilo.start()
+
+
+def _parsear_niveles(texto):
+    niveles = {}
+    for par in (texto or '').split(','):
+        if '=' in par:
+            nombre, nivel = par.split('=', 1)
+            niveles[nombre.strip()] = nivel.strip().upper()
+    return niveles
+
+
+def configurar(formato=None, nivel=None, niveles=None, cola=None, muestreo_debug=None, limite_por_segundo=None):
+    """
+    Instala el handler en la raíz. Se puede llamar de nuevo para cambiar la configuración.
+    Escribe directamente en stderr salvo que iniciar() ya haya arrancado el listener en este proceso.
+    """
+    global _listener
+    _config.update({
+        k: v for k, v in {
+            'formato': formato, 'nivel': nivel, 'niveles': niveles, 'cola': cola,
+            'muestreo_debug': muestreo_debug, 'limite_por_segundo': limite_por_segundo,
+        }.items() if v is not None
+    })
+    # El listener heredado de otro proceso (fork) no tiene hilo: se descarta sin pararlo
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+    _listener = None
+
+    salida = logging.StreamHandler(sys.stderr)
+    salida.setFormatter(FormatoTexto() if _config['formato'] == 'texto' else FormatoJSON())
+
+    if _listener_pid == os.getpid():
+        cola_registros = _queue.Queue(maxsize=_config['cola'])
+        manejador = _QueueHandlerAcotado(cola_registros)
+        _listener = _ListenerHiloReal(cola_registros, salida, respect_handler_level=False)
+    else:
+        manejador = salida
+    manejador.addFilter(FiltroContexto())
+    manejador.addFilter(FiltroMuestreo(_config['muestreo_debug'], _config['limite_por_segundo']))
+
+    raiz = logging.getLogger()
+    for anterior in list(raiz.handlers):
+        raiz.removeHandler(anterior)
+    raiz.addHandler(manejador)
+    raiz.setLevel(_config['nivel'])
+    for nombre, nivel_logger in _config['niveles'].items():
+        logging.getLogger(nombre).setLevel(nivel_logger)
+
+    if _listener is not None:
+        _listener.start()
+
+
+def iniciar():
+    """
+    Pasa a la cola y al hilo listener en este proceso (worker de gunicorn o __main__). Con la
+    configuración vigente; no hace nada si ya se llamó en este proceso.
+    """
+    global _listener_pid
+    if _listener_pid == os.getpid():
+        return
+    _listener_pid = os.getpid()
+    configurar()
+
+
+def detener():
+    """Vacía la cola y para el listener (al salir de scripts). Lo siguiente se escribe directamente."""
+    global _listener, _listener_pid
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+    _listener = None
+    _listener_pid = None
+    configurar()
+
+
+def init_app(app):
+    configurar(
+        formato=app.config.get('LOG_FORMAT', 'json'),
+        nivel=app.config.get('LOG_LEVEL', 'INFO').upper(),
+        niveles=_parsear_niveles(app.config.get('LOG_LEVELS')),
+        cola=int(app.config.get('LOG_QUEUE_SIZE', 10000)),
+        muestreo_debug=float(app.config.get('LOG_DEBUG_SAMPLE', 1.0)),
+        limite_por_segundo=int(app.config.get('LOG_RATE_LIMIT', 50)),
+    )
+    app.before_request_funcs.setdefault(None, []).insert(0, _inicio_peticion)
+    app.after_request(_despues_peticion)
+    app.teardown_request(_fin_peticion)
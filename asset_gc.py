@@ -0,0 +1,237 @@
+import logging
+import time
+from threading import Timer
+
+import pymysql.cursors
+
+import redis_store
+import storage
+from extensions import get_db
+
+logger = logging.getLogger(__name__)
+
+# ====================================================================================================
+# Recolección diferida de archivos (Cloudinary / almacén local)
+# ====================================================================================================
+# Las rutas ya no borran archivos dentro de la petición. En la MISMA transacción que borra o
+# reemplaza filas, encolan lo que sobra en la tabla 'assets_pendientes' (cola durable: si el
+# worker muere, la cola sigue ahí):
+#
+#   tipo='url'      valor=<url del archivo>   carpeta=<carpeta lógica donde se subió>
+#   tipo='carpeta'  valor=<prefijo>           (todo lo que cuelga de él)
+#
+# Un colector periódico (ASSET_GC_INTERVAL) toma lotes, los borra con llamadas en bloque
+# (storage.eliminar_lote -> cloudinary.api.delete_resources de 100 en 100) y reintenta con
+# backoff exponencial lo que falle. Un solo worker colecta a la vez (lock en Redis).
+#
+# Cada ASSET_GC_ORPHAN_SCAN_INTERVAL se compara lo que hay en el almacenamiento bajo
+# 'publicaciones/' y 'fotos_perfil/' con lo referenciado en imagenes_publicacion(_variantes)
+# y users.foto_perfil; lo no referenciado y más antiguo que ASSET_GC_ORPHAN_GRACE se encola.
+
+TIPO_URL = 'url'
+TIPO_CARPETA = 'carpeta'
+
+PREFIJOS_ESCANEO = ('publicaciones/', 'fotos_perfil/')
+
+_config = {
+    'intervalo': 60.0,
+    'lote': 200,
+    'max_intentos': 8,
+    'intervalo_huerfanos': 6 * 3600.0,
+    'gracia_huerfanos': 24 * 3600.0,
+}
+
+_timer = None
+_ultimo_escaneo = 0.0
+
+
+def init_app(app):
+    _config.update({
+        'intervalo': float(app.config.get('ASSET_GC_INTERVAL', 60)),
+        'lote': int(app.config.get('ASSET_GC_BATCH', 200)),
+        'max_intentos': int(app.config.get('ASSET_GC_MAX_ATTEMPTS', 8)),
+        'intervalo_huerfanos': float(app.config.get('ASSET_GC_ORPHAN_SCAN_INTERVAL', 6 * 3600)),
+        'gracia_huerfanos': float(app.config.get('ASSET_GC_ORPHAN_GRACE', 24 * 3600)),
+    })
+
+
+# ================== ENCOLAR (dentro de la transacción de la ruta) ==================
+
+def encolar_urls(cursor, urls, carpeta=None):
+    """Encola archivos sueltos. No hace commit: va en la transacción de quien llama."""
+    filas = [(TIPO_URL, url, carpeta) for url in dict.fromkeys(urls) if url]
+    if filas:
+        cursor.executemany(
+            "INSERT INTO assets_pendientes (tipo, valor, carpeta) VALUES (%s, %s, %s)", filas
+        )
+    return len(filas)
+
+
+def encolar_carpeta(cursor, carpeta):
+    cursor.execute(
+        "INSERT INTO assets_pendientes (tipo, valor, carpeta) VALUES (%s, %s, NULL)",
+        (TIPO_CARPETA, carpeta.strip('/'))
+    )
+
+
+# ================== COLECTOR ==================
+
+def _backoff(intentos):
+    """Segundos hasta el próximo intento: 30 s, 1 min, 2 min, ... hasta 6 h."""
+    return min(30 * (2 ** max(intentos - 1, 0)), 6 * 3600)
+
+
+def procesar_lote(conn, lote=None):
+    """
+    Borra un lote de la cola. Devuelve (borrados, fallidos).
+    Las entradas que agotan ASSET_GC_MAX_ATTEMPTS se quedan en la tabla con su último error
+    (proximo_intento NULL) para revisarlas a mano.
+    """
+    lote = lote or _config['lote']
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        cursor.execute(
+            "SELECT id, tipo, valor, carpeta, intentos FROM assets_pendientes "
+            "WHERE proximo_intento <= NOW() ORDER BY id LIMIT %s",
+            (lote,)
+        )
+        entradas = cursor.fetchall()
+        if not entradas:
+            return 0, 0
+
+        errores = {}
+        urls = [e for e in entradas if e['tipo'] == TIPO_URL]
+        if urls:
+            resultado = storage.eliminar_lote([(e['valor'], e['carpeta']) for e in urls])
+            for e in urls:
+                if resultado.get(e['valor']):
+                    errores[e['id']] = resultado[e['valor']]
+        for e in entradas:
+            if e['tipo'] != TIPO_CARPETA:
+                continue
+            try:
+                storage.eliminar_carpeta(e['valor'])
+            except Exception as ex:
+                errores[e['id']] = str(ex)
+
+        hechos = [e['id'] for e in entradas if e['id'] not in errores]
+        if hechos:
+            marcadores = ', '.join(['%s'] * len(hechos))
+            cursor.execute(f"DELETE FROM assets_pendientes WHERE id IN ({marcadores})", tuple(hechos))
+
+        fallidos = [e for e in entradas if e['id'] in errores]
+        if fallidos:
+            cursor.executemany(
+                # MySQL evalúa el SET de izquierda a derecha: 'intentos' ya está incrementado
+                "UPDATE assets_pendientes SET intentos = intentos + 1, ultimo_error = %s, "
+                "proximo_intento = IF(intentos >= %s, NULL, NOW() + INTERVAL %s SECOND) "
+                "WHERE id = %s",
+                [
+                    (errores[e['id']][:255], _config['max_intentos'], _backoff(e['intentos'] + 1), e['id'])
+                    for e in fallidos
+                ]
+            )
+        conn.commit()
+        return len(hechos), len(fallidos)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def _familias_referenciadas(cursor):
+    """Familias (storage.familia) de todos los archivos que la BD sigue usando."""
+    cursor.execute(
+        "SELECT url FROM imagenes_publicacion "
+        "UNION ALL SELECT url FROM imagenes_publicacion_variantes "
+        "UNION ALL SELECT foto_perfil AS url FROM users WHERE foto_perfil IS NOT NULL"
+    )
+    familias = set()
+    for fila in cursor.fetchall():
+        for nombre in storage.nombres_de_url(fila['url']):
+            familias.add(storage.familia(nombre))
+    return familias
+
+
+def escanear_huerfanos(conn, prefijos=PREFIJOS_ESCANEO, gracia=None):
+    """
+    Encola los archivos bajo 'prefijos' que ninguna fila referencia. Solo los más antiguos que
+    'gracia' segundos, para no tocar subidas en curso. Devuelve cuántos se encolaron.
+    """
+    gracia = _config['gracia_huerfanos'] if gracia is None else gracia
+    limite = time.time() - gracia
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        familias = _familias_referenciadas(cursor)
+        huerfanos = []
+        for prefijo in prefijos:
+            for archivo in storage.listar(prefijo):
+                if archivo['creado'] and archivo['creado'] > limite:
+                    continue
+                if storage.familia(archivo['nombre']) in familias:
+                    continue
+                huerfanos.append((archivo['url'], archivo['nombre'].rpartition('/')[0]))
+        for url, carpeta in huerfanos:
+            encolar_urls(cursor, [url], carpeta=carpeta)
+        conn.commit()
+        return len(huerfanos)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def _tomar_turno():
+    """Solo un worker colecta por ciclo. Sin Redis se colecta igual (los borrados son idempotentes)."""
+    try:
+        cliente = redis_store.require_client()
+        ttl = max(int(_config['intervalo']), 1)
+        return bool(cliente.set(redis_store.key('lock', 'asset_gc'), '1', nx=True, ex=ttl))
+    except redis_store.RedisNoDisponible:
+        return True
+
+
+def ejecutar_ciclo(conn):
+    """Vacía la cola (lote a lote) y, si toca, escanea huérfanos. Devuelve un resumen."""
+    global _ultimo_escaneo
+    borrados = fallidos = 0
+    while True:
+        b, f = procesar_lote(conn)
+        borrados += b
+        fallidos += f
+        if b + f < _config['lote']:
+            break
+    encolados = 0
+    if time.time() - _ultimo_escaneo >= _config['intervalo_huerfanos']:
+        _ultimo_escaneo = time.time()
+        encolados = escanear_huerfanos(conn)
+    return {'borrados': borrados, 'fallidos': fallidos, 'huerfanos_encolados': encolados}
+
+
+def _ciclo(app):
+    global _timer
+    try:
+        if _tomar_turno():
+            with app.app_context():
+                resumen = ejecutar_ciclo(get_db())
+            if any(resumen.values()):
+                logger.info("Ciclo de recolección: %s", resumen)
+    except Exception as e:
+        logger.exception("Fallo en el ciclo de recolección: %s", e)
+    finally:
+        _timer = Timer(_config['intervalo'], _ciclo, args=(app,))
+        _timer.daemon = True
+        _timer.start()
+
+
+def iniciar_colector(app):
+    global _timer, _ultimo_escaneo
+    if _timer is not None:
+        return
+    # El primer escaneo de huérfanos espera un intervalo completo tras el arranque
+    _ultimo_escaneo = time.time()
+    _timer = Timer(_config['intervalo'], _ciclo, args=(app,))
+    _timer.daemon = True
+    _timer.start()
@@ -0,0 +1,151 @@
+import base64
+import json
+import logging
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+
+from extensions import get_db
+
+logger = logging.getLogger(__name__)
+
+# ====================================================================================================
+# Publicaciones de un autor (GET /blog/autores/<id|username>/publicaciones) y sus contadores
+# ====================================================================================================
+# Listado: paginación por clave (keyset) sobre idx_publicaciones_autor_fecha (autor_id, created_at, id).
+# La consulta de la página lee solo ese índice (filtro, orden y columnas), así que la página 500
+# cuesta lo mismo que la primera; las filas completas se hidratan por id después. El cursor es
+# (created_at, id) de la última publicación devuelta.
+#
+# Contadores: tabla autores_contadores, una fila por autor. Crear/eliminar publicación, like/unlike
+# y comentar/eliminar comentario la actualizan dentro de su misma transacción con un upsert relativo
+# (col = col + delta), así que leerlos es una búsqueda por clave primaria y nunca un COUNT/SUM.
+# El conciliador periódico de post_counters.py corrige los que se desvíen; 'flask
+# recalcular-contadores-autor' los reconstruye todos desde las tablas de una vez.
+
+LIMITE_MAX = 50
+
+_config = {
+    'limite': 20,
+}
+
+
+class CursorInvalido(ValueError):
+    """El parámetro 'cursor' no es uno devuelto por esta API."""
+
+
+def init_app(app):
+    _config['limite'] = min(int(app.config.get('AUTHOR_TIMELINE_PAGE_SIZE', 20)), LIMITE_MAX)
+    app.cli.add_command(recalcular_comando)
+
+
+# ================== CURSOR ==================
+
+def codificar_cursor(created_at, publicacion_id):
+    crudo = json.dumps([created_at.isoformat(sep=' '), publicacion_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        fecha, publicacion_id = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        return datetime.fromisoformat(fecha), int(publicacion_id)
+    except (ValueError, TypeError) as e:
+        raise CursorInvalido("Cursor de publicaciones inválido.") from e
+
+
+# ================== LISTADO ==================
+
+def pagina(cursor, autor_id, despues=None, limite=None):
+    """
+    Ids de la página de publicaciones del autor, de la más nueva a la más vieja, y el cursor de
+    la siguiente (None si no hay más). 'despues' es un cursor ya decodificado.
+    """
+    limite = min(max(int(limite or _config['limite']), 1), LIMITE_MAX)
+    sql = "SELECT id, created_at FROM publicaciones WHERE autor_id = %s"
+    valores = [autor_id]
+    if despues:
+        fecha, ultimo_id = despues
+        # Expandido en vez de (created_at, id) < (%s, %s) para que MySQL lo use como rango del índice
+        sql += " AND (created_at < %s OR (created_at = %s AND id < %s))"
+        valores += [fecha, fecha, ultimo_id]
+    sql += " ORDER BY created_at DESC, id DESC LIMIT %s"
+    valores.append(limite + 1)
+
+    cursor.execute(sql, tuple(valores))
+    filas = cursor.fetchall()
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        siguiente = codificar_cursor(filas[-1]['created_at'], filas[-1]['id'])
+    return [fila['id'] for fila in filas], siguiente
+
+
+# ================== CONTADORES ==================
+
+def sumar(cursor, autor_id, publicaciones=0, likes=0, comentarios=0):
+    """Aplica los deltas a los contadores del autor en la transacción en curso (no hace commit)."""
+    cursor.execute(
+        """
+        INSERT INTO autores_contadores (autor_id, publicaciones, likes_recibidos, comentarios_recibidos)
+        VALUES (%s, GREATEST(%s, 0), GREATEST(%s, 0), GREATEST(%s, 0))
+        ON DUPLICATE KEY UPDATE
+            publicaciones = GREATEST(publicaciones + %s, 0),
+            likes_recibidos = GREATEST(likes_recibidos + %s, 0),
+            comentarios_recibidos = GREATEST(comentarios_recibidos + %s, 0)
+        """,
+        (autor_id, publicaciones, likes, comentarios, publicaciones, likes, comentarios)
+    )
+
+
+def contadores(cursor, autor_id):
+    cursor.execute(
+        "SELECT publicaciones, likes_recibidos, comentarios_recibidos FROM autores_contadores WHERE autor_id = %s",
+        (autor_id,)
+    )
+    fila = cursor.fetchone()
+    if not fila:
+        return {'publicaciones': 0, 'likes_recibidos': 0, 'comentarios_recibidos': 0}
+    return {clave: int(valor) for clave, valor in fila.items()}
+
+
+def recalcular(conn, autor_id=None):
+    """Reescribe los contadores (de un autor o de todos) contándolos desde las tablas. Devuelve cuántas filas tocó."""
+    filtro = "WHERE u.id = %s" if autor_id else ""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            f"""
+            INSERT INTO autores_contadores (autor_id, publicaciones, likes_recibidos, comentarios_recibidos)
+            SELECT u.id,
+                   (SELECT COUNT(*) FROM publicaciones p WHERE p.autor_id = u.id),
+                   (SELECT COUNT(*) FROM likes l JOIN publicaciones p ON p.id = l.publicacion_id
+                     WHERE p.autor_id = u.id),
+                   (SELECT COUNT(*) FROM comentarios c JOIN publicaciones p ON p.id = c.publicacion_id
+                     WHERE p.autor_id = u.id)
+            FROM users u {filtro}
+            ON DUPLICATE KEY UPDATE
+                publicaciones = VALUES(publicaciones),
+                likes_recibidos = VALUES(likes_recibidos),
+                comentarios_recibidos = VALUES(comentarios_recibidos)
+            """,
+            (autor_id,) if autor_id else ()
+        )
+        conn.commit()
+        return cursor.rowcount
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+@click.command('recalcular-contadores-autor')
+@click.option('--autor', 'autor_id', type=int, default=None, help="Solo este autor (por defecto, todos).")
+@with_appcontext
+def recalcular_comando(autor_id):
+    """Reconstruye autores_contadores desde publicaciones, likes y comentarios."""
+    filas = recalcular(get_db(), autor_id)
+    click.echo(f"Contadores de autor recalculados ({filas} filas afectadas).")
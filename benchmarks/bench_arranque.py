@@ -0,0 +1,208 @@
+"""
+Arranque en frío y memoria por worker.
+
+1. Importación: en --repeticiones procesos nuevos se mide cuánto tarda 'import app' (el módulo
+   entero: eventlet, Flask, extensiones, blueprints) y el RSS del proceso al terminar.
+2. gunicorn + eventlet (como el Dockerfile) con --workers N, sin y con preload_app: tiempo hasta
+   la primera respuesta de /metrics y, ya asentado, RSS y PSS de cada worker y del master. El PSS
+   reparte las páginas compartidas entre los procesos que las usan, así que refleja lo que
+   ahorra la precarga (copy-on-write) mejor que el RSS.
+
+La app apunta a un Redis local (standins.RedisLocal) y al almacenamiento local; MySQL no hace
+falta porque ninguna de estas mediciones hace consultas. Para comparar antes / después, correr el
+script en ambas versiones con --salida y comparar los JSON.
+
+Uso:
+    python benchmarks/bench_arranque.py [--repeticiones 5] [--workers 4] [--salida arranque.json]
+"""
+import argparse
+import json
+import os
+import platform
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import standins  # noqa: E402
+
+RAIZ = standins.RAIZ
+
+_SONDA_IMPORTACION = """
+import json, os, sys, time
+inicio = time.perf_counter()
+import app
+segundos = time.perf_counter() - inicio
+with open('/proc/self/status') as f:
+    rss = next(int(l.split()[1]) for l in f if l.startswith('VmRSS:'))
+print(json.dumps({'segundos': segundos, 'rss_kb': rss, 'modulos': len(sys.modules)}))
+sys.stdout.flush()
+os._exit(0)
+"""
+
+
+# ================== /proc ==================
+
+def memoria(pid):
+    """(RSS, PSS) en kB; PSS es None si el kernel no expone smaps_rollup."""
+    with open(f'/proc/{pid}/status') as f:
+        rss = next(int(linea.split()[1]) for linea in f if linea.startswith('VmRSS:'))
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            pss = next(int(linea.split()[1]) for linea in f if linea.startswith('Pss:'))
+    except (OSError, StopIteration):
+        pss = None
+    return rss, pss
+
+
+def hijos(pid):
+    encontrados = []
+    for entrada in os.listdir('/proc'):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entrada}/stat') as f:
+                campos = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(campos[1]) == pid:
+            encontrados.append(int(entrada))
+    return sorted(encontrados)
+
+
+# ================== MEDICIONES ==================
+
+def medir_importacion(entorno, repeticiones):
+    muestras = []
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, '-c', _SONDA_IMPORTACION], cwd=RAIZ, env={**os.environ, **entorno},
+            capture_output=True, text=True, timeout=120,
+        )
+        linea = salida.stdout.strip().splitlines()[-1] if salida.stdout.strip() else ''
+        if salida.returncode != 0 or not linea.startswith('{'):
+            raise RuntimeError(f"la importación falló:\n{salida.stderr[-2000:]}")
+        muestras.append(json.loads(linea))
+    tiempos = [m['segundos'] for m in muestras]
+    return {
+        'repeticiones': repeticiones,
+        'mediana_ms': round(statistics.median(tiempos) * 1000, 1),
+        'min_ms': round(min(tiempos) * 1000, 1),
+        'max_ms': round(max(tiempos) * 1000, 1),
+        'rss_mb': round(statistics.median(m['rss_kb'] for m in muestras) / 1024, 1),
+        'modulos': muestras[-1]['modulos'],
+    }
+
+
+def medir_gunicorn(entorno, workers, precarga, asentamiento, log_path):
+    puerto = standins.puerto_libre()
+    comando = [sys.executable, '-m', 'gunicorn', '--worker-class', 'eventlet', '--workers', str(workers),
+               '--bind', f'127.0.0.1:{puerto}', '--timeout', '120']
+    if precarga:
+        comando.append('--preload')
+    comando.append('app:app')
+    # GUNICORN_PRELOAD=0 para que gunicorn.conf.py no fuerce la precarga en la medición sin ella
+    entorno = {**os.environ, **entorno, 'GUNICORN_PRELOAD': '1' if precarga else '0'}
+
+    with open(log_path, 'ab') as log:
+        inicio = time.perf_counter()
+        proceso = subprocess.Popen(comando, cwd=RAIZ, env=entorno, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            primera = None
+            limite = time.monotonic() + 120
+            while primera is None:
+                if proceso.poll() is not None:
+                    raise RuntimeError(f"gunicorn terminó con código {proceso.returncode}; ver {log_path}")
+                if time.monotonic() > limite:
+                    raise RuntimeError(f"gunicorn no respondió en 120 s; ver {log_path}")
+                try:
+                    if requests.get(f'http://127.0.0.1:{puerto}/metrics', timeout=5).status_code == 200:
+                        primera = time.perf_counter() - inicio
+                except requests.RequestException:
+                    time.sleep(0.05)
+
+            time.sleep(asentamiento)
+            pids = hijos(proceso.pid)
+            por_worker = [memoria(pid) for pid in pids]
+            master = memoria(proceso.pid)
+        finally:
+            restantes = hijos(proceso.pid)
+            proceso.terminate()
+            try:
+                proceso.wait(20)
+            except subprocess.TimeoutExpired:
+                proceso.kill()
+                for pid in restantes:
+                    try:
+                        os.kill(pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+
+    rss = [r for r, _ in por_worker]
+    pss = [p for _, p in por_worker if p is not None]
+    return {
+        'precarga': precarga,
+        'workers': len(pids),
+        'primera_respuesta_ms': round(primera * 1000, 1),
+        'rss_worker_mb': round(statistics.mean(rss) / 1024, 1) if rss else None,
+        'pss_worker_mb': round(statistics.mean(pss) / 1024, 1) if pss else None,
+        'rss_master_mb': round(master[0] / 1024, 1),
+        'pss_total_mb': round((sum(pss) + (master[1] or 0)) / 1024, 1) if pss else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=5, help="Procesos para medir la importación")
+    parser.add_argument('--workers', type=int, default=4, help="Workers de gunicorn")
+    parser.add_argument('--asentamiento', type=float, default=3.0,
+                        help="Segundos tras la primera respuesta antes de leer la memoria")
+    parser.add_argument('--log-app', default=os.path.join(tempfile.gettempdir(), 'bench_arranque_app.log'))
+    parser.add_argument('--salida', help="Archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    redis = standins.RedisLocal().iniciar()
+    almacen = tempfile.mkdtemp(prefix='bench_arranque_')
+    entorno = {
+        'REDIS_URL': redis.url,
+        'STORAGE_BACKEND': 'local',
+        'STORAGE_LOCAL_ROOT': almacen,
+        'LOG_LEVEL': 'WARNING',
+        'METRICS_DIR': '',
+    }
+    try:
+        importacion = medir_importacion(entorno, args.repeticiones)
+        print(f"import app: mediana {importacion['mediana_ms']} ms (min {importacion['min_ms']}, "
+              f"max {importacion['max_ms']}), RSS {importacion['rss_mb']} MB, {importacion['modulos']} módulos")
+
+        gunicorn = []
+        for precarga in (False, True):
+            r = medir_gunicorn(entorno, args.workers, precarga, args.asentamiento, args.log_app)
+            gunicorn.append(r)
+            print(f"gunicorn {'con' if precarga else 'sin'} preload: primera respuesta {r['primera_respuesta_ms']} ms, "
+                  f"{r['workers']} workers, RSS/worker {r['rss_worker_mb']} MB, PSS/worker {r['pss_worker_mb']} MB, "
+                  f"PSS total {r['pss_total_mb']} MB")
+    finally:
+        redis.detener()
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump({
+                'fecha': datetime.now(timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'redis': redis.tipo,
+                'importacion': importacion,
+                'gunicorn': gunicorn,
+            }, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,563 @@
+"""
+Prueba de carga de punta a punta sin servicios externos: levanta los sustitutos de standins.py
+(MySQL, Redis, Cloudinary, SMTP e IA), carga flask.sql en una base nueva, siembra usuarios,
+publicaciones y comentarios, arranca la app con gunicorn + eventlet (como el Dockerfile) y la
+somete a cada escenario con N clientes concurrentes durante un tiempo fijo.
+
+Escenarios:
+    feed         GET /blog/publicaciones (a veces filtrando por categoría)
+    detalle      GET /blog/publicaciones/<id>/comentarios de una publicación al azar
+    likes        like / unlike de muchos usuarios sobre la misma publicación
+    comentarios  hilo de comentarios: comentar y releer el hilo de una publicación
+    login        POST /login (bcrypt incluido)
+    quiz         get-next-question / submit-answer (la sesión se abre contra la IA falsa)
+    fanout       un like y el tiempo hasta que los --oyentes clientes Socket.IO reciben 'like_update'
+
+Por escenario se informa peticiones, errores, throughput y p50/p95/p99/max en ms. Con --salida
+se guarda en JSON (línea base); con --comparar se contrasta con una línea base anterior y el
+proceso termina con código 1 si algún p95 empeora o el throughput cae más de --tolerancia.
+
+MySQL: si hay mysqld / mariadbd en el PATH se arranca uno temporal; si no, se usa el servidor de
+MYSQL_HOST / MYSQL_PORT / MYSQL_USER / MYSQL_PASSWORD (p. ej. el de docker-compose en el 3307),
+en el que se crea (y se borra) la base --base. Redis: redis-server del PATH o fakeredis.
+Opcional: websocket-client para que los clientes Socket.IO usen websocket en vez de polling.
+
+Uso:
+    python benchmarks/bench_carga.py [--escenarios feed,likes] [--concurrencia 16] [--duracion 20]
+                                     [--salida base.json] [--comparar base.json --tolerancia 0.15]
+"""
+import argparse
+import importlib.util
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import standins  # noqa: E402
+
+RAIZ = standins.RAIZ
+PASSWORD = 'bench-1234'
+JWT_SECRET = 'bench-jwt-secreto-solo-para-pruebas-locales'
+ESCENARIOS = ('feed', 'detalle', 'likes', 'comentarios', 'login', 'quiz', 'fanout')
+TIMEOUT_HTTP = 30
+
+
+# ================== DATOS ==================
+
+def sembrar(conexion, usuarios, publicaciones, comentarios_por_publicacion, comentarios_hilo):
+    """Usuarios verificados (todos con PASSWORD), publicaciones con una imagen y comentarios."""
+    from flask_bcrypt import generate_password_hash
+
+    hash_password = generate_password_hash(PASSWORD).decode()
+    rnd = random.Random(42)
+    with conexion.cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO users (username, email, password_hash, verificado, token, DescripUsuario) "
+            "VALUES (%s, %s, %s, TRUE, %s, %s)",
+            [(f"bench_{i}", f"bench_{i}@goe.local", hash_password, uuid.uuid4().hex, f"Usuario de prueba {i}")
+             for i in range(usuarios)],
+        )
+        cursor.execute("SELECT id, username, email FROM users ORDER BY id")
+        filas = cursor.fetchall()
+        ids_usuarios = [f[0] for f in filas]
+
+        cursor.executemany(
+            "INSERT INTO publicaciones (autor_id, titulo, texto, categoria_id, likes_count) VALUES (%s, %s, %s, %s, 0)",
+            [(rnd.choice(ids_usuarios), f"Publicación {i}", f"Texto de la publicación {i}. " * 20, rnd.randint(1, 6))
+             for i in range(publicaciones)],
+        )
+        cursor.execute("SELECT id FROM publicaciones ORDER BY id")
+        ids_publicaciones = [f[0] for f in cursor.fetchall()]
+
+        cursor.executemany(
+            "INSERT INTO imagenes_publicacion (publicacion_id, url, orden) VALUES (%s, %s, 1)",
+            [(p, f"http://127.0.0.1/bench/image/upload/v1/publicaciones/{p}/imagen.jpg") for p in ids_publicaciones],
+        )
+        caliente = ids_publicaciones[0]
+        comentarios = [
+            (p, rnd.choice(ids_usuarios), f"Comentario {j} en la publicación {p}")
+            for p in ids_publicaciones[1:] for j in range(comentarios_por_publicacion)
+        ] + [(caliente, rnd.choice(ids_usuarios), f"Comentario {j} del hilo") for j in range(comentarios_hilo)]
+        for i in range(0, len(comentarios), 1000):
+            cursor.executemany(
+                "INSERT INTO comentarios (publicacion_id, autor_id, texto) VALUES (%s, %s, %s)",
+                comentarios[i:i + 1000],
+            )
+    conexion.commit()
+    return {
+        'usuarios': [{'id': f[0], 'username': f[1], 'email': f[2]} for f in filas],
+        'publicaciones': ids_publicaciones,
+        'caliente': caliente,
+    }
+
+
+def emitir_tokens(usuarios):
+    """
+    Access tokens firmados con el mismo JWT_SECRET_KEY que recibe la app, con el claim
+    'verificado' que exigen likes y comentarios. Evita pasar 200 veces por bcrypt al preparar.
+    """
+    from flask import Flask
+    from flask_jwt_extended import JWTManager, create_access_token
+
+    app = Flask('bench_tokens')
+    app.config['JWT_SECRET_KEY'] = JWT_SECRET
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = False
+    JWTManager(app)
+    with app.app_context():
+        for u in usuarios:
+            u['token'] = create_access_token(
+                identity=str(u['id']),
+                additional_claims={'verificado': True, 'username': u['username'], 'user_id': u['id']},
+            )
+
+
+# ================== APP ==================
+
+class App:
+    """La app real bajo gunicorn + eventlet, apuntando a los sustitutos."""
+
+    def __init__(self, entorno, workers=1):
+        self.puerto = standins.puerto_libre()
+        self.entorno = entorno
+        self.workers = workers
+        self._proceso = None
+        self._log = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.puerto}"
+
+    def iniciar(self, log_path):
+        self._log = open(log_path, 'wb')
+        self._proceso = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--worker-class', 'eventlet', '--workers', str(self.workers),
+             '--bind', f'127.0.0.1:{self.puerto}', '--timeout', '120', 'app:app'],
+            cwd=RAIZ, env={**os.environ, **self.entorno}, stdout=self._log, stderr=subprocess.STDOUT,
+        )
+        standins.esperar_puerto(self.puerto, timeout=60, proceso=self._proceso)
+        return self
+
+    def detener(self):
+        if self._proceso:
+            self._proceso.terminate()
+            try:
+                self._proceso.wait(20)
+            except subprocess.TimeoutExpired:
+                self._proceso.kill()
+        if self._log:
+            self._log.close()
+
+
+# ================== MEDICIÓN ==================
+
+def percentil(ordenadas, p):
+    if not ordenadas:
+        return None
+    return ordenadas[max(0, math.ceil(p / 100 * len(ordenadas)) - 1)]
+
+
+def _ms(segundos):
+    return round(segundos * 1000, 2) if segundos is not None else None
+
+
+def resumir(latencias, errores, segundos):
+    ordenadas = sorted(latencias)
+    return {
+        'peticiones': len(ordenadas),
+        'errores': errores,
+        'rps': round(len(ordenadas) / segundos, 1) if segundos else 0.0,
+        'p50_ms': _ms(percentil(ordenadas, 50)),
+        'p95_ms': _ms(percentil(ordenadas, 95)),
+        'p99_ms': _ms(percentil(ordenadas, 99)),
+        'max_ms': _ms(ordenadas[-1] if ordenadas else None),
+    }
+
+
+def correr(operacion, estados, duracion, calentamiento):
+    """
+    Un hilo por estado; cada uno repite operacion(estado) -> bool hasta agotar el tiempo.
+    Solo se miden las operaciones que empiezan después del calentamiento.
+    """
+    inicio = time.perf_counter()
+    desde = inicio + calentamiento
+    hasta = desde + duracion
+    latencias = [[] for _ in estados]
+    errores = [0] * len(estados)
+
+    def bucle(i):
+        estado = estados[i]
+        while True:
+            t0 = time.perf_counter()
+            if t0 >= hasta:
+                return
+            try:
+                ok = operacion(estado)
+            except Exception:
+                ok = False
+            if t0 >= desde:
+                if ok:
+                    latencias[i].append(time.perf_counter() - t0)
+                else:
+                    errores[i] += 1
+
+    hilos = [threading.Thread(target=bucle, args=(i,), daemon=True) for i in range(len(estados))]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return resumir([v for lista in latencias for v in lista], sum(errores), duracion)
+
+
+# ================== ESCENARIOS ==================
+
+def _sesion(usuario=None):
+    sesion = requests.Session()
+    if usuario is not None:
+        sesion.headers['Authorization'] = f"Bearer {usuario['token']}"
+    return sesion
+
+
+def _repartir(usuarios, n):
+    """n estados con usuarios disjuntos: ningún par de hilos toca el mismo like o la misma sesión de quiz."""
+    return [{'usuarios': usuarios[i::n], 'turno': 0} for i in range(n)]
+
+
+def escenario_feed(ctx, n):
+    estados = [{'sesion': _sesion(), 'rnd': random.Random(i)} for i in range(n)]
+
+    def operacion(e):
+        parametros = {'categoria_id': e['rnd'].randint(1, 6)} if e['rnd'].random() < 0.3 else None
+        return e['sesion'].get(f"{ctx['url']}/blog/publicaciones", params=parametros, timeout=TIMEOUT_HTTP).ok
+
+    return operacion, estados
+
+
+def escenario_detalle(ctx, n):
+    estados = [{'sesion': _sesion(), 'rnd': random.Random(i)} for i in range(n)]
+
+    def operacion(e):
+        publicacion = e['rnd'].choice(ctx['publicaciones'])
+        return e['sesion'].get(f"{ctx['url']}/blog/publicaciones/{publicacion}/comentarios", timeout=TIMEOUT_HTTP).ok
+
+    return operacion, estados
+
+
+def _alternar_like(ctx, e, sesiones):
+    """Like si el usuario del turno no lo había dado, unlike si sí. Devuelve la respuesta."""
+    usuario = e['usuarios'][e['turno'] % len(e['usuarios'])]
+    e['turno'] += 1
+    sesion = sesiones.setdefault(usuario['id'], _sesion(usuario))
+    url = f"{ctx['url']}/blog/publicaciones/{ctx['caliente']}"
+    if usuario['id'] in e.setdefault('con_like', set()):
+        e['con_like'].discard(usuario['id'])
+        return sesion.delete(f"{url}/unlike", timeout=TIMEOUT_HTTP)
+    e['con_like'].add(usuario['id'])
+    return sesion.post(f"{url}/like", timeout=TIMEOUT_HTTP)
+
+
+def escenario_likes(ctx, n):
+    estados = _repartir(ctx['usuarios'], n)
+    for e in estados:
+        e['sesiones'] = {}
+    return (lambda e: _alternar_like(ctx, e, e['sesiones']).ok), estados
+
+
+def escenario_comentarios(ctx, n):
+    estados = _repartir(ctx['usuarios'], n)
+    for e in estados:
+        e['sesion'] = _sesion(e['usuarios'][0])
+
+    def operacion(e):
+        e['turno'] += 1
+        if e['turno'] % 2:
+            return e['sesion'].post(
+                f"{ctx['url']}/blog/comentar-publicacion",
+                json={'publicacion_id': ctx['caliente'], 'comentario': f"Comentario de carga {e['turno']}"},
+                timeout=TIMEOUT_HTTP,
+            ).ok
+        return e['sesion'].get(f"{ctx['url']}/blog/publicaciones/{ctx['caliente']}/comentarios", timeout=TIMEOUT_HTTP).ok
+
+    return operacion, estados
+
+
+def escenario_login(ctx, n):
+    estados = [{'sesion': _sesion(), 'rnd': random.Random(i)} for i in range(n)]
+
+    def operacion(e):
+        usuario = e['rnd'].choice(ctx['usuarios'])
+        return e['sesion'].post(f"{ctx['url']}/login", json={'email': usuario['email'], 'password': PASSWORD},
+                                timeout=TIMEOUT_HTTP).ok
+
+    return operacion, estados
+
+
+def _abrir_quiz(ctx, sesion):
+    return sesion.post(f"{ctx['url']}/auth_juego/start-game-session",
+                       json={'tema': 'Python', 'dificultad': 'Fácil', 'curso': 'Python básico'},
+                       timeout=TIMEOUT_HTTP + 30)
+
+
+def escenario_quiz(ctx, n):
+    """
+    Cada hilo juega con su propio usuario: pide la pregunta activa y responde (bien la mitad de
+    las veces). La sesión se abre una vez por usuario al preparar (pasa por la IA falsa) y se reabre
+    si se acaban las preguntas.
+    """
+    estados = []
+    for e in _repartir(ctx['usuarios'], n):
+        usuario = e['usuarios'][0]
+        e.update({'usuario': usuario, 'sesion': _sesion(usuario), 'pregunta': None, 'rnd': random.Random(usuario['id'])})
+        respuesta = _abrir_quiz(ctx, e['sesion'])
+        if not respuesta.ok:
+            raise RuntimeError(f"start-game-session devolvió {respuesta.status_code}: {respuesta.text[:200]}")
+        estados.append(e)
+
+    def operacion(e):
+        base = f"{ctx['url']}/auth_juego"
+        if e['pregunta'] is None:
+            r = e['sesion'].get(f"{base}/get-next-question/{e['usuario']['username']}", timeout=TIMEOUT_HTTP)
+            if r.status_code == 404:
+                return _abrir_quiz(ctx, e['sesion']).ok
+            if r.ok:
+                e['pregunta'] = r.json()['pregunta']
+            return r.ok
+        pregunta, e['pregunta'] = e['pregunta'], None
+        respuesta = pregunta['respuesta'] if e['rnd'].random() < 0.5 else 'z'
+        return e['sesion'].post(f"{base}/submit-answer/{e['usuario']['username']}", json={'respuesta': respuesta},
+                                timeout=TIMEOUT_HTTP).ok
+
+    return operacion, estados
+
+
+class Oyentes:
+    """Clientes Socket.IO unidos a la sala de la publicación caliente; cuentan los 'like_update' recibidos."""
+
+    def __init__(self, url, sala, n):
+        import socketio
+
+        self.recibidos = [0] * n
+        self.condicion = threading.Condition()
+        transportes = ['websocket'] if importlib.util.find_spec('websocket') else ['polling']
+        self.clientes = []
+        for i in range(n):
+            cliente = socketio.Client(reconnection=False)
+            cliente.on('like_update', self._contador(i))
+            cliente.connect(url, transports=transportes, wait_timeout=10)
+            cliente.emit('join_room', {'room': sala})
+            self.clientes.append(cliente)
+        time.sleep(1.0)  # que los join_room lleguen antes del primer like
+
+    def _contador(self, i):
+        def al_recibir(_datos):
+            with self.condicion:
+                self.recibidos[i] += 1
+                self.condicion.notify_all()
+        return al_recibir
+
+    def esperar(self, minimos, timeout):
+        with self.condicion:
+            return self.condicion.wait_for(
+                lambda: all(r >= m for r, m in zip(self.recibidos, minimos)), timeout=timeout)
+
+    def cerrar(self):
+        for cliente in self.clientes:
+            try:
+                cliente.disconnect()
+            except Exception:
+                pass
+
+
+def escenario_fanout(ctx, n):
+    """
+    Un único emisor (los eventos se cuentan por orden de llegada, así que no puede haber dos likes
+    en vuelo): latencia = del POST del like hasta que los --oyentes clientes reciben el evento.
+    """
+    oyentes = Oyentes(ctx['url'], f"publicacion_{ctx['caliente']}", ctx['oyentes'])
+    ctx['_cerrar'].append(oyentes.cerrar)
+    estado = _repartir(ctx['usuarios'], 1)[0]
+    estado['sesiones'] = {}
+
+    def operacion(e):
+        with oyentes.condicion:
+            minimos = [r + 1 for r in oyentes.recibidos]
+        if not _alternar_like(ctx, e, e['sesiones']).ok:
+            return False
+        return oyentes.esperar(minimos, timeout=10)
+
+    return operacion, [estado]
+
+
+FABRICAS = {
+    'feed': escenario_feed,
+    'detalle': escenario_detalle,
+    'likes': escenario_likes,
+    'comentarios': escenario_comentarios,
+    'login': escenario_login,
+    'quiz': escenario_quiz,
+    'fanout': escenario_fanout,
+}
+
+
+# ================== COMPARACIÓN ==================
+
+def comparar(actual, base, tolerancia):
+    """Regresiones de 'actual' frente a 'base': p95 más alto o rps más bajo que la tolerancia."""
+    regresiones = []
+    for nombre, medida in actual['escenarios'].items():
+        anterior = base.get('escenarios', {}).get(nombre)
+        if not anterior or not anterior.get('peticiones') or not medida.get('peticiones'):
+            continue
+        if anterior['p95_ms'] and medida['p95_ms'] > anterior['p95_ms'] * (1 + tolerancia):
+            regresiones.append(f"{nombre}: p95 {anterior['p95_ms']} -> {medida['p95_ms']} ms")
+        if medida['rps'] < anterior['rps'] * (1 - tolerancia):
+            regresiones.append(f"{nombre}: rps {anterior['rps']} -> {medida['rps']}")
+        if medida['errores'] > anterior['errores']:
+            regresiones.append(f"{nombre}: errores {anterior['errores']} -> {medida['errores']}")
+    return regresiones
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+# ================== MAIN ==================
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escenarios', default=','.join(ESCENARIOS))
+    parser.add_argument('--concurrencia', type=int, default=16, help="Clientes simultáneos por escenario")
+    parser.add_argument('--duracion', type=float, default=20, help="Segundos medidos por escenario")
+    parser.add_argument('--calentamiento', type=float, default=3, help="Segundos descartados al empezar")
+    parser.add_argument('--workers', type=int, default=1, help="Workers de gunicorn")
+    parser.add_argument('--usuarios', type=int, default=200)
+    parser.add_argument('--publicaciones', type=int, default=300)
+    parser.add_argument('--comentarios', type=int, default=3, help="Comentarios por publicación")
+    parser.add_argument('--comentarios-hilo', type=int, default=200, help="Comentarios iniciales del hilo caliente")
+    parser.add_argument('--oyentes', type=int, default=50, help="Clientes Socket.IO del escenario fanout")
+    parser.add_argument('--latencia-ia-ms', type=float, default=800)
+    parser.add_argument('--latencia-cloudinary-ms', type=float, default=50)
+    parser.add_argument('--latencia-smtp-ms', type=float, default=50)
+    parser.add_argument('--base', default='goe_bench', help="Base de datos que se crea (y se borra) para la prueba")
+    parser.add_argument('--mantener-base', action='store_true', help="No borrar la base al terminar")
+    parser.add_argument('--log-app', default=os.path.join(tempfile.gettempdir(), 'bench_carga_app.log'),
+                        help="Salida de gunicorn (errores de la app durante la prueba)")
+    parser.add_argument('--salida', help="Archivo JSON donde guardar los resultados")
+    parser.add_argument('--comparar', help="Línea base JSON con la que comparar")
+    parser.add_argument('--tolerancia', type=float, default=0.15)
+    args = parser.parse_args()
+
+    escenarios = [e.strip() for e in args.escenarios.split(',') if e.strip()]
+    desconocidos = set(escenarios) - set(FABRICAS)
+    if desconocidos:
+        parser.error(f"escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+
+    servicios = []
+    ctx = {'_cerrar': [], 'oyentes': args.oyentes}
+    mysql = None
+    try:
+        mysql = standins.MySQLLocal() if standins.MySQLLocal.disponible() else standins.MySQLExterno()
+        try:
+            mysql.iniciar()
+        except Exception as e:
+            print(f"No hay MySQL disponible ({type(mysql).__name__}: {e}). Instala mysqld/mariadbd o define "
+                  f"MYSQL_HOST/MYSQL_PORT/MYSQL_USER/MYSQL_PASSWORD.", file=sys.stderr)
+            return 2
+        servicios.append(mysql)
+        redis_local = standins.RedisLocal().iniciar()
+        servicios.append(redis_local)
+        cloudinary = standins.CloudinaryFalso(latencia_ms=args.latencia_cloudinary_ms).iniciar()
+        servicios.append(cloudinary)
+        smtp = standins.SMTPSumidero(latencia_ms=args.latencia_smtp_ms).iniciar()
+        servicios.append(smtp)
+        ia = standins.IAFalsa(latencia_ms=args.latencia_ia_ms, preguntas=500).iniciar()
+        servicios.append(ia)
+
+        conexion = mysql.conectar()
+        avisos = standins.cargar_esquema(conexion, args.base)
+        conexion.select_db(args.base)
+        datos = sembrar(conexion, args.usuarios, args.publicaciones, args.comentarios, args.comentarios_hilo)
+        conexion.close()
+        for aviso in avisos:
+            print(f"aviso: {aviso}", file=sys.stderr)
+        emitir_tokens(datos['usuarios'])
+        print(f"mysql={mysql.tipo} redis={redis_local.tipo}; {args.usuarios} usuarios, "
+              f"{args.publicaciones} publicaciones sembradas", file=sys.stderr)
+
+        entorno = {
+            'MYSQL_HOST': mysql.host, 'MYSQL_PORT': str(mysql.puerto), 'MYSQL_USER': mysql.usuario,
+            'MYSQL_PASSWORD': mysql.password, 'MYSQL_DB': args.base,
+            'REDIS_URL': redis_local.url, 'JWT_SECRET_KEY': JWT_SECRET,
+            'LOG_LEVEL': 'WARNING', 'SQL_N1_MODE': 'warn',
+            **cloudinary.entorno(), **smtp.entorno(), **ia.entorno(),
+        }
+        app = App(entorno, workers=args.workers).iniciar(args.log_app)
+        servicios.append(app)
+        ctx.update(datos, url=app.url)
+
+        resultados = {}
+        for nombre in escenarios:
+            print(f"{nombre}: preparando...", file=sys.stderr)
+            operacion, estados = FABRICAS[nombre](ctx, args.concurrencia)
+            resultados[nombre] = correr(operacion, estados, args.duracion, args.calentamiento)
+            r = resultados[nombre]
+            print(f"{nombre:12} {r['peticiones']:7d} ok {r['errores']:5d} err {r['rps']:8.1f} rps  "
+                  f"p50 {r['p50_ms']} p95 {r['p95_ms']} p99 {r['p99_ms']} ms", file=sys.stderr)
+
+        informe = {
+            'fecha': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': _commit(),
+            'python': platform.python_version(),
+            'parametros': {k: v for k, v in vars(args).items() if k not in ('salida', 'comparar', 'log_app')},
+            'sustitutos': {'mysql': mysql.tipo, 'redis': redis_local.tipo},
+            'externos': {'subidas_cloudinary': cloudinary.subidas, 'correos_smtp': smtp.recibidos,
+                         'llamadas_ia': ia.llamadas},
+            'escenarios': resultados,
+        }
+        texto = json.dumps(informe, indent=2, ensure_ascii=False)
+        if args.salida:
+            with open(args.salida, 'w', encoding='utf-8') as f:
+                f.write(texto + '\n')
+        print(texto)
+
+        if args.comparar:
+            with open(args.comparar, encoding='utf-8') as f:
+                regresiones = comparar(informe, json.load(f), args.tolerancia)
+            for linea in regresiones:
+                print(f"REGRESIÓN {linea}", file=sys.stderr)
+            if regresiones:
+                return 1
+        return 0
+    finally:
+        for cerrar in ctx['_cerrar']:
+            cerrar()
+        if mysql is not None and mysql in servicios and not args.mantener_base \
+                and isinstance(mysql, standins.MySQLExterno):
+            try:
+                conexion = mysql.conectar()
+                with conexion.cursor() as cursor:
+                    cursor.execute(f"DROP DATABASE IF EXISTS `{args.base}`")
+                conexion.close()
+            except Exception:
+                pass
+        for servicio in reversed(servicios):
+            servicio.detener()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Compara JSON (lo que usan hoy Socket.IO y json.dumps en Redis) contra MessagePack (codec.py)
+para mensajes realistas del feed y de comentarios: coste de codificar/decodificar y bytes.
+
+Uso:
+    python benchmarks/bench_codec.py [--iteraciones 2000] [--json-salida resultados.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import codec  # noqa: E402
+
+
+def _autor(i):
+    return {
+        "autor_id": i,
+        "autor_username": f"usuario_{i}",
+        "autor_foto_perfil_url": f"https://res.cloudinary.com/demo/image/upload/v1712345678/fotos_perfil/{i}/profile_picture.jpg",
+        "autor_verificado": True,
+    }
+
+
+def _comentario(i, publicacion_id, base):
+    creado = (base + timedelta(minutes=i)).isoformat()
+    return {
+        "id": 1000 + i,
+        "publicacion_id": publicacion_id,
+        **_autor(i % 37),
+        "texto": "¡Muy buen aporte! Me sirvió bastante para entender el tema, gracias por compartir. " * 2,
+        "created_at": creado,
+        "edited_at": creado,
+    }
+
+
+def _publicacion(i, base):
+    return {
+        "id": i,
+        **_autor(i % 50),
+        "titulo": f"Cómo preparar la partida #{i}: guía rápida",
+        "content": "Texto de la publicación con acentos (á, é, í, ó, ú, ñ) y algo de longitud. " * 6,
+        "created_at": (base - timedelta(hours=i)).isoformat(),
+        "categoria_id": 1 + i % 6,
+        "categoria_nombre": "Tutoriales",
+        "imageUrl": f"https://res.cloudinary.com/demo/image/upload/v1712345678/publicaciones/{i % 50}/{i}/imagen.jpg",
+        "imagenes": [{"id": i * 10, "url": f"https://res.cloudinary.com/demo/image/upload/publicaciones/{i}/a.jpg"}],
+        "imagenes_adicionales_urls": [],
+        "likes": 120 + i,
+    }
+
+
+def mensajes_realistas():
+    base = datetime(2025, 5, 1, 12, 0, 0)
+    return {
+        "like_update": {"publicacion_id": 42, "likes": 1532, "user_id": 981, "user_has_liked": True},
+        "comment_added": {"publicacion_id": 42, "comment": _comentario(1, 42, base)},
+        "publication_events (1 like + 20 comentarios)": {
+            "publicacion_id": 42,
+            "seq": 17,
+            "like": {"publicacion_id": 42, "likes": 1532, "user_id": 981, "user_has_liked": True},
+            "events": [{"type": "comment_added", "data": {"publicacion_id": 42, "comment": _comentario(i, 42, base)}}
+                       for i in range(20)],
+        },
+        "batched_publication_updates (25 publicaciones)": [_publicacion(i, base) for i in range(25)],
+        "feed (50 publicaciones)": [_publicacion(i, base) for i in range(50)],
+        "pregunta_actual": {
+            "pregunta": "¿Cuál es la complejidad de búsqueda en un árbol binario balanceado?",
+            "opciones": ["O(1)", "O(log n)", "O(n)", "O(n log n)"],
+            "respuesta": "O(log n)",
+            "explicacion": "En cada nivel se descarta la mitad de los nodos restantes.",
+        },
+    }
+
+
+def _medir(fn, arg, iteraciones):
+    inicio = time.perf_counter()
+    for _ in range(iteraciones):
+        fn(arg)
+    return (time.perf_counter() - inicio) / iteraciones * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iteraciones", type=int, default=2000)
+    parser.add_argument("--json-salida", help="Guarda los resultados en este archivo JSON")
+    args = parser.parse_args()
+
+    if not codec.msgpack_disponible():
+        print("msgpack no está instalado: solo se medirá JSON (pip install msgpack).")
+
+    resultados = []
+    for nombre, mensaje in mensajes_realistas().items():
+        # Socket.IO serializa los payloads con json.dumps (ensure_ascii por defecto)
+        json_bytes = json.dumps(mensaje).encode("utf-8")
+        fila = {
+            "mensaje": nombre,
+            "json_bytes": len(json_bytes),
+            "json_encode_us": _medir(json.dumps, mensaje, args.iteraciones),
+            "json_decode_us": _medir(json.loads, json_bytes, args.iteraciones),
+        }
+        if codec.msgpack_disponible():
+            mp_bytes = codec.pack(mensaje)
+            fila.update({
+                "msgpack_bytes": len(mp_bytes),
+                "msgpack_encode_us": _medir(codec.pack, mensaje, args.iteraciones),
+                "msgpack_decode_us": _medir(codec.unpack, mp_bytes, args.iteraciones),
+            })
+        resultados.append(fila)
+
+    print(f"{'mensaje':48} {'json B':>8} {'mp B':>8} {'ahorro':>7} {'enc json':>9} {'enc mp':>8} {'dec json':>9} {'dec mp':>8}")
+    for f in resultados:
+        mp_b = f.get("msgpack_bytes")
+        ahorro = f"{100 * (1 - mp_b / f['json_bytes']):.0f}%" if mp_b else "-"
+        print(f"{f['mensaje']:48} {f['json_bytes']:>8} {mp_b or '-':>8} {ahorro:>7} "
+              f"{f['json_encode_us']:>8.1f}u {f.get('msgpack_encode_us', 0):>7.1f}u "
+              f"{f['json_decode_us']:>8.1f}u {f.get('msgpack_decode_us', 0):>7.1f}u")
+
+    if args.json_salida:
+        with open(args.json_salida, "w", encoding="utf-8") as fh:
+            json.dump(resultados, fh, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
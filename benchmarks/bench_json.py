@@ -0,0 +1,123 @@
+"""
+Mide cuánto cuesta convertir a JSON una página de 1.000 publicaciones del feed, tal como salen de
+PyMySQL (datetime, TINYINT(1) como 0/1):
+
+  - antes:  bucle por fila (.isoformat(), bool(), renombrar likes_count) + jsonify de Flask por defecto
+  - stdlib: como_bool() + ProveedorJSON (json_provider.py) sin orjson
+  - orjson: como_bool() + ProveedorJSON con orjson (si está instalado)
+
+Uso:
+    python benchmarks/bench_json.py [--publicaciones 1000] [--iteraciones 30] [--json-salida resultados.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+import json_provider  # noqa: E402
+
+
+def _fila(i, base, renombrada):
+    """Fila del feed como la devuelve el cursor, ya con imágenes y srcsets."""
+    fila = {
+        "id": i,
+        "autor_id": i % 50,
+        "titulo": f"Cómo preparar la partida #{i}: guía rápida",
+        "content": "Texto de la publicación con acentos (á, é, í, ó, ú, ñ) y algo de longitud. " * 6,
+        "created_at": base - timedelta(minutes=i, microseconds=i),
+        "comments_count": i % 17,
+        "images_count": 1,
+        "categoria_id": 1 + i % 6,
+        "categoria_nombre": "Tutoriales",
+        "autor_username": f"usuario_{i % 50}",
+        "autor_foto_perfil_url": f"https://res.cloudinary.com/demo/image/upload/fotos_perfil/{i % 50}.jpg" if i % 3 else None,
+        "autor_verificado": i % 2,
+        "imagenes": [{"id": i * 10, "url": f"https://res.cloudinary.com/demo/image/upload/publicaciones/{i}/a.jpg",
+                      "srcset": {"webp": f"https://cdn.example/{i}/a-480.webp 480w, https://cdn.example/{i}/a-960.webp 960w"}}],
+        "imageUrl": f"https://res.cloudinary.com/demo/image/upload/publicaciones/{i}/a.jpg",
+        "imagenes_adicionales_urls": [],
+    }
+    fila["likes" if renombrada else "likes_count"] = 120 + i
+    return fila
+
+
+def _antes(app, filas):
+    for pub in filas:
+        if isinstance(pub['created_at'], datetime):
+            pub['created_at'] = pub['created_at'].isoformat()
+        pub['autor_verificado'] = bool(pub['autor_verificado'])
+        pub['autor_foto_perfil_url'] = pub['autor_foto_perfil_url'] if pub['autor_foto_perfil_url'] else None
+        pub['likes'] = pub.pop('likes_count')
+    return app.json.response(filas).get_data()
+
+
+def _despues(app, filas):
+    json_provider.como_bool(filas, ('autor_verificado',))
+    return app.json.response(filas).get_data()
+
+
+def _medir(app, fn, paginas):
+    with app.app_context():
+        inicio = time.perf_counter()
+        for filas in paginas:
+            cuerpo = fn(app, filas)
+        return (time.perf_counter() - inicio) / len(paginas) * 1000, cuerpo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--publicaciones", type=int, default=1000)
+    parser.add_argument("--iteraciones", type=int, default=30)
+    parser.add_argument("--json-salida", help="Guarda los resultados en este archivo JSON")
+    args = parser.parse_args()
+
+    base = datetime(2025, 5, 1, 12, 0, 0)
+    # Páginas construidas de antemano: el bucle de 'antes' modifica las filas
+    paginas = lambda renombrada: [[_fila(i, base, renombrada) for i in range(args.publicaciones)]  # noqa: E731
+                                  for _ in range(args.iteraciones)]
+
+    app_antes = Flask("antes")
+    app_antes.json = DefaultJSONProvider(app_antes)
+    app_nuevo = Flask("nuevo")
+    json_provider.init_app(app_nuevo)
+
+    orjson = json_provider.orjson
+    variantes = [("antes", app_antes, _antes, False), ("stdlib", app_nuevo, _despues, True)]
+    if orjson is not None:
+        variantes.append(("orjson", app_nuevo, _despues, True))
+    else:
+        print("orjson no está instalado: solo se medirá la stdlib (pip install orjson).")
+
+    resultados = []
+    referencia = None
+    for nombre, app, fn, renombrada in variantes:
+        json_provider.orjson = orjson if nombre == "orjson" else None
+        ms, cuerpo = _medir(app, fn, paginas(renombrada))
+        datos = json.loads(cuerpo)
+        if referencia is None:
+            referencia = datos
+        elif datos != referencia:
+            print(f"AVISO: la salida de '{nombre}' no coincide con la de 'antes'.")
+        resultados.append({"variante": nombre, "ms_por_pagina": round(ms, 2), "bytes": len(cuerpo)})
+    json_provider.orjson = orjson
+
+    print(f"{args.publicaciones} publicaciones por página, {args.iteraciones} iteraciones")
+    print(f"{'variante':10} {'ms/página':>10} {'bytes':>10} {'x antes':>8}")
+    for f in resultados:
+        print(f"{f['variante']:10} {f['ms_por_pagina']:>10.2f} {f['bytes']:>10} "
+              f"{resultados[0]['ms_por_pagina'] / f['ms_por_pagina']:>7.1f}x")
+
+    if args.json_salida:
+        with open(args.json_salida, "w", encoding="utf-8") as fh:
+            json.dump(resultados, fh, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
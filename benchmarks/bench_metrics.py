@@ -0,0 +1,104 @@
+"""
+Mide el coste de la instrumentación de metrics.py: la misma ruta trivial servida por el test client
+de Flask con y sin métricas (3 consultas SQL y 2 comandos Redis simulados por petición a través de
+los mismos observadores que usan extensions.get_db y redis_store), y el tiempo de generar /metrics.
+
+Uso:
+    python benchmarks/bench_metrics.py [--peticiones 5000] [--endpoints 60]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask, jsonify  # noqa: E402
+
+import extensions  # noqa: E402
+import metrics  # noqa: E402
+import redis_store  # noqa: E402
+
+
+def _crear_app(con_metricas, directorio=None):
+    app = Flask(__name__)
+    app.config['METRICS_DIR'] = directorio
+
+    @app.route('/ping')
+    def ping():
+        # Sin métricas las listas de observadores están vacías (metrics.init_app aún no se llamó)
+        for _ in range(3):
+            for observador in extensions._observadores_sql:
+                observador("SELECT 1", 0.0005, 1, False)
+        for _ in range(2):
+            for observador in redis_store._observadores:
+                observador('GET', 0.0002, False)
+        return jsonify({"ok": True})
+
+    if con_metricas:
+        metrics.init_app(app)
+    return app
+
+
+def _medir(app, peticiones):
+    cliente = app.test_client()
+    for _ in range(200):  # calentamiento
+        cliente.get('/ping')
+    mejor = None
+    for _ in range(5):  # mejor de 5 rondas: menos ruido del planificador
+        inicio = time.perf_counter()
+        for _ in range(peticiones // 5):
+            cliente.get('/ping')
+        ronda = (time.perf_counter() - inicio) / (peticiones // 5) * 1e6
+        mejor = ronda if mejor is None else min(mejor, ronda)
+    return mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--peticiones", type=int, default=5000)
+    parser.add_argument("--endpoints", type=int, default=60, help="Endpoints distintos para medir /metrics")
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix='bench_metrics_')
+    try:
+        sin = _medir(_crear_app(False), args.peticiones)
+        con = _medir(_crear_app(True, directorio), args.peticiones)
+        print(f"{'sin métricas':24} {sin:8.1f} us/petición")
+        print(f"{'con métricas':24} {con:8.1f} us/petición  (+{con - sin:.1f} us, {100 * (con - sin) / sin:.1f} %)")
+
+        # Coste aislado de los hooks (sin el ruido del test client): inicio + 3 SQL + 2 Redis + fin
+        app = _crear_app(False)
+        with app.test_request_context('/ping'):
+            inicio = time.perf_counter()
+            for _ in range(args.peticiones):
+                metrics._inicio_peticion()
+                for _ in range(3):
+                    metrics._observar_sql("SELECT 1", 0.0005, 1, False)
+                for _ in range(2):
+                    metrics._observar_redis('GET', 0.0002, False)
+                metrics._fin_peticion()
+            hooks = (time.perf_counter() - inicio) / args.peticiones * 1e6
+        print(f"{'solo hooks':24} {hooks:8.1f} us/petición")
+
+        # /metrics con muchos endpoints y 4 workers simulados
+        for i in range(args.endpoints):
+            metrics._observar('goe_http_request_duration_seconds', ('blog', f'blog.ruta_{i}', 'GET'), 0.02,
+                              metrics.BUCKETS_LATENCIA)
+            metrics._sumar('goe_http_requests_total', ('blog', f'blog.ruta_{i}', 'GET', '200'))
+        metrics.volcar()
+        propio = os.path.join(directorio, f"{os.getpid()}.json")
+        for pid in (1, 2, 3):
+            shutil.copy(propio, os.path.join(directorio, f"{10_000_000 + pid}.json"))
+        inicio = time.perf_counter()
+        texto = metrics.exportar()
+        duracion = (time.perf_counter() - inicio) * 1000
+        print(f"{'/metrics (4 workers)':24} {duracion:8.2f} ms  ({len(texto.splitlines())} líneas)")
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,625 @@
+"""
+Sustitutos locales de los servicios externos de la app, para levantarla sin red ni contenedores
+(los usa bench_carga.py; también se pueden arrancar solos para desarrollo):
+
+    MySQL       mysqld / mariadbd del PATH con un datadir temporal, o un servidor existente
+                (MYSQL_HOST, ...). En ambos casos el esquema se carga desde flask.sql.
+    Redis       redis-server del PATH o, si no está, el servidor TCP de fakeredis.
+    Cloudinary  servidor HTTP que acepta subidas (image / raw), las sirve y responde a los
+                borrados de la Admin API. La app llega a él con CLOUDINARY_UPLOAD_PREFIX.
+    SMTP        sumidero con STARTTLS (certificado autofirmado generado con openssl) y AUTH.
+    IA          POST /start-game con un curso y N preguntas, con latencia configurable.
+
+Uso:
+    python benchmarks/standins.py [--latencia-ia-ms 800]   # arranca todo y muestra las variables
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import re
+import shutil
+import socket
+import socketserver
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def esperar_puerto(puerto, timeout=30.0, proceso=None):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if proceso is not None and proceso.poll() is not None:
+            raise RuntimeError(f"El proceso terminó (código {proceso.returncode}) antes de abrir el puerto {puerto}")
+        try:
+            with socket.create_connection(('127.0.0.1', puerto), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Nada escucha en 127.0.0.1:{puerto} tras {timeout:.0f} s")
+
+
+class _ServidorHTTP(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def _arrancar_hilo(servidor, nombre):
+    hilo = threading.Thread(target=servidor.serve_forever, name=nombre, daemon=True)
+    hilo.start()
+    return hilo
+
+
+# ================== REDIS ==================
+
+class RedisLocal:
+    """redis-server sin persistencia en un puerto libre; fakeredis por TCP si no está instalado."""
+
+    def __init__(self):
+        self.puerto = puerto_libre()
+        self.tipo = None
+        self._proceso = None
+        self._servidor = None
+
+    @property
+    def url(self):
+        return f"redis://127.0.0.1:{self.puerto}/0"
+
+    def iniciar(self):
+        binario = shutil.which('redis-server')
+        if binario:
+            self._proceso = subprocess.Popen(
+                [binario, '--port', str(self.puerto), '--bind', '127.0.0.1', '--save', '', '--appendonly', 'no'],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            esperar_puerto(self.puerto, proceso=self._proceso)
+            self.tipo = 'redis-server'
+        else:
+            from fakeredis import TcpFakeServer
+
+            self._servidor = TcpFakeServer(('127.0.0.1', self.puerto), server_type='redis')
+            self._servidor.daemon_threads = True
+            _arrancar_hilo(self._servidor, 'fakeredis')
+            self.tipo = 'fakeredis'
+        return self
+
+    def detener(self):
+        if self._proceso:
+            self._proceso.terminate()
+            self._proceso.wait(10)
+        if self._servidor:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+
+
+# ================== MYSQL ==================
+
+def sentencias_sql(texto):
+    """Parte un script como el de flask.sql en sentencias, respetando DELIMITER (triggers)."""
+    delimitador = ';'
+    actual = []
+    for linea in texto.splitlines():
+        limpia = linea.strip()
+        if not actual and (not limpia or limpia.startswith('--')):
+            continue
+        if limpia.upper().startswith('DELIMITER '):
+            delimitador = limpia.split(None, 1)[1]
+            continue
+        actual.append(linea)
+        if limpia.endswith(delimitador):
+            sentencia = '\n'.join(actual).rstrip()[:-len(delimitador)].strip()
+            actual = []
+            if sentencia:
+                yield sentencia
+    resto = '\n'.join(actual).strip()
+    if resto:
+        yield resto
+
+
+def cargar_esquema(conexion, base, ruta=None):
+    """
+    Crea 'base' desde cero con flask.sql (el nombre flask_api se sustituye por 'base').
+    Devuelve la lista de avisos (p. ej. el trigger, si el usuario no tiene privilegio para crearlo).
+    """
+    with open(ruta or os.path.join(RAIZ, 'flask.sql'), encoding='utf-8') as f:
+        script = f.read()
+    avisos = []
+    with conexion.cursor() as cursor:
+        cursor.execute(f"DROP DATABASE IF EXISTS `{base}`")
+        for sentencia in sentencias_sql(script):
+            sentencia = re.sub(r'\bflask_api\b', f'`{base}`', sentencia)
+            try:
+                cursor.execute(sentencia)
+            except Exception as e:
+                # 1419: con binlog activo, crear triggers exige SUPER o log_bin_trust_function_creators
+                if 'TRIGGER' in sentencia.upper() and getattr(e, 'args', (None,))[0] == 1419:
+                    avisos.append(f"trigger omitido: {e}")
+                    continue
+                raise
+    conexion.commit()
+    return avisos
+
+
+class MySQLLocal:
+    """
+    mysqld (MySQL 8) o mariadbd del PATH con un datadir temporal, sin binlog ni contraseña para root.
+    Si no hay ninguno instalado, usar MySQLExterno contra un servidor ya levantado.
+    """
+
+    def __init__(self):
+        self.puerto = puerto_libre()
+        self.host = '127.0.0.1'
+        self.usuario = 'root'
+        self.password = ''
+        self.tipo = None
+        self._dir = None
+        self._proceso = None
+
+    @staticmethod
+    def disponible():
+        return bool(shutil.which('mariadbd') or shutil.which('mysqld'))
+
+    def iniciar(self):
+        self._dir = tempfile.mkdtemp(prefix='goe_mysql_')
+        datos = os.path.join(self._dir, 'datos')
+        socket_unix = os.path.join(self._dir, 'mysql.sock')
+        comunes = [f'--datadir={datos}', f'--socket={socket_unix}', f'--port={self.puerto}',
+                   '--bind-address=127.0.0.1', '--skip-log-bin']
+        if os.geteuid() == 0:
+            comunes.append('--user=root')
+
+        mariadb = shutil.which('mariadbd')
+        if mariadb:
+            instalador = shutil.which('mariadb-install-db') or shutil.which('mysql_install_db')
+            subprocess.run([instalador, f'--datadir={datos}', '--auth-root-authentication-method=normal',
+                            '--skip-test-db'] + (['--user=root'] if os.geteuid() == 0 else []),
+                           check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            binario, self.tipo = mariadb, 'mariadb'
+        else:
+            binario, self.tipo = shutil.which('mysqld'), 'mysql'
+            subprocess.run([binario, '--initialize-insecure', f'--datadir={datos}']
+                           + (['--user=root'] if os.geteuid() == 0 else []),
+                           check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            comunes += ['--mysqlx=OFF', '--default-authentication-plugin=mysql_native_password']
+
+        self._proceso = subprocess.Popen(
+            [binario, f'--log-error={os.path.join(self._dir, "error.log")}'] + comunes,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        esperar_puerto(self.puerto, timeout=60, proceso=self._proceso)
+        return self
+
+    def conectar(self, base=None):
+        import pymysql
+
+        return pymysql.connect(host=self.host, port=self.puerto, user=self.usuario, password=self.password,
+                               database=base, charset='utf8mb4', autocommit=False)
+
+    def detener(self):
+        if self._proceso:
+            self._proceso.terminate()
+            try:
+                self._proceso.wait(30)
+            except subprocess.TimeoutExpired:
+                self._proceso.kill()
+        if self._dir:
+            shutil.rmtree(self._dir, ignore_errors=True)
+
+
+class MySQLExterno:
+    """Servidor ya levantado (p. ej. el de docker-compose en el puerto 3307). Solo crea la base de pruebas."""
+
+    tipo = 'externo'
+
+    def __init__(self, host=None, puerto=None, usuario=None, password=None):
+        self.host = host or os.getenv('MYSQL_HOST', '127.0.0.1')
+        self.puerto = int(puerto or os.getenv('MYSQL_PORT', 3306))
+        self.usuario = usuario or os.getenv('MYSQL_USER', 'root')
+        self.password = password if password is not None else os.getenv('MYSQL_PASSWORD', '')
+
+    def iniciar(self):
+        self.conectar().close()  # falla pronto si el servidor no está o las credenciales no valen
+        return self
+
+    def conectar(self, base=None):
+        import pymysql
+
+        return pymysql.connect(host=self.host, port=self.puerto, user=self.usuario, password=self.password,
+                               database=base, charset='utf8mb4', autocommit=False)
+
+    def detener(self):
+        pass
+
+
+# ================== CLOUDINARY ==================
+
+class CloudinaryFalso:
+    """
+    Imita las rutas de Cloudinary que usa la app:
+      POST   /v1_1/<cloud>/<image|raw>/upload          -> guarda el archivo y devuelve secure_url
+      GET    /<cloud>/<image|raw>/upload/v<n>/<id>     -> devuelve lo subido
+      DELETE /v1_1/<cloud>/resources/...               -> {'deleted': {id: 'deleted'}}
+      GET    /v1_1/<cloud>/resources/...               -> listado vacío
+      POST   /v1_1/<cloud>/<tipo>/destroy              -> {'result': 'ok'}
+    """
+
+    def __init__(self, cloud='bench', latencia_ms=0.0):
+        self.cloud = cloud
+        self.latencia = latencia_ms / 1000.0
+        self.puerto = puerto_libre()
+        self.archivos = {}  # (tipo, public_id) -> (bytes, content-type)
+        self.subidas = 0
+        self._lock = threading.Lock()
+        self._versiones = itertools.count(int(time.time()))
+        self._servidor = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.puerto}"
+
+    def entorno(self):
+        return {
+            'CLOUDINARY_CLOUD_NAME': self.cloud,
+            'CLOUDINARY_API_KEY': 'bench',
+            'CLOUDINARY_API_SECRET': 'bench',
+            'CLOUDINARY_UPLOAD_PREFIX': self.url,
+        }
+
+    def iniciar(self):
+        falso = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, datos, estado=200):
+                cuerpo = json.dumps(datos).encode()
+                self.send_response(estado)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def _cuerpo(self):
+                return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+            def do_POST(self):
+                if falso.latencia:
+                    time.sleep(falso.latencia)
+                partes = urlparse(self.path).path.strip('/').split('/')
+                cuerpo = self._cuerpo()
+                if len(partes) >= 4 and partes[-1] == 'upload':
+                    self._json(falso._subir(partes[-2], self.headers.get('Content-Type', ''), cuerpo))
+                elif partes[-1] == 'destroy':
+                    self._json({'result': 'ok'})
+                else:
+                    self._json({'error': {'message': f'ruta no soportada: {self.path}'}}, 404)
+
+            def do_DELETE(self):
+                if falso.latencia:
+                    time.sleep(falso.latencia)
+                # El SDK manda los public_ids en la query o en el cuerpo, según la versión
+                consulta = parse_qs(urlparse(self.path).query)
+                cuerpo = self._cuerpo().decode('utf-8', 'replace')
+                if cuerpo.lstrip().startswith('{'):
+                    consulta.setdefault('public_ids', json.loads(cuerpo).get('public_ids', []))
+                else:
+                    for clave, valores in parse_qs(cuerpo).items():
+                        consulta.setdefault(clave, valores)
+                ids = [v for clave, valores in consulta.items() if clave.startswith('public_ids') for v in valores]
+                self._json({'deleted': {i: 'deleted' for i in ids}, 'partial': False})
+
+            def do_GET(self):
+                partes = urlparse(self.path).path.strip('/').split('/')
+                if partes[:1] == ['v1_1']:
+                    self._json({'resources': []})
+                    return
+                # /<cloud>/<tipo>/upload/v<n>/<public_id>[.ext]
+                if len(partes) < 5 or partes[2] != 'upload':
+                    self._json({'error': 'no encontrado'}, 404)
+                    return
+                public_id = re.sub(r'\.[a-zA-Z0-9]+$', '', '/'.join(partes[4:]))
+                with falso._lock:
+                    archivo = falso.archivos.get((partes[1], public_id))
+                if archivo is None:
+                    self._json({'error': 'no encontrado'}, 404)
+                    return
+                datos, tipo_contenido = archivo
+                self.send_response(200)
+                self.send_header('Content-Type', tipo_contenido)
+                self.send_header('Content-Length', str(len(datos)))
+                self.end_headers()
+                self.wfile.write(datos)
+
+        self._servidor = _ServidorHTTP(('127.0.0.1', self.puerto), Manejador)
+        _arrancar_hilo(self._servidor, 'cloudinary-falso')
+        return self
+
+    def _subir(self, tipo, content_type, cuerpo):
+        campos, archivo = _multipart(content_type, cuerpo)
+        carpeta = campos.get('folder', '').strip('/')
+        nombre = campos.get('public_id') or hashlib.sha1(archivo or b'').hexdigest()[:20]
+        public_id = f"{carpeta}/{nombre}" if carpeta else nombre
+        version = next(self._versiones)
+        if tipo == 'raw':
+            extension, tipo_contenido = '.json', 'application/json'
+        else:
+            extension, tipo_contenido = '.jpg', 'image/jpeg'
+        with self._lock:
+            self.archivos[(tipo, public_id)] = (archivo or b'', tipo_contenido)
+            self.subidas += 1
+        url = f"{self.url}/{self.cloud}/{tipo}/upload/v{version}/{public_id}{extension}"
+        return {
+            'public_id': public_id, 'version': version, 'resource_type': tipo, 'type': 'upload',
+            'bytes': len(archivo or b''), 'url': url, 'secure_url': url,
+        }
+
+    def detener(self):
+        if self._servidor:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+
+
+def _multipart(content_type, cuerpo):
+    """Campos de texto y bytes del archivo de un multipart/form-data (lo que envía el SDK de Cloudinary)."""
+    m = re.search(r'boundary="?([^";]+)"?', content_type)
+    if not m:
+        return {k: v[0] for k, v in parse_qs(cuerpo.decode('utf-8', 'replace')).items()}, None
+    campos, archivo = {}, None
+    for parte in cuerpo.split(b'--' + m.group(1).encode()):
+        cabecera, _, valor = parte.partition(b'\r\n\r\n')
+        nombre = re.search(rb'name="([^"]*)"', cabecera)
+        if not nombre:
+            continue
+        valor = valor[:-2] if valor.endswith(b'\r\n') else valor
+        if b'filename=' in cabecera:
+            archivo = valor
+        else:
+            campos[nombre.group(1).decode()] = valor.decode('utf-8', 'replace')
+    return campos, archivo
+
+
+# ================== SMTP ==================
+
+def certificado_autofirmado(directorio):
+    """Genera con openssl un par clave/certificado para el STARTTLS del sumidero."""
+    clave = os.path.join(directorio, 'smtp.key')
+    certificado = os.path.join(directorio, 'smtp.crt')
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+         '-subj', '/CN=localhost', '-keyout', clave, '-out', certificado],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    return certificado, clave
+
+
+class SMTPSumidero:
+    """
+    Servidor SMTP mínimo que acepta todo: EHLO, STARTTLS, AUTH PLAIN/LOGIN, MAIL, RCPT, DATA.
+    Los correos no se envían a ningún sitio; solo se cuentan (y se guardan los últimos 100).
+    smtplib.starttls() sin contexto no verifica el certificado, así que basta uno autofirmado.
+    """
+
+    def __init__(self, latencia_ms=0.0):
+        self.latencia = latencia_ms / 1000.0
+        self.puerto = puerto_libre()
+        self.recibidos = 0
+        self.ultimos = []
+        self._lock = threading.Lock()
+        self._dir = None
+        self._servidor = None
+        self._contexto = None
+
+    def entorno(self):
+        return {'MAIL_HOST': '127.0.0.1', 'MAIL_PORT': str(self.puerto),
+                'MAIL_USER': 'bench@goe.local', 'MAIL_PASS': 'bench'}
+
+    def iniciar(self):
+        self._dir = tempfile.mkdtemp(prefix='goe_smtp_')
+        if shutil.which('openssl'):
+            self._contexto = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            self._contexto.load_cert_chain(*certificado_autofirmado(self._dir))
+        sumidero = self
+
+        class Manejador(socketserver.StreamRequestHandler):
+            def _responder(self, linea):
+                self.wfile.write(linea.encode() + b'\r\n')
+                self.wfile.flush()
+
+            def _ehlo(self):
+                extensiones = ['250-goe-sumidero', '250-AUTH PLAIN LOGIN', '250-8BITMIME']
+                if sumidero._contexto is not None and not isinstance(self.connection, ssl.SSLSocket):
+                    extensiones.append('250-STARTTLS')
+                extensiones.append('250 SMTPUTF8')
+                for linea in extensiones:
+                    self._responder(linea)
+
+            def handle(self):
+                self._responder('220 goe-sumidero ESMTP')
+                while True:
+                    linea = self.rfile.readline()
+                    if not linea:
+                        return
+                    comando = linea.decode('utf-8', 'replace').strip()
+                    verbo = comando.split(' ', 1)[0].upper()
+                    if verbo in ('EHLO', 'HELO'):
+                        self._ehlo()
+                    elif verbo == 'STARTTLS' and sumidero._contexto is not None:
+                        self._responder('220 listo para TLS')
+                        self.connection = sumidero._contexto.wrap_socket(self.connection, server_side=True)
+                        self.rfile = self.connection.makefile('rb')
+                        self.wfile = self.connection.makefile('wb')
+                    elif verbo == 'AUTH':
+                        partes = comando.split()
+                        if len(partes) >= 2 and partes[1].upper() == 'LOGIN':
+                            for pregunta in ('VXNlcm5hbWU6', 'UGFzc3dvcmQ6'):
+                                self._responder(f'334 {pregunta}')
+                                self.rfile.readline()
+                        elif len(partes) == 2:  # AUTH PLAIN sin respuesta inicial
+                            self._responder('334 ')
+                            self.rfile.readline()
+                        self._responder('235 autenticado')
+                    elif verbo == 'DATA':
+                        self._responder('354 fin con <CRLF>.<CRLF>')
+                        mensaje = []
+                        while True:
+                            parte = self.rfile.readline()
+                            if not parte or parte in (b'.\r\n', b'.\n'):
+                                break
+                            mensaje.append(parte)
+                        if sumidero.latencia:
+                            time.sleep(sumidero.latencia)
+                        with sumidero._lock:
+                            sumidero.recibidos += 1
+                            sumidero.ultimos = (sumidero.ultimos + [b''.join(mensaje)])[-100:]
+                        self._responder('250 aceptado')
+                    elif verbo == 'QUIT':
+                        self._responder('221 adiós')
+                        return
+                    elif verbo in ('MAIL', 'RCPT', 'RSET', 'NOOP'):
+                        self._responder('250 ok')
+                    else:
+                        self._responder('502 no implementado')
+
+        class Servidor(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self._servidor = Servidor(('127.0.0.1', self.puerto), Manejador)
+        _arrancar_hilo(self._servidor, 'smtp-sumidero')
+        return self
+
+    def detener(self):
+        if self._servidor:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+        if self._dir:
+            shutil.rmtree(self._dir, ignore_errors=True)
+
+
+# ================== IA ==================
+
+def preguntas_de_prueba(tema, n):
+    return [
+        {
+            'pregunta': f"{tema}: pregunta {i + 1}",
+            'opciones': {'a': f"opción a{i}", 'b': f"opción b{i}", 'c': f"opción c{i}", 'd': f"opción d{i}"},
+            'respuesta': 'abcd'[i % 4],
+            'explicacion': f"La respuesta de la pregunta {i + 1} es la {'abcd'[i % 4]}.",
+        }
+        for i in range(n)
+    ]
+
+
+class IAFalsa:
+    """POST /start-game -> {'curso_data': {...}, 'preguntas': [...]} tras 'latencia_ms' (± jitter)."""
+
+    def __init__(self, latencia_ms=500.0, jitter_ms=0.0, preguntas=50):
+        self.latencia = latencia_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.n_preguntas = preguntas
+        self.puerto = puerto_libre()
+        self.llamadas = 0
+        self._servidor = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.puerto}/start-game"
+
+    def entorno(self):
+        return {'AI_API_URL': self.url}
+
+    def iniciar(self):
+        import random
+
+        ia = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                datos = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+                espera = ia.latencia + (random.uniform(-ia.jitter, ia.jitter) if ia.jitter else 0.0)
+                if espera > 0:
+                    time.sleep(espera)
+                ia.llamadas += 1
+                tema = datos.get('tema', 'General')
+                respuesta = {
+                    'curso_data': {
+                        'titulo': f"Curso de {tema}",
+                        'curso': datos.get('curso'),
+                        'dificultad': datos.get('dificultad'),
+                        'modulos': [
+                            {'titulo': f"Módulo {i + 1}", 'contenido': f"Contenido del módulo {i + 1} sobre {tema}. " * 8}
+                            for i in range(6)
+                        ],
+                    },
+                    'preguntas': preguntas_de_prueba(tema, ia.n_preguntas),
+                }
+                cuerpo = json.dumps(respuesta, ensure_ascii=False).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+        self._servidor = _ServidorHTTP(('127.0.0.1', self.puerto), Manejador)
+        _arrancar_hilo(self._servidor, 'ia-falsa')
+        return self
+
+    def detener(self):
+        if self._servidor:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latencia-ia-ms', type=float, default=800)
+    parser.add_argument('--latencia-cloudinary-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    servicios = [
+        RedisLocal().iniciar(),
+        CloudinaryFalso(latencia_ms=args.latencia_cloudinary_ms).iniciar(),
+        SMTPSumidero().iniciar(),
+        IAFalsa(latencia_ms=args.latencia_ia_ms).iniciar(),
+    ]
+    entorno = {'REDIS_URL': servicios[0].url}
+    for servicio in servicios[1:]:
+        entorno.update(servicio.entorno())
+    for clave, valor in entorno.items():
+        print(f"export {clave}={valor}")
+    print(f"# redis: {servicios[0].tipo}. MySQL no se arranca aquí (ver bench_carga.py). Ctrl+C para salir.",
+          file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for servicio in servicios:
+            servicio.detener()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import json
+
+try:
+    import msgpack
+except ImportError:  # msgpack es opcional: sin él todo sigue viajando como JSON
+    msgpack = None
+
+# ====================================================================================================
+# Codec de payloads (Socket.IO y valores propios en Redis)
+# ====================================================================================================
+# JSON sigue siendo el formato por defecto. MessagePack es opt-in:
+#   - Socket.IO: el cliente lo negocia al conectarse ({'codec': 'msgpack'} en auth o ?codec=msgpack)
+#     y recibe los eventos como binario en salas ':msgpack' paralelas a las JSON.
+#   - Redis: REDIS_VALUE_CODEC=msgpack guarda los valores nuevos con un byte marcador delante.
+#     Los valores JSON existentes se siguen leyendo sin migración.
+
+CODEC_JSON = 'json'
+CODEC_MSGPACK = 'msgpack'
+CODECS = (CODEC_JSON, CODEC_MSGPACK)
+
+# 0xC1 es el único byte que la especificación de MessagePack declara "nunca usado", y tampoco
+# puede iniciar un documento JSON, así que sirve para distinguir ambos formatos al leer.
+MARCADOR_MSGPACK = b'\xc1'
+
+
+def msgpack_disponible():
+    return msgpack is not None
+
+
+def normalizar_codec(codec):
+    """Devuelve un codec soportado; cae a JSON si se pide msgpack y no está instalado."""
+    codec = (codec or CODEC_JSON).lower()
+    if codec == CODEC_MSGPACK and msgpack_disponible():
+        return CODEC_MSGPACK
+    return CODEC_JSON
+
+
+def _default(obj):
+    # Fechas y Decimal llegan ya convertidos en la mayoría de payloads; esto cubre el resto.
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    return str(obj)
+
+
+def pack(obj):
+    """Serializa a MessagePack (bytes). Requiere msgpack instalado."""
+    return msgpack.packb(obj, use_bin_type=True, default=_default)
+
+
+def unpack(data):
+    return msgpack.unpackb(data, raw=False)
+
+
+def encode_value(obj, codec=CODEC_JSON):
+    """Serializa un valor para guardarlo en Redis. Siempre devuelve bytes."""
+    if normalizar_codec(codec) == CODEC_MSGPACK:
+        return MARCADOR_MSGPACK + pack(obj)
+    return json.dumps(obj, ensure_ascii=False, default=_default).encode('utf-8')
+
+
+def decode_value(raw):
+    """Deserializa un valor leído de Redis (bytes o str), detectando el formato."""
+    if raw is None:
+        return None
+    if isinstance(raw, bytes) and raw[:1] == MARCADOR_MSGPACK:
+        return unpack(raw[1:])
+    if isinstance(raw, bytes):
+        raw = raw.decode('utf-8')
+    return json.loads(raw)
+
+
+def encode_payload(obj, codec=CODEC_JSON):
+    """
+    Prepara un payload de Socket.IO. Con msgpack devuelve bytes (python-socketio los envía como
+    adjunto binario); con JSON devuelve el objeto tal cual para que lo serialice Socket.IO.
+    """
+    if normalizar_codec(codec) == CODEC_MSGPACK:
+        return pack(obj)
+    return obj
@@ -1,48 +1,119 @@
 # extensions.py (CORREGIDO - AHORA MANEJA EL ERROR "ALREADY CLOSED")
+import logging
 from flask import Flask, g, current_app 
 from flask_bcrypt import Bcrypt
-import redis
+import json_provider
+import redis_store
+import replicas
 import os
-import sys
 from flask_socketio import SocketIO
 import pymysql # ✅ NUEVA IMPORTACIÓN
 import pymysql.cursors # ✅ NUEVA IMPORTACIÓN
 import pymysql.err # 👈 Importación necesaria para manejar la excepción
+import pymysql.connections
+import time
+
+logger = logging.getLogger(__name__)
 
 # ❌ REMOVER: mysql = MySQL()
 bcrypt = Bcrypt()
-redis_client = None 
-socketio = SocketIO(cors_allowed_origins="*")
+# Los eventos se serializan con el mismo proveedor JSON que las respuestas HTTP (fechas, Decimal)
+socketio = SocketIO(cors_allowed_origins="*", json=json_provider.JSONSocketIO)
 
 # ===============================================
 # ✅ FUNCIONES PARA LA GESTIÓN DE CONEXIÓN PyMySQL
 # ===============================================
 
-def get_db():
-    """Obtiene una conexión a la base de datos (PyMySQL), creando una si no existe."""
-    if 'db' not in g:
+_observadores_sql = []
+
+
+def agregar_observador_sql(fn):
+    """Registra fn(sql, duracion_s, filas, error) para cada consulta de las conexiones de get_db()."""
+    _observadores_sql.append(fn)
+
+
+class ConexionMedida(pymysql.connections.Connection):
+    """
+    Conexión PyMySQL que mide cada sentencia. Todos los cursores (DictCursor incluido, aunque
+    se pida explícitamente en conn.cursor(...)) pasan por Connection.query.
+    """
+
+    def query(self, sql, unbuffered=False):
+        inicio = time.perf_counter()
+        error = False
+        try:
+            return super().query(sql, unbuffered)
+        except Exception:
+            error = True
+            raise
+        finally:
+            duracion = time.perf_counter() - inicio
+            resultado = self._result
+            filas = resultado.affected_rows if resultado is not None and not error else 0
+            for observador in _observadores_sql:
+                try:
+                    observador(sql, duracion, filas, error)
+                except Exception:
+                    pass
+
+
+def _parametros_conexion(host, port):
+    config = {
+        "host": host,
+        "port": port,
+        "user": current_app.config['MYSQL_USER'],
+        "password": current_app.config['MYSQL_PASSWORD'],
+        "database": current_app.config['MYSQL_DB'],
+        "charset": current_app.config['MYSQL_CHARSET'],
+        # Usar DictCursor por defecto para que las consultas devuelvan diccionarios
+        "cursorclass": pymysql.cursors.DictCursor 
+    }
+    
+    # Lógica para SSL con TiDB Cloud
+    basedir = os.path.abspath(os.path.dirname(__file__))
+    tidb_ca = os.path.join(basedir, "certs", "isrgrootx1.pem")
+
+    if 'tidbcloud.com' in host and os.path.exists(tidb_ca):
+        config["ssl"] = {"ca": tidb_ca}
+    return config
+
+
+def _db_lectura():
+    """Conexión a una réplica sana para esta petición, o None si hay que leer del primario."""
+    if not replicas.activas() or replicas.lectura_en_primario():
+        return None
+    conn = g.get('db_lectura')
+    if conn is not None and conn.open:
+        return conn
+    replica = replicas.elegir()
+    if replica is None:
+        return None
+    try:
+        g.db_lectura = ConexionMedida(connect_timeout=2, **_parametros_conexion(*replica))
+        return g.db_lectura
+    except Exception as e:
+        replicas.marcar_caida(replica, e)
+        return None
+
+
+def get_db(lectura=False):
+    """
+    Obtiene una conexión a la base de datos (PyMySQL), creando una si no existe.
+    Con lectura=True puede ser una réplica (ver replicas.py); las escrituras nunca deben pedirla.
+    """
+    if lectura:
+        conn = _db_lectura()
+        if conn is not None:
+            return conn
+    # Las rutas cierran la conexión al terminar; si otra función ya la cerró en esta petición, se reabre
+    if 'db' not in g or not g.db.open:
         try:
             # Reutiliza la configuración de Flask
-            config = {
-                "host": current_app.config['MYSQL_HOST'],
-                "user": current_app.config['MYSQL_USER'],
-                "password": current_app.config['MYSQL_PASSWORD'],
-                "database": current_app.config['MYSQL_DB'],
-                "charset": current_app.config['MYSQL_CHARSET'],
-                # Usar DictCursor por defecto para que las consultas devuelvan diccionarios
-                "cursorclass": pymysql.cursors.DictCursor 
-            }
-            
-            # Lógica para SSL con TiDB Cloud
-            basedir = os.path.abspath(os.path.dirname(__file__))
-            tidb_ca = os.path.join(basedir, "certs", "isrgrootx1.pem")
-
-            if 'tidbcloud.com' in current_app.config['MYSQL_HOST'] and os.path.exists(tidb_ca):
-                config["ssl"] = {"ca": tidb_ca}
-
-            g.db = pymysql.connect(**config)
+            g.db = ConexionMedida(**_parametros_conexion(
+                current_app.config['MYSQL_HOST'], current_app.config.get('MYSQL_PORT', 3306)
+            ))
         except Exception as e:
-            print(f"ERROR: Fallo al conectar a la base de datos con PyMySQL: {e}", file=sys.stderr)
+            logger.error("Fallo al conectar a la base de datos con PyMySQL: %s", e)
             # Asegúrate de propagar el error si la conexión falla completamente
             raise e
     return g.db
@@ -53,8 +124,10 @@ def close_db(e=None):
     Maneja el error 'Already closed' que ocurre si PyMySQL cerró la conexión
     automáticamente después de un error de SQL.
     """
-    db = g.pop('db', None)
-    if db is not None:
+    for clave in ('db', 'db_lectura'):
+        db = g.pop(clave, None)
+        if db is None:
+            continue
         try:
             db.close()
         except pymysql.err.Error as error:
@@ -63,7 +136,7 @@ def close_db(e=None):
                 # Si es otro error, lo relanza (para no ocultar problemas reales)
                 raise
             # Si es 'Already closed', simplemente ignoramos la excepción.
-            print("INFO: Conexión PyMySQL ya estaba cerrada. Ignorando 'Already closed' en teardown.", file=sys.stderr)
+            logger.info("Conexión PyMySQL ya estaba cerrada. Ignorando 'Already closed' en teardown.")
 
 
 # ===============================================
@@ -79,33 +152,5 @@ def init_app(app: Flask):
     app.config['SOCKETIO_MESSAGE_QUEUE'] = app.config.get('REDIS_URL')
     socketio.init_app(app)
 
-    global redis_client
-    # ... (Lógica de conexión a Redis, sin cambios) ...
-    try:
-        redis_url = app.config.get('REDIS_URL') or os.getenv('REDIS_URL')
-        if redis_url:
-            # 🚀 Render u otra instancia con URL completa
-            redis_client = redis.StrictRedis.from_url(redis_url, decode_responses=True)
-            print(f"INFO: Conectando a Redis mediante URL: {redis_url}")
-        else:
-            # 🚀 Local con Docker Compose
-            redis_host = app.config.get('REDIS_HOST', os.getenv('REDIS_HOST', 'localhost'))
-            redis_port = int(app.config.get('REDIS_PORT', os.getenv('REDIS_PORT', 6379)))
-            redis_db = int(app.config.get('REDIS_DB', os.getenv('REDIS_DB', 0)))
-            redis_client = redis.StrictRedis(
-                host=redis_host,
-                port=redis_port,
-                db=redis_db,
-                decode_responses=True
-            )
-            print(f"INFO: Conectando a Redis en {redis_host}:{redis_port}/{redis_db}")
-            
-        redis_client.ping()
-        print("INFO: ✅ Conectado exitosamente a Redis!")
-    except Exception as e:
-        redis_client = None
-        print(f"ERROR: Fallo al conectar a Redis: {e}", file=sys.stderr)
-        # Esto no es fatal si la app no depende fuertemente de Redis.
-        # En tu caso, es necesario para SocketIO y rate limiting.
-        if app.config.get('REDIS_URL'):
-             print("ADVERTENCIA: Si usas SocketIO con REDIS_URL, la cola de mensajes podría fallar.", file=sys.stderr)
+    # Redis: pool, reconexión y helpers viven en redis_store.py
+    redis_store.init_app(app)
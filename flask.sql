@@ -23,7 +23,9 @@ CREATE TABLE IF NOT EXISTS users (
     reset_token VARCHAR(255) NULL,         -- Columna para el token/código de restablecimiento de contraseña
     reset_token_expira DATETIME NULL,      -- Columna para la expiración del token/código de restablecimiento
     token VARCHAR(255) NULL,               -- Added token column
-    estado_pregunta VARCHAR(20) DEFAULT NULL -- 🔹 NUEVA COLUMNA
+    estado_pregunta VARCHAR(20) DEFAULT NULL, -- 🔹 NUEVA COLUMNA
+    curso_url VARCHAR(255) DEFAULT NULL,     -- JSON del curso generado por la IA (storage.py)
+    preguntas_url VARCHAR(255) DEFAULT NULL  -- JSON con las preguntas pendientes del usuario
 );
 
 -- Tabla de dificultades para las partidas (ej. Fácil, Intermedio, Difícil, Experto)
@@ -78,10 +80,17 @@ CREATE TABLE IF NOT EXISTS publicaciones (
     categoria_id INT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     likes_count INT DEFAULT 0, -- ¡NUEVA COLUMNA AÑADIDA!
+    -- Contadores mantenidos al escribir (ver post_counters.py)
+    comments_count INT NOT NULL DEFAULT 0,
+    images_count INT NOT NULL DEFAULT 0,
     -- Clave foránea al usuario que creó la publicación
     FOREIGN KEY (autor_id) REFERENCES users(id) ON DELETE CASCADE,
     -- NUEVO: Clave foránea para la categoría
-    FOREIGN KEY (categoria_id) REFERENCES categorias(id) ON DELETE SET NULL
+    FOREIGN KEY (categoria_id) REFERENCES categorias(id) ON DELETE SET NULL,
+    -- Búsqueda de texto completo (GET /blog/buscar, search.py)
+    FULLTEXT INDEX ft_publicaciones_titulo_texto (titulo, texto),
+    -- Publicaciones de un autor con paginación por clave (author_timeline.py)
+    INDEX idx_publicaciones_autor_fecha (autor_id, created_at, id)
 );
 
 -- Tabla de imágenes por publicación
@@ -172,3 +181,39 @@ INSERT IGNORE INTO categorias (id, nombre) VALUES (3, 'Eventos');
 INSERT IGNORE INTO categorias (id, nombre) VALUES (4, 'Opinión');
 INSERT IGNORE INTO categorias (id, nombre) VALUES (5, 'Desarrollo');
 INSERT IGNORE INTO categorias (id, nombre) VALUES (6, 'General');
+
+-- Variantes responsive de cada imagen (ver image_pipeline.py)
+-- Una fila por (imagen, formato, ancho). El feed arma con ellas un 'srcset' por formato.
+CREATE TABLE IF NOT EXISTS imagenes_publicacion_variantes (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    imagen_id INT NOT NULL,
+    formato VARCHAR(10) NOT NULL, -- 'webp' | 'jpeg'
+    ancho INT NOT NULL,
+    alto INT NOT NULL,
+    bytes INT NOT NULL,
+    url VARCHAR(255) NOT NULL,
+    UNIQUE (imagen_id, formato, ancho),
+    FOREIGN KEY (imagen_id) REFERENCES imagenes_publicacion(id) ON DELETE CASCADE
+);
+
+-- Cola de borrado diferido de archivos (asset_gc.py)
+CREATE TABLE IF NOT EXISTS assets_pendientes (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    tipo VARCHAR(10) NOT NULL, -- 'url' | 'carpeta'
+    valor VARCHAR(255) NOT NULL,
+    carpeta VARCHAR(255) NULL,
+    intentos INT NOT NULL DEFAULT 0,
+    proximo_intento DATETIME NULL DEFAULT CURRENT_TIMESTAMP, -- NULL: reintentos agotados
+    ultimo_error VARCHAR(255) NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_assets_pendientes_proximo (proximo_intento)
+);
+
+-- Contadores por autor mantenidos al escribir (author_timeline.py); nunca se calculan al leer
+CREATE TABLE IF NOT EXISTS autores_contadores (
+    autor_id INT PRIMARY KEY,
+    publicaciones INT NOT NULL DEFAULT 0,
+    likes_recibidos INT NOT NULL DEFAULT 0,
+    comentarios_recibidos INT NOT NULL DEFAULT 0,
+    FOREIGN KEY (autor_id) REFERENCES users(id) ON DELETE CASCADE
+);
@@ -0,0 +1,13 @@
+# gunicorn lee este archivo automáticamente desde el directorio de trabajo (el CMD del Dockerfile
+# no cambia). Con preload_app el master importa app.py una sola vez y los workers comparten esa
+# memoria (copy-on-write); create_app() no abre conexiones ni arranca hilos, y cada worker inicia
+# los suyos en post_worker_init.
+import os
+
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') != '0'
+
+
+def post_worker_init(worker):
+    # Corre dentro del worker ya inicializado (eventlet parcheado), con o sin preload_app
+    import app as modulo
+    modulo.iniciar_servicios(modulo.app)
@@ -0,0 +1,179 @@
+import gzip
+import hashlib
+import logging
+import os
+import time
+from functools import wraps
+
+from flask import Response, make_response, request
+
+import redis_store
+import replicas
+from redis_store import RedisNoDisponible
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:  # opcional: sin él solo se ofrece gzip
+    brotli = None
+
+# ====================================================================================================
+# Respuestas condicionales (ETag / 304) y compresión de JSON
+# ====================================================================================================
+# ETag a partir de versiones de datos, no del cuerpo: cada recurso ('publicaciones',
+# 'comentarios:<id>', 'perfil:<user_id>', ...) tiene en Redis un token <ns>:version:<recurso> que
+# las rutas renuevan con invalidar() DESPUÉS del commit. Un GET decorado con @condicional lee los
+# tokens de sus recursos (un pipeline), arma con ellos y la URL un ETag débil y, si coincide con
+# If-None-Match, responde 304 sin ejecutar la vista (ni tocar MySQL).
+#
+#   - Un recurso sin token recibe uno nuevo al leerlo (SET NX), así que perder Redis solo cambia
+#     los ETag una vez. Sin Redis no hay ETag: la vista corre siempre.
+#   - Los recursos que también cambian por fuera de la app (partidas del juego, SQL a mano) llevan
+#     TTL en VIDA_VERSION: al expirar el token cambia solo, lo que acota cuánto puede durar un 304
+#     desactualizado.
+#   - Con réplicas (replicas.py) una lectura puede ir con retraso respecto del primario: si algún
+#     token se renovó hace menos que el retraso tolerado, no se emite ETag (si no, un dato viejo
+#     quedaría guardado con la versión nueva).
+#
+# Compresión: las respuestas JSON de al menos HTTP_COMPRESS_MIN_BYTES se envían con brotli (si el
+# paquete está instalado y el cliente lo acepta) o gzip, con Vary: Accept-Encoding. El ETag es
+# débil, así que vale para cualquier codificación.
+
+# Segundos de vida del token por prefijo de recurso (sin entrada: no expira)
+VIDA_VERSION = {
+    'perfil': 60,
+    'categorias': 3600,
+    'usuarios': 3600,
+}
+
+_config = {
+    'min_bytes': 1024,
+    'nivel_gzip': 6,
+    'calidad_brotli': 5,
+    'sal': '',
+}
+
+
+def init_app(app):
+    _config.update({
+        'min_bytes': int(app.config.get('HTTP_COMPRESS_MIN_BYTES', 1024)),
+        'nivel_gzip': int(app.config.get('HTTP_GZIP_LEVEL', 6)),
+        'calidad_brotli': int(app.config.get('HTTP_BROTLI_QUALITY', 5)),
+        'sal': app.config.get('HTTP_ETAG_SALT', ''),
+    })
+    app.after_request(_comprimir)
+
+
+# ================== VERSIONES ==================
+
+def _clave(recurso):
+    return redis_store.key('version', recurso)
+
+
+def _vida(recurso):
+    return VIDA_VERSION.get(recurso.split(':', 1)[0])
+
+
+def _token_nuevo():
+    # Milisegundos (para saber cuándo cambió) + algo único por proceso
+    return f"{int(time.time() * 1000):x}.{os.getpid():x}.{os.urandom(3).hex()}"
+
+
+def invalidar(*recursos):
+    """Renueva los tokens de los recursos. Llamar después del commit; sin Redis no hace nada."""
+    recursos = [r for r in recursos if r]
+    if not recursos:
+        return
+    try:
+        with redis_store.pipeline() as pipe:
+            for recurso in recursos:
+                pipe.set(_clave(recurso), _token_nuevo(), ex=_vida(recurso))
+    except RedisNoDisponible as e:
+        logger.warning("No se invalidaron las versiones %s: %s", recursos, e)
+
+
+def versiones(recursos):
+    """Tokens actuales de los recursos (creándolos si faltan), en una ida a Redis."""
+    with redis_store.pipeline() as pipe:
+        for recurso in recursos:
+            pipe.set(_clave(recurso), _token_nuevo(), ex=_vida(recurso), nx=True)
+        pipe.mget([_clave(r) for r in recursos])
+    return list(pipe.resultados[-1])
+
+
+def _reciente(tokens):
+    """True si algún token cambió hace menos de lo que puede atrasarse una réplica."""
+    ventana = replicas.ventana_retraso()
+    if not ventana:
+        return False
+    ahora_ms = time.time() * 1000
+    for token in tokens:
+        try:
+            if ahora_ms - int(str(token).split('.', 1)[0], 16) < ventana * 1000:
+                return True
+        except ValueError:
+            continue
+    return False
+
+
+def _etag(recursos):
+    try:
+        tokens = versiones(recursos)
+    except RedisNoDisponible:
+        return None
+    if any(t is None for t in tokens) or (not replicas.lectura_en_primario() and _reciente(tokens)):
+        return None
+    base = '|'.join([_config['sal'], request.full_path, *map(str, tokens)])
+    return hashlib.sha1(base.encode('utf-8')).hexdigest()[:20]
+
+
+# ================== DECORADOR ==================
+
+def condicional(recursos, cache_control='no-cache', vary=()):
+    """
+    GET con ETag por versión de datos. 'recursos(**view_args)' devuelve la lista de recursos de
+    los que depende la respuesta. Va debajo de @jwt_required si la vista lo usa.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return vista(*args, **kwargs)
+            etag = _etag(recursos(**kwargs))
+            if etag and request.if_none_match.contains_weak(etag):
+                respuesta = Response(status=304)
+            else:
+                respuesta = make_response(vista(*args, **kwargs))
+                if respuesta.status_code != 200:
+                    return respuesta
+            if etag:
+                respuesta.set_etag(etag, weak=True)
+            respuesta.headers['Cache-Control'] = cache_control
+            for cabecera in vary:
+                respuesta.vary.add(cabecera)
+            return respuesta
+        return envoltura
+    return decorador
+
+
+# ================== COMPRESIÓN ==================
+
+def _comprimir(respuesta):
+    if (respuesta.status_code < 200 or respuesta.status_code in (204, 304) or respuesta.direct_passthrough
+            or respuesta.mimetype != 'application/json' or 'Content-Encoding' in respuesta.headers
+            or request.method == 'HEAD' or _config['min_bytes'] <= 0):
+        return respuesta
+    respuesta.vary.add('Accept-Encoding')
+    cuerpo = respuesta.get_data()
+    if len(cuerpo) < _config['min_bytes']:
+        return respuesta
+
+    aceptadas = request.accept_encodings
+    if brotli is not None and aceptadas['br']:
+        respuesta.set_data(brotli.compress(cuerpo, quality=_config['calidad_brotli']))
+        respuesta.headers['Content-Encoding'] = 'br'
+    elif aceptadas['gzip']:
+        respuesta.set_data(gzip.compress(cuerpo, compresslevel=_config['nivel_gzip'], mtime=0))
+        respuesta.headers['Content-Encoding'] = 'gzip'
+    return respuesta
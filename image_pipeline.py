@@ -0,0 +1,161 @@
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+
+import process_pool
+from image_worker import FORMATO_JPEG, FORMATO_WEBP, FORMATOS, ImagenInvalida, generar_variantes  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+# ====================================================================================================
+# Derivados responsive de imágenes (Pillow)
+# ====================================================================================================
+# Antes de guardar una imagen se decodifica UNA vez y se generan variantes de ancho fijo en WebP
+# y JPEG (sin EXIF/ICC, con la orientación EXIF ya aplicada). El feed devuelve un mapa tipo
+# 'srcset' por formato para que el cliente pida el ancho que necesita en lugar del original.
+#
+# La decodificación y el re-escalado (image_worker.py) corren en un pool de procesos 'spawn'
+# (process_pool.py) cuyos hijos solo importan image_worker y Pillow, nunca app.py. El hub de
+# eventlet nunca toca los píxeles: con eventlet parcheado, el hilo gestor del pool y
+# future.result() son verdes, así que la espera cede el hub al resto de peticiones mientras el
+# hijo trabaja.
+#
+# Variantes persistidas en 'imagenes_publicacion_variantes' (ver flask.sql / migrations/).
+
+ANCHOS_PUBLICACION = (320, 640, 1080, 1600)
+ANCHOS_PERFIL = (64, 128, 256, 512)
+
+_pool = None
+_pool_lock = Lock()
+_config = {
+    'workers': 2,
+    'timeout': 30.0,
+}
+
+
+def init_app(app):
+    _config.update({
+        'workers': int(app.config.get('IMAGE_WORKERS', 2)),
+        'timeout': float(app.config.get('IMAGE_PROCESS_TIMEOUT', 30)),
+    })
+
+
+# ================== POOL DE PROCESOS ==================
+
+def _obtener_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = process_pool.crear_pool(_config['workers'], 'image_worker')
+        return _pool
+
+
+def _reiniciar_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def procesar(origen, anchos):
+    """
+    Genera las variantes en el pool de procesos. 'origen' es preferiblemente una ruta en disco
+    (el hijo lee el archivo; el worker no carga la imagen) o, si no, los bytes.
+    """
+    try:
+        futuro = _obtener_pool().submit(generar_variantes, origen, tuple(anchos))
+        return futuro.result(_config['timeout'])
+    except BrokenProcessPool:
+        # Un hijo murió (p. ej. OOM con una imagen enorme): se recrea el pool para la próxima.
+        _reiniciar_pool()
+        raise
+
+
+# ================== SUBIDA Y PERSISTENCIA ==================
+
+def subir_variantes(variantes, folder, token=None):
+    """
+    Guarda cada variante en el almacenamiento configurado (storage.py) como
+    '<folder>/<token>_<ancho>w_<formato>' y devuelve las variantes con su 'url' (sin los bytes).
+    Las subidas se hacen en paralelo. Sin 'token' se genera uno aleatorio; con un token fijo
+    cada subida sobrescribe la anterior.
+    """
+    import storage
+
+    token = token or uuid.uuid4().hex[:12]
+
+    def _subir(variante):
+        resultado = storage.subir_imagen(
+            variante['datos'],
+            folder,
+            nombre=f"{token}_{variante['ancho']}w_{variante['formato']}",
+            extension=variante['formato']
+        )
+        return {
+            'ancho': variante['ancho'],
+            'alto': variante['alto'],
+            'formato': variante['formato'],
+            'bytes': len(variante['datos']),
+            'url': resultado['url'],
+            'version': resultado.get('version'),
+        }
+
+    with ThreadPoolExecutor(max_workers=4) as ejecutor:
+        return list(ejecutor.map(_subir, variantes))
+
+
+def procesar_y_subir(archivo, folder, anchos=ANCHOS_PUBLICACION, token=None):
+    """
+    Genera las variantes del archivo subido (upload_ingest.ArchivoSubido, FileStorage o bytes)
+    y las sube.
+    Devuelve (principal, variantes). La principal es el JPEG más ancho: su URL sustituye al
+    original en las columnas existentes (imagenes_publicacion.url, users.foto_perfil).
+    """
+    if hasattr(archivo, 'ruta'):
+        origen = archivo.ruta
+    else:
+        origen = archivo if isinstance(archivo, bytes) else archivo.read()
+    _, _, variantes = procesar(origen, anchos)
+    subidas = subir_variantes(variantes, folder, token=token)
+    jpegs = [v for v in subidas if v['formato'] == FORMATO_JPEG]
+    principal = max(jpegs, key=lambda v: v['ancho'])
+    logger.debug("%s variantes subidas a %s", len(subidas), folder)
+    return principal, subidas
+
+
+def guardar_variantes(cursor, imagen_id, variantes, reemplazar=False):
+    if reemplazar:
+        cursor.execute("DELETE FROM imagenes_publicacion_variantes WHERE imagen_id = %s", (imagen_id,))
+    cursor.executemany(
+        "INSERT INTO imagenes_publicacion_variantes (imagen_id, formato, ancho, alto, bytes, url) "
+        "VALUES (%s, %s, %s, %s, %s, %s)",
+        [(imagen_id, v['formato'], v['ancho'], v['alto'], v['bytes'], v['url']) for v in variantes]
+    )
+
+
+def srcset_de(variantes):
+    """{'webp': 'url 320w, url 640w', 'jpeg': '...'} a partir de filas de variantes."""
+    por_formato = {}
+    for v in sorted(variantes, key=lambda v: v['ancho']):
+        por_formato.setdefault(v['formato'], []).append(f"{v['url']} {v['ancho']}w")
+    return {formato: ', '.join(entradas) for formato, entradas in por_formato.items()}
+
+
+def srcsets_por_imagen(cursor, imagen_ids):
+    """Una sola consulta para todas las imágenes: {imagen_id: srcset_de(...)}."""
+    imagen_ids = list(imagen_ids)
+    if not imagen_ids:
+        return {}
+    marcadores = ', '.join(['%s'] * len(imagen_ids))
+    cursor.execute(
+        f"SELECT imagen_id, formato, ancho, url FROM imagenes_publicacion_variantes "
+        f"WHERE imagen_id IN ({marcadores})",
+        tuple(imagen_ids)
+    )
+    agrupadas = {}
+    for fila in cursor.fetchall():
+        agrupadas.setdefault(fila['imagen_id'], []).append(fila)
+    return {imagen_id: srcset_de(filas) for imagen_id, filas in agrupadas.items()}
@@ -0,0 +1,73 @@
+import io
+import logging
+
+logger = logging.getLogger(__name__)
+
+# ====================================================================================================
+# Proceso hijo del pool de image_pipeline
+# ====================================================================================================
+# Módulo de entrada de los hijos (process_pool.py): solo importa io y Pillow, nunca la app.
+
+FORMATO_WEBP = 'webp'
+FORMATO_JPEG = 'jpeg'
+FORMATOS = (FORMATO_WEBP, FORMATO_JPEG)
+
+CALIDAD = {FORMATO_WEBP: 80, FORMATO_JPEG: 82}
+
+
+class ImagenInvalida(ValueError):
+    """El archivo no se pudo decodificar como imagen."""
+
+
+def _aplanar(imagen, fondo=(255, 255, 255)):
+    """RGB sin canal alfa (JPEG no lo soporta): se compone sobre fondo blanco."""
+    from PIL import Image
+
+    if imagen.mode in ('RGBA', 'LA') or (imagen.mode == 'P' and 'transparency' in imagen.info):
+        imagen = imagen.convert('RGBA')
+        base = Image.new('RGB', imagen.size, fondo)
+        base.paste(imagen, mask=imagen.getchannel('A'))
+        return base
+    return imagen.convert('RGB')
+
+
+def generar_variantes(origen, anchos, formatos=FORMATOS):
+    """
+    Decodifica 'origen' (ruta en disco o bytes) y devuelve (ancho_original, alto_original, variantes), donde cada
+    variante es {'ancho', 'alto', 'formato', 'datos'}. Nunca se amplía: los anchos mayores
+    que el original se sustituyen por el ancho original (una sola vez).
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        with Image.open(origen if isinstance(origen, str) else io.BytesIO(origen)) as original:
+            original.seek(0)  # GIF animados: primer fotograma
+            imagen = ImageOps.exif_transpose(original)
+            imagen.load()
+    except (UnidentifiedImageError, OSError) as e:
+        raise ImagenInvalida(str(e))
+
+    ancho_original, alto_original = imagen.size
+    con_alfa = imagen.mode in ('RGBA', 'LA') or (imagen.mode == 'P' and 'transparency' in imagen.info)
+    rgb = _aplanar(imagen)
+    rgba = imagen.convert('RGBA') if con_alfa else rgb
+
+    objetivos = sorted({min(ancho, ancho_original) for ancho in anchos})
+    variantes = []
+    for ancho in objetivos:
+        alto = max(1, round(alto_original * ancho / ancho_original))
+        for formato in formatos:
+            fuente = rgba if formato == FORMATO_WEBP else rgb
+            escalada = fuente if ancho == ancho_original else fuente.resize((ancho, alto), Image.LANCZOS)
+            salida = io.BytesIO()
+            if formato == FORMATO_WEBP:
+                escalada.save(salida, 'WEBP', quality=CALIDAD[formato], method=4)
+            else:
+                escalada.save(salida, 'JPEG', quality=CALIDAD[formato], optimize=True, progressive=True)
+            variantes.append({
+                'ancho': ancho,
+                'alto': alto,
+                'formato': formato,
+                'datos': salida.getvalue(),
+            })
+    return ancho_original, alto_original, variantes
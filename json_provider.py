@@ -0,0 +1,110 @@
+import json
+import logging
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se usa json de la stdlib (más lento, misma salida)
+    orjson = None
+
+# ====================================================================================================
+# Proveedor JSON de la app (jsonify, request.get_json) y de Socket.IO
+# ====================================================================================================
+# Las rutas devuelven las filas de PyMySQL tal cual: las fechas y los Decimal los serializa este
+# proveedor, no un bucle por fila. Los nombres que ve el cliente salen de alias en el SQL y las
+# columnas TINYINT(1) que son booleanos se declaran una vez por recurso y pasan por como_bool().
+#
+#   - datetime / date / time -> ISO 8601 (lo que devolvía .isoformat(), no la fecha HTTP de Flask)
+#   - Decimal (SUM, AVG, DECIMAL) -> número: int si es entero, float si no
+#   - Salida UTF-8 sin escapar acentos y sin ordenar claves.
+#
+# Con orjson instalado se serializa con él directamente a bytes; si no, con json.dumps y el mismo
+# 'default', así que el cliente recibe lo mismo con o sin orjson.
+
+
+def _default(obj):
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    # dataclasses, UUID, __html__: como Flask
+    return DefaultJSONProvider.default(obj)
+
+
+def _opciones(sort_keys=False, indent=None):
+    opciones = orjson.OPT_NON_STR_KEYS
+    if sort_keys:
+        opciones |= orjson.OPT_SORT_KEYS
+    if indent:
+        opciones |= orjson.OPT_INDENT_2
+    return opciones
+
+
+def dumps_bytes(obj, sort_keys=False, indent=None):
+    """Serializa obj a JSON en UTF-8."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=_opciones(sort_keys, indent))
+    separadores = None if indent else (',', ':')
+    return json.dumps(obj, default=_default, ensure_ascii=False, sort_keys=sort_keys, indent=indent,
+                      separators=separadores).encode('utf-8')
+
+
+def dumps(obj, **kwargs):
+    return dumps_bytes(obj, kwargs.get('sort_keys', False), kwargs.get('indent')).decode('utf-8')
+
+
+def loads(s, **kwargs):
+    if orjson is not None and not kwargs:
+        return orjson.loads(s)
+    return json.loads(s, **kwargs)
+
+
+def como_bool(filas, campos):
+    """Convierte a bool las columnas TINYINT(1) indicadas (PyMySQL las devuelve como 0/1). Devuelve filas."""
+    for fila in filas:
+        for campo in campos:
+            if fila.get(campo) is not None:
+                fila[campo] = bool(fila[campo])
+    return filas
+
+
+class ProveedorJSON(DefaultJSONProvider):
+    sort_keys = False
+    ensure_ascii = False
+
+    def dumps(self, obj, **kwargs):
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        return dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        return loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # Igual que Flask: con indentación en debug (o compact=False), compacto si no
+        indent = 2 if (self.compact is None and self._app.debug) or self.compact is False else None
+        cuerpo = dumps_bytes(obj, self.sort_keys, indent)
+        if indent:
+            cuerpo += b'\n'
+        return self._app.response_class(cuerpo, mimetype=self.mimetype)
+
+
+class JSONSocketIO:
+    """Módulo 'json' para Socket.IO: mismo formato que las respuestas HTTP, sin app context."""
+    dumps = staticmethod(dumps)
+    loads = staticmethod(loads)
+
+
+def orjson_disponible():
+    return orjson is not None
+
+
+def init_app(app):
+    app.json = ProveedorJSON(app)
+    if orjson is None:
+        logger.info("orjson no está instalado: JSON con la stdlib (pip install orjson).")
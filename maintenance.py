@@ -0,0 +1,527 @@
+import gzip
+import json
+import logging
+import os
+import re
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import click
+import pymysql
+import pymysql.cursors
+from flask import current_app
+from flask.cli import AppGroup
+
+import asset_gc
+import author_timeline
+import http_cache
+import redis_store
+import replicas as replicas_db
+import search
+import trending
+from extensions import get_db
+from redis_store import RedisNoDisponible
+
+logger = logging.getLogger(__name__)
+
+# ====================================================================================================
+# Purga y archivado por lotes (flask mantenimiento ...), reemplaza a CLEAN_DATA.py
+# ====================================================================================================
+#   flask mantenimiento purgar <tabla> --antes 90d [--archivar DIR] [--lote 500] [--pausa 0.2]
+#                                      [--replica host:puerto ...] [--simular]
+#   flask mantenimiento estado
+#
+# Recorre la tabla por rangos de clave primaria (id BETWEEN a AND b, --lote ids por rango) y en
+# cada rango, en una transacción corta en READ COMMITTED:
+#   1. SELECT ... FOR UPDATE de las filas del rango que se van a borrar (fecha anterior al corte y
+#      el criterio de retención de la tabla). En READ COMMITTED InnoDB suelta enseguida el bloqueo
+#      de las filas del rango que no cumplen el WHERE, así que solo quedan bloqueadas esas;
+#   2. con --archivar, las escribe (con sus filas hijas) como NDJSON en un .ndjson.gz y hace fsync
+#      ANTES de borrarlas;
+#   3. DELETE ... WHERE id IN (...), ajusta los contadores que dependen de ellas y encola sus
+#      archivos en assets_pendientes (asset_gc.py), todo en la misma transacción;
+#   4. commit y checkpoint (último id procesado y corte ya resuelto) en --checkpoint-dir. El
+#      checkpoint se identifica por la tabla y el texto de --antes, así que volver a ejecutar el
+#      mismo comando tras un corte sigue desde ahí con el mismo corte y el mismo archivo aunque
+#      --antes sea relativo (90d). Un rango repetido no borra nada dos veces (a lo sumo repite
+#      líneas en el archivo, que se deduplican por id). Una purga terminada no se reanuda: la
+#      siguiente ejecución calcula un corte nuevo.
+# Entre rangos duerme --pausa y espera mientras las réplicas (--replica) vayan con más de --max-lag
+# segundos de retraso, las páginas sucias del buffer pool superen --max-sucias o la history list
+# de InnoDB (purga pendiente) supere --max-historial. Como created_at crece con el id, el recorrido
+# termina en el primer rango sin filas anteriores al corte (--recorrer-todo lo desactiva): no se
+# lee la parte reciente de la tabla, que es la que el buffer pool necesita caliente.
+# Los archivos encolados se borran por lotes a través de storage (asset_gc.procesar_lote) tras
+# cada rango, salvo --dejar-archivos (entonces los borra el colector de los workers).
+
+_RE_RELATIVO = re.compile(r'^(\d+)([dhm])$')
+
+_RE_NO_ALFANUMERICO = re.compile(r'[^0-9a-z]+')
+
+# Columnas que nunca salen en un archivo
+_COLUMNAS_SENSIBLES = ('password_hash', 'verification_code', 'reset_token', 'token')
+
+
+class Tabla:
+    """
+    Cómo purgar una tabla: columna de fecha, criterio de retención adicional ('condicion', SQL),
+    filas hijas a archivar y efectos de borrar.
+    """
+
+    def __init__(self, nombre, fecha, condicion=None, hijos=None, preparar=None, despues=None, lote=500):
+        self.nombre = nombre
+        self.fecha = fecha
+        self.condicion = condicion
+        self.hijos = hijos
+        self.preparar = preparar
+        self.despues = despues
+        self.lote = lote
+
+
+# ================== EFECTOS POR TABLA ==================
+# hijos(cursor, filas) -> añade a cada fila lo que cae con ella en cascada (solo para el archivo)
+# preparar(cursor, filas) -> en la transacción, antes del DELETE (contadores, assets encolados)
+# despues(filas) -> tras el commit (Redis: búsqueda, trending, caché del feed)
+
+def _marcadores(valores):
+    return ', '.join(['%s'] * len(valores))
+
+
+def _agrupar(filas, clave):
+    grupos = {}
+    for fila in filas:
+        grupos.setdefault(fila.pop(clave), []).append(fila)
+    return grupos
+
+
+def _hijos_publicaciones(cursor, filas):
+    ids = [f['id'] for f in filas]
+    cursor.execute(f"SELECT * FROM comentarios WHERE publicacion_id IN ({_marcadores(ids)}) ORDER BY id", ids)
+    comentarios = _agrupar(cursor.fetchall(), 'publicacion_id')
+    cursor.execute(
+        f"SELECT id, publicacion_id, url, orden FROM imagenes_publicacion "
+        f"WHERE publicacion_id IN ({_marcadores(ids)}) ORDER BY id", ids
+    )
+    imagenes = _agrupar(cursor.fetchall(), 'publicacion_id')
+    cursor.execute(f"SELECT publicacion_id, user_id FROM likes WHERE publicacion_id IN ({_marcadores(ids)})", ids)
+    likes = {}
+    for like in cursor.fetchall():
+        likes.setdefault(like['publicacion_id'], []).append(like['user_id'])
+    for fila in filas:
+        fila['comentarios'] = comentarios.get(fila['id'], [])
+        fila['imagenes'] = imagenes.get(fila['id'], [])
+        fila['likes'] = likes.get(fila['id'], [])
+
+
+def _preparar_publicaciones(cursor, filas):
+    ids = [f['id'] for f in filas]
+    cursor.execute(
+        f"""
+        SELECT i.publicacion_id, i.url FROM imagenes_publicacion i WHERE i.publicacion_id IN ({_marcadores(ids)})
+        UNION ALL
+        SELECT i.publicacion_id, v.url FROM imagenes_publicacion_variantes v
+        JOIN imagenes_publicacion i ON v.imagen_id = i.id
+        WHERE i.publicacion_id IN ({_marcadores(ids)})
+        """, ids + ids
+    )
+    urls = {}
+    for fila in cursor.fetchall():
+        urls.setdefault(fila['publicacion_id'], []).append(fila['url'])
+
+    por_autor = {}
+    for fila in filas:
+        carpeta = f"publicaciones/{fila['autor_id']}/{fila['id']}"
+        asset_gc.encolar_urls(cursor, urls.get(fila['id'], []), carpeta=carpeta)
+        asset_gc.encolar_carpeta(cursor, carpeta)
+        deltas = por_autor.setdefault(fila['autor_id'], [0, 0, 0])
+        deltas[0] -= 1
+        deltas[1] -= fila['likes_count'] or 0
+        deltas[2] -= fila['comments_count'] or 0
+    for autor_id, (publicaciones, likes, comentarios) in por_autor.items():
+        author_timeline.sumar(cursor, autor_id, publicaciones=publicaciones, likes=likes, comentarios=comentarios)
+
+
+def _despues_publicaciones(filas):
+    for fila in filas:
+        search.eliminar(fila['id'])
+        trending.publicacion_eliminada(fila['id'], fila['categoria_id'])
+    try:
+        redis_store.delete(*[redis_store.key('publicacion_feed', f['id']) for f in filas], binary=True)
+    except RedisNoDisponible:
+        pass
+    http_cache.invalidar('publicaciones', *[f"comentarios:{f['id']}" for f in filas])
+
+
+def _preparar_comentarios(cursor, filas):
+    por_publicacion = {}
+    for fila in filas:
+        por_publicacion[fila['publicacion_id']] = por_publicacion.get(fila['publicacion_id'], 0) + 1
+    ids = list(por_publicacion)
+    cursor.execute(f"SELECT id, autor_id FROM publicaciones WHERE id IN ({_marcadores(ids)})", ids)
+    por_autor = {}
+    for pub in cursor.fetchall():
+        por_autor[pub['autor_id']] = por_autor.get(pub['autor_id'], 0) + por_publicacion[pub['id']]
+    cursor.executemany(
+        "UPDATE publicaciones SET comments_count = GREATEST(comments_count - %s, 0) WHERE id = %s",
+        [(n, publicacion_id) for publicacion_id, n in por_publicacion.items()]
+    )
+    for autor_id, n in por_autor.items():
+        author_timeline.sumar(cursor, autor_id, comentarios=-n)
+
+
+def _despues_comentarios(filas):
+    publicaciones = {f['publicacion_id'] for f in filas}
+    try:
+        redis_store.delete(*[redis_store.key('publicacion_feed', i) for i in publicaciones], binary=True)
+    except RedisNoDisponible:
+        pass
+    http_cache.invalidar('publicaciones', *[f'comentarios:{i}' for i in publicaciones])
+
+
+def _preparar_users(cursor, filas):
+    # Sus publicaciones, comentarios, likes y partidas caen por ON DELETE CASCADE; sus archivos no
+    ids = [f['id'] for f in filas]
+    cursor.execute(f"SELECT id, autor_id, categoria_id FROM publicaciones WHERE autor_id IN ({_marcadores(ids)})", ids)
+    publicaciones = _agrupar(cursor.fetchall(), 'autor_id')
+    for fila in filas:
+        fila['_publicaciones'] = publicaciones.get(fila['id'], [])
+        asset_gc.encolar_urls(cursor, [fila['foto_perfil']], carpeta=f"fotos_perfil/{fila['id']}")
+        asset_gc.encolar_carpeta(cursor, f"fotos_perfil/{fila['id']}")
+        asset_gc.encolar_carpeta(cursor, f"publicaciones/{fila['id']}")
+
+
+def _despues_users(filas):
+    for fila in filas:
+        for pub in fila.pop('_publicaciones', []):
+            search.eliminar(pub['id'])
+            trending.publicacion_eliminada(pub['id'], pub['categoria_id'])
+    http_cache.invalidar('publicaciones', 'usuarios')
+
+
+TABLAS = {
+    'publicaciones': Tabla('publicaciones', 'created_at', hijos=_hijos_publicaciones,
+                           preparar=_preparar_publicaciones, despues=_despues_publicaciones),
+    'comentarios': Tabla('comentarios', 'created_at', preparar=_preparar_comentarios, despues=_despues_comentarios),
+    'leaderboard': Tabla('leaderboard', 'fecha_registro'),
+    # Solo cuentas que nunca se verificaron: la antigüedad de una cuenta activa no es motivo para
+    # borrarla. Cada usuario arrastra en cascada todo lo suyo: rangos más chicos.
+    # (partidas no se purga: no registra la última actividad y su created_at es el de la primera
+    # partida, no el de la última; cae con su usuario.)
+    'users': Tabla('users', 'created_at', condicion="verificado = 0",
+                   preparar=_preparar_users, despues=_despues_users, lote=50),
+}
+
+
+# ================== SALUD DEL SERVIDOR ==================
+
+def _conectar_replica(host, puerto):
+    return pymysql.connect(
+        host=host, port=puerto,
+        user=current_app.config['MYSQL_USER'], password=current_app.config['MYSQL_PASSWORD'],
+        cursorclass=pymysql.cursors.DictCursor, connect_timeout=5, autocommit=True,
+    )
+
+
+def salud(conn, replicas=()):
+    """Lo que vigila el throttling: retraso máximo de réplicas, % de páginas sucias y history list."""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SHOW GLOBAL STATUS WHERE Variable_name IN "
+            "('Innodb_buffer_pool_pages_dirty', 'Innodb_buffer_pool_pages_total')"
+        )
+        estado = {f['Variable_name']: int(f['Value']) for f in cursor.fetchall()}
+        cursor.execute("SELECT `COUNT` AS n FROM information_schema.INNODB_METRICS WHERE NAME = 'trx_rseg_history_len'")
+        historial = cursor.fetchone()
+    total = estado.get('Innodb_buffer_pool_pages_total') or 0
+    retrasos = [replicas_db.retraso_replica(r) for r in replicas]
+    return {
+        'retraso': float('inf') if None in retrasos else max(retrasos, default=0),
+        'sucias_pct': round(100.0 * estado.get('Innodb_buffer_pool_pages_dirty', 0) / total, 1) if total else 0.0,
+        'historial': int(historial['n']) if historial else 0,
+    }
+
+
+def _esperar_salud(conn, replicas, limites):
+    """Bloquea mientras el servidor o las réplicas estén por encima de los límites. Devuelve los segundos esperados."""
+    inicio = time.monotonic()
+    avisado = 0.0
+    while True:
+        s = salud(conn, replicas)
+        excedidos = [
+            nombre for nombre, valor, limite in (
+                ('retraso', s['retraso'], limites['max_lag']),
+                ('sucias_pct', s['sucias_pct'], limites['max_sucias']),
+                ('historial', s['historial'], limites['max_historial']),
+            ) if limite is not None and valor > limite
+        ]
+        if not excedidos:
+            return time.monotonic() - inicio
+        if time.monotonic() - avisado >= 10:
+            avisado = time.monotonic()
+            click.echo(f"  esperando: {', '.join(f'{n}={s[n]}' for n in excedidos)}")
+        time.sleep(1)
+
+
+# ================== CHECKPOINTS Y ARCHIVO ==================
+
+def _ruta_checkpoint(directorio, tabla, antes):
+    """Por tabla y texto de --antes (no por el corte resuelto, que con '90d' cambia en cada ejecución)."""
+    return os.path.join(directorio, f"{tabla}-{_RE_NO_ALFANUMERICO.sub('', antes.strip().lower())}.json")
+
+
+def _leer_checkpoint(ruta):
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _guardar_checkpoint(ruta, datos):
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, indent=2, ensure_ascii=False)
+    os.replace(temporal, ruta)
+
+
+def _serializar(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, bytes):
+        return valor.decode('utf-8', 'replace')
+    raise TypeError(f"No serializable: {type(valor).__name__}")
+
+
+def _archivar(ruta, filas):
+    """Agrega las filas al .ndjson.gz (un miembro gzip por rango) y fuerza el fsync antes de seguir."""
+    with open(ruta, 'ab') as crudo:
+        with gzip.GzipFile(fileobj=crudo, mode='wb') as comprimido:
+            for fila in filas:
+                limpia = {k: v for k, v in fila.items() if k not in _COLUMNAS_SENSIBLES and not k.startswith('_')}
+                comprimido.write(json.dumps(limpia, ensure_ascii=False, default=_serializar).encode('utf-8'))
+                comprimido.write(b'\n')
+        crudo.flush()
+        os.fsync(crudo.fileno())
+
+
+def parsear_corte(texto):
+    """'90d', '12h', '30m' (hacia atrás desde ahora) o una fecha/fecha-hora ISO."""
+    relativo = _RE_RELATIVO.match(texto.strip().lower())
+    if relativo:
+        cantidad, unidad = int(relativo.group(1)), relativo.group(2)
+        delta = {'d': timedelta(days=cantidad), 'h': timedelta(hours=cantidad), 'm': timedelta(minutes=cantidad)}[unidad]
+        return (datetime.now() - delta).replace(microsecond=0)
+    try:
+        return datetime.fromisoformat(texto.strip())
+    except ValueError:
+        raise click.BadParameter("Usa una fecha ISO (2024-01-31) o una antigüedad como 90d, 12h o 30m.")
+
+
+def preparar_checkpoint(directorio, tabla, antes, desde_cero=False, simular=False):
+    """
+    (ruta del checkpoint, corte, checkpoint pendiente o None). Si hay una purga interrumpida con
+    el mismo --antes se reanuda con su corte, no con uno recalculado desde ahora; una terminada
+    (o --desde-cero) se descarta y el corte se calcula de nuevo.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    ruta = _ruta_checkpoint(directorio, tabla, antes)
+    previo = _leer_checkpoint(ruta)
+    if previo and (desde_cero or previo.get('completado')):
+        if not simular:
+            os.remove(ruta)
+        previo = None
+    if previo:
+        return ruta, datetime.fromisoformat(previo['corte']), previo
+    return ruta, parsear_corte(antes), None
+
+
+# ================== PURGA ==================
+
+def purgar(conn, tabla, corte, archivo=None, lote=None, pausa=0.2, replicas=(), limites=None,
+           checkpoint=None, simular=False, drenar_archivos=True, recorrer_todo=False, informar=None):
+    """
+    Borra (y archiva, si 'archivo') las filas de 'tabla' con fecha < 'corte', rango a rango.
+    'checkpoint' es la ruta del JSON de progreso; si existe, se continúa desde él. Devuelve un resumen.
+    """
+    spec = TABLAS[tabla]
+    lote = lote or spec.lote
+    limites = limites or {'max_lag': None, 'max_sucias': None, 'max_historial': None}
+    informar = informar or (lambda resumen: None)
+
+    estado = (_leer_checkpoint(checkpoint) if checkpoint else None) or {
+        'tabla': tabla, 'corte': corte.isoformat(), 'ultimo_id': None, 'filas': 0, 'rangos': 0,
+        'archivo': archivo, 'segundos': 0.0,
+    }
+    if estado.get('completado'):
+        return estado
+    archivo = estado.get('archivo') or archivo
+
+    condicion = f"{spec.fecha} < %s" + (f" AND {spec.condicion}" if spec.condicion else "")
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        # Con READ COMMITTED el FOR UPDATE no retiene bloqueos sobre las filas que no se borran
+        cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL READ COMMITTED")
+        cursor.execute(f"SELECT MIN(id) AS minimo, MAX(id) AS maximo FROM {spec.nombre}")
+        limites_id = cursor.fetchone()
+        conn.commit()
+        if limites_id['minimo'] is None:
+            estado['completado'] = True
+            return estado
+        desde = (estado['ultimo_id'] + 1) if estado['ultimo_id'] is not None else limites_id['minimo']
+        inicio = time.monotonic() - estado['segundos']
+        espera = 0.0
+
+        while desde <= limites_id['maximo']:
+            hasta = desde + lote - 1
+            cursor.execute(
+                f"SELECT COUNT(*) AS n, MIN({spec.fecha}) AS primera FROM {spec.nombre} WHERE id BETWEEN %s AND %s",
+                (desde, hasta)
+            )
+            rango = cursor.fetchone()
+            cursor.execute(
+                f"SELECT * FROM {spec.nombre} WHERE id BETWEEN %s AND %s AND {condicion} ORDER BY id"
+                + ("" if simular else " FOR UPDATE"),
+                (desde, hasta, corte)
+            )
+            filas = cursor.fetchall()
+
+            if filas and not simular:
+                if archivo:
+                    if spec.hijos:
+                        spec.hijos(cursor, filas)
+                    _archivar(archivo, filas)
+                if spec.preparar:
+                    spec.preparar(cursor, filas)
+                ids = [f['id'] for f in filas]
+                cursor.execute(f"DELETE FROM {spec.nombre} WHERE id IN ({_marcadores(ids)})", ids)
+            conn.commit()
+            if filas and not simular and spec.despues:
+                spec.despues(filas)
+
+            estado.update({
+                'ultimo_id': hasta,
+                'filas': estado['filas'] + len(filas),
+                'rangos': estado['rangos'] + 1,
+                'segundos': round(time.monotonic() - inicio, 2),
+            })
+            if checkpoint and not simular:
+                _guardar_checkpoint(checkpoint, estado)
+            informar(estado)
+
+            if filas and drenar_archivos and not simular:
+                asset_gc.procesar_lote(conn)
+
+            # created_at crece con el id: un rango con filas y ninguna anterior al corte marca el final
+            # (por fecha, no por el criterio de retención: más adelante puede haber filas que lo cumplan)
+            if rango['n'] and rango['primera'] is not None and rango['primera'] >= corte and not recorrer_todo:
+                break
+            desde = hasta + 1
+            if pausa:
+                time.sleep(pausa)
+            espera += _esperar_salud(conn, replicas, limites)
+
+        if drenar_archivos and not simular:
+            # Lo que falla queda con backoff en la cola para el colector; el bucle termina igual
+            while sum(asset_gc.procesar_lote(conn)):
+                pass
+        estado.update({
+            'completado': True,
+            'segundos': round(time.monotonic() - inicio, 2),
+            'espera_salud': round(espera, 2),
+        })
+        estado['por_segundo'] = round(estado['filas'] / estado['segundos'], 1) if estado['segundos'] else None
+        if checkpoint and not simular:
+            _guardar_checkpoint(checkpoint, estado)
+        return estado
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+# ================== CLI ==================
+
+mantenimiento_cli = AppGroup('mantenimiento', help="Purga y archivado por lotes de datos antiguos.")
+
+
+def init_app(app):
+    app.cli.add_command(mantenimiento_cli)
+
+
+@mantenimiento_cli.command('purgar')
+@click.argument('tabla', type=click.Choice(sorted(TABLAS)))
+@click.option('--antes', required=True, help="Corte: fecha ISO o antigüedad (90d, 12h, 30m).")
+@click.option('--archivar', 'directorio_archivo', type=click.Path(file_okay=False),
+              help="Exportar cada fila (con sus hijas) a DIR/<tabla>-<corte>.ndjson.gz antes de borrarla.")
+@click.option('--lote', type=int, default=None, help="Ids por rango (por defecto 500; 50 para users).")
+@click.option('--pausa', type=float, default=0.2, show_default=True, help="Segundos entre rangos.")
+@click.option('--replica', 'replicas', multiple=True,
+              help="host[:puerto] de una réplica a vigilar (por defecto, las de MYSQL_REPLICAS).")
+@click.option('--max-lag', type=float, default=5.0, show_default=True, help="Retraso máximo de réplicas (s).")
+@click.option('--max-sucias', type=float, default=50.0, show_default=True,
+              help="Páginas sucias máximas del buffer pool (%).")
+@click.option('--max-historial', type=int, default=1_000_000, show_default=True,
+              help="History list length máxima de InnoDB.")
+@click.option('--checkpoint-dir', default='.mantenimiento', show_default=True, type=click.Path(file_okay=False))
+@click.option('--desde-cero', is_flag=True, help="Ignorar el checkpoint existente.")
+@click.option('--dejar-archivos', is_flag=True, help="No borrar los archivos ahora (lo hará el colector).")
+@click.option('--recorrer-todo', is_flag=True, help="No cortar en el primer rango sin filas viejas.")
+@click.option('--simular', is_flag=True, help="Solo contar lo que se borraría.")
+def purgar_comando(tabla, antes, directorio_archivo, lote, pausa, replicas, max_lag, max_sucias, max_historial,
+                   checkpoint_dir, desde_cero, dejar_archivos, recorrer_todo, simular):
+    """Borra (o archiva y borra) las filas de TABLA anteriores al corte, por rangos de id."""
+    checkpoint, corte, previo = preparar_checkpoint(checkpoint_dir, tabla, antes, desde_cero, simular)
+    if previo:
+        click.echo(f"Continuando la purga interrumpida desde el id {previo['ultimo_id']}.")
+    archivo = None
+    if directorio_archivo:
+        os.makedirs(directorio_archivo, exist_ok=True)
+        archivo = os.path.join(directorio_archivo, f"{tabla}-{corte:%Y%m%dT%H%M%S}.ndjson.gz")
+
+    direcciones = replicas_db.parsear_replicas(','.join(replicas) or current_app.config.get('MYSQL_REPLICAS'))
+    conexiones = [_conectar_replica(host, puerto) for host, puerto in direcciones]
+    ultimo_aviso = [0.0]
+
+    def informar(estado):
+        if time.monotonic() - ultimo_aviso[0] >= 5:
+            ultimo_aviso[0] = time.monotonic()
+            ritmo = estado['filas'] / estado['segundos'] if estado['segundos'] else 0
+            click.echo(f"  {tabla}: hasta id {estado['ultimo_id']}, {estado['filas']} filas, {ritmo:.0f} filas/s")
+
+    click.echo(f"{'Simulando purga' if simular else 'Purgando'} de {tabla} anteriores a {corte}"
+               + (f" (archivo: {archivo})" if archivo else ""))
+    try:
+        resumen = purgar(
+            get_db(), tabla, corte, archivo=archivo, lote=lote, pausa=pausa, replicas=conexiones,
+            limites={'max_lag': max_lag if conexiones else None, 'max_sucias': max_sucias,
+                     'max_historial': max_historial},
+            checkpoint=None if simular else checkpoint, simular=simular,
+            drenar_archivos=not dejar_archivos, recorrer_todo=recorrer_todo, informar=informar,
+        )
+    finally:
+        for c in conexiones:
+            c.close()
+    if tabla == 'users' and resumen['filas'] and not simular:
+        # La cascada se llevó likes y comentarios de otros autores: sus contadores se recalculan
+        author_timeline.recalcular(get_db())
+    click.echo(f"{'Se borrarían' if simular else 'Borradas'} {resumen['filas']} filas en {resumen['rangos']} rangos, "
+               f"{resumen['segundos']} s ({resumen.get('por_segundo') or 0} filas/s, "
+               f"{resumen.get('espera_salud', 0)} s esperando al servidor).")
+
+
+@mantenimiento_cli.command('estado')
+@click.option('--checkpoint-dir', default='.mantenimiento', show_default=True, type=click.Path(file_okay=False))
+def estado_comando(checkpoint_dir):
+    """Checkpoints de purgas (terminadas o por continuar) y salud actual del servidor."""
+    if os.path.isdir(checkpoint_dir):
+        for nombre in sorted(os.listdir(checkpoint_dir)):
+            if nombre.endswith('.json'):
+                datos = _leer_checkpoint(os.path.join(checkpoint_dir, nombre)) or {}
+                click.echo(f"{nombre}: {'completada' if datos.get('completado') else 'pendiente'}, "
+                           f"hasta id {datos.get('ultimo_id')}, {datos.get('filas', 0)} filas")
+    s = salud(get_db())
+    click.echo(f"Buffer pool: {s['sucias_pct']}% páginas sucias; history list: {s['historial']}")
@@ -0,0 +1,13 @@
+-- Bases de datos existentes: flask.sql solo se ejecuta al crear el contenedor de MySQL.
+-- Aplicar con: mysql -u <usuario> -p flask_api < migrations/001_imagenes_publicacion_variantes.sql
+CREATE TABLE IF NOT EXISTS imagenes_publicacion_variantes (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    imagen_id INT NOT NULL,
+    formato VARCHAR(10) NOT NULL,
+    ancho INT NOT NULL,
+    alto INT NOT NULL,
+    bytes INT NOT NULL,
+    url VARCHAR(255) NOT NULL,
+    UNIQUE (imagen_id, formato, ancho),
+    FOREIGN KEY (imagen_id) REFERENCES imagenes_publicacion(id) ON DELETE CASCADE
+);
@@ -0,0 +1,13 @@
+-- Bases de datos existentes: flask.sql solo se ejecuta al crear el contenedor de MySQL.
+-- Aplicar con: mysql -u <usuario> -p flask_api < migrations/002_assets_pendientes.sql
+CREATE TABLE IF NOT EXISTS assets_pendientes (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    tipo VARCHAR(10) NOT NULL, -- 'url' | 'carpeta'
+    valor VARCHAR(255) NOT NULL,
+    carpeta VARCHAR(255) NULL,
+    intentos INT NOT NULL DEFAULT 0,
+    proximo_intento DATETIME NULL DEFAULT CURRENT_TIMESTAMP, -- NULL: reintentos agotados
+    ultimo_error VARCHAR(255) NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_assets_pendientes_proximo (proximo_intento)
+);
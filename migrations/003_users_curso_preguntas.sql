@@ -0,0 +1,6 @@
+-- Bases de datos existentes: flask.sql solo se ejecuta al crear el contenedor de MySQL.
+-- Aplicar con: mysql -u <usuario> -p flask_api < migrations/003_users_curso_preguntas.sql
+-- routes/auth_juego.py guarda aquí las URLs del curso y de las preguntas de cada usuario.
+ALTER TABLE users
+    ADD COLUMN curso_url VARCHAR(255) DEFAULT NULL,
+    ADD COLUMN preguntas_url VARCHAR(255) DEFAULT NULL;
@@ -0,0 +1,5 @@
+-- Bases de datos existentes: flask.sql solo se ejecuta al crear el contenedor de MySQL.
+-- Aplicar con: mysql -u <usuario> -p flask_api < migrations/004_publicaciones_fulltext.sql
+-- Índice de GET /blog/buscar con SEARCH_ENGINE=mysql (search.py).
+ALTER TABLE publicaciones
+    ADD FULLTEXT INDEX ft_publicaciones_titulo_texto (titulo, texto);
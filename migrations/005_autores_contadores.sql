@@ -0,0 +1,25 @@
+-- Bases de datos existentes: flask.sql solo se ejecuta al crear el contenedor de MySQL.
+-- Aplicar con: mysql -u <usuario> -p flask_api < migrations/005_autores_contadores.sql
+-- GET /blog/autores/<id|username>/publicaciones y contadores del perfil (author_timeline.py).
+ALTER TABLE publicaciones
+    ADD INDEX idx_publicaciones_autor_fecha (autor_id, created_at, id);
+
+CREATE TABLE IF NOT EXISTS autores_contadores (
+    autor_id INT PRIMARY KEY,
+    publicaciones INT NOT NULL DEFAULT 0,
+    likes_recibidos INT NOT NULL DEFAULT 0,
+    comentarios_recibidos INT NOT NULL DEFAULT 0,
+    FOREIGN KEY (autor_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Carga inicial (equivale a 'flask recalcular-contadores-autor')
+INSERT INTO autores_contadores (autor_id, publicaciones, likes_recibidos, comentarios_recibidos)
+SELECT u.id,
+       (SELECT COUNT(*) FROM publicaciones p WHERE p.autor_id = u.id),
+       (SELECT COUNT(*) FROM likes l JOIN publicaciones p ON p.id = l.publicacion_id WHERE p.autor_id = u.id),
+       (SELECT COUNT(*) FROM comentarios c JOIN publicaciones p ON p.id = c.publicacion_id WHERE p.autor_id = u.id)
+FROM users u
+ON DUPLICATE KEY UPDATE
+    publicaciones = VALUES(publicaciones),
+    likes_recibidos = VALUES(likes_recibidos),
+    comentarios_recibidos = VALUES(comentarios_recibidos);
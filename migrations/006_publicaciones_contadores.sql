@@ -0,0 +1,15 @@
+-- Bases de datos existentes: flask.sql solo se ejecuta al crear el contenedor de MySQL.
+-- Aplicar con: mysql -u <usuario> -p flask_api < migrations/006_publicaciones_contadores.sql
+-- Contadores del feed mantenidos al escribir (post_counters.py concilia los desvíos).
+ALTER TABLE publicaciones
+    ADD COLUMN comments_count INT NOT NULL DEFAULT 0,
+    ADD COLUMN images_count INT NOT NULL DEFAULT 0;
+
+-- Carga inicial (equivale a 'flask conciliar-contadores')
+UPDATE publicaciones p
+LEFT JOIN (SELECT publicacion_id, COUNT(*) AS n FROM comentarios GROUP BY publicacion_id) c
+    ON c.publicacion_id = p.id
+LEFT JOIN (SELECT publicacion_id, COUNT(*) AS n FROM imagenes_publicacion GROUP BY publicacion_id) i
+    ON i.publicacion_id = p.id
+SET p.comments_count = COALESCE(c.n, 0),
+    p.images_count = COALESCE(i.n, 0);
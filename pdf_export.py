@@ -0,0 +1,238 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import time
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+
+import process_pool
+import redis_store
+import static_delivery
+from pdf_worker import TIPO_CURSO, TIPO_PUBLICACION, TIPOS, generar  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+# ====================================================================================================
+# Exportación de PDFs (curso del usuario y publicación con comentarios)
+# ====================================================================================================
+# - El nombre del archivo es '<tipo>_<sha256 de los datos de origen>.pdf': si el curso o la
+#   publicación no cambian, el PDF ya existe y se sirve sin volver a generarlo. Como el nombre
+#   lleva el hash, static_delivery lo sirve 'immutable'.
+# - La generación (pdf_worker.py) corre en un pool de procesos 'spawn' (process_pool.py, como
+#   image_pipeline). La petición solo encola y responde 202; el cliente consulta /pdfs/<archivo>
+#   hasta que devuelve 200.
+# - Trabajos en curso: dict local del worker + marca en Redis (SET NX) para que otro worker no
+#   genere el mismo PDF a la vez y también responda 202. Un trabajo cuenta como en curso como
+#   mucho PDF_RENDER_TIMEOUT segundos desde que se encola (la marca caduca poco después): si el
+#   worker que lo generaba muere, la siguiente petición lo vuelve a encolar.
+# - PDF_FOLDER se limita a PDF_CACHE_MAX_BYTES expulsando los exportados menos usados (LRU por
+#   mtime: cada vez que se sirve o se vuelve a pedir un PDF se actualiza su mtime).
+#
+# El PDF se escribe a mano (texto, Helvetica con WinAnsiEncoding): no hace falta ninguna
+# dependencia nueva y los hijos del pool solo importan pdf_worker (stdlib).
+
+# Subir al cambiar el formato del PDF: invalida todos los exportados anteriores
+VERSION_PLANTILLA = 1
+
+_PATRON_EXPORTADO = re.compile(r"^(?:curso|publicacion)_[0-9a-f]{32}\.pdf$")
+
+_pool = None
+_pool_lock = Lock()
+_en_curso = {}  # nombre -> (Future, instante en que se encoló)
+_en_curso_lock = Lock()
+_expulsion_lock = Lock()
+
+_config = {
+    'carpeta': None,
+    'workers': 1,
+    'max_bytes': 500 * 1024 * 1024,
+    'timeout': 60.0,
+}
+
+# Segundos que la marca de Redis sobrevive al timeout (relojes y latencia entre workers)
+MARGEN_MARCA = 10
+
+
+def init_app(app):
+    _config.update({
+        'carpeta': app.config['PDF_FOLDER'],
+        'workers': int(app.config.get('PDF_WORKERS', 1)),
+        'max_bytes': int(app.config.get('PDF_CACHE_MAX_BYTES', 500 * 1024 * 1024)),
+        'timeout': float(app.config.get('PDF_RENDER_TIMEOUT', 60)),
+    })
+
+
+# ================== TRABAJOS ==================
+
+def nombre_de(tipo, datos):
+    """'<tipo>_<hash>.pdf'. Los datos se serializan ordenados: mismo contenido, mismo nombre."""
+    canonico = json.dumps(
+        {'v': VERSION_PLANTILLA, 'tipo': tipo, 'datos': datos},
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return f"{tipo}_{hashlib.sha256(canonico.encode('utf-8')).hexdigest()[:32]}.pdf"
+
+
+def es_exportado(filename):
+    return bool(_PATRON_EXPORTADO.match(filename))
+
+
+def _ruta(nombre):
+    return os.path.join(_config['carpeta'], nombre)
+
+
+def _obtener_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = process_pool.crear_pool(_config['workers'], 'pdf_worker')
+        return _pool
+
+
+def _reiniciar_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _clave_en_curso(nombre):
+    return redis_store.key('pdf_en_curso', nombre)
+
+
+def _marcar_en_curso(nombre):
+    """True si este worker se queda el trabajo. Sin Redis, solo se coordina dentro del worker."""
+    cliente = redis_store.get_client()
+    if cliente is None:
+        return True
+    try:
+        ttl = math.ceil(_config['timeout']) + MARGEN_MARCA
+        return bool(cliente.set(_clave_en_curso(nombre), '1', nx=True, ex=ttl))
+    except Exception:
+        return True
+
+
+def _desmarcar(nombre):
+    try:
+        redis_store.delete(_clave_en_curso(nombre))
+    except Exception:
+        pass
+
+
+def _en_curso_local(nombre):
+    """True si este worker encoló el trabajo hace menos de PDF_RENDER_TIMEOUT. Con _en_curso_lock."""
+    trabajo = _en_curso.get(nombre)
+    return trabajo is not None and time.monotonic() - trabajo[1] < _config['timeout']
+
+
+def en_curso(nombre):
+    with _en_curso_lock:
+        if _en_curso_local(nombre):
+            return True
+    cliente = redis_store.get_client()
+    if cliente is None:
+        return False
+    try:
+        return bool(cliente.exists(_clave_en_curso(nombre)))
+    except Exception:
+        return False
+
+
+def _al_terminar(nombre, futuro):
+    with _en_curso_lock:
+        # Si se volvió a encolar tras el timeout, la entrada ya es la del trabajo nuevo
+        if _en_curso.get(nombre, (None,))[0] is futuro:
+            del _en_curso[nombre]
+    _desmarcar(nombre)
+    try:
+        tamano = futuro.result()
+        logger.debug("%s generado (%s bytes)", nombre, tamano)
+        expulsar(proteger=nombre)
+    except BrokenProcessPool:
+        logger.error("El proceso que generaba %s murió; se recrea el pool.", nombre)
+        _reiniciar_pool()
+    except Exception as e:
+        logger.error("Fallo generando %s: %s", nombre, e)
+
+
+def solicitar(tipo, datos):
+    """
+    Devuelve (nombre, listo). Si el PDF no existe y nadie lo está generando, encola el trabajo.
+    """
+    nombre = nombre_de(tipo, datos)
+    ruta = _ruta(nombre)
+    if os.path.isfile(ruta):
+        tocar(nombre)
+        return nombre, True
+    with _en_curso_lock:
+        if _en_curso_local(nombre):
+            return nombre, False
+        if not _marcar_en_curso(nombre):
+            return nombre, False
+        try:
+            futuro = _obtener_pool().submit(generar, tipo, datos, ruta)
+        except Exception:
+            _desmarcar(nombre)
+            raise
+        _en_curso[nombre] = (futuro, time.monotonic())
+    futuro.add_done_callback(lambda f: _al_terminar(nombre, f))
+    return nombre, False
+
+
+def tocar(nombre):
+    """Marca el PDF como recién usado para la expulsión LRU."""
+    try:
+        os.utime(_ruta(nombre))
+    except OSError:
+        pass
+
+
+def expulsar(proteger=None):
+    """Borra los PDFs exportados menos usados hasta que la carpeta quepa en PDF_CACHE_MAX_BYTES."""
+    with _expulsion_lock:
+        archivos = []
+        total = 0
+        with os.scandir(_config['carpeta']) as entradas:
+            for entrada in entradas:
+                if not entrada.is_file() or not es_exportado(entrada.name):
+                    continue
+                stat = entrada.stat()
+                total += stat.st_size
+                archivos.append((stat.st_mtime, stat.st_size, entrada.name))
+        borrados = 0
+        for _, tamano, nombre in sorted(archivos):
+            if total <= _config['max_bytes']:
+                break
+            if nombre == proteger:
+                continue
+            try:
+                os.remove(_ruta(nombre))
+                static_delivery.olvidar_etag(_ruta(nombre))
+                total -= tamano
+                borrados += 1
+            except OSError:
+                pass
+        if borrados:
+            logger.debug("%s PDFs expulsados de la caché (%s bytes en uso)", borrados, total)
+        return borrados
+
+
+def respuesta_en_curso(nombre):
+    """Cuerpo y cabeceras del 202 que devuelven las rutas mientras se genera el PDF."""
+    return (
+        {"estado": "en_proceso", "archivo": nombre, "url": f"/pdfs/{nombre}"},
+        {"Retry-After": "2", "Location": f"/pdfs/{nombre}", "Cache-Control": "no-store"},
+    )
+
+
+def esperar(nombre, timeout=30.0):
+    """Espera a que termine un trabajo de este worker (scripts / pruebas). True si el PDF existe."""
+    with _en_curso_lock:
+        trabajo = _en_curso.get(nombre)
+    if trabajo is not None:
+        trabajo[0].result(timeout)
+    return os.path.isfile(_ruta(nombre))
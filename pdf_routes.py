@@ -1,13 +1,122 @@
-from flask import Blueprint, send_from_directory, current_app
+import logging
+import os
+
+import pymysql.cursors
+from flask import Blueprint, current_app, jsonify
+
+import pdf_export
+import static_delivery
+import storage
+from extensions import get_db
+
+logger = logging.getLogger(__name__)
 
 # Define el Blueprint para las rutas de PDFs
 # No se especifica 'url_prefix' aquí, ya que la ruta '/pdfs/<filename>' lo define
 # directamente para este Blueprint.
 pdf_bp = Blueprint('pdfs', __name__)
 
+
+def _respuesta_exportacion(tipo, datos):
+    """200 con la URL si el PDF ya existe; si no, lo encola y responde 202."""
+    nombre, listo = pdf_export.solicitar(tipo, datos)
+    if listo:
+        return jsonify({"estado": "listo", "archivo": nombre, "url": f"/pdfs/{nombre}"}), 200
+    cuerpo, cabeceras = pdf_export.respuesta_en_curso(nombre)
+    return jsonify(cuerpo), 202, cabeceras
+
+
 # Ruta para servir archivos PDF desde la carpeta configurada en app.py
 @pdf_bp.route('/pdfs/<filename>')
 def serve_pdf(filename):
-    # 'current_app' permite acceder a las configuraciones definidas en app.py,
-    # como app.config['PDF_FOLDER'].
-    return send_from_directory(current_app.config['PDF_FOLDER'], filename)
\ No newline at end of file
+    if pdf_export.es_exportado(filename):
+        if os.path.isfile(os.path.join(current_app.config['PDF_FOLDER'], filename)):
+            pdf_export.tocar(filename)
+        elif pdf_export.en_curso(filename):
+            cuerpo, cabeceras = pdf_export.respuesta_en_curso(filename)
+            return jsonify(cuerpo), 202, cabeceras
+    # static_delivery resuelve la carpeta (app.config['PDF_FOLDER']), el ETag, la caché,
+    # los 304 / Range y, si está configurado, delega el envío de los bytes a nginx.
+    # Los exportados se nombran por el hash de sus datos: mismo nombre, mismo PDF.
+    return static_delivery.servir_archivo('pdfs', filename, inmutable=pdf_export.es_exportado(filename))
+
+
+@pdf_bp.route('/pdfs/curso/<string:username>', methods=['POST', 'GET'])
+def exportar_curso(username):
+    conn = None
+    cursor = None
+    try:
+        conn = get_db()
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        cursor.execute("SELECT curso_url FROM users WHERE username = %s", (username,))
+        user = cursor.fetchone()
+        if not user:
+            return jsonify({"message": "Usuario no encontrado"}), 404
+        if not user["curso_url"]:
+            return jsonify({"message": "El usuario no tiene curso asignado"}), 404
+
+        curso = storage.leer_json(user["curso_url"])
+        if curso is None:
+            # Sin contenido no se encola nada: se cachearía un PDF de un curso vacío
+            logger.error("No se pudo leer el curso de %s (%s)", username, user["curso_url"])
+            if storage.directorio_objetos():
+                return jsonify({"message": "El curso del usuario no existe en el almacenamiento"}), 404
+            return jsonify({"message": "No se pudo descargar el curso del usuario"}), 502
+        return _respuesta_exportacion(pdf_export.TIPO_CURSO, {"usuario": username, "curso": curso})
+    except Exception as e:
+        logger.exception("Fallo exportando el curso de %s: %s", username, e)
+        return jsonify({"message": "Error interno del servidor"}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
+
+@pdf_bp.route('/pdfs/publicacion/<int:publicacion_id>', methods=['POST', 'GET'])
+def exportar_publicacion(publicacion_id):
+    conn = None
+    cursor = None
+    try:
+        conn = get_db()
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        cursor.execute("""
+            SELECT p.titulo, p.texto, p.created_at, u.username AS autor, c.nombre AS categoria
+            FROM publicaciones p
+            JOIN users u ON p.autor_id = u.id
+            LEFT JOIN categorias c ON p.categoria_id = c.id
+            WHERE p.id = %s
+        """, (publicacion_id,))
+        publicacion = cursor.fetchone()
+        if not publicacion:
+            return jsonify({"error": "Publicación no encontrada."}), 404
+
+        cursor.execute("""
+            SELECT u.username AS autor, c.texto, c.created_at
+            FROM comentarios c
+            JOIN users u ON c.autor_id = u.id
+            WHERE c.publicacion_id = %s
+            ORDER BY c.created_at ASC, c.id ASC
+        """, (publicacion_id,))
+        comentarios = [
+            {"autor": c["autor"], "texto": c["texto"], "created_at": str(c["created_at"])}
+            for c in cursor.fetchall()
+        ]
+
+        datos = {
+            "titulo": publicacion["titulo"],
+            "texto": publicacion["texto"],
+            "autor": publicacion["autor"],
+            "categoria": publicacion["categoria"],
+            "created_at": str(publicacion["created_at"]),
+            "comentarios": comentarios,
+        }
+        return _respuesta_exportacion(pdf_export.TIPO_PUBLICACION, datos)
+    except Exception as e:
+        logger.exception("Fallo exportando la publicación %s: %s", publicacion_id, e)
+        return jsonify({"error": "Error interno."}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
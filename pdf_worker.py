@@ -0,0 +1,180 @@
+import logging
+import os
+import tempfile
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# ====================================================================================================
+# Proceso hijo del pool de pdf_export
+# ====================================================================================================
+# Módulo de entrada de los hijos (process_pool.py): compone y escribe el PDF solo con la stdlib,
+# sin importar la app, Redis ni Flask.
+
+TIPO_CURSO = 'curso'
+TIPO_PUBLICACION = 'publicacion'
+TIPOS = (TIPO_CURSO, TIPO_PUBLICACION)
+
+ANCHO_PAGINA, ALTO_PAGINA = 595, 842  # A4 en puntos
+MARGEN = 56
+# Ancho medio de un carácter de Helvetica en proporción al cuerpo (para partir líneas)
+_ANCHO_CARACTER = 0.5
+
+ESTILOS = {
+    'titulo': (18, True, 10),
+    'subtitulo': (14, True, 6),
+    'seccion': (12, True, 4),
+    'texto': (10, False, 2),
+    'meta': (8, False, 2),
+}
+
+
+def _escapar(texto):
+    datos = texto.encode('cp1252', errors='replace')
+    return datos.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def _partir(texto, tamano, sangria=0):
+    maximo = max(int((ANCHO_PAGINA - 2 * MARGEN - sangria) / (tamano * _ANCHO_CARACTER)), 10)
+    lineas = []
+    for parrafo in str(texto).splitlines() or ['']:
+        actual = ''
+        for palabra in parrafo.split():
+            while len(palabra) > maximo:  # palabras larguísimas (URLs)
+                if actual:
+                    lineas.append(actual)
+                    actual = ''
+                lineas.append(palabra[:maximo])
+                palabra = palabra[maximo:]
+            if actual and len(actual) + 1 + len(palabra) > maximo:
+                lineas.append(actual)
+                actual = palabra
+            else:
+                actual = f"{actual} {palabra}" if actual else palabra
+        lineas.append(actual)
+    return lineas
+
+
+def escribir_pdf(bloques, titulo_documento=''):
+    """
+    Compone un PDF de texto a partir de bloques (estilo, texto, sangría) y devuelve los bytes.
+    'estilo' es una clave de ESTILOS.
+    """
+    paginas = []
+    operaciones = []
+    y = ALTO_PAGINA - MARGEN
+    for estilo, texto, sangria in bloques:
+        tamano, negrita, espacio = ESTILOS[estilo]
+        interlineado = tamano * 1.35
+        y -= espacio
+        for linea in _partir(texto, tamano, sangria):
+            if y - interlineado < MARGEN:
+                paginas.append(operaciones)
+                operaciones = []
+                y = ALTO_PAGINA - MARGEN
+            y -= interlineado
+            fuente = 'F2' if negrita else 'F1'
+            operaciones.append(
+                b"BT /%s %d Tf %.2f %.2f Td (%s) Tj ET" % (
+                    fuente.encode(), tamano, MARGEN + sangria, y, _escapar(linea)
+                )
+            )
+    paginas.append(operaciones)
+
+    # Objetos: 1 catálogo, 2 árbol de páginas, 3-4 fuentes, 5 info, luego (página, contenido) por página
+    objetos = {
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        4: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+        5: b"<< /Title (%s) /Producer (GOE) >>" % _escapar(titulo_documento),
+    }
+    hijos = []
+    for i, operaciones_pagina in enumerate(paginas):
+        id_pagina, id_contenido = 6 + 2 * i, 7 + 2 * i
+        hijos.append(b"%d 0 R" % id_pagina)
+        contenido = zlib.compress(b"\n".join(operaciones_pagina))
+        objetos[id_pagina] = (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+            b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>"
+            % (ANCHO_PAGINA, ALTO_PAGINA, id_contenido)
+        )
+        objetos[id_contenido] = (
+            b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(contenido), contenido)
+        )
+    objetos[1] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objetos[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(hijos), len(hijos))
+
+    salida = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    desplazamientos = {}
+    for numero in sorted(objetos):
+        desplazamientos[numero] = len(salida)
+        salida += b"%d 0 obj\n%s\nendobj\n" % (numero, objetos[numero])
+    inicio_xref = len(salida)
+    total = max(objetos) + 1
+    salida += b"xref\n0 %d\n0000000000 65535 f \n" % total
+    for numero in range(1, total):
+        salida += b"%010d 00000 n \n" % desplazamientos[numero]
+    salida += b"trailer\n<< /Size %d /Root 1 0 R /Info 5 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (total, inicio_xref)
+    return bytes(salida)
+
+
+def _titular(clave):
+    return str(clave).replace('_', ' ').strip().capitalize()
+
+
+def _bloques_json(valor, nivel=0):
+    """Recorre el JSON del curso: claves -> encabezados, listas -> viñetas, escalares -> texto."""
+    sangria = min(nivel, 4) * 14
+    if isinstance(valor, dict):
+        bloques = []
+        for clave, hijo in valor.items():
+            if isinstance(hijo, (dict, list)):
+                bloques.append(('seccion' if nivel else 'subtitulo', _titular(clave), sangria))
+                bloques.extend(_bloques_json(hijo, nivel + 1))
+            else:
+                bloques.append(('texto', f"{_titular(clave)}: {hijo}", sangria))
+        return bloques
+    if isinstance(valor, list):
+        bloques = []
+        for elemento in valor:
+            if isinstance(elemento, (dict, list)):
+                bloques.extend(_bloques_json(elemento, nivel + 1))
+            else:
+                bloques.append(('texto', f"• {elemento}", sangria))
+        return bloques
+    return [('texto', str(valor), sangria)]
+
+
+def componer(tipo, datos):
+    """Bytes del PDF para 'tipo' a partir de los datos de origen. Se ejecuta en el proceso hijo."""
+    if tipo == TIPO_CURSO:
+        titulo = f"Curso de {datos['usuario']}"
+        bloques = [('titulo', titulo, 0)] + _bloques_json(datos['curso'])
+    else:
+        titulo = datos['titulo']
+        bloques = [
+            ('titulo', titulo, 0),
+            ('meta', f"{datos['autor']} · {datos.get('categoria') or 'Sin categoría'} · {datos['created_at']}", 0),
+            ('texto', datos['texto'], 0),
+            ('subtitulo', f"Comentarios ({len(datos['comentarios'])})", 0),
+        ]
+        for comentario in datos['comentarios']:
+            bloques.append(('meta', f"{comentario['autor']} · {comentario['created_at']}", 0))
+            bloques.append(('texto', comentario['texto'], 14))
+    return escribir_pdf(bloques, titulo)
+
+
+def generar(tipo, datos, destino):
+    """Proceso hijo: escribe el PDF en un temporal de la misma carpeta y lo mueve (atómico)."""
+    contenido = componer(tipo, datos)
+    descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(destino), prefix='.pdf_', suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as fh:
+            fh.write(contenido)
+        os.replace(temporal, destino)
+    except BaseException:
+        try:
+            os.remove(temporal)
+        except OSError:
+            pass
+        raise
+    return len(contenido)
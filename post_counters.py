@@ -0,0 +1,225 @@
+import logging
+import time
+from threading import Timer
+
+import click
+from flask.cli import with_appcontext
+
+import http_cache
+import redis_store
+from extensions import get_db
+
+logger = logging.getLogger(__name__)
+
+# ====================================================================================================
+# Conciliación de los contadores de publicaciones (likes_count, comments_count, images_count) y de autores
+# ====================================================================================================
+# Las rutas los mantienen en la misma transacción que inserta o borra el like / comentario /
+# imagen, así que el feed los lee sin COUNT(*). Si algo escribe en esas tablas por fuera (scripts,
+# borrados en cascada de usuarios, una consola) se desvían; este job los recalcula en bloque cada
+# COUNTERS_RECONCILE_INTERVAL segundos, por rangos de COUNTERS_RECONCILE_BATCH ids.
+# Por rango, una lectura sin bloqueos (una sola instantánea) devuelve las filas cuyos contadores
+# no coinciden con los conteos agrupados, y cada una se corrige con un UPDATE condicionado a que
+# sus contadores sigan valiendo lo leído. Un like o comentario que se confirme entre la lectura y
+# el UPDATE (o que esté en curso y tenga la fila bloqueada) cambia el contador, así que esa fila
+# se salta en lugar de pisar el incremento con un conteo viejo; se revisa en el siguiente ciclo.
+# Con la misma técnica, por rangos de ids de usuario, se corrigen los contadores por autor de
+# autores_contadores (publicaciones, likes y comentarios recibidos, ver author_timeline.py), que
+# las rutas también mantienen al escribir y nada más repararía si se desvían. Al autor sin fila
+# se le inserta (INSERT IGNORE: si una ruta la crea antes, gana la ruta y se revisa en el siguiente ciclo).
+# Un solo worker concilia por ciclo (lock en Redis). Si hubo correcciones se renueva la versión
+# del feed (ETag, http_cache.py) y la del perfil de cada autor corregido; las filas cacheadas
+# del feed se corrigen al expirar su TTL.
+
+_config = {
+    'intervalo': 3600.0,
+    'lote': 1000,
+}
+
+_timer = None
+
+_SQL_DESVIADAS = """
+    SELECT p.id, p.likes_count, p.comments_count, p.images_count,
+           COALESCE(l.n, 0) AS likes, COALESCE(c.n, 0) AS comentarios, COALESCE(i.n, 0) AS imagenes
+    FROM publicaciones p
+    LEFT JOIN (
+        SELECT publicacion_id, COUNT(*) AS n FROM likes
+        WHERE publicacion_id BETWEEN %s AND %s GROUP BY publicacion_id
+    ) l ON l.publicacion_id = p.id
+    LEFT JOIN (
+        SELECT publicacion_id, COUNT(*) AS n FROM comentarios
+        WHERE publicacion_id BETWEEN %s AND %s GROUP BY publicacion_id
+    ) c ON c.publicacion_id = p.id
+    LEFT JOIN (
+        SELECT publicacion_id, COUNT(*) AS n FROM imagenes_publicacion
+        WHERE publicacion_id BETWEEN %s AND %s GROUP BY publicacion_id
+    ) i ON i.publicacion_id = p.id
+    WHERE p.id BETWEEN %s AND %s
+      AND (p.likes_count <> COALESCE(l.n, 0)
+           OR p.comments_count <> COALESCE(c.n, 0)
+           OR p.images_count <> COALESCE(i.n, 0))
+"""
+
+# Solo si los contadores siguen como se leyeron junto a los conteos
+_SQL_CORREGIR = """
+    UPDATE publicaciones SET likes_count = %s, comments_count = %s, images_count = %s
+    WHERE id = %s AND likes_count = %s AND comments_count = %s AND images_count = %s
+"""
+
+_SQL_AUTORES_DESVIADOS = """
+    SELECT u.id, a.autor_id AS con_fila, a.publicaciones, a.likes_recibidos, a.comentarios_recibidos,
+           COALESCE(p.n, 0) AS n_publicaciones, COALESCE(l.n, 0) AS n_likes, COALESCE(c.n, 0) AS n_comentarios
+    FROM users u
+    LEFT JOIN autores_contadores a ON a.autor_id = u.id
+    LEFT JOIN (
+        SELECT autor_id, COUNT(*) AS n FROM publicaciones
+        WHERE autor_id BETWEEN %s AND %s GROUP BY autor_id
+    ) p ON p.autor_id = u.id
+    LEFT JOIN (
+        SELECT pl.autor_id, COUNT(*) AS n FROM likes lk JOIN publicaciones pl ON pl.id = lk.publicacion_id
+        WHERE pl.autor_id BETWEEN %s AND %s GROUP BY pl.autor_id
+    ) l ON l.autor_id = u.id
+    LEFT JOIN (
+        SELECT pc.autor_id, COUNT(*) AS n FROM comentarios co JOIN publicaciones pc ON pc.id = co.publicacion_id
+        WHERE pc.autor_id BETWEEN %s AND %s GROUP BY pc.autor_id
+    ) c ON c.autor_id = u.id
+    WHERE u.id BETWEEN %s AND %s
+      AND (COALESCE(a.publicaciones, 0) <> COALESCE(p.n, 0)
+           OR COALESCE(a.likes_recibidos, 0) <> COALESCE(l.n, 0)
+           OR COALESCE(a.comentarios_recibidos, 0) <> COALESCE(c.n, 0))
+"""
+
+_SQL_CORREGIR_AUTOR = """
+    UPDATE autores_contadores SET publicaciones = %s, likes_recibidos = %s, comentarios_recibidos = %s
+    WHERE autor_id = %s AND publicaciones = %s AND likes_recibidos = %s AND comentarios_recibidos = %s
+"""
+
+_SQL_CREAR_AUTOR = """
+    INSERT IGNORE INTO autores_contadores (autor_id, publicaciones, likes_recibidos, comentarios_recibidos)
+    VALUES (%s, %s, %s, %s)
+"""
+
+
+def init_app(app):
+    _config.update({
+        'intervalo': float(app.config.get('COUNTERS_RECONCILE_INTERVAL', 3600)),
+        'lote': int(app.config.get('COUNTERS_RECONCILE_BATCH', 1000)),
+    })
+    app.cli.add_command(conciliar_comando)
+
+
+def _rangos(cursor, tabla, lote):
+    cursor.execute(f"SELECT MIN(id) AS minimo, MAX(id) AS maximo FROM {tabla}")
+    limites = cursor.fetchone()
+    if limites['minimo'] is None:
+        return []
+    return [(desde, desde + lote - 1) for desde in range(limites['minimo'], limites['maximo'] + 1, lote)]
+
+
+def _corregir_autor(cursor, f):
+    """Corrige un autor desviado si sus contadores siguen como se leyeron. Devuelve si lo corrigió."""
+    reales = (f['n_publicaciones'], f['n_likes'], f['n_comentarios'])
+    if f['con_fila'] is None:
+        cursor.execute(_SQL_CREAR_AUTOR, (f['id'],) + reales)
+    else:
+        cursor.execute(_SQL_CORREGIR_AUTOR, reales + (
+            f['id'], f['publicaciones'], f['likes_recibidos'], f['comentarios_recibidos']))
+    return cursor.rowcount == 1
+
+
+def conciliar(conn, lote=None):
+    """
+    Recalcula los contadores de todas las publicaciones y de todos los autores, un rango de ids
+    por transacción. Devuelve un resumen ('autores': ids de los autores corregidos).
+    """
+    lote = lote or _config['lote']
+    inicio = time.perf_counter()
+    corregidas = rangos = 0
+    autores = []
+    cursor = conn.cursor()
+    try:
+        for desde, hasta in _rangos(cursor, 'publicaciones', lote):
+            cursor.execute(_SQL_DESVIADAS, (desde, hasta) * 4)
+            desviadas = cursor.fetchall()
+            if desviadas:
+                cursor.executemany(_SQL_CORREGIR, [
+                    (f['likes'], f['comentarios'], f['imagenes'],
+                     f['id'], f['likes_count'], f['comments_count'], f['images_count'])
+                    for f in desviadas
+                ])
+                corregidas += cursor.rowcount
+            rangos += 1
+            conn.commit()
+        for desde, hasta in _rangos(cursor, 'users', lote):
+            cursor.execute(_SQL_AUTORES_DESVIADOS, (desde, hasta) * 4)
+            # Uno a uno: son pocos y hace falta saber cuáles se corrigieron para invalidar su perfil
+            autores += [f['id'] for f in cursor.fetchall() if _corregir_autor(cursor, f)]
+            rangos += 1
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return {
+        'corregidas': corregidas,
+        'autores': autores,
+        'rangos': rangos,
+        'segundos': round(time.perf_counter() - inicio, 2),
+    }
+
+
+def _invalidar(resumen):
+    if resumen['corregidas']:
+        http_cache.invalidar('publicaciones')
+    if resumen['autores']:
+        http_cache.invalidar(*(f'perfil:{autor_id}' for autor_id in resumen['autores']))
+
+
+@click.command('conciliar-contadores')
+@click.option('--lote', type=int, default=None, help="Ids de publicación (o de usuario) por transacción.")
+@with_appcontext
+def conciliar_comando(lote):
+    """Corrige los contadores de las publicaciones (likes, comentarios, imágenes) y de los autores."""
+    resumen = conciliar(get_db(), lote)
+    _invalidar(resumen)
+    click.echo(f"{resumen['corregidas']} publicaciones y {len(resumen['autores'])} autores corregidos "
+               f"en {resumen['rangos']} rangos ({resumen['segundos']} s).")
+
+
+# ================== JOB PERIÓDICO ==================
+
+def _tomar_turno():
+    """Solo un worker concilia por ciclo. Sin Redis se concilia igual (el UPDATE es idempotente)."""
+    try:
+        cliente = redis_store.require_client()
+        ttl = max(int(_config['intervalo']), 1)
+        return bool(cliente.set(redis_store.key('lock', 'post_counters'), '1', nx=True, ex=ttl))
+    except redis_store.RedisNoDisponible:
+        return True
+
+
+def _ciclo(app):
+    global _timer
+    try:
+        if _tomar_turno():
+            with app.app_context():
+                resumen = conciliar(get_db())
+            _invalidar(resumen)
+            if resumen['corregidas'] or resumen['autores']:
+                logger.warning("Contadores de publicaciones o autores desviados y corregidos: %s", resumen)
+    except Exception as e:
+        logger.exception("Fallo conciliando los contadores de publicaciones: %s", e)
+    finally:
+        _timer = Timer(_config['intervalo'], _ciclo, args=(app,))
+        _timer.daemon = True
+        _timer.start()
+
+
+def iniciar_conciliador(app):
+    global _timer
+    if _timer is not None or _config['intervalo'] <= 0:
+        return
+    _timer = Timer(_config['intervalo'], _ciclo, args=(app,))
+    _timer.daemon = True
+    _timer.start()
@@ -0,0 +1,198 @@
+import logging
+import os
+import socket
+import time
+from threading import Lock, Timer
+
+import redis_store
+
+logger = logging.getLogger(__name__)
+
+# ====================================================================================================
+# Presencia y ocupación de salas de publicaciones (Redis)
+# ====================================================================================================
+# Cada sala 'publicacion_<id>' (y sus variantes ':v2' / ':msgpack') tiene en Redis un sorted set
+#   <ns>:presence:<sala>  ->  miembro '<worker>|<sid>' con score = instante de expiración
+# Cada worker refresca periódicamente (PRESENCE_TTL / 3) la expiración de sus conexiones, así que
+# si un worker muere sus miembros caducan solos y se limpian con ZREMRANGEBYSCORE.
+# La ocupación de una sala es ZCOUNT(ahora, +inf), cacheada localmente PRESENCE_CACHE_TTL segundos
+# para que los helpers de emisión puedan consultarla en cada like/comentario sin ir a Redis.
+
+PREFIJO_SALA_RASTREADA = 'publicacion_'
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"  # se recalcula en iniciar_heartbeat (tras el fork)
+
+_ttl = 60
+_cache_ttl = 1.0
+
+_salas_por_sid = {}  # sid -> set(salas) de este worker
+_lock = Lock()
+_cache_ocupacion = {}  # sala -> (ocupacion, expira_en)
+_heartbeat_timer = None
+
+
+def init_app(app):
+    global _ttl, _cache_ttl
+    _ttl = int(app.config.get('PRESENCE_TTL', 60))
+    _cache_ttl = float(app.config.get('PRESENCE_CACHE_TTL', 1.0))
+
+
+def _rastreada(sala):
+    return sala.startswith(PREFIJO_SALA_RASTREADA)
+
+
+def _clave(sala):
+    return redis_store.key('presence', sala)
+
+
+def _miembro(sid):
+    return f"{WORKER_ID}|{sid}"
+
+
+def unirse(sid, sala):
+    """Registra que la conexión 'sid' de este worker está en 'sala'."""
+    if not _rastreada(sala):
+        return
+    with _lock:
+        _salas_por_sid.setdefault(sid, set()).add(sala)
+    _cache_ocupacion.pop(sala, None)
+    client = redis_store.get_client()
+    if client is None:
+        return
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.zadd(_clave(sala), {_miembro(sid): time.time() + _ttl})
+        pipe.expire(_clave(sala), _ttl * 2)
+        pipe.execute()
+    except Exception as e:
+        logger.error("No se pudo registrar %s en %s: %s", sid, sala, e)
+
+
+def salir(sid, sala):
+    if not _rastreada(sala):
+        return
+    with _lock:
+        salas = _salas_por_sid.get(sid)
+        if salas:
+            salas.discard(sala)
+    _cache_ocupacion.pop(sala, None)
+    client = redis_store.get_client()
+    if client is None:
+        return
+    try:
+        client.zrem(_clave(sala), _miembro(sid))
+    except Exception as e:
+        logger.error("No se pudo quitar %s de %s: %s", sid, sala, e)
+
+
+def desconectar(sid):
+    """Quita la conexión de todas las salas en las que estaba (evento 'disconnect')."""
+    with _lock:
+        salas = _salas_por_sid.pop(sid, set())
+    if not salas:
+        return
+    client = redis_store.get_client()
+    if client is None:
+        return
+    try:
+        pipe = client.pipeline(transaction=False)
+        for sala in salas:
+            pipe.zrem(_clave(sala), _miembro(sid))
+            _cache_ocupacion.pop(sala, None)
+        pipe.execute()
+    except Exception as e:
+        logger.error("No se pudo limpiar la presencia de %s: %s", sid, e)
+
+
+def heartbeat():
+    """Refresca la expiración de todas las conexiones de este worker y purga las caducadas."""
+    with _lock:
+        membresias = [(sid, sala) for sid, salas in _salas_por_sid.items() for sala in salas]
+    client = redis_store.get_client()
+    if client is None or not membresias:
+        return
+    ahora = time.time()
+    try:
+        pipe = client.pipeline(transaction=False)
+        for sid, sala in membresias:
+            pipe.zadd(_clave(sala), {_miembro(sid): ahora + _ttl})
+        for sala in {sala for _, sala in membresias}:
+            pipe.zremrangebyscore(_clave(sala), '-inf', ahora)
+            pipe.expire(_clave(sala), _ttl * 2)
+        pipe.execute()
+    except Exception as e:
+        logger.error("Fallo en heartbeat de presencia: %s", e)
+
+
+def _ciclo_heartbeat():
+    global _heartbeat_timer
+    try:
+        heartbeat()
+    finally:
+        _heartbeat_timer = Timer(max(_ttl / 3.0, 1.0), _ciclo_heartbeat)
+        _heartbeat_timer.daemon = True
+        _heartbeat_timer.start()
+
+
+def iniciar_heartbeat():
+    global _heartbeat_timer, WORKER_ID
+    if _heartbeat_timer is not None:
+        return
+    WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+    _heartbeat_timer = Timer(max(_ttl / 3.0, 1.0), _ciclo_heartbeat)
+    _heartbeat_timer.daemon = True
+    _heartbeat_timer.start()
+
+
+def ocupacion_salas(salas):
+    """
+    Devuelve {sala: conexiones vivas} en una sola ida a Redis para las que no estén en la
+    caché local. Si Redis no está disponible devuelve None para esas salas (desconocido).
+    """
+    ahora = time.time()
+    resultado = {}
+    pendientes = []
+    for sala in salas:
+        cacheado = _cache_ocupacion.get(sala)
+        if cacheado and cacheado[1] > ahora:
+            resultado[sala] = cacheado[0]
+        else:
+            pendientes.append(sala)
+    if not pendientes:
+        return resultado
+
+    client = redis_store.get_client()
+    if client is None:
+        resultado.update({sala: None for sala in pendientes})
+        return resultado
+    try:
+        pipe = client.pipeline(transaction=False)
+        for sala in pendientes:
+            pipe.zcount(_clave(sala), ahora, '+inf')
+        conteos = pipe.execute()
+    except Exception as e:
+        logger.error("No se pudo leer la ocupación: %s", e)
+        resultado.update({sala: None for sala in pendientes})
+        return resultado
+
+    for sala, conteo in zip(pendientes, conteos):
+        conteo = int(conteo or 0)
+        _cache_ocupacion[sala] = (conteo, ahora + _cache_ttl)
+        resultado[sala] = conteo
+    return resultado
+
+
+def hay_oyentes(sala):
+    """
+    True si alguien escucha la sala. Las salas no rastreadas, y cualquier duda (Redis caído),
+    cuentan como ocupadas: es preferible emitir de más que perder eventos.
+    """
+    if not _rastreada(sala):
+        return True
+    ocupacion = ocupacion_salas([sala])[sala]
+    return ocupacion is None or ocupacion > 0
+
+
+def espectadores(salas):
+    """Suma de conexiones vivas en las salas dadas (todas las variantes de una publicación)."""
+    return sum(c or 0 for c in ocupacion_salas(salas).values())
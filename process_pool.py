@@ -0,0 +1,53 @@
+import importlib
+import logging
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.context import SpawnContext, SpawnProcess
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+# ====================================================================================================
+# Pools de procesos con hijos ligeros
+# ====================================================================================================
+# Con 'spawn' cada hijo ejecuta de nuevo el __main__ del padre antes de recibir trabajo: lanzado
+# con 'python app.py', eso es el monkey_patch de eventlet, create_app() y todos los blueprints en
+# cada hijo. Los pools de este módulo arrancan sus hijos con un módulo de entrada como __main__
+# (image_worker.py, pdf_worker.py), que solo importa lo que necesitan sus tareas.
+#
+# Este módulo también lo importan los hijos (para reconstruir el proceso): solo stdlib.
+
+_main_lock = Lock()
+
+
+class _Proceso(SpawnProcess):
+    """Proceso 'spawn' que se presenta al hijo con 'entrada' como __main__ en lugar del del padre."""
+
+    def __init__(self, entrada, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._entrada = entrada
+
+    def start(self):
+        entrada = importlib.import_module(self._entrada)
+        # multiprocessing lee sys.modules['__main__'] al preparar el hijo, dentro de start()
+        with _main_lock:
+            principal = sys.modules['__main__']
+            sys.modules['__main__'] = entrada
+            try:
+                super().start()
+            finally:
+                sys.modules['__main__'] = principal
+
+
+class _Contexto(SpawnContext):
+    def __init__(self, entrada):
+        super().__init__()
+        self._entrada = entrada
+
+    def Process(self, *args, **kwargs):
+        return _Proceso(self._entrada, *args, **kwargs)
+
+
+def crear_pool(max_workers, entrada):
+    """ProcessPoolExecutor cuyos hijos solo importan el módulo 'entrada' (y lo que este importe)."""
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=_Contexto(entrada))
@@ -0,0 +1,178 @@
+import logging
+import time
+from threading import Timer
+
+import codec
+import redis_store
+from extensions import get_db
+
+logger = logging.getLogger(__name__)
+
+# ====================================================================================================
+# Estado de la sesión de preguntas (Redis, write-behind a MySQL)
+# ====================================================================================================
+# Antes cada paso del quiz hacía 'UPDATE users SET estado_pregunta = ...' sobre las mismas filas
+# calientes de 'users' que leen login, perfil y el feed. Ahora el estado vive en un hash por usuario:
+#
+#   <ns>:quiz:<username>   pregunta         pregunta activa (codificada con codec.py)
+#                          pregunta_expira  epoch en el que la pregunta activa deja de valer
+#                          estado           'no_respondio' | 'correcto' | 'incorrecto'
+#                          racha            respuestas correctas seguidas
+#
+# Cada cambio de estado añade el usuario al set <ns>:quiz_pendientes. El flusher periódico
+# (QUIZ_FLUSH_INTERVAL) vacía ese set y persiste solo el último estado de cada usuario con un
+# único executemany, así que MySQL recibe a lo sumo una escritura por usuario y por intervalo.
+
+CAMPO_PREGUNTA = b'pregunta'
+CAMPO_EXPIRA = b'pregunta_expira'
+CAMPO_ESTADO = b'estado'
+CAMPO_RACHA = b'racha'
+
+LOTE_FLUSH = 500
+
+_flush_timer = None
+
+
+def _clave(username):
+    return redis_store.key('quiz', username)
+
+
+def _clave_pendientes():
+    return redis_store.key('quiz_pendientes')
+
+
+def _texto(valor):
+    return valor.decode('utf-8') if isinstance(valor, bytes) else valor
+
+
+def obtener_pregunta(username):
+    """Pregunta activa del usuario, o None si no tiene o ya expiró."""
+    pregunta, expira = redis_store.get_fields(_clave(username), [CAMPO_PREGUNTA, CAMPO_EXPIRA], binary=True)
+    if not pregunta:
+        return None
+    if expira and float(expira) < time.time():
+        return None
+    return codec.decode_value(pregunta)
+
+
+def guardar_pregunta(username, pregunta, codec_valor=codec.CODEC_JSON):
+    """Fija la nueva pregunta activa y marca el estado como 'no_respondio'."""
+    clave = _clave(username)
+    with redis_store.pipeline(binary=True) as pipe:
+        pipe.hset(clave, mapping={
+            CAMPO_PREGUNTA: codec.encode_value(pregunta, codec_valor),
+            CAMPO_EXPIRA: str(time.time() + redis_store.ttl('pregunta_actual')),
+            CAMPO_ESTADO: 'no_respondio',
+        })
+        pipe.expire(clave, redis_store.ttl('quiz'))
+        pipe.sadd(_clave_pendientes(), username)
+
+
+def registrar_respuesta(username, resultado):
+    """
+    Guarda el resultado de la respuesta. Si es correcta se retira la pregunta activa y la racha
+    aumenta; si es incorrecta la pregunta se mantiene y la racha vuelve a 0. Devuelve la racha.
+    """
+    clave = _clave(username)
+    with redis_store.pipeline(binary=True) as pipe:
+        pipe.hset(clave, CAMPO_ESTADO, resultado)
+        if resultado == 'correcto':
+            pipe.hdel(clave, CAMPO_PREGUNTA, CAMPO_EXPIRA)
+            pipe.hincrby(clave, CAMPO_RACHA, 1)
+        else:
+            pipe.hset(clave, CAMPO_RACHA, 0)
+        pipe.expire(clave, redis_store.ttl('quiz'))
+        pipe.sadd(_clave_pendientes(), username)
+    return int(pipe.resultados[2] if resultado == 'correcto' else 0)
+
+
+def actualizar_estado(username, estado):
+    clave = _clave(username)
+    with redis_store.pipeline(binary=True) as pipe:
+        pipe.hset(clave, CAMPO_ESTADO, estado)
+        pipe.expire(clave, redis_store.ttl('quiz'))
+        pipe.sadd(_clave_pendientes(), username)
+
+
+def obtener_estado(username):
+    """(estado, racha) desde Redis. estado es None si el usuario no tiene sesión cacheada."""
+    estado, racha = redis_store.get_fields(_clave(username), [CAMPO_ESTADO, CAMPO_RACHA], binary=True)
+    return _texto(estado), int(racha or 0)
+
+
+def cachear_estado(username, estado):
+    """Carga en Redis el estado leído de MySQL (sin marcarlo como pendiente de escribir)."""
+    clave = _clave(username)
+    with redis_store.pipeline(binary=True) as pipe:
+        pipe.hsetnx(clave, CAMPO_ESTADO, estado or '')
+        pipe.expire(clave, redis_store.ttl('quiz'))
+
+
+# ================== WRITE-BEHIND ==================
+
+def flush_pendientes(conn, lote=LOTE_FLUSH):
+    """
+    Persiste en users.estado_pregunta el último estado de los usuarios pendientes.
+    Devuelve cuántos usuarios se escribieron. Si el UPDATE falla, los vuelve a encolar.
+    """
+    total = 0
+    while True:
+        with redis_store.pipeline(binary=True) as pipe:
+            pipe.spop(_clave_pendientes(), lote)
+        usernames = pipe.resultados[0]
+        if not usernames:
+            return total
+
+        with redis_store.pipeline(binary=True) as pipe:
+            for username in usernames:
+                pipe.hget(_clave(_texto(username)), CAMPO_ESTADO)
+        filas = [
+            (_texto(estado), _texto(username))
+            for username, estado in zip(usernames, pipe.resultados)
+            if estado
+        ]
+
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            cursor.executemany("UPDATE users SET estado_pregunta = %s WHERE username = %s", filas)
+            conn.commit()
+            total += len(filas)
+        except Exception:
+            conn.rollback()
+            with redis_store.pipeline(binary=True) as pipe:
+                pipe.sadd(_clave_pendientes(), *usernames)
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+
+        if len(usernames) < lote:
+            return total
+
+
+def _ciclo_flush(app, intervalo):
+    global _flush_timer
+    try:
+        with app.app_context():
+            escritos = flush_pendientes(get_db())
+            if escritos:
+                logger.debug("%s estados de pregunta persistidos en MySQL.", escritos)
+    except redis_store.RedisNoDisponible:
+        pass
+    except Exception as e:
+        logger.exception("Fallo persistiendo estados de pregunta: %s", e)
+    finally:
+        _flush_timer = Timer(intervalo, _ciclo_flush, args=(app, intervalo))
+        _flush_timer.daemon = True
+        _flush_timer.start()
+
+
+def iniciar_flusher(app):
+    global _flush_timer
+    if _flush_timer is not None:
+        return
+    intervalo = float(app.config.get('QUIZ_FLUSH_INTERVAL', 30))
+    _flush_timer = Timer(intervalo, _ciclo_flush, args=(app, intervalo))
+    _flush_timer.daemon = True
+    _flush_timer.start()
@@ -0,0 +1,220 @@
+import logging
+from threading import Timer, Lock
+
+import codec
+import presence
+
+logger = logging.getLogger(__name__)
+
+# ====================================================================================================
+# Coalescencia de eventos Socket.IO por sala de publicación
+# ====================================================================================================
+# Una publicación viral genera cientos de 'like_update' / 'comment_*' por segundo, y cada emit
+# se publica en la cola de Redis y se reparte a todos los workers y sockets de la sala.
+# Los clientes que se unen a la sala con 'protocol': 2 reciben en su lugar un único mensaje
+# 'publication_events' por ventana (REALTIME_COALESCE_MS, 200 ms por defecto) con el último
+# conteo de likes y los eventos de comentarios en orden. Los clientes antiguos (protocolo 1)
+# siguen en la sala 'publicacion_<id>' y reciben el flujo evento por evento de siempre.
+#
+# Además, cada cliente puede negociar el codec al conectarse ({'codec': 'msgpack'} en auth o
+# ?codec=msgpack). Los clientes msgpack se unen a la variante ':msgpack' de cada sala y reciben
+# los payloads como binario; los broadcasts se envían a las salas 'global' / 'global:msgpack'.
+
+PROTOCOLO_LEGACY = 1
+PROTOCOLO_BATCH = 2
+
+PREFIJO_SALA_PUBLICACION = 'publicacion_'
+SUFIJO_SALA_BATCH = ':v2'
+
+SUFIJO_SALA_MSGPACK = ':msgpack'
+SALA_GLOBAL = 'global'
+
+EVENTO_BATCH = 'publication_events'
+
+# Codec negociado por cada conexión (sid -> codec). Se limpia al desconectar.
+_codec_por_sid = {}
+_msgpack_habilitado = False
+
+
+def sala_publicacion(publicacion_id, protocolo=PROTOCOLO_LEGACY):
+    """Nombre de la sala Socket.IO de una publicación para la versión de protocolo dada."""
+    sala = f"{PREFIJO_SALA_PUBLICACION}{publicacion_id}"
+    if protocolo >= PROTOCOLO_BATCH:
+        return sala + SUFIJO_SALA_BATCH
+    return sala
+
+
+def sala_para_codec(sala, codec_cliente):
+    """Variante de la sala para el codec del cliente ('sala' para JSON, 'sala:msgpack' para msgpack)."""
+    if codec_cliente == codec.CODEC_MSGPACK and not sala.endswith(SUFIJO_SALA_MSGPACK):
+        return sala + SUFIJO_SALA_MSGPACK
+    return sala
+
+
+def sala_para_protocolo(sala, protocolo, codec_cliente=codec.CODEC_JSON):
+    """
+    Traduce la sala pedida por el cliente a la sala real según su protocolo y su codec.
+    Solo las salas de publicaciones tienen variante batch; todas tienen variante msgpack.
+    """
+    if protocolo >= PROTOCOLO_BATCH and sala.startswith(PREFIJO_SALA_PUBLICACION) \
+            and not sala.endswith(SUFIJO_SALA_BATCH):
+        sala = sala + SUFIJO_SALA_BATCH
+    return sala_para_codec(sala, codec_cliente)
+
+
+def leer_protocolo(data):
+    """Obtiene la versión de protocolo enviada por el cliente (1 si falta o es inválida)."""
+    try:
+        return int(data.get('protocol') or PROTOCOLO_LEGACY)
+    except (TypeError, ValueError):
+        return PROTOCOLO_LEGACY
+
+
+def registrar_codec(sid, codec_pedido):
+    """
+    Guarda el codec negociado por una conexión y devuelve el efectivo. Si msgpack no está
+    habilitado en el servidor (o no está instalado) el cliente se queda en JSON.
+    """
+    efectivo = codec.normalizar_codec(codec_pedido) if _msgpack_habilitado else codec.CODEC_JSON
+    _codec_por_sid[sid] = efectivo
+    return efectivo
+
+
+def codec_de(sid):
+    return _codec_por_sid.get(sid, codec.CODEC_JSON)
+
+
+def olvidar_codec(sid):
+    _codec_por_sid.pop(sid, None)
+
+
+def salas_publicacion(publicacion_id):
+    """Todas las variantes (protocolo x codec) de la sala de una publicación."""
+    salas = []
+    for protocolo in (PROTOCOLO_LEGACY, PROTOCOLO_BATCH):
+        sala = sala_publicacion(publicacion_id, protocolo)
+        salas.append(sala)
+        salas.append(sala_para_codec(sala, codec.CODEC_MSGPACK))
+    return salas
+
+
+def emit_codificado(socketio, evento, payload, room, namespace='/', solo_con_oyentes=False):
+    """
+    Emite el evento a la sala JSON y, si msgpack está habilitado, el mismo payload en binario
+    a la sala ':msgpack' correspondiente. Con solo_con_oyentes=True se omite cada variante
+    que, según presence.py, no tiene a nadie escuchando (no se publica nada en la cola de Redis).
+    """
+    if not solo_con_oyentes or presence.hay_oyentes(room):
+        socketio.emit(evento, payload, namespace=namespace, room=room)
+    if _msgpack_habilitado:
+        sala_msgpack = sala_para_codec(room, codec.CODEC_MSGPACK)
+        if not solo_con_oyentes or presence.hay_oyentes(sala_msgpack):
+            socketio.emit(
+                evento,
+                codec.encode_payload(payload, codec.CODEC_MSGPACK),
+                namespace=namespace,
+                room=sala_msgpack
+            )
+
+
+def hay_oyentes_batch(publicacion_id):
+    """True si algún cliente con protocolo 2 (JSON o msgpack) escucha la publicación."""
+    sala = sala_publicacion(publicacion_id, PROTOCOLO_BATCH)
+    if presence.hay_oyentes(sala):
+        return True
+    return _msgpack_habilitado and presence.hay_oyentes(sala_para_codec(sala, codec.CODEC_MSGPACK))
+
+
+def emit_broadcast(socketio, evento, payload, namespace='/'):
+    """Emite a todos los clientes conectados, cada uno en el codec que negoció."""
+    emit_codificado(socketio, evento, payload, SALA_GLOBAL, namespace=namespace)
+
+
+class RoomCoalescer:
+    """
+    Acumula los eventos de cada publicación durante una ventana corta y los emite juntos.
+
+    - Los 'like_update' se colapsan: solo se conserva el último payload (el conteo más reciente).
+    - Los eventos de comentarios ('comment_added', 'comment_updated', 'comment_deleted') se
+      conservan todos, en el orden en que ocurrieron.
+    """
+
+    def __init__(self, socketio=None, window=0.2, namespace='/'):
+        self.socketio = socketio
+        self.window = window
+        self.namespace = namespace
+        self._pending = {}
+        self._lock = Lock()
+        self._seq = 0
+
+    def init_app(self, app, socketio):
+        self.socketio = socketio
+        self.window = app.config.get('REALTIME_COALESCE_MS', 200) / 1000.0
+
+    def add_like(self, publicacion_id, payload):
+        if not hay_oyentes_batch(publicacion_id):
+            return
+        with self._lock:
+            entrada = self._entrada(publicacion_id)
+            entrada['like'] = payload
+
+    def add_comment_event(self, publicacion_id, evento, payload):
+        if not hay_oyentes_batch(publicacion_id):
+            return
+        with self._lock:
+            entrada = self._entrada(publicacion_id)
+            entrada['events'].append({'type': evento, 'data': payload})
+
+    def _entrada(self, publicacion_id):
+        # Debe llamarse con self._lock tomado.
+        entrada = self._pending.get(publicacion_id)
+        if entrada is None:
+            entrada = {'like': None, 'events': []}
+            self._pending[publicacion_id] = entrada
+            timer = Timer(self.window, self.flush, args=(publicacion_id,))
+            timer.daemon = True
+            timer.start()
+        return entrada
+
+    def flush(self, publicacion_id):
+        with self._lock:
+            entrada = self._pending.pop(publicacion_id, None)
+            if entrada is None:
+                return
+            self._seq += 1
+            seq = self._seq
+
+        mensaje = {
+            'publicacion_id': publicacion_id,
+            'seq': seq,
+            'like': entrada['like'],
+            'events': entrada['events'],
+        }
+        try:
+            emit_codificado(
+                self.socketio,
+                EVENTO_BATCH,
+                mensaje,
+                sala_publicacion(publicacion_id, PROTOCOLO_BATCH),
+                namespace=self.namespace,
+                solo_con_oyentes=True
+            )
+        except Exception as e:
+            logger.error("Fallo emitiendo batch para publicacion_%s: %s", publicacion_id, e)
+
+    def flush_all(self):
+        with self._lock:
+            pendientes = list(self._pending.keys())
+        for publicacion_id in pendientes:
+            self.flush(publicacion_id)
+
+
+coalescer = RoomCoalescer()
+
+
+def init_app(app, socketio):
+    global _msgpack_habilitado
+    _msgpack_habilitado = app.config.get('SOCKETIO_MSGPACK', False) and codec.msgpack_disponible()
+    if app.config.get('SOCKETIO_MSGPACK') and not codec.msgpack_disponible():
+        logger.warning("SOCKETIO_MSGPACK activo pero msgpack no está instalado; se usará JSON.")
+    coalescer.init_app(app, socketio)
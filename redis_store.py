@@ -0,0 +1,395 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+import redis
+import redis.client
+import redis.exceptions
+
+logger = logging.getLogger(__name__)
+
+# ====================================================================================================
+# Capa de acceso a Redis
+# ====================================================================================================
+# Todo el código de la app pasa por aquí en lugar de usar un StrictRedis suelto:
+#   - Un BlockingConnectionPool explícito (REDIS_POOL_SIZE). Con eventlet cientos de greenlets
+#     comparten el pool; cuando se agota esperan REDIS_POOL_TIMEOUT segundos en lugar de abrir
+#     conexiones sin límite.
+#   - Reconexión perezosa: si Redis no responde al arrancar (o se cae), get_client() devuelve None
+#     y vuelve a intentarlo pasado REDIS_RECONNECT_BACKOFF segundos. require_client() lanza
+#     RedisNoDisponible, que las rutas traducen a 503 en lugar de reventar con AttributeError.
+#   - Dos clientes sobre el mismo servidor: texto (decode_responses=True) y binario (bytes).
+#   - Scripts Lua precargados para operaciones atómicas de leer-y-consumir.
+#   - Convención de claves '<REDIS_NAMESPACE>:<tipo>:<id>' y TTLs centralizados en TTL.
+#   - Latencia por comando (count / total / max / errores) consultable con stats().
+
+
+class RedisNoDisponible(RuntimeError):
+    """Redis no está configurado o no responde."""
+
+
+# TTL (segundos) por tipo de clave. Las claves sin entrada aquí no expiran.
+TTL = {
+    'game_token': 60,
+    'pregunta_actual': 300,
+    'publicacion_feed': 60,
+    'quiz': 7 * 24 * 3600,
+}
+
+# GET + DEL atómico (equivalente a GETDEL para servidores < 6.2)
+LUA_CONSUMIR = """
+local valor = redis.call('GET', KEYS[1])
+if valor then
+    redis.call('DEL', KEYS[1])
+end
+return valor
+"""
+
+# INCR que fija el TTL solo cuando la clave es nueva (contadores con ventana)
+LUA_INCR_CON_TTL = """
+local valor = redis.call('INCRBY', KEYS[1], ARGV[1])
+if valor == tonumber(ARGV[1]) and tonumber(ARGV[2]) > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return valor
+"""
+
+_config = {
+    'url': None,
+    'namespace': 'goe',
+    'pool_size': 64,
+    'pool_timeout': 5.0,
+    'socket_timeout': 2.0,
+    'backoff': 5.0,
+}
+
+_clientes = {}  # 'text' / 'binary' -> cliente
+_scripts = {}  # (modo, nombre) -> redis.commands.core.Script
+# nombre -> código Lua. Los módulos añaden los suyos al importarse con registrar_script()
+_lua = {
+    'consumir': LUA_CONSUMIR,
+    'incr_con_ttl': LUA_INCR_CON_TTL,
+}
+_ultimo_fallo = 0.0
+_lock = Lock()
+_soporta_getdel = True
+
+_stats = {}  # comando -> [count, total_s, max_s, errores]
+_stats_lock = Lock()
+_observadores = []
+
+
+# ================== MÉTRICAS ==================
+
+def _registrar(comando, duracion, error=False):
+    with _stats_lock:
+        entrada = _stats.get(comando)
+        if entrada is None:
+            entrada = _stats[comando] = [0, 0.0, 0.0, 0]
+        entrada[0] += 1
+        entrada[1] += duracion
+        if duracion > entrada[2]:
+            entrada[2] = duracion
+        if error:
+            entrada[3] += 1
+    for observador in _observadores:
+        try:
+            observador(comando, duracion, error)
+        except Exception:
+            pass
+
+
+def agregar_observador(fn):
+    """Registra fn(comando, duracion_s, error) para cada comando o pipeline ejecutado."""
+    _observadores.append(fn)
+
+
+def stats():
+    """Latencia acumulada por comando: {cmd: {count, total_ms, avg_ms, max_ms, errors}}."""
+    with _stats_lock:
+        copia = {k: list(v) for k, v in _stats.items()}
+    return {
+        cmd: {
+            'count': c,
+            'total_ms': round(total * 1000, 3),
+            'avg_ms': round(total * 1000 / c, 3) if c else 0.0,
+            'max_ms': round(maximo * 1000, 3),
+            'errors': errores,
+        }
+        for cmd, (c, total, maximo, errores) in copia.items()
+    }
+
+
+class _PipelineMedido(redis.client.Pipeline):
+    def execute(self, raise_on_error=True):
+        n = len(self.command_stack)
+        inicio = time.perf_counter()
+        error = False
+        try:
+            return super().execute(raise_on_error=raise_on_error)
+        except Exception:
+            error = True
+            raise
+        finally:
+            if n:
+                _registrar('PIPELINE', time.perf_counter() - inicio, error)
+
+
+class _RedisMedido(redis.StrictRedis):
+    def execute_command(self, *args, **options):
+        inicio = time.perf_counter()
+        error = False
+        try:
+            return super().execute_command(*args, **options)
+        except Exception:
+            error = True
+            raise
+        finally:
+            _registrar(str(args[0]).upper(), time.perf_counter() - inicio, error)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return _PipelineMedido(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+# ================== CONEXIÓN ==================
+
+def init_app(app):
+    redis_url = app.config.get('REDIS_URL') or os.getenv('REDIS_URL')
+    if not redis_url:
+        # Local con Docker Compose
+        redis_host = app.config.get('REDIS_HOST', os.getenv('REDIS_HOST', 'localhost'))
+        redis_port = int(app.config.get('REDIS_PORT', os.getenv('REDIS_PORT', 6379)))
+        redis_db = int(app.config.get('REDIS_DB', os.getenv('REDIS_DB', 0)))
+        redis_url = f"redis://{redis_host}:{redis_port}/{redis_db}"
+
+    _config.update({
+        'url': redis_url,
+        'namespace': app.config.get('REDIS_NAMESPACE', os.getenv('REDIS_NAMESPACE', 'goe')),
+        'pool_size': int(app.config.get('REDIS_POOL_SIZE', os.getenv('REDIS_POOL_SIZE', 64))),
+        'pool_timeout': float(app.config.get('REDIS_POOL_TIMEOUT', os.getenv('REDIS_POOL_TIMEOUT', 5))),
+        'socket_timeout': float(app.config.get('REDIS_SOCKET_TIMEOUT', os.getenv('REDIS_SOCKET_TIMEOUT', 2))),
+        'backoff': float(app.config.get('REDIS_RECONNECT_BACKOFF', os.getenv('REDIS_RECONNECT_BACKOFF', 5))),
+    })
+    logger.info("Redis configurado en %s (pool=%s)", redis_url, _config['pool_size'])
+    # Sin conexión aquí: init_app corre al importar la app (también en el master de gunicorn con
+    # preload_app) y los sockets no deben heredarse entre procesos. Cada worker llama a conectar().
+
+
+def conectar():
+    """Primera conexión del proceso (app.iniciar_servicios). Si falla, get_client() reintenta."""
+    if _conectar():
+        logger.info("Conectado a Redis.")
+        return True
+    logger.warning("Si usas SocketIO con REDIS_URL, la cola de mensajes podría fallar.")
+    return False
+
+
+def _crear_cliente(decode_responses):
+    pool = redis.BlockingConnectionPool.from_url(
+        _config['url'],
+        max_connections=_config['pool_size'],
+        timeout=_config['pool_timeout'],
+        socket_timeout=_config['socket_timeout'],
+        socket_connect_timeout=_config['socket_timeout'],
+        health_check_interval=30,
+        decode_responses=decode_responses,
+    )
+    return _RedisMedido(connection_pool=pool)
+
+
+def _conectar():
+    """Crea (o recrea) los clientes y precarga los scripts. Devuelve True si Redis responde."""
+    global _ultimo_fallo
+    with _lock:
+        if _clientes:
+            return True
+        try:
+            texto = _crear_cliente(decode_responses=True)
+            binario = _crear_cliente(decode_responses=False)
+            texto.ping()
+            scripts = {}
+            for modo, cliente in (('text', texto), ('binary', binario)):
+                for nombre, lua in _lua.items():
+                    scripts[(modo, nombre)] = cliente.register_script(lua)
+            # SCRIPT LOAD una vez para que las llamadas vayan directas por EVALSHA
+            for lua in _lua.values():
+                texto.script_load(lua)
+            _scripts.clear()
+            _scripts.update(scripts)
+            _clientes['text'] = texto
+            _clientes['binary'] = binario
+            return True
+        except Exception as e:
+            _ultimo_fallo = time.monotonic()
+            logger.error("Fallo al conectar a Redis: %s", e)
+            return False
+
+
+def _marcar_caido():
+    global _ultimo_fallo
+    with _lock:
+        for cliente in _clientes.values():
+            try:
+                cliente.connection_pool.disconnect()
+            except Exception:
+                pass
+        _clientes.clear()
+        _ultimo_fallo = time.monotonic()
+
+
+def get_client(binary=False):
+    """
+    Devuelve el cliente (texto o binario) o None si Redis no está disponible.
+    Si la conexión falló hace más de REDIS_RECONNECT_BACKOFF segundos, reintenta.
+    """
+    cliente = _clientes.get('binary' if binary else 'text')
+    if cliente is not None:
+        return cliente
+    if _config['url'] is None:
+        return None
+    if time.monotonic() - _ultimo_fallo < _config['backoff']:
+        return None
+    if _conectar():
+        return _clientes.get('binary' if binary else 'text')
+    return None
+
+
+def require_client(binary=False):
+    cliente = get_client(binary)
+    if cliente is None:
+        raise RedisNoDisponible("Redis no está disponible")
+    return cliente
+
+
+def reset():
+    """Cierra los pools (p. ej. tras un fork). La siguiente llamada reconecta."""
+    global _ultimo_fallo
+    _marcar_caido()
+    _ultimo_fallo = 0.0
+
+
+# ================== SCRIPTS ==================
+
+def registrar_script(nombre, lua):
+    """
+    Declara un script Lua (a nivel de módulo, al importarse). Se crea un Script por cliente al
+    conectar, no en cada llamada; script(nombre) lo devuelve.
+    """
+    with _lock:
+        _lua[nombre] = lua
+        for modo, cliente in _clientes.items():
+            _scripts[(modo, nombre)] = cliente.register_script(lua)
+
+
+def script(nombre, binary=False):
+    """Script registrado con registrar_script(). Lanza RedisNoDisponible sin conexión."""
+    require_client(binary)
+    return _scripts[('binary' if binary else 'text', nombre)]
+
+
+# ================== CLAVES ==================
+
+def key(tipo, *partes):
+    """Clave con namespace: key('game_token', t) -> 'goe:game_token:<t>'."""
+    return ':'.join([_config['namespace'], tipo, *(str(p) for p in partes)])
+
+
+def ttl(tipo):
+    return TTL.get(tipo)
+
+
+# ================== OPERACIONES ==================
+
+def _con_reconexion(fn):
+    """Ejecuta fn; ante un error de conexión marca Redis como caído y lanza RedisNoDisponible."""
+    try:
+        return fn()
+    except (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError) as e:
+        _marcar_caido()
+        raise RedisNoDisponible(str(e)) from e
+
+
+def set_value(clave, valor, tipo=None, binary=False):
+    """SET con el TTL del tipo de clave (si tiene)."""
+    cliente = require_client(binary)
+    segundos = ttl(tipo) if tipo else None
+    return _con_reconexion(lambda: cliente.set(clave, valor, ex=segundos))
+
+
+def get_value(clave, binary=False):
+    cliente = require_client(binary)
+    return _con_reconexion(lambda: cliente.get(clave))
+
+
+def delete(*claves, binary=False):
+    if not claves:
+        return 0
+    cliente = require_client(binary)
+    return _con_reconexion(lambda: cliente.delete(*claves))
+
+
+def consume(clave, binary=False):
+    """
+    Lee y borra la clave en una sola operación atómica. Usa GETDEL (Redis >= 6.2) y cae al
+    script Lua equivalente si el servidor no lo soporta.
+    """
+    global _soporta_getdel
+    cliente = require_client(binary)
+    if _soporta_getdel:
+        try:
+            return _con_reconexion(lambda: cliente.getdel(clave))
+        except redis.exceptions.ResponseError as e:
+            if 'unknown command' not in str(e).lower():
+                raise
+            _soporta_getdel = False
+    script = _scripts[('binary' if binary else 'text', 'consumir')]
+    return _con_reconexion(lambda: script(keys=[clave]))
+
+
+def incr_con_ttl(clave, segundos, cantidad=1):
+    """INCRBY que fija el TTL solo la primera vez (ventanas de conteo)."""
+    require_client()
+    script = _scripts[('text', 'incr_con_ttl')]
+    return _con_reconexion(lambda: script(keys=[clave], args=[cantidad, segundos]))
+
+
+def get_many(claves, binary=False):
+    """MGET: una ida a Redis para varias claves. Devuelve la lista en el mismo orden."""
+    if not claves:
+        return []
+    cliente = require_client(binary)
+    return _con_reconexion(lambda: cliente.mget(claves))
+
+
+def get_fields(clave, campos, binary=False):
+    """HMGET: los campos indicados de un hash, en el mismo orden (None los que no existan)."""
+    cliente = require_client(binary)
+    return _con_reconexion(lambda: cliente.hmget(clave, campos))
+
+
+def set_many(valores, tipo=None, binary=False):
+    """SET de varias claves {clave: valor} en un pipeline, todas con el TTL del tipo."""
+    if not valores:
+        return
+    segundos = ttl(tipo) if tipo else None
+    with pipeline(binary=binary) as pipe:
+        for clave, valor in valores.items():
+            pipe.set(clave, valor, ex=segundos)
+
+
+@contextmanager
+def pipeline(binary=False, transaction=False):
+    """
+    Pipeline que se ejecuta al salir del bloque:
+
+        with redis_store.pipeline() as pipe:
+            pipe.incr(a)
+            pipe.expire(a, 60)
+        resultados = pipe.resultados
+    """
+    cliente = require_client(binary)
+    pipe = cliente.pipeline(transaction=transaction)
+    yield pipe
+    pipe.resultados = _con_reconexion(pipe.execute)
@@ -0,0 +1,214 @@
+import hashlib
+import logging
+import threading
+import time
+
+import click
+import pymysql.cursors
+from flask import current_app, request
+from flask.cli import AppGroup
+
+import http_cache
+import json_provider
+import redis_store
+from extensions import get_db
+from redis_store import RedisNoDisponible
+
+logger = logging.getLogger(__name__)
+
+# ====================================================================================================
+# Datos de referencia en memoria: categorias y dificultades
+# ====================================================================================================
+# Son tablas pequeñas que se siembran en flask.sql y casi nunca cambian. Cada worker las carga al
+# arrancar (iniciar()) en una instantánea inmutable: {id: nombre} de cada tabla y la respuesta de
+# /blog/categorias y /auth_juego/dificultades ya serializada, con su ETag (hash del cuerpo).
+# El feed resuelve categoria_nombre con ella en lugar de un JOIN a categorias por fila.
+#
+# Invalidación entre workers: quien cambia una tabla llama a invalidar() (o 'flask referencia ...'),
+# que incrementa <ns>:referencia:version y publica la versión nueva en el canal <ns>:referencia.
+# Cada worker escucha el canal en un hilo y recarga al recibirla; al reconectarse compara la versión
+# guardada por si se perdió algún mensaje. Sin Redis, la instantánea se recarga al leerla si tiene
+# más de REFERENCE_DATA_MAX_AGE segundos.
+
+TABLAS = ('categorias', 'dificultades')
+
+_SQL = {
+    'categorias': "SELECT id, nombre FROM categorias ORDER BY nombre ASC",
+    'dificultades': "SELECT id, nombre FROM dificultades ORDER BY id ASC",
+}
+
+_config = {
+    'max_edad': 3600.0,
+    'reintento': 5.0,
+}
+
+_datos = None
+_lock = threading.Lock()
+_hilo = None
+
+
+def init_app(app):
+    _config['max_edad'] = float(app.config.get('REFERENCE_DATA_MAX_AGE', 3600))
+    app.cli.add_command(referencia_cli)
+
+
+def _clave_version():
+    return redis_store.key('referencia', 'version')
+
+
+def _canal():
+    return redis_store.key('referencia')
+
+
+def _version_actual():
+    try:
+        return int(redis_store.get_value(_clave_version()) or 0)
+    except RedisNoDisponible:
+        return None
+
+
+# ================== CARGA ==================
+
+def cargar(conn):
+    """Lee las tablas y reemplaza la instantánea del proceso. Devuelve la instantánea nueva."""
+    global _datos
+    version = _version_actual()
+    datos = {'version': version, 'cargado': time.monotonic(), 'respuestas': {}}
+    with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+        for tabla in TABLAS:
+            cursor.execute(_SQL[tabla])
+            filas = cursor.fetchall()
+            datos[tabla] = {fila['id']: fila['nombre'] for fila in filas}
+            cuerpo = json_provider.dumps_bytes(filas)
+            datos['respuestas'][tabla] = (cuerpo, hashlib.sha1(cuerpo).hexdigest()[:20])
+    with _lock:
+        _datos = datos
+    logger.info("Datos de referencia cargados (versión %s): %s categorías, %s dificultades.",
+                version, len(datos['categorias']), len(datos['dificultades']))
+    return datos
+
+
+def actuales():
+    """Instantánea vigente; la (re)carga si no hay o si es más vieja que REFERENCE_DATA_MAX_AGE."""
+    datos = _datos
+    if datos is None or time.monotonic() - datos['cargado'] > _config['max_edad']:
+        datos = cargar(get_db())
+    return datos
+
+
+def nombre_categoria(categoria_id):
+    if categoria_id is None:
+        return None
+    return actuales()['categorias'].get(categoria_id)
+
+
+def nombre_dificultad(dificultad_id):
+    return actuales()['dificultades'].get(dificultad_id)
+
+
+def respuesta(tabla, cache_control='public, max-age=60'):
+    """Respuesta JSON pre-serializada de la tabla, con ETag; 304 si coincide con If-None-Match."""
+    cuerpo, etag = actuales()['respuestas'][tabla]
+    resp = current_app.response_class(cuerpo, mimetype='application/json')
+    resp.set_etag(etag, weak=True)
+    resp.headers['Cache-Control'] = cache_control
+    return resp.make_conditional(request)
+
+
+# ================== INVALIDACIÓN ==================
+
+def invalidar():
+    """Tras el commit de un cambio en categorias o dificultades: todos los workers recargan."""
+    global _datos
+    with _lock:
+        _datos = None
+    http_cache.invalidar('categorias')
+    try:
+        cliente = redis_store.require_client()
+        version = cliente.incr(_clave_version())
+        cliente.publish(_canal(), version)
+    except RedisNoDisponible as e:
+        logger.warning("No se avisó a los workers del cambio en los datos de referencia: %s", e)
+
+
+def _recargar(app, version):
+    datos = _datos
+    if datos is not None and version is not None and datos['version'] == version:
+        return
+    with app.app_context():
+        cargar(get_db())
+
+
+def _escuchar(app):
+    while True:
+        pubsub = None
+        try:
+            pubsub = redis_store.require_client().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(_canal())
+            # Lo que haya cambiado mientras no estábamos suscritos
+            _recargar(app, _version_actual())
+            while True:
+                mensaje = pubsub.get_message(timeout=1.0)
+                if mensaje:
+                    _recargar(app, int(mensaje['data']))
+        except Exception as e:
+            logger.warning("Suscripción a cambios de datos de referencia caída: %s", e)
+            time.sleep(_config['reintento'])
+        finally:
+            if pubsub is not None:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+
+def iniciar(app):
+    """Carga inicial del worker y suscripción a las invalidaciones."""
+    global _hilo
+    if _hilo is not None:
+        return
+    try:
+        with app.app_context():
+            cargar(get_db())
+    except Exception as e:
+        # Se reintenta al primer uso
+        logger.warning("No se pudieron cargar los datos de referencia al arrancar: %s", e)
+    _hilo = threading.Thread(target=_escuchar, args=(app,), name='reference-data', daemon=True)
+    _hilo.start()
+
+
+# ================== CLI ==================
+
+referencia_cli = AppGroup('referencia', help="Categorías y dificultades cacheadas en los workers.")
+
+
+@referencia_cli.command('categoria')
+@click.argument('nombre')
+@click.option('--id', 'categoria_id', type=int, default=None, help="Renombrar esta categoría (por defecto, crear una).")
+def categoria_comando(nombre, categoria_id):
+    """Crea o renombra una categoría y avisa a los workers."""
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        if categoria_id is None:
+            cursor.execute("INSERT INTO categorias (nombre) VALUES (%s)", (nombre,))
+            categoria_id = cursor.lastrowid
+        else:
+            cursor.execute("UPDATE categorias SET nombre = %s WHERE id = %s", (nombre, categoria_id))
+            if not cursor.rowcount:
+                raise click.ClickException(f"No existe la categoría {categoria_id} (o ya se llama así).")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    invalidar()
+    click.echo(f"Categoría {categoria_id}: {nombre}")
+
+
+@referencia_cli.command('recargar')
+def recargar_comando():
+    """Avisa a los workers de que recarguen (tras editar categorias o dificultades a mano)."""
+    invalidar()
+    click.echo("Workers avisados.")
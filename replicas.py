@@ -0,0 +1,226 @@
+import logging
+import random
+import threading
+import time
+from threading import Timer
+
+import pymysql
+import pymysql.cursors
+from flask import g, request
+
+import redis_store
+from redis_store import RedisNoDisponible
+
+logger = logging.getLogger(__name__)
+
+# ====================================================================================================
+# Lecturas en réplicas (get_db(lectura=True))
+# ====================================================================================================
+# MYSQL_REPLICAS="host1:3306,host2" lista las réplicas; sin ella todo va al primario como siempre.
+# Los GET que aceptan datos de una réplica piden get_db(lectura=True) y reciben una conexión a una
+# réplica sana elegida al azar; si no hay ninguna, o no conecta, la conexión es la del primario.
+#
+# Réplica sana: cada worker consulta SHOW REPLICA STATUS cada DB_REPLICA_CHECK_INTERVAL segundos;
+# con la replicación detenida, un error, o más de DB_REPLICA_MAX_LAG segundos de retraso, la
+# réplica sale de la rotación hasta el siguiente chequeo que la vea bien.
+#
+# Leer lo que uno acaba de escribir: tras un POST/PUT/PATCH/DELETE con éxito, durante
+# DB_STICKY_SECONDS las lecturas de ese cliente van al primario. Se marca en Redis por usuario
+# (<ns>:db_sticky:<user_id>, sirve entre pestañas y dispositivos) y en una cookie (clientes sin
+# JWT o sin Redis).
+
+COOKIE_STICKY = 'db_primario_hasta'
+
+_config = {
+    'replicas': [],
+    'max_lag': 2.0,
+    'intervalo': 5.0,
+    'sticky': 5.0,
+    'credenciales': {},
+}
+
+# (host, puerto) -> {'sana': bool, 'lag': float | None, 'error': str | None, 'chequeada': epoch}
+_estado = {}
+_lock = threading.Lock()
+_timer = None
+_conexiones_monitor = {}
+
+
+def parsear_replicas(texto):
+    replicas = []
+    for parte in (texto or '').split(','):
+        parte = parte.strip()
+        if not parte:
+            continue
+        host, _, puerto = parte.partition(':')
+        replicas.append((host, int(puerto or 3306)))
+    return replicas
+
+
+def init_app(app):
+    _config.update({
+        'replicas': parsear_replicas(app.config.get('MYSQL_REPLICAS')),
+        'max_lag': float(app.config.get('DB_REPLICA_MAX_LAG', 2)),
+        'intervalo': float(app.config.get('DB_REPLICA_CHECK_INTERVAL', 5)),
+        'sticky': float(app.config.get('DB_STICKY_SECONDS', 5)),
+        'credenciales': {
+            'user': app.config['MYSQL_USER'],
+            'password': app.config['MYSQL_PASSWORD'],
+            'charset': app.config.get('MYSQL_CHARSET', 'utf8mb4'),
+        },
+    })
+    with _lock:
+        # Hasta el primer chequeo ninguna réplica está en rotación
+        for replica in _config['replicas']:
+            _estado.setdefault(replica, {'sana': False, 'lag': None, 'error': 'sin chequear', 'chequeada': 0.0})
+    if _config['replicas']:
+        app.after_request(_marcar_escritura)
+
+
+def activas():
+    return bool(_config['replicas'])
+
+
+def ventana_retraso():
+    """Segundos que una réplica en rotación puede ir atrasada (0 sin réplicas)."""
+    if not _config['replicas']:
+        return 0
+    # El retraso se mide cada 'intervalo': entre chequeos puede crecer sin que se note
+    return _config['max_lag'] + _config['intervalo']
+
+
+def estado():
+    """Copia del estado de cada réplica (para /metrics o depuración)."""
+    with _lock:
+        return {f"{host}:{puerto}": dict(info) for (host, puerto), info in _estado.items()}
+
+
+# ================== RETRASO ==================
+
+def retraso_replica(conn):
+    """Segundos de retraso de la réplica (None si la replicación está detenida o no es réplica)."""
+    with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+        try:
+            cursor.execute("SHOW REPLICA STATUS")
+            fila = cursor.fetchone() or {}
+            return fila.get('Seconds_Behind_Source')
+        except pymysql.err.ProgrammingError:
+            # MySQL < 8.0.22
+            cursor.execute("SHOW SLAVE STATUS")
+            fila = cursor.fetchone() or {}
+            return fila.get('Seconds_Behind_Master')
+
+
+def _chequear(replica):
+    host, puerto = replica
+    try:
+        conn = _conexiones_monitor.get(replica)
+        if conn is None or not conn.open:
+            conn = pymysql.connect(host=host, port=puerto, connect_timeout=2, read_timeout=2, autocommit=True,
+                                   **_config['credenciales'])
+            _conexiones_monitor[replica] = conn
+        lag = retraso_replica(conn)
+        sana = lag is not None and lag <= _config['max_lag']
+        info = {'sana': sana, 'lag': lag, 'error': None if lag is not None else 'replicación detenida'}
+    except Exception as e:
+        _conexiones_monitor.pop(replica, None)
+        info = {'sana': False, 'lag': None, 'error': str(e)[:200]}
+    info['chequeada'] = time.time()
+    with _lock:
+        anterior = _estado.get(replica, {}).get('sana')
+        _estado[replica] = info
+    if anterior is not None and anterior != info['sana']:
+        if info['sana']:
+            logger.info("Réplica %s:%s vuelve a la rotación (lag %ss).", host, puerto, info['lag'])
+        else:
+            logger.warning("Réplica %s:%s fuera de rotación: lag=%s error=%s", host, puerto, info['lag'], info['error'])
+
+
+def _ciclo():
+    global _timer
+    try:
+        for replica in _config['replicas']:
+            _chequear(replica)
+    except Exception as e:
+        logger.exception("Fallo chequeando réplicas: %s", e)
+    finally:
+        _timer = Timer(_config['intervalo'], _ciclo)
+        _timer.daemon = True
+        _timer.start()
+
+
+def iniciar_monitor():
+    global _timer
+    if _timer is not None or not _config['replicas']:
+        return
+    _timer = Timer(0, _ciclo)
+    _timer.daemon = True
+    _timer.start()
+
+
+def marcar_caida(replica, error):
+    """Una conexión de petición falló: fuera de rotación hasta el próximo chequeo."""
+    with _lock:
+        _estado[replica] = {'sana': False, 'lag': None, 'error': str(error)[:200], 'chequeada': time.time()}
+    logger.warning("Réplica %s:%s fuera de rotación: %s", replica[0], replica[1], error)
+
+
+def elegir():
+    """(host, puerto) de una réplica sana al azar, o None."""
+    with _lock:
+        sanas = [r for r, info in _estado.items() if info['sana']]
+    return random.choice(sanas) if sanas else None
+
+
+# ================== LEER LO QUE UNO ESCRIBIÓ ==================
+
+def _usuario_actual():
+    """Id del usuario del JWT de la petición, si trae uno válido (las rutas públicas no lo verifican)."""
+    try:
+        from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+
+def _clave_sticky(user_id):
+    return redis_store.key('db_sticky', user_id)
+
+
+def lectura_en_primario():
+    """True si este cliente escribió hace menos de DB_STICKY_SECONDS (sus lecturas van al primario)."""
+    if 'db_sticky' in g:
+        return g.db_sticky
+    pegajoso = False
+    try:
+        pegajoso = float(request.cookies.get(COOKIE_STICKY, 0)) > time.time()
+    except ValueError:
+        pass
+    if not pegajoso:
+        user_id = _usuario_actual()
+        if user_id is not None:
+            try:
+                pegajoso = bool(redis_store.get_value(_clave_sticky(user_id)))
+            except RedisNoDisponible:
+                pass
+    g.db_sticky = pegajoso
+    return pegajoso
+
+
+def _marcar_escritura(response):
+    if request.method not in ('POST', 'PUT', 'PATCH', 'DELETE') or response.status_code >= 400:
+        return response
+    segundos = _config['sticky']
+    if segundos <= 0:
+        return response
+    user_id = _usuario_actual()
+    if user_id is not None:
+        try:
+            with redis_store.pipeline() as pipe:
+                pipe.set(_clave_sticky(user_id), '1', px=int(segundos * 1000))
+        except RedisNoDisponible:
+            pass
+    response.set_cookie(COOKIE_STICKY, f"{time.time() + segundos:.3f}", max_age=int(segundos) + 1,
+                        httponly=True, samesite='Lax')
+    return response
@@ -1,3 +1,4 @@
+import logging
 from flask import Blueprint, request, jsonify, current_app
 # ✅ Nueva importación:
 from extensions import bcrypt, get_db
@@ -7,10 +8,9 @@ from datetime import datetime, timedelta
 from email.mime.text import MIMEText
 from email.header import Header
 import smtplib
+import metrics
 import os
 import re
-import sys
-import traceback
 import uuid # Importa uuid para generar tokens únicos para usuarios
 import pymysql.cursors # Usaremos pymysql.cursors.DictCursor
 import pymysql.err # Para manejar errores de la DB
@@ -23,6 +23,8 @@ from dotenv import load_dotenv
 # IMPORTANTE: Importar get_user_details desde user.py
 from routes.user import get_user_details
 
+logger = logging.getLogger(__name__)
+
 load_dotenv()
 
 auth_bp = Blueprint('auth', __name__)
@@ -66,10 +68,10 @@ def enviar_correo_verificacion(destinatario, codigo):
     Envía un correo electrónico con el código de verificación.
     Retorna True si el envío es exitoso, False en caso contrario.
     """
-    print(f"DEBUG-VERIF: Intentando enviar correo de verificación a: {destinatario}", file=sys.stderr)
-    print(f"DEBUG-VERIF: MAIL_USER configurado: {MAIL_USER}", file=sys.stderr)
+    logger.debug("Intentando enviar correo de verificación a: %s", destinatario)
+    logger.debug("MAIL_USER configurado: %s", MAIL_USER)
     if not MAIL_USER or not MAIL_PASS:
-        print("ERROR-VERIF: MAIL_USER o MAIL_PASS no están configurados. No se puede enviar correo.", file=sys.stderr)
+        logger.error("MAIL_USER o MAIL_PASS no están configurados. No se puede enviar correo.")
         return False
         
     remitente = MAIL_USER
@@ -95,26 +97,23 @@ def enviar_correo_verificacion(destinatario, codigo):
 
     try:
         # 🚀 [MODIFICADO] Conexión SMTP con smtplib.SMTP y STARTTLS para SendGrid
-        print(f"DEBUG-VERIF: Conectando a {SMTP_SERVER}:{SMTP_PORT} con STARTTLS...", file=sys.stderr)
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
+        logger.debug("Conectando a %s:%s con STARTTLS...", SMTP_SERVER, SMTP_PORT)
+        with metrics.salida('smtp'), smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
             server.starttls() # ¡Obligatorio para el puerto 587!
             server.login(MAIL_USER, MAIL_PASS)
-            print(f"DEBUG-VERIF: Login SMTP exitoso.", file=sys.stderr)
+            logger.debug("Login SMTP exitoso.")
             server.sendmail(remitente, destinatario, msg.as_string())
-        print(f"DEBUG-VERIF: Correo de verificación enviado exitosamente a: {destinatario}", file=sys.stderr)
+        logger.debug("Correo de verificación enviado exitosamente a: %s", destinatario)
         return True
     except smtplib.SMTPAuthenticationError:
-        print("ERROR-VERIF: Fallo de autenticación SMTP. Revisa tu MAIL_USER ('apikey') y MAIL_PASS (tu clave API).", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo de autenticación SMTP. Revisa tu MAIL_USER ('apikey') y MAIL_PASS (tu clave API).")
         return False
     except smtplib.SMTPConnectError as e:
         # Esto ahora manejará el ETIMEDOUT si el puerto 587 también falla (poco probable con SendGrid)
-        print(f"ERROR-VERIF: Fallo de conexión al servidor SMTP. Host/Puerto: {SMTP_SERVER}:{SMTP_PORT}. Detalle: {e} (AÚN HAY BLOQUEO DE FIREWALL).", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo de conexión al servidor SMTP. Host/Puerto: %s:%s. Detalle: %s (AÚN HAY BLOQUEO DE FIREWALL).", SMTP_SERVER, SMTP_PORT, e)
         return False
     except Exception as e:
-        print(f"ERROR-VERIF: Fallo general al enviar correo de verificación a {destinatario}: {e}", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo general al enviar correo de verificación a %s: %s", destinatario, e)
         return False
 
 def enviar_correo_restablecimiento(destinatario, codigo):
@@ -122,9 +121,9 @@ def enviar_correo_restablecimiento(destinatario, codigo):
     Envía un correo electrónico con el código para restablecer la contraseña.
     Retorna True si el envío es exitoso, False en caso contrario.
     """
-    print(f"DEBUG-VERIF: Intentando enviar correo de restablecimiento a: {destinatario}", file=sys.stderr)
+    logger.debug("Intentando enviar correo de restablecimiento a: %s", destinatario)
     if not MAIL_USER or not MAIL_PASS:
-        print("ERROR-VERIF: MAIL_USER o MAIL_PASS no están configurados.", file=sys.stderr)
+        logger.error("MAIL_USER o MAIL_PASS no están configurados.")
         return False
 
     remitente = MAIL_USER
@@ -149,25 +148,22 @@ def enviar_correo_restablecimiento(destinatario, codigo):
 
     try:
         # 🚀 [MODIFICADO] Conexión SMTP con smtplib.SMTP y STARTTLS para SendGrid
-        print(f"DEBUG-VERIF: Conectando a {SMTP_SERVER}:{SMTP_PORT} con STARTTLS...", file=sys.stderr)
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
+        logger.debug("Conectando a %s:%s con STARTTLS...", SMTP_SERVER, SMTP_PORT)
+        with metrics.salida('smtp'), smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
             server.starttls() # ¡Obligatorio para el puerto 587!
             server.login(MAIL_USER, MAIL_PASS)
-            print(f"DEBUG-VERIF: Login SMTP exitoso.", file=sys.stderr)
+            logger.debug("Login SMTP exitoso.")
             server.sendmail(remitente, destinatario, msg.as_string())
-        print(f"DEBUG-VERIF: Correo de restablecimiento enviado exitosamente a: {destinatario}", file=sys.stderr)
+        logger.info("Correo de restablecimiento enviado exitosamente a: %s", destinatario)
         return True
     except smtplib.SMTPAuthenticationError:
-        print("ERROR-VERIF: Fallo de autenticación SMTP. Revisa tu MAIL_USER ('apikey') y MAIL_PASS (tu clave API).", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo de autenticación SMTP. Revisa tu MAIL_USER ('apikey') y MAIL_PASS (tu clave API).")
         return False
     except smtplib.SMTPConnectError as e:
-        print(f"ERROR-VERIF: Fallo de conexión al servidor SMTP. Host/Puerto: {SMTP_SERVER}:{SMTP_PORT}. Detalle: {e} (Bloqueo de red o configuración de host incorrecta).", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo de conexión al servidor SMTP. Host/Puerto: %s:%s. Detalle: %s (Bloqueo de red o configuración de host incorrecta).", SMTP_SERVER, SMTP_PORT, e)
         return False
     except Exception as e:
-        print(f"ERROR-VERIF: Fallo general al enviar correo de restablecimiento a {destinatario}: {e}", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo general al enviar correo de restablecimiento a %s: %s", destinatario, e)
         return False
 
 def enviar_correo_bienvenida(destinatario, username):
@@ -175,9 +171,9 @@ def enviar_correo_bienvenida(destinatario, username):
     Envía un correo electrónico de bienvenida.
     Retorna True si el envío es exitoso, False en caso contrario.
     """
-    print(f"DEBUG-VERIF: Intentando enviar correo de bienvenida a: {destinatario}", file=sys.stderr)
+    logger.debug("Intentando enviar correo de bienvenida a: %s", destinatario)
     if not MAIL_USER or not MAIL_PASS:
-        print("ERROR-VERIF: MAIL_USER o MAIL_PASS no están configurados.", file=sys.stderr)
+        logger.error("MAIL_USER o MAIL_PASS no están configurados.")
         return False
 
     remitente = MAIL_USER
@@ -200,25 +196,22 @@ def enviar_correo_bienvenida(destinatario, username):
 
     try:
         # 🚀 [MODIFICADO] Conexión SMTP con smtplib.SMTP y STARTTLS para SendGrid
-        print(f"DEBUG-VERIF: Conectando a {SMTP_SERVER}:{SMTP_PORT} con STARTTLS...", file=sys.stderr)
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
+        logger.debug("Conectando a %s:%s con STARTTLS...", SMTP_SERVER, SMTP_PORT)
+        with metrics.salida('smtp'), smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
             server.starttls() # ¡Obligatorio para el puerto 587!
             server.login(MAIL_USER, MAIL_PASS)
-            print(f"DEBUG-VERIF: Login SMTP exitoso.", file=sys.stderr)
+            logger.debug("Login SMTP exitoso.")
             server.sendmail(remitente, destinatario, msg.as_string())
-        print(f"DEBUG-VERIF: Correo de bienvenida enviado exitosamente a: {destinatario}", file=sys.stderr)
+        logger.info("Correo de bienvenida enviado exitosamente a: %s", destinatario)
         return True
     except smtplib.SMTPAuthenticationError:
-        print("ERROR-VERIF: Fallo de autenticación SMTP. Revisa tu MAIL_USER ('apikey') y MAIL_PASS (tu clave API).", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo de autenticación SMTP. Revisa tu MAIL_USER ('apikey') y MAIL_PASS (tu clave API).")
         return False
     except smtplib.SMTPConnectError as e:
-        print(f"ERROR-VERIF: Fallo de conexión al servidor SMTP. Host/Puerto: {SMTP_SERVER}:{SMTP_PORT}. Detalle: {e} (Bloqueo de red o configuración de host incorrecta).", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo de conexión al servidor SMTP. Host/Puerto: %s:%s. Detalle: %s (Bloqueo de red o configuración de host incorrecta).", SMTP_SERVER, SMTP_PORT, e)
         return False
     except Exception as e:
-        print(f"ERROR-VERIF: Fallo general al enviar correo de bienvenida a {destinatario}: {e}", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo general al enviar correo de bienvenida a %s: %s", destinatario, e)
         return False
 
 @auth_bp.route('/register', methods=['POST'])
@@ -262,7 +255,7 @@ def register():
         
         # Enviar correo de verificación (no bloquea el registro si falla el envío)
         if not enviar_correo_verificacion(email, verification_code):
-            print(f"ADVERTENCIA: Fallo al enviar correo de verificación a {email}.", file=sys.stderr)
+            logger.warning("Fallo al enviar correo de verificación a %s.", email)
             # Opcional: Podrías revertir el registro aquí, pero es mejor permitirlo y dejar que el usuario reintente el código.
         
         return jsonify({
@@ -274,13 +267,11 @@ def register():
     except pymysql.err.OperationalError as e:
         conn.rollback()
         # El error original era aquí: "Unknown column 'user_id' in 'field list'" (1054)
-        print(f"ERROR-DB: Fallo en transacción de registro: {e}", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo en transacción de registro: %s", e)
         return jsonify({"error": f"Error en la base de datos al registrar: {e.args[1]}"}), 500
     except Exception as e:
         conn.rollback()
-        print(f"ERROR: Fallo general en /register: {str(e)}", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo general en /register: %s", str(e))
         return jsonify({"error": "Error interno del servidor."}), 500
 
 
@@ -332,15 +323,14 @@ def verificar_cuenta():
         user_details = get_user_details(email)
         if user_details:
              if not enviar_correo_bienvenida(email, user_details.get('username', 'usuario')):
-                 print(f"ADVERTENCIA: Fallo al enviar correo de bienvenida a {email}.", file=sys.stderr)
+                 logger.warning("Fallo al enviar correo de bienvenida a %s.", email)
 
 
         return jsonify({"message": "Cuenta verificada exitosamente."}), 200
 
     except Exception as e:
         conn.rollback()
-        print(f"ERROR: Fallo general en /verify-code: {str(e)}", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo general en /verify-code: %s", str(e))
         return jsonify({"error": "Error interno del servidor."}), 500
 
 
@@ -398,8 +388,7 @@ def login():
             return jsonify({"error": "Credenciales inválidas."}), 401
 
     except Exception as e:
-        print(f"ERROR: Fallo general en /login: {str(e)}", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo general en /login: %s", str(e))
         return jsonify({"error": "Error interno del servidor."}), 500
 
 
@@ -439,8 +428,7 @@ def refresh():
         }), 200
 
     except Exception as e:
-        print(f"ERROR: Fallo general en /refresh: {str(e)}", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo general en /refresh: %s", str(e))
         return jsonify({"error": "Error interno del servidor."}), 500
 
 
@@ -483,8 +471,7 @@ def resend_verification_code():
 
     except Exception as e:
         conn.rollback()
-        print(f"ERROR: Fallo general en /resend-code: {str(e)}", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo general en /resend-code: %s", str(e))
         return jsonify({"error": "Error interno del servidor."}), 500
 
 
@@ -523,8 +510,7 @@ def forgot_password():
 
     except Exception as e:
         conn.rollback()
-        print(f"ERROR: Fallo general en /forgot-password: {str(e)}", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo general en /forgot-password: %s", str(e))
         return jsonify({"error": "Error interno del servidor."}), 500
 
 
@@ -574,8 +560,7 @@ def reset_password():
     except Exception as e:
         if conn:
             conn.rollback()
-        print(f"ERROR: Fallo general en /reset-password: {str(e)}", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo general en /reset-password: %s", str(e))
         return jsonify({"error": "Error interno del servidor."}), 500
 
 
@@ -601,6 +586,5 @@ def logeado():
             return jsonify({"error": "Usuario no encontrado."}), 404
 
     except Exception as e:
-        print(f"ERROR: Fallo general en /logeado: {str(e)}", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo general en /logeado: %s", str(e))
         return jsonify({"error": "Error interno del servidor."}), 500
\ No newline at end of file
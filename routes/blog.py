@@ -1,3 +1,4 @@
+import logging
 from flask import Blueprint, request, jsonify, current_app
 # ❌ Reemplazar: from extensions import mysql, socketio
 # ✅ Nueva importación:
@@ -5,24 +6,58 @@ from extensions import socketio, get_db, close_db
 # ❌ Reemplazar: from MySQLdb.cursors import DictCursor
 # ✅ Nueva importación:
 import pymysql.cursors
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
 import os
-import sys
-import traceback
 from datetime import datetime
 import shutil
-import cloudinary.uploader
-import re
 
 # ✅ Import directo desde la raíz
-from utils import upload_image_to_cloudinary
+import image_pipeline
+from image_pipeline import ImagenInvalida
+import upload_ingest
+import asset_gc
+import search
+import trending
+import author_timeline
+import http_cache
+import json_provider
+import reference_data
+import codec
+import redis_store
+from redis_store import RedisNoDisponible
+from upload_ingest import SubidaRechazada, limitar_subida
 
 from flask_jwt_extended import get_jwt, get_jwt_identity, jwt_required, verify_jwt_in_request
 
 from routes.user import get_user_details
 
+from realtime import coalescer, sala_publicacion, salas_publicacion, emit_codificado, emit_broadcast
+import presence
+
+logger = logging.getLogger(__name__)
+
 blog_bp = Blueprint('blog', __name__)
 
+def emit_like_update(publicacion_id, payload):
+    """
+    Emite 'like_update' a la sala de la publicación (flujo legacy, un evento por like)
+    y lo añade a la ventana de coalescencia para los clientes con protocolo 2.
+    Las salas sin nadie escuchando se omiten (ver presence.py).
+    """
+    if current_app.config.get('REALTIME_LEGACY_STREAM', True):
+        emit_codificado(socketio, 'like_update', payload, sala_publicacion(publicacion_id), solo_con_oyentes=True)
+    coalescer.add_like(publicacion_id, payload)
+
+def emit_comment_event(publicacion_id, evento, payload):
+    """
+    Emite un evento de comentario ('comment_added', 'comment_updated', 'comment_deleted')
+    al flujo legacy y lo encola, en orden, en el batch de la publicación.
+    """
+    if current_app.config.get('REALTIME_LEGACY_STREAM', True):
+        emit_codificado(socketio, evento, payload, sala_publicacion(publicacion_id), solo_con_oyentes=True)
+    coalescer.add_comment_event(publicacion_id, evento, payload)
+
 def get_publicacion_con_imagenes_y_comentarios(publicacion_id):
     """
     Obtiene los detalles completos de una publicación, incluyendo imágenes y comentarios.
@@ -36,7 +71,7 @@ def get_publicacion_con_imagenes_y_comentarios(publicacion_id):
         cursor = conn.cursor(pymysql.cursors.DictCursor)
         publicacion_id = int(publicacion_id)
 
-        print(f"DEBUG GET_PUB_DETAILS: Paso 1 - Obteniendo detalles básicos de la publicación {publicacion_id}", file=sys.stderr)
+        logger.debug("Paso 1 - Obteniendo detalles básicos de la publicación %s", publicacion_id)
         cursor.execute("""
             SELECT
                 p.id, p.autor_id, p.titulo, p.texto AS content, p.created_at, p.likes_count,
@@ -51,7 +86,7 @@ def get_publicacion_con_imagenes_y_comentarios(publicacion_id):
             WHERE p.id = %s
         """, (publicacion_id,))
         publicacion = cursor.fetchone()
-        print(f"DEBUG GET_PUB_DETAILS: Paso 1 - Publicación encontrada: {publicacion is not None}", file=sys.stderr)
+        logger.debug("Paso 1 - Publicación encontrada: %s", publicacion is not None)
 
         if not publicacion:
             return None
@@ -62,15 +97,19 @@ def get_publicacion_con_imagenes_y_comentarios(publicacion_id):
         publicacion['autor_verificado'] = bool(publicacion['autor_verificado'])
         publicacion['autor_foto_perfil_url'] = publicacion['autor_foto_perfil_url'] if publicacion['autor_foto_perfil_url'] else None
 
-        print(f"DEBUG GET_PUB_DETAILS: Paso 2 - Obteniendo imágenes para la publicación {publicacion_id}", file=sys.stderr)
+        logger.debug("Paso 2 - Obteniendo imágenes para la publicación %s", publicacion_id)
         cursor.execute("SELECT id, url FROM imagenes_publicacion WHERE publicacion_id = %s ORDER BY id", (publicacion_id,))
         imagenes = cursor.fetchall()
+        srcsets = image_pipeline.srcsets_por_imagen(cursor, [img['id'] for img in imagenes])
+        for img in imagenes:
+            img['srcset'] = srcsets.get(img['id'], {})
         publicacion['imagenes'] = imagenes
         publicacion['imageUrl'] = imagenes[0]['url'] if imagenes else None
+        publicacion['imageSrcset'] = imagenes[0]['srcset'] if imagenes else {}
         publicacion['imagenes_adicionales_urls'] = [img['url'] for img in imagenes[1:]] if len(imagenes) > 1 else []
-        print(f"DEBUG GET_PUB_DETAILS: Paso 2 - Imágenes encontradas: {len(imagenes)}", file=sys.stderr)
+        logger.debug("Paso 2 - Imágenes encontradas: %s", len(imagenes))
 
-        print(f"DEBUG GET_PUB_DETAILS: Paso 3 - Obteniendo comentarios para la publicación {publicacion_id}", file=sys.stderr)
+        logger.debug("Paso 3 - Obteniendo comentarios para la publicación %s", publicacion_id)
         cursor.execute("""
             SELECT
                 c.id, c.autor_id, c.texto, c.created_at, c.edited_at,
@@ -83,7 +122,7 @@ def get_publicacion_con_imagenes_y_comentarios(publicacion_id):
             ORDER BY c.created_at ASC
         """, (publicacion_id,))
         comentarios = cursor.fetchall()
-        print(f"DEBUG GET_PUB_DETAILS: Paso 3 - Comentarios encontrados: {len(comentarios)}", file=sys.stderr)
+        logger.debug("Paso 3 - Comentarios encontrados: %s", len(comentarios))
 
         for c in comentarios:
             if isinstance(c['created_at'], datetime):
@@ -99,8 +138,7 @@ def get_publicacion_con_imagenes_y_comentarios(publicacion_id):
         publicacion['likes'] = publicacion.pop('likes_count')
         return publicacion
     except Exception as e:
-        print(f"ERROR: get_publicacion_con_imagenes_y_comentarios para ID {publicacion_id} - {e}", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("get_publicacion_con_imagenes_y_comentarios para ID %s - %s", publicacion_id, e)
         return None
     finally:
         # ✅ CAMBIO 3: Asegurar el cierre de la conexión (y cursor)
@@ -109,39 +147,16 @@ def get_publicacion_con_imagenes_y_comentarios(publicacion_id):
         if conn:
             conn.close()
 
-def extract_public_id_from_url(url: str) -> str:
-    """
-    Extrae el public_id de una URL de Cloudinary.
-    Ejemplo:
-        https://res.cloudinary.com/demo/image/upload/v1234567/publicaciones/5/10/imagen.jpg
-    Retorna:
-        publicaciones/5/10/imagen  (sin la extensión .jpg)
-    """
-    if not url:
-        return None
-
-    try:
-        # Quita los parámetros después del ?
-        url = url.split("?")[0]
-        # Quita la extensión (jpg, png, etc.)
-        url_no_ext = re.sub(r"\.[a-zA-Z0-9]+$", "", url)
-        # Busca la parte después de /upload/
-        match = re.search(r"/upload/(?:v\d+/)?(.+)", url_no_ext)
-        if match:
-            return match.group(1)
-    except Exception as e:
-        print(f"Error extrayendo public_id de URL {url}: {e}", file=sys.stderr)
-
-    return None
-
 @blog_bp.route('/crear-publicacion', methods=['POST', 'OPTIONS'])
 @jwt_required()
+@limitar_subida('publicacion')
 def crear_publicacion():
     if request.method == 'OPTIONS':
         return jsonify({'message': 'Preflight success'}), 200
 
     conn = None
     cursor = None
+    subida = None
     try:
         current_user_id = int(get_jwt_identity())
         claims = get_jwt()
@@ -158,6 +173,12 @@ def crear_publicacion():
             return jsonify({"error": "Faltan campos obligatorios."}), 400
         if not image_file or not image_file.filename.strip():
             return jsonify({"error": "La imagen es obligatoria."}), 400
+
+        # Validar tipo real, tamaño y dimensiones antes de tocar la base de datos
+        try:
+            subida = upload_ingest.ingerir(image_file, 'publicacion')
+        except SubidaRechazada as e:
+            return jsonify({"error": str(e)}), e.status
         
         # ✅ CAMBIO 1: Obtener la conexión
         conn = get_db()
@@ -171,40 +192,57 @@ def crear_publicacion():
         )
         publicacion_id = cursor.lastrowid
 
-        # Ahora subimos la imagen en carpeta única
-        upload_result = upload_image_to_cloudinary(
-            image_file,
-            folder=f"publicaciones/{current_user_id}/{publicacion_id}"
-        )
-        nueva_imagen_url = upload_result.get("secure_url") if isinstance(upload_result, dict) else upload_result
-
-        if not nueva_imagen_url:
+        # Ahora generamos las variantes (WebP/JPEG por ancho) y las subimos en carpeta única
+        try:
+            principal, variantes = image_pipeline.procesar_y_subir(
+                subida,
+                folder=f"publicaciones/{current_user_id}/{publicacion_id}"
+            )
+        except ImagenInvalida:
+            conn.rollback()
+            return jsonify({"error": "El archivo no es una imagen válida."}), 400
+        except Exception as e:
+            logger.error("Fallo procesando/subiendo la imagen: %s", e)
             # ✅ CAMBIO 3: Usar conn.rollback()
             conn.rollback()
             return jsonify({"error": "Error al subir la imagen."}), 500
 
+        nueva_imagen_url = principal['url']
+
         # Guardamos en DB
         cursor.execute(
             "INSERT INTO imagenes_publicacion (publicacion_id, url, orden) VALUES (%s, %s, 1)",
             (publicacion_id, nueva_imagen_url)
         )
+        image_pipeline.guardar_variantes(cursor, cursor.lastrowid, variantes)
+        cursor.execute("UPDATE publicaciones SET images_count = images_count + 1 WHERE id = %s", (publicacion_id,))
+        author_timeline.sumar(cursor, current_user_id, publicaciones=1)
         # ✅ CAMBIO 4: Usar conn.commit()
         conn.commit()
+        search.indexar(publicacion_id, titulo, texto, categoria_id)
+        trending.publicacion_creada(publicacion_id, int(categoria_id))
+        _publicacion_cambiada(publicacion_id)
 
         return jsonify({
             "message": "Publicación creada exitosamente.",
             "id": publicacion_id,
-            "imageUrl": nueva_imagen_url
+            "imageUrl": nueva_imagen_url,
+            "imageSrcset": image_pipeline.srcset_de(variantes)
         }), 201
 
+    except HTTPException:
+        # 413 de limitar_subida al parsear el formulario: lo responde el errorhandler de la app
+        raise
     except Exception as e:
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo al crear la publicación: %s", e)
         # ✅ CAMBIO 5: Usar conn.rollback() si la conexión está abierta (aunque pymysql maneja bien esto)
         if conn:
             conn.rollback()
         return jsonify({"error": "Error interno."}), 500
     finally:
         # ✅ CAMBIO 6: Asegurar el cierre de la conexión (y cursor)
+        if subida:
+            subida.cerrar()
         if cursor:
             cursor.close()
         if conn:
@@ -219,8 +257,7 @@ def eliminar_publicacion(publicacion_id):
     current_user_id = int(get_jwt_identity())
     claims = get_jwt()
 
-    print(f"DEBUG ELIMINAR: current_user_id del JWT: {current_user_id}", file=sys.stderr)
-    print(f"DEBUG ELIMINAR: claims del JWT: {claims}", file=sys.stderr)
+    logger.debug("current_user_id del JWT: %s", current_user_id)
 
     if not claims.get('verificado'):
         return jsonify({"error": "Usuario no verificado."}), 403
@@ -233,7 +270,10 @@ def eliminar_publicacion(publicacion_id):
         # ✅ CAMBIO 2: Crear el cursor DictCursor
         cursor = conn.cursor(pymysql.cursors.DictCursor)
         
-        cursor.execute("SELECT autor_id FROM publicaciones WHERE id = %s", (publicacion_id,))
+        cursor.execute(
+            "SELECT autor_id, categoria_id, likes_count, comments_count FROM publicaciones WHERE id = %s FOR UPDATE",
+            (publicacion_id,)
+        )
         resultado = cursor.fetchone()
         
         if not resultado:
@@ -243,49 +283,45 @@ def eliminar_publicacion(publicacion_id):
         if autor_publicacion_id != current_user_id:
             return jsonify({"error": "No autorizado para eliminar esta publicación."}), 403
 
-        # 🔥 Obtener imágenes asociadas
-        cursor.execute("SELECT url FROM imagenes_publicacion WHERE publicacion_id = %s", (publicacion_id,))
-        image_urls_to_delete = cursor.fetchall()
-
-        for row in image_urls_to_delete:
-            img_url = row['url']
-            public_id = extract_public_id_from_url(img_url)
-            if public_id:
-                try:
-                    cloudinary.uploader.destroy(public_id)
-                    print(f"DEBUG ELIMINAR: Imagen eliminada de Cloudinary: {public_id}", file=sys.stderr)
-                except Exception as e:
-                    print(f"ERROR ELIMINAR: Fallo eliminando {public_id} de Cloudinary: {e}", file=sys.stderr)
-
-        # 🔥 Eliminar toda la carpeta en Cloudinary (publicaciones/<user_id>/<publicacion_id>)
-        try:
-            folder_prefix = f"publicaciones/{autor_publicacion_id}/{publicacion_id}"
-            cloudinary.api.delete_resources_by_prefix(folder_prefix)
-            cloudinary.api.delete_folder(folder_prefix)
-            print(f"DEBUG ELIMINAR: Carpeta eliminada en Cloudinary: {folder_prefix}", file=sys.stderr)
-        except Exception as e:
-            print(f"ERROR ELIMINAR: No se pudo eliminar la carpeta de Cloudinary: {e}", file=sys.stderr)
+        # 🔥 Encolar los archivos asociados (imágenes y variantes) para el colector de asset_gc.py
+        cursor.execute("""
+            SELECT i.url FROM imagenes_publicacion i WHERE i.publicacion_id = %s
+            UNION
+            SELECT v.url FROM imagenes_publicacion_variantes v
+            JOIN imagenes_publicacion i ON v.imagen_id = i.id
+            WHERE i.publicacion_id = %s
+        """, (publicacion_id, publicacion_id))
+        folder_prefix = f"publicaciones/{autor_publicacion_id}/{publicacion_id}"
+        asset_gc.encolar_urls(cursor, [row['url'] for row in cursor.fetchall()], carpeta=folder_prefix)
+        asset_gc.encolar_carpeta(cursor, folder_prefix)
+
+        # Los likes y comentarios que caen con la publicación dejan de contar para el autor. La fila
+        # está bloqueada (FOR UPDATE): un like o comentario no puede cambiar estos contadores hasta el DELETE
+        author_timeline.sumar(
+            cursor, autor_publicacion_id, publicaciones=-1,
+            likes=-(resultado['likes_count'] or 0), comentarios=-resultado['comments_count']
+        )
 
-        # 🔥 Borrar datos relacionados en la DB
-        cursor.execute("DELETE FROM comentarios WHERE publicacion_id = %s", (publicacion_id,))
-        cursor.execute("DELETE FROM imagenes_publicacion WHERE publicacion_id = %s", (publicacion_id,))
-        cursor.execute("DELETE FROM likes WHERE publicacion_id = %s", (publicacion_id,))
+        # 🔥 Borrar la publicación: comentarios, imágenes, variantes y likes caen por ON DELETE CASCADE
         cursor.execute("DELETE FROM publicaciones WHERE id = %s", (publicacion_id,))
         # ✅ CAMBIO 3: Usar conn.commit()
         conn.commit()
+        search.eliminar(publicacion_id)
+        trending.publicacion_eliminada(publicacion_id, resultado['categoria_id'])
+        _publicacion_cambiada(publicacion_id)
+        http_cache.invalidar(f'comentarios:{publicacion_id}')
 
         # 🔥 Emitir evento a todos los clientes
-        socketio.emit('publication_deleted', {
+        emit_broadcast(socketio, 'publication_deleted', {
             'id': publicacion_id,
             'message': 'Publicación eliminada.'
-        }, namespace='/')
+        })
 
-        print(f"DEBUG ELIMINAR: Evento 'publication_deleted' emitido para pub {publicacion_id}.", file=sys.stderr)
+        logger.debug("Evento 'publication_deleted' emitido para pub %s.", publicacion_id)
 
         return jsonify({"message": "Publicación eliminada correctamente."}), 200
     except Exception as e:
-        print(f"Error al eliminar publicación {publicacion_id} para user {current_user_id}: {e}", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Error al eliminar publicación %s para user %s: %s", publicacion_id, current_user_id, e)
         # ✅ CAMBIO 4: Usar conn.rollback()
         if conn:
             conn.rollback()
@@ -297,29 +333,156 @@ def eliminar_publicacion(publicacion_id):
         if conn:
             conn.close()
 
+# Forma de cada recurso: las columnas salen del SQL ya con el nombre que ve el cliente (alias) y
+# las TINYINT(1) que son booleanos se listan en _BOOL_*. Fechas y Decimal los serializa
+# json_provider.py, así que las filas se devuelven sin recorrerlas para convertir campos.
+# categoria_nombre no sale de un JOIN: se resuelve con la copia en memoria de reference_data.py.
+
+_SQL_FEED = """
+    SELECT
+        p.id, p.autor_id, p.titulo, p.texto AS content, p.created_at, p.likes_count AS likes,
+        p.comments_count, p.images_count, p.categoria_id,
+        u.username AS autor_username, NULLIF(u.foto_perfil, '') AS autor_foto_perfil_url,
+        u.verificado AS autor_verificado
+    FROM publicaciones p
+    JOIN users u ON p.autor_id = u.id
+"""
+_BOOL_PUBLICACION = ('autor_verificado',)
+
+# Los comentarios siempre han llevado un avatar: sin foto de perfil, la imagen por defecto
+AVATAR_POR_DEFECTO = "https://static.vecteezy.com/system/resources/previews/009/292/244/original/default-avatar-icon-of-social-media-user-vector.jpg"
+
+_SQL_COMENTARIO = f"""
+    SELECT
+        c.id, c.publicacion_id, c.autor_id, c.texto, c.created_at,
+        COALESCE(c.edited_at, c.created_at) AS edited_at,
+        u.username AS autor_username,
+        COALESCE(NULLIF(u.foto_perfil, ''), '{AVATAR_POR_DEFECTO}') AS autor_foto_perfil_url,
+        u.verificado AS autor_verificado
+    FROM comentarios c
+    JOIN users u ON c.autor_id = u.id
+"""
+_BOOL_COMENTARIO = ('autor_verificado',)
+
+
+def _comentarios(cursor, condicion, valores):
+    """Comentarios con la forma de _SQL_COMENTARIO que cumplen 'condicion' (WHERE ... ORDER BY ...)."""
+    cursor.execute(f"{_SQL_COMENTARIO} {condicion}", valores)
+    return json_provider.como_bool(cursor.fetchall(), _BOOL_COMENTARIO)
+
+
+def _completar_publicaciones(cursor, publicaciones):
+    """Completa las filas de _SQL_FEED con lo que espera el cliente: booleanos, categoría, imágenes y srcsets."""
+    # Imágenes de todas las publicaciones en una sola consulta (antes: una por publicación)
+    imagenes_por_publicacion = {}
+    if publicaciones:
+        marcadores = ', '.join(['%s'] * len(publicaciones))
+        cursor.execute(
+            f"SELECT id, publicacion_id, url FROM imagenes_publicacion "
+            f"WHERE publicacion_id IN ({marcadores}) ORDER BY id",
+            tuple(pub['id'] for pub in publicaciones)
+        )
+        for img in cursor.fetchall():
+            imagenes_por_publicacion.setdefault(img.pop('publicacion_id'), []).append(img)
+
+    json_provider.como_bool(publicaciones, _BOOL_PUBLICACION)
+    for pub in publicaciones:
+        pub['categoria_nombre'] = reference_data.nombre_categoria(pub['categoria_id'])
+        imagenes = imagenes_por_publicacion.get(pub['id'], [])
+        pub['imagenes'] = imagenes
+        pub['imageUrl'] = imagenes[0]['url'] if imagenes else None
+        pub['imagenes_adicionales_urls'] = [img['url'] for img in imagenes[1:]] if len(imagenes) > 1 else []
+
+    # Variantes responsive de todas las imágenes del feed en una sola consulta
+    srcsets = image_pipeline.srcsets_por_imagen(
+        cursor, [img['id'] for pub in publicaciones for img in pub['imagenes']]
+    )
+    for pub in publicaciones:
+        for img in pub['imagenes']:
+            img['srcset'] = srcsets.get(img['id'], {})
+        pub['imageSrcset'] = pub['imagenes'][0]['srcset'] if pub['imagenes'] else {}
+    return publicaciones
+
+
+def _publicacion_cambiada(publicacion_id):
+    """
+    Tras el commit de un cambio visible en el feed: descarta la fila cacheada de la publicación
+    (si no, expira sola con su TTL) y renueva la versión del feed (ETag, http_cache.py).
+    """
+    try:
+        redis_store.delete(redis_store.key('publicacion_feed', publicacion_id), binary=True)
+    except RedisNoDisponible:
+        pass
+    http_cache.invalidar('publicaciones')
+
+
+def _publicaciones_por_id(cursor, ids):
+    """
+    Filas del feed de las publicaciones pedidas, en ese orden. Primero un MGET a la caché
+    (publicacion_feed); las que faltan salen de una sola consulta IN y se cachean con un pipeline.
+    Las que ya no existen se omiten.
+    """
+    claves = [redis_store.key('publicacion_feed', i) for i in ids]
+    try:
+        crudos = redis_store.get_many(claves, binary=True)
+    except RedisNoDisponible:
+        crudos = [None] * len(ids)
+    por_id = {i: codec.decode_value(crudo) for i, crudo in zip(ids, crudos) if crudo is not None}
+    for pub in por_id.values():
+        # La fila cacheada puede ser anterior a un cambio de nombre de la categoría
+        pub['categoria_nombre'] = reference_data.nombre_categoria(pub['categoria_id'])
+
+    faltan = [i for i in ids if i not in por_id]
+    if faltan:
+        marcadores = ', '.join(['%s'] * len(faltan))
+        cursor.execute(_SQL_FEED + f" WHERE p.id IN ({marcadores})", tuple(faltan))
+        nuevas = _completar_publicaciones(cursor, cursor.fetchall())
+        formato = current_app.config.get('REDIS_VALUE_CODEC', 'json')
+        try:
+            redis_store.set_many(
+                {redis_store.key('publicacion_feed', pub['id']): codec.encode_value(pub, formato) for pub in nuevas},
+                tipo='publicacion_feed', binary=True,
+            )
+        except RedisNoDisponible:
+            pass
+        por_id.update((pub['id'], pub) for pub in nuevas)
+
+    return [por_id[i] for i in ids if i in por_id]
+
+
 @blog_bp.route('/publicaciones', methods=['GET', 'OPTIONS'])
+@http_cache.condicional(lambda: ['publicaciones', 'usuarios', 'categorias'], cache_control='public, no-cache')
 def get_publicaciones():
     if request.method == 'OPTIONS':
         return jsonify({'message': 'Preflight success'}), 200
 
     categoria_id = request.args.get('categoria_id', type=int)
+    trending_activo = request.args.get('orden') == 'trending'
+    if trending_activo:
+        # Paginación por posición en el ranking (las puntuaciones cambian entre páginas)
+        desde = max(request.args.get('desde', 0, type=int), 0)
+        limite = min(max(request.args.get('limite', 20, type=int), 1), 50)
+        try:
+            ranking = trending.pagina(categoria_id, desde, limite)
+        except RedisNoDisponible:
+            return jsonify({"error": "El feed trending no está disponible en este momento."}), 503
+
     conn = None
     cursor = None
     try:
         # ✅ CAMBIO 1: Obtener la conexión
-        conn = get_db()
+        conn = get_db(lectura=True)
         # ✅ CAMBIO 2: Crear el cursor DictCursor
         cursor = conn.cursor(pymysql.cursors.DictCursor)
 
-        sql = """
-            SELECT
-                p.id, p.autor_id, p.titulo, p.texto AS content, p.created_at, p.likes_count,
-                p.categoria_id, c.nombre AS categoria_nombre,
-                u.username AS autor_username, u.foto_perfil AS autor_foto_perfil_url, u.verificado AS autor_verificado
-            FROM publicaciones p
-            JOIN users u ON p.autor_id = u.id
-            LEFT JOIN categorias c ON p.categoria_id = c.id
-        """
+        if trending_activo:
+            puntuaciones = dict(ranking)
+            publicaciones = _publicaciones_por_id(cursor, [i for i, _ in ranking])
+            for pub in publicaciones:
+                pub['trending_score'] = puntuaciones[pub['id']]
+            return jsonify(publicaciones), 200
+
+        sql = _SQL_FEED
         values = []
 
         if categoria_id:
@@ -329,34 +492,12 @@ def get_publicaciones():
         sql += " ORDER BY p.created_at DESC"
 
         cursor.execute(sql, tuple(values))
-        publicaciones = cursor.fetchall()
-
-        for pub in publicaciones:
-            # Normalizar fechas
-            if isinstance(pub['created_at'], datetime):
-                pub['created_at'] = pub['created_at'].isoformat()
-            pub['autor_verificado'] = bool(pub['autor_verificado'])
-            pub['autor_foto_perfil_url'] = pub['autor_foto_perfil_url'] if pub['autor_foto_perfil_url'] else None
-
-            # Obtener imágenes principales
-            # ✅ CAMBIO 3: Crear un nuevo cursor desde conn
-            cursor_img = conn.cursor(pymysql.cursors.DictCursor)
-            cursor_img.execute("SELECT id, url FROM imagenes_publicacion WHERE publicacion_id = %s ORDER BY id", (pub['id'],))
-            imagenes = cursor_img.fetchall()
-            cursor_img.close()
-
-            pub['imagenes'] = imagenes
-            pub['imageUrl'] = imagenes[0]['url'] if imagenes else None
-            pub['imagenes_adicionales_urls'] = [img['url'] for img in imagenes[1:]] if len(imagenes) > 1 else []
-
-            # Renombrar campo likes_count → likes
-            pub['likes'] = pub.pop('likes_count')
+        publicaciones = _completar_publicaciones(cursor, cursor.fetchall())
 
         return jsonify(publicaciones), 200
 
     except Exception as e:
-        print(f"ERROR al obtener publicaciones: {e}", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo al obtener publicaciones: %s", e)
         return jsonify({"error": "Error interno del servidor al obtener publicaciones."}), 500
     finally:
         # ✅ CAMBIO 4: Asegurar el cierre de la conexión (y cursor)
@@ -367,8 +508,90 @@ def get_publicaciones():
 
 
 
+@blog_bp.route('/buscar', methods=['GET', 'OPTIONS'])
+def buscar_publicaciones():
+    if request.method == 'OPTIONS':
+        return jsonify({'message': 'Preflight success'}), 200
+
+    consulta = (request.args.get('q') or '').strip()
+    if not consulta:
+        return jsonify({"error": "Falta el texto a buscar (parámetro 'q')."}), 400
+    categoria_id = request.args.get('categoria_id', type=int)
+    limite = request.args.get('limite', type=int)
+    try:
+        despues = search.decodificar_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except search.CursorInvalido as e:
+        return jsonify({"error": str(e)}), 400
+
+    conn = None
+    try:
+        conn = get_db(lectura=True)
+        resultados, siguiente = search.buscar(
+            conn, consulta, categoria_id=categoria_id, despues=despues, limite=limite
+        )
+        return jsonify({"resultados": resultados, "siguiente": siguiente}), 200
+    except RedisNoDisponible:
+        raise
+    except Exception as e:
+        logger.exception("Fallo al buscar publicaciones (q=%r): %s", consulta, e)
+        return jsonify({"error": "Error interno del servidor al buscar publicaciones."}), 500
+    finally:
+        if conn:
+            conn.close()
+
+@blog_bp.route('/autores/<autor>/publicaciones', methods=['GET', 'OPTIONS'])
+def get_publicaciones_autor(autor):
+    """Publicaciones de un autor (por id o username) con paginación por cursor y sus contadores."""
+    if request.method == 'OPTIONS':
+        return jsonify({'message': 'Preflight success'}), 200
+
+    try:
+        despues = author_timeline.decodificar_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except author_timeline.CursorInvalido as e:
+        return jsonify({"error": str(e)}), 400
+
+    conn = None
+    cursor = None
+    try:
+        conn = get_db(lectura=True)
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+
+        # Un valor numérico es el id; cualquier otro, el username
+        columna = 'id' if autor.isdigit() else 'username'
+        cursor.execute(
+            f"SELECT id, username, foto_perfil, verificado FROM users WHERE {columna} = %s",
+            (int(autor) if autor.isdigit() else autor,)
+        )
+        usuario = cursor.fetchone()
+        if not usuario:
+            return jsonify({"error": "Autor no encontrado."}), 404
+
+        ids, siguiente = author_timeline.pagina(
+            cursor, usuario['id'], despues=despues, limite=request.args.get('limite', type=int)
+        )
+        return jsonify({
+            "autor": {
+                "id": usuario['id'],
+                "username": usuario['username'],
+                "foto_perfil_url": usuario['foto_perfil'] or None,
+                "verificado": bool(usuario['verificado']),
+            },
+            "contadores": author_timeline.contadores(cursor, usuario['id']),
+            "publicaciones": _publicaciones_por_id(cursor, ids),
+            "siguiente": siguiente,
+        }), 200
+    except Exception as e:
+        logger.exception("Fallo al obtener las publicaciones del autor %s: %s", autor, e)
+        return jsonify({"error": "Error interno del servidor al obtener publicaciones."}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
 @blog_bp.route('/editar-publicacion/<int:publicacion_id>', methods=['PUT', 'OPTIONS'])
 @jwt_required()
+@limitar_subida('publicacion')
 def editar_publicacion(publicacion_id):
     if request.method == 'OPTIONS':
         return jsonify({'message': 'Preflight success'}), 200
@@ -391,7 +614,7 @@ def editar_publicacion(publicacion_id):
         # ✅ CAMBIO 2: Crear el cursor DictCursor
         cursor = conn.cursor(pymysql.cursors.DictCursor)
 
-        cursor.execute("SELECT autor_id FROM publicaciones WHERE id = %s", (publicacion_id,))
+        cursor.execute("SELECT autor_id, categoria_id FROM publicaciones WHERE id = %s", (publicacion_id,))
         result = cursor.fetchone()
         if not result:
             return jsonify({"error": "Publicación no encontrada"}), 404
@@ -416,31 +639,47 @@ def editar_publicacion(publicacion_id):
         # Si viene nueva imagen, reemplazamos
         if image_file and image_file.filename.strip():
             # Buscar la imagen actual
-            cursor.execute("SELECT url FROM imagenes_publicacion WHERE publicacion_id = %s AND orden = 1", (publicacion_id,))
+            cursor.execute("SELECT id, url FROM imagenes_publicacion WHERE publicacion_id = %s AND orden = 1", (publicacion_id,))
             old = cursor.fetchone()
+
+            # Validar y generar/subir las variantes de la nueva imagen
+            try:
+                with upload_ingest.ingerir(image_file, 'publicacion') as subida:
+                    principal, variantes = image_pipeline.procesar_y_subir(
+                        subida,
+                        folder=f"publicaciones/{current_user_id}/{publicacion_id}"
+                    )
+            except SubidaRechazada as e:
+                return jsonify({"error": str(e)}), e.status
+            except ImagenInvalida:
+                return jsonify({"error": "El archivo no es una imagen válida."}), 400
+
             if old:
-                old_public_id = extract_public_id_from_url(old['url'])
-                if old_public_id:
-                    try:
-                        cloudinary.uploader.destroy(old_public_id)
-                    except Exception as e:
-                        print(f"Error eliminando {old_public_id} de Cloudinary: {e}", file=sys.stderr)
-
-            # Subir nueva
-            upload_result = upload_image_to_cloudinary(
-                image_file,
-                folder=f"publicaciones/{current_user_id}/{publicacion_id}"
-            )
-            nueva_imagen_url = upload_result.get("secure_url") if isinstance(upload_result, dict) else upload_result
+                # Eliminar la imagen anterior y sus variantes
+                cursor.execute("SELECT url FROM imagenes_publicacion_variantes WHERE imagen_id = %s", (old['id'],))
+                old_urls = [old['url']] + [row['url'] for row in cursor.fetchall()]
+                # Se borran fuera de la petición (asset_gc), con el commit de esta transacción
+                asset_gc.encolar_urls(cursor, old_urls, carpeta=f"publicaciones/{current_user_id}/{publicacion_id}")
 
-            if nueva_imagen_url:
                 # ✅ CAMBIO 3: Usar cursor de conn
                 cursor_update_img = conn.cursor()
                 cursor_update_img.execute(
-                    "UPDATE imagenes_publicacion SET url = %s WHERE publicacion_id = %s AND orden = 1",
-                    (nueva_imagen_url, publicacion_id)
+                    "UPDATE imagenes_publicacion SET url = %s WHERE id = %s",
+                    (principal['url'], old['id'])
                 )
+                image_pipeline.guardar_variantes(cursor_update_img, old['id'], variantes, reemplazar=True)
                 cursor_update_img.close()
+            else:
+                cursor_insert_img = conn.cursor()
+                cursor_insert_img.execute(
+                    "INSERT INTO imagenes_publicacion (publicacion_id, url, orden) VALUES (%s, %s, 1)",
+                    (publicacion_id, principal['url'])
+                )
+                image_pipeline.guardar_variantes(cursor_insert_img, cursor_insert_img.lastrowid, variantes)
+                cursor_insert_img.execute(
+                    "UPDATE publicaciones SET images_count = images_count + 1 WHERE id = %s", (publicacion_id,)
+                )
+                cursor_insert_img.close()
 
         if update_fields:
             update_values.append(publicacion_id)
@@ -453,10 +692,17 @@ def editar_publicacion(publicacion_id):
 
         # ✅ CAMBIO 5: Usar conn.commit()
         conn.commit()
+        if update_fields:
+            search.publicacion_cambiada(conn, publicacion_id)
+        if categoria_id:
+            trending.categoria_cambiada(publicacion_id, result['categoria_id'], categoria_id)
+        _publicacion_cambiada(publicacion_id)
         return jsonify({"message": "Publicación actualizada exitosamente."}), 200
 
+    except HTTPException:
+        raise
     except Exception as e:
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo al editar la publicación %s: %s", publicacion_id, e)
         # ✅ CAMBIO 6: Usar conn.rollback()
         if conn:
             conn.rollback()
@@ -477,21 +723,20 @@ def comentar_publicacion():
     current_user_id = int(get_jwt_identity())
     claims = get_jwt()
 
-    print(f"DEBUG COMENTAR: current_user_id del JWT: {current_user_id}", file=sys.stderr)
-    print(f"DEBUG COMENTAR: claims del JWT: {claims}", file=sys.stderr)
+    logger.debug("current_user_id del JWT: %s", current_user_id)
 
     if not claims.get('verificado'):
-        print(f"DEBUG COMENTAR: Usuario {current_user_id} no verificado, acceso denegado.", file=sys.stderr)
+        logger.debug("Usuario %s no verificado, acceso denegado.", current_user_id)
         return jsonify({"error": "Usuario no verificado. Por favor, verifica tu correo electrónico."}), 403
 
     data = request.json
     publicacion_id = data.get('publicacion_id')
     comentario_texto = data.get('comentario')
 
-    print(f"DEBUG COMENTAR: Solicitud para comentar publicacion_id: {publicacion_id}, texto: '{str(comentario_texto)[:50] if comentario_texto else 'None'}...'", file=sys.stderr)
+    logger.debug("Solicitud para comentar publicacion_id: %s, texto: '%s...'", publicacion_id, str(comentario_texto)[:50] if comentario_texto else 'None')
 
     if publicacion_id is None or not comentario_texto:
-        print("ERROR COMENTAR: Datos incompletos - publicacion_id o comentario faltante.", file=sys.stderr)
+        logger.error("Datos incompletos - publicacion_id o comentario faltante.")
         return jsonify({"error": "ID de publicación y comentario son requeridos."}), 400
 
     conn = None
@@ -503,52 +748,39 @@ def comentar_publicacion():
         cursor = conn.cursor()
         publicacion_id = int(publicacion_id)
 
-        cursor.execute("SELECT id FROM publicaciones WHERE id = %s", (publicacion_id,))
-        if not cursor.fetchone():
-            print(f"ERROR COMENTAR: Publicación {publicacion_id} no encontrada.", file=sys.stderr)
+        cursor.execute("SELECT autor_id, categoria_id FROM publicaciones WHERE id = %s", (publicacion_id,))
+        publicacion = cursor.fetchone()
+        if not publicacion:
+            logger.error("Publicación %s no encontrada.", publicacion_id)
             return jsonify({"error": "La publicación no existe."}), 404
 
         cursor.execute(
             "INSERT INTO comentarios (publicacion_id, autor_id, texto) VALUES (%s, %s, %s)",
             (publicacion_id, current_user_id, comentario_texto)
         )
+        new_comment_id = cursor.lastrowid
+        cursor.execute("UPDATE publicaciones SET comments_count = comments_count + 1 WHERE id = %s", (publicacion_id,))
+        author_timeline.sumar(cursor, publicacion['autor_id'], comentarios=1)
         # ✅ CAMBIO 3: Usar conn.commit()
         conn.commit()
-        new_comment_id = cursor.lastrowid
-        print(f"DEBUG COMENTAR: Comentario {new_comment_id} creado en publicación {publicacion_id} por user {current_user_id}.", file=sys.stderr)
+        trending.comentario(publicacion_id, publicacion['categoria_id'])
+        _publicacion_cambiada(publicacion_id)
+        logger.debug("Comentario %s creado en publicación %s por user %s.", new_comment_id, publicacion_id, current_user_id)
 
         # ✅ CAMBIO 4: Crear un nuevo cursor DictCursor para obtener el comentario
         comments_cursor = conn.cursor(pymysql.cursors.DictCursor)
-        comments_cursor.execute("""
-            SELECT
-                c.id, c.publicacion_id, c.autor_id, c.texto, c.created_at, c.edited_at,
-                u.username AS autor_username, u.foto_perfil AS autor_foto_perfil_url, u.verificado AS autor_verificado
-            FROM comentarios c
-            JOIN users u ON c.autor_id = u.id
-            WHERE c.id = %s
-        """, (new_comment_id,))
-        new_comment_data = comments_cursor.fetchone()
+        filas = _comentarios(comments_cursor, "WHERE c.id = %s", (new_comment_id,))
         comments_cursor.close()
-
-        if new_comment_data:
-            if isinstance(new_comment_data['created_at'], datetime):
-                new_comment_data['created_at'] = new_comment_data['created_at'].isoformat()
-            if isinstance(new_comment_data['edited_at'], datetime):
-                new_comment_data['edited_at'] = new_comment_data['edited_at'].isoformat()
-            else:
-                new_comment_data['edited_at'] = new_comment_data['created_at']
-
-            new_comment_data['autor_foto_perfil_url'] = new_comment_data['autor_foto_perfil_url'] if new_comment_data['autor_foto_perfil_url'] else None
-            new_comment_data['autor_verificado'] = bool(new_comment_data['autor_verificado'])
+        new_comment_data = filas[0] if filas else None
 
         # ✅ Emitir evento al "room" de la publicación
-        socketio.emit(
+        http_cache.invalidar(f'comentarios:{publicacion_id}')
+        emit_comment_event(
+            publicacion_id,
             'comment_added',
-            {'publicacion_id': publicacion_id, 'comment': new_comment_data},
-            namespace='/',
-            room=f'publicacion_{publicacion_id}'
+            {'publicacion_id': publicacion_id, 'comment': new_comment_data}
         )
-        print(f"DEBUG COMENTAR: Evento 'comment_added' emitido para publicacion_{publicacion_id}.", file=sys.stderr)
+        logger.debug("Evento 'comment_added' emitido para publicacion_%s.", publicacion_id)
 
         return jsonify({
             "message": "Comentario publicado exitosamente.",
@@ -557,8 +789,7 @@ def comentar_publicacion():
         }), 201
 
     except Exception as e:
-        print(f"Error al comentar publicación {publicacion_id} para user {current_user_id}: {e}", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Error al comentar publicación %s para user %s: %s", publicacion_id, current_user_id, e)
         # ✅ CAMBIO 5: Usar conn.rollback()
         if conn:
             conn.rollback()
@@ -571,63 +802,37 @@ def comentar_publicacion():
             conn.close()
 
 @blog_bp.route('/publicaciones/<int:publicacion_id>/comentarios', methods=['GET', 'OPTIONS'])
+@http_cache.condicional(lambda publicacion_id: [f'comentarios:{publicacion_id}', 'usuarios'],
+                        cache_control='public, no-cache')
 def get_comentarios_publicacion(publicacion_id):
     # Código para obtener comentarios
     if request.method == 'OPTIONS':
         return jsonify({'message': 'Preflight success'}), 200
 
     publicacion_id = int(publicacion_id)
-    print(f"DEBUG GET_COMENTARIOS: Solicitud recibida para /publicaciones/{publicacion_id}/comentarios", file=sys.stderr)
+    logger.debug("Solicitud recibida para /publicaciones/%s/comentarios", publicacion_id)
     conn = None
     cursor = None
     try:
         # ✅ CAMBIO 1: Obtener la conexión
-        conn = get_db()
+        conn = get_db(lectura=True)
         # ✅ CAMBIO 2: Crear el cursor DictCursor
         cursor = conn.cursor(pymysql.cursors.DictCursor)
 
         cursor.execute("SELECT id FROM publicaciones WHERE id = %s", (publicacion_id,))
         publication_exists = cursor.fetchone()
         if not publication_exists:
-            print(f"DEBUG GET_COMENTARIOS: Publicación {publicacion_id} no encontrada en la DB.", file=sys.stderr)
+            logger.debug("Publicación %s no encontrada en la DB.", publicacion_id)
             return jsonify({"error": "Publicación no encontrada."}), 404
 
-        cursor.execute("""
-            SELECT
-                c.id,
-                c.autor_id,
-                u.username AS autor_username,
-                u.foto_perfil AS autor_foto_perfil_url,
-                u.verificado AS autor_verificado,
-                c.texto AS texto,
-                c.created_at AS created_at,
-                c.edited_at AS edited_at
-            FROM
-                comentarios c
-            JOIN
-                users u ON c.autor_id = u.id
-            WHERE
-                c.publicacion_id = %s
-            ORDER BY
-                c.created_at ASC
-        """, (publicacion_id,))
-        comentarios = cursor.fetchall()
-
-        for comentario in comentarios:
-            if isinstance(comentario['created_at'], datetime):
-                comentario['created_at'] = comentario['created_at'].isoformat()
-            if isinstance(comentario['edited_at'], datetime):
-                comentario['edited_at'] = comentario['edited_at'].isoformat()
-            else:
-                comentario['edited_at'] = comentario['created_at']
-            comentario['autor_foto_perfil_url'] = comentario['autor_foto_perfil_url'] if comentario['autor_foto_perfil_url'] else "https://static.vecteezy.com/system/resources/previews/009/292/244/original/default-avatar-icon-of-social-media-user-vector.jpg"
-            comentario['autor_verificado'] = bool(comentario['autor_verificado'])
+        comentarios = _comentarios(
+            cursor, "WHERE c.publicacion_id = %s ORDER BY c.created_at ASC", (publicacion_id,)
+        )
 
-        print(f"DEBUG GET_COMENTARIOS: Devolviendo {len(comentarios)} comentarios para publicación {publicacion_id}.", file=sys.stderr)
+        logger.debug("Devolviendo %s comentarios para publicación %s.", len(comentarios), publicacion_id)
         return jsonify(comentarios), 200
     except Exception as e:
-        print(f"Error al obtener comentarios para publicación {publicacion_id}: {str(e)}", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Error al obtener comentarios para publicación %s: %s", publicacion_id, str(e))
         return jsonify({"error": "Error interno del servidor al obtener comentarios."}), 500
     finally:
         # ✅ CAMBIO 3: Asegurar el cierre de la conexión (y cursor)
@@ -647,20 +852,19 @@ def editar_comentario(comentario_id):
     comentario_id = int(comentario_id)
     claims = get_jwt()
 
-    print(f"DEBUG EDIT_COMMENT: current_user_id del JWT: {current_user_id}", file=sys.stderr)
-    print(f"DEBUG EDIT_COMMENT: claims del JWT: {claims}", file=sys.stderr)
+    logger.debug("current_user_id del JWT: %s", current_user_id)
 
     if not claims.get('verificado'):
-        print(f"DEBUG EDIT_COMMENT: Usuario {current_user_id} no verificado, acceso denegado.", file=sys.stderr)
+        logger.debug("Usuario %s no verificado, acceso denegado.", current_user_id)
         return jsonify({"error": "Usuario no verificado. Por favor, verifica tu correo electrónico."}), 403
 
     data = request.json
     nuevo_texto = data.get('texto')
 
-    print(f"DEBUG EDIT_COMMENT: Solicitud para editar comentario {comentario_id} con texto: '{str(nuevo_texto)[:50] if nuevo_texto else 'None'}...'", file=sys.stderr)
+    logger.debug("Solicitud para editar comentario %s con texto: '%s...'", comentario_id, str(nuevo_texto)[:50] if nuevo_texto else 'None')
 
     if not nuevo_texto:
-        print(f"ERROR EDIT_COMMENT: Nuevo texto de comentario {comentario_id} requerido.", file=sys.stderr)
+        logger.error("Nuevo texto de comentario %s requerido.", comentario_id)
         return jsonify({"error": "Nuevo texto del comentario requerido."}), 400
 
     conn = None
@@ -674,55 +878,37 @@ def editar_comentario(comentario_id):
         cursor.execute("SELECT autor_id, publicacion_id FROM comentarios WHERE id = %s", (comentario_id,))
         resultado = cursor.fetchone()
         if not resultado:
-            print(f"ERROR EDIT_COMMENT: Comentario {comentario_id} no encontrado.", file=sys.stderr)
+            logger.error("Comentario %s no encontrado.", comentario_id)
             return jsonify({"error": "Comentario no encontrado."}), 404
 
-        comment_author_id = resultado[0]
-        publicacion_id = resultado[1]
+        comment_author_id = resultado['autor_id']
+        publicacion_id = resultado['publicacion_id']
         
-        print(f"DEBUG EDIT_COMMENT: Autor del comentario {comentario_id} es {comment_author_id}, usuario actual es {current_user_id}.", file=sys.stderr)
+        logger.debug("Autor del comentario %s es %s, usuario actual es %s.", comentario_id, comment_author_id, current_user_id)
 
         if comment_author_id != current_user_id:
-            print(f"ERROR EDIT_COMMENT: Usuario {current_user_id} no autorizado para editar comentario {comentario_id}.", file=sys.stderr)
+            logger.error("Usuario %s no autorizado para editar comentario %s.", current_user_id, comentario_id)
             return jsonify({"error": "No autorizado para editar este comentario."}), 403
 
 
         cursor.execute("UPDATE comentarios SET texto = %s, edited_at = %s WHERE id = %s", (nuevo_texto, datetime.now(), comentario_id))
         # ✅ CAMBIO 3: Usar conn.commit()
         conn.commit()
-        print(f"DEBUG EDIT_COMMENT: Comentario {comentario_id} editado correctamente por usuario {current_user_id}.", file=sys.stderr)
+        logger.debug("Comentario %s editado correctamente por usuario %s.", comentario_id, current_user_id)
 
         # ✅ CAMBIO 4: Crear un nuevo cursor DictCursor para obtener el comentario
         comments_cursor = conn.cursor(pymysql.cursors.DictCursor)
-        comments_cursor.execute("""
-            SELECT
-                c.id, c.publicacion_id, c.autor_id, c.texto, c.created_at, c.edited_at,
-                u.username AS autor_username, u.foto_perfil AS autor_foto_perfil_url, u.verificado AS autor_verificado
-            FROM comentarios c
-            JOIN users u ON c.autor_id = u.id
-            WHERE c.id = %s
-        """, (comentario_id,))
-        updated_comment_data = comments_cursor.fetchone()
+        filas = _comentarios(comments_cursor, "WHERE c.id = %s", (comentario_id,))
         comments_cursor.close()
+        updated_comment_data = filas[0] if filas else None
 
-        if updated_comment_data:
-            if isinstance(updated_comment_data['created_at'], datetime):
-                updated_comment_data['created_at'] = updated_comment_data['created_at'].isoformat()
-            if isinstance(updated_comment_data['edited_at'], datetime):
-                updated_comment_data['edited_at'] = updated_comment_data['edited_at'].isoformat()
-            else:
-                updated_comment_data['edited_at'] = updated_comment_data['created_at']
-            updated_comment_data['autor_foto_perfil_url'] = updated_comment_data['autor_foto_perfil_url'] if updated_comment_data['autor_foto_perfil_url'] else None
-            updated_comment_data['autor_verificado'] = bool(updated_comment_data['autor_verificado'])
-
-
-        socketio.emit('comment_updated', {'publicacion_id': publicacion_id, 'comment': updated_comment_data}, room=f'publicacion_{publicacion_id}', namespace='/')
-        print(f"DEBUG EDIT_COMMENT: Evento 'comment_updated' emitido para publicacion_{publicacion_id}.", file=sys.stderr)
+        http_cache.invalidar(f'comentarios:{publicacion_id}')
+        emit_comment_event(publicacion_id, 'comment_updated', {'publicacion_id': publicacion_id, 'comment': updated_comment_data})
+        logger.debug("Evento 'comment_updated' emitido para publicacion_%s.", publicacion_id)
 
         return jsonify({"message": "Comentario editado correctamente.", "comment": updated_comment_data}), 200
     except Exception as e:
-        print(f"Error al editar comentario {comentario_id} para user {current_user_id}: {e}", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Error al editar comentario %s para user %s: %s", comentario_id, current_user_id, e)
         # ✅ CAMBIO 5: Usar conn.rollback()
         if conn:
             conn.rollback()
@@ -745,11 +931,10 @@ def eliminar_comentario(comentario_id):
     comentario_id = int(comentario_id)
     claims = get_jwt()
 
-    print(f"DEBUG DELETE_COMMENT: current_user_id del JWT: {current_user_id}", file=sys.stderr)
-    print(f"DEBUG DELETE_COMMENT: claims del JWT: {claims}", file=sys.stderr)
+    logger.debug("current_user_id del JWT: %s", current_user_id)
 
     if not claims.get('verificado'):
-        print(f"DEBUG DELETE_COMMENT: Usuario {current_user_id} no verificado, acceso denegado.", file=sys.stderr)
+        logger.debug("Usuario %s no verificado, acceso denegado.", current_user_id)
         return jsonify({"error": "Usuario no verificado. Por favor, verifica tu correo electrónico."}), 403
 
     conn = None
@@ -760,38 +945,53 @@ def eliminar_comentario(comentario_id):
         # ✅ CAMBIO 2: Crear el cursor
         cursor = conn.cursor()
         
-        cursor.execute("SELECT autor_id, publicacion_id FROM comentarios WHERE id = %s", (comentario_id,))
+        cursor.execute(
+            "SELECT autor_id, publicacion_id, UNIX_TIMESTAMP(created_at) AS creado FROM comentarios WHERE id = %s FOR UPDATE",
+            (comentario_id,)
+        )
         resultado = cursor.fetchone()
         if not resultado:
-            print(f"ERROR DELETE_COMMENT: Comentario {comentario_id} no encontrado.", file=sys.stderr)
+            logger.error("Comentario %s no encontrado.", comentario_id)
             return jsonify({"error": "Comentario no encontrado."}), 404
 
-        comment_author_id = resultado[0]
-        publicacion_id = resultado[1]
+        comment_author_id = resultado['autor_id']
+        publicacion_id = resultado['publicacion_id']
 
-        cursor.execute("SELECT autor_id FROM publicaciones WHERE id = %s", (publicacion_id,))
-        publicacion_autor_id = cursor.fetchone()[0]
+        cursor.execute("SELECT autor_id, categoria_id FROM publicaciones WHERE id = %s", (publicacion_id,))
+        publicacion = cursor.fetchone()
+        publicacion_autor_id = publicacion['autor_id']
 
-        print(f"DEBUG DELETE_COMMENT: Autor del comentario {comentario_id} es {comment_author_id}.", file=sys.stderr)
-        print(f"DEBUG DELETE_COMMENT: Autor de la publicación {publicacion_id} es {publicacion_autor_id}.", file=sys.stderr)
-        print(f"DEBUG DELETE_COMMENT: Usuario actual {current_user_id}.", file=sys.stderr)
+        logger.debug("Autor del comentario %s es %s.", comentario_id, comment_author_id)
+        logger.debug("Autor de la publicación %s es %s.", publicacion_id, publicacion_autor_id)
+        logger.debug("Usuario actual %s.", current_user_id)
 
         if comment_author_id != current_user_id and publicacion_autor_id != current_user_id:
-            print(f"ERROR DELETE_COMMENT: Usuario {current_user_id} no autorizado para eliminar comentario {comentario_id}.", file=sys.stderr)
+            logger.error("Usuario %s no autorizado para eliminar comentario %s.", current_user_id, comentario_id)
             return jsonify({"error": "No autorizado para eliminar este comentario."}), 403
 
         cursor.execute("DELETE FROM comentarios WHERE id = %s", (comentario_id,))
+        if cursor.rowcount != 1:
+            # Otra petición lo borró entre la lectura y el DELETE: sus contadores ya se restaron
+            conn.rollback()
+            return jsonify({"error": "Comentario no encontrado."}), 404
+        cursor.execute(
+            "UPDATE publicaciones SET comments_count = GREATEST(comments_count - 1, 0) WHERE id = %s",
+            (publicacion_id,)
+        )
+        author_timeline.sumar(cursor, publicacion_autor_id, comentarios=-1)
         # ✅ CAMBIO 3: Usar conn.commit()
         conn.commit()
-        print(f"DEBUG DELETE_COMMENT: Comentario {comentario_id} eliminado correctamente por usuario {current_user_id}.", file=sys.stderr)
+        trending.comentario(publicacion_id, publicacion['categoria_id'], eliminado=True, instante=resultado['creado'])
+        _publicacion_cambiada(publicacion_id)
+        logger.debug("Comentario %s eliminado correctamente por usuario %s.", comentario_id, current_user_id)
 
-        socketio.emit('comment_deleted', {'id': comentario_id, 'publicacion_id': publicacion_id}, room=f'publicacion_{publicacion_id}', namespace='/')
-        print(f"DEBUG DELETE_COMMENT: Evento 'comment_deleted' emitido para publicacion_{publicacion_id}.", file=sys.stderr)
+        http_cache.invalidar(f'comentarios:{publicacion_id}')
+        emit_comment_event(publicacion_id, 'comment_deleted', {'id': comentario_id, 'publicacion_id': publicacion_id})
+        logger.debug("Evento 'comment_deleted' emitido para publicacion_%s.", publicacion_id)
 
         return jsonify({"message": "Comentario eliminado correctamente."}), 200
     except Exception as e:
-        print(f"Error al eliminar comentario {comentario_id} para user {current_user_id}: {e}", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Error al eliminar comentario %s para user %s: %s", comentario_id, current_user_id, e)
         # ✅ CAMBIO 4: Usar conn.rollback()
         if conn:
             conn.rollback()
@@ -805,6 +1005,7 @@ def eliminar_comentario(comentario_id):
 
 @blog_bp.route('/publicaciones/<int:publicacion_id>/upload_imagen', methods=['POST'])
 @jwt_required()
+@limitar_subida('publicacion')
 def upload_publicacion_image(publicacion_id):
     current_user_id = int(get_jwt_identity())
     claims = get_jwt()
@@ -818,14 +1019,18 @@ def upload_publicacion_image(publicacion_id):
     if file.filename == '':
         return jsonify({"error": "Archivo vacío"}), 400
 
-    allowed_extensions = current_app.config.get('ALLOWED_EXTENSIONS', {'png', 'jpg', 'jpeg', 'gif'})
-    if file and '.' in file.filename and file.filename.rsplit('.', 1)[1].lower() in allowed_extensions:
-        
+    # El tipo se decide por el contenido (magic bytes), no por la extensión del nombre
+    try:
+        subida = upload_ingest.ingerir(file, 'publicacion')
+    except SubidaRechazada as e:
+        return jsonify({"error": str(e)}), e.status
+
+    with subida:
         conn = None
         cursor = None
         try:
-            upload_result = upload_image_to_cloudinary(file, folder=f"publicaciones/{publicacion_id}")
-            image_url = upload_result.get("secure_url") if isinstance(upload_result, dict) else upload_result
+            principal, variantes = image_pipeline.procesar_y_subir(subida, folder=f"publicaciones/{publicacion_id}")
+            image_url = principal['url']
 
             if image_url:
                 # ✅ CAMBIO 1: Obtener la conexión
@@ -836,11 +1041,22 @@ def upload_publicacion_image(publicacion_id):
                     "INSERT INTO imagenes_publicacion (publicacion_id, url, orden) VALUES (%s, %s, 1)",
                     (publicacion_id, image_url)
                 )
+                image_pipeline.guardar_variantes(cursor, cursor.lastrowid, variantes)
+                cursor.execute(
+                    "UPDATE publicaciones SET images_count = images_count + 1 WHERE id = %s", (publicacion_id,)
+                )
                 # ✅ CAMBIO 3: Usar conn.commit()
                 conn.commit()
-                return jsonify({"message": "Imagen subida", "url": image_url}), 200
+                _publicacion_cambiada(publicacion_id)
+                return jsonify({
+                    "message": "Imagen subida",
+                    "url": image_url,
+                    "srcset": image_pipeline.srcset_de(variantes)
+                }), 200
+        except ImagenInvalida:
+            return jsonify({"error": "El archivo no es una imagen válida."}), 400
         except Exception as e:
-            traceback.print_exc(file=sys.stderr)
+            logger.exception("Fallo al subir la imagen de la publicación %s: %s", publicacion_id, e)
             # ✅ CAMBIO 4: Usar conn.rollback()
             if conn:
                 conn.rollback()
@@ -852,44 +1068,30 @@ def upload_publicacion_image(publicacion_id):
             if conn:
                 conn.close()
 
-    return jsonify({"error": "Formato de archivo no permitido"}), 400
+    return jsonify({"error": "Error al subir imagen"}), 500
 
 
-from flask import Response
-import json
+@blog_bp.route('/publicaciones/<int:publicacion_id>/viewers', methods=['GET', 'OPTIONS'])
+def get_viewers_publicacion(publicacion_id):
+    """Número de clientes que tienen abierta la publicación en este momento ("viendo ahora")."""
+    if request.method == 'OPTIONS':
+        return jsonify({'message': 'Preflight success'}), 200
+
+    viewers = presence.espectadores(salas_publicacion(publicacion_id))
+    return jsonify({"publicacion_id": publicacion_id, "viewers": viewers}), 200
+
 
 @blog_bp.route('/categorias', methods=['GET', 'OPTIONS'])
 def get_categorias():
     if request.method == 'OPTIONS':
         return jsonify({'message': 'Preflight success'}), 200
 
-    conn = None
-    cursor = None
     try:
-        # ✅ CAMBIO 1: Obtener la conexión
-        conn = get_db()
-        # ✅ CAMBIO 2: Crear el cursor DictCursor
-        cursor = conn.cursor(pymysql.cursors.DictCursor)
-        cursor.execute("SELECT id, nombre FROM categorias ORDER BY nombre ASC")
-        categorias = cursor.fetchall()
-        print(f"DEBUG: Devolviendo {len(categorias)} categorías.", file=sys.stderr)
-
-        # 🚀 Devolver la respuesta en UTF-8 sin romper acentos
-        return Response(
-            json.dumps(categorias, ensure_ascii=False),
-            mimetype="application/json; charset=utf-8"
-        ), 200
-
+        # Cuerpo ya serializado y ETag de la copia en memoria (reference_data.py)
+        return reference_data.respuesta('categorias')
     except Exception as e:
-        print(f"Error al obtener categorías: {e}", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Error al obtener categorías: %s", e)
         return jsonify({"error": "Error interno del servidor al obtener categorías."}), 500
-    finally:
-        # ✅ CAMBIO 3: Asegurar el cierre de la conexión (y cursor)
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
 @blog_bp.route('/publicaciones/<int:publicacion_id>/like', methods=['POST', 'OPTIONS'])
 @jwt_required()
@@ -904,7 +1106,7 @@ def like_publicacion(publicacion_id):
     if not claims.get('verificado'):
         return jsonify({"error": "Usuario no verificado. Por favor, verifica tu correo electrónico."}), 403
 
-    print(f"DEBUG LIKES: Recibida solicitud LIKE para publicacion_id: {publicacion_id}", file=sys.stderr)
+    logger.debug("Recibida solicitud LIKE para publicacion_id: %s", publicacion_id)
 
     conn = None
     cursor = None
@@ -914,8 +1116,9 @@ def like_publicacion(publicacion_id):
         # ✅ CAMBIO 2: Crear el cursor
         cursor = conn.cursor()
         
-        cursor.execute("SELECT id FROM publicaciones WHERE id = %s", (publicacion_id,))
-        if not cursor.fetchone():
+        cursor.execute("SELECT autor_id, categoria_id FROM publicaciones WHERE id = %s", (publicacion_id,))
+        publicacion = cursor.fetchone()
+        if not publicacion:
             return jsonify({"error": "Publicación no encontrada."}), 404
 
         cursor.execute("SELECT id FROM likes WHERE publicacion_id = %s AND user_id = %s", (publicacion_id, current_user_id))
@@ -925,19 +1128,21 @@ def like_publicacion(publicacion_id):
         cursor.execute("INSERT INTO likes (publicacion_id, user_id) VALUES (%s, %s)", (publicacion_id, current_user_id))
         
         cursor.execute("UPDATE publicaciones SET likes_count = likes_count + 1 WHERE id = %s", (publicacion_id,))
+        author_timeline.sumar(cursor, publicacion['autor_id'], likes=1)
         # ✅ CAMBIO 3: Usar conn.commit()
         conn.commit()
 
         cursor.execute("SELECT likes_count FROM publicaciones WHERE id = %s", (publicacion_id,))
-        new_likes_count = cursor.fetchone()[0]
+        new_likes_count = cursor.fetchone()['likes_count']
+        trending.like(publicacion_id, publicacion['categoria_id'])
+        _publicacion_cambiada(publicacion_id)
 
-        socketio.emit('like_update', {'publicacion_id': publicacion_id, 'likes': new_likes_count, 'user_id': current_user_id, 'user_has_liked': True}, namespace='/', room=f'publicacion_{publicacion_id}')
-        print(f"DEBUG LIKES: Publicación {publicacion_id} - Like añadido por user {current_user_id}. Total: {new_likes_count}", file=sys.stderr)
+        emit_like_update(publicacion_id, {'publicacion_id': publicacion_id, 'likes': new_likes_count, 'user_id': current_user_id, 'user_has_liked': True})
+        logger.debug("Publicación %s - Like añadido por user %s. Total: %s", publicacion_id, current_user_id, new_likes_count)
 
         return jsonify({"message": "Me gusta añadido exitosamente.", "new_likes_count": new_likes_count, "user_has_liked": True}), 200
     except Exception as e:
-        print(f"ERROR LIKE: Fallo al añadir like a pub {publicacion_id} por user {current_user_id}: {e}", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo al añadir like a pub %s por user %s: %s", publicacion_id, current_user_id, e)
         # ✅ CAMBIO 4: Usar conn.rollback()
         if conn:
             conn.rollback()
@@ -962,7 +1167,7 @@ def unlike_publicacion(publicacion_id):
     if not claims.get('verificado'):
         return jsonify({"error": "Usuario no verificado. Por favor, verifica tu correo electrónico."}), 403
 
-    print(f"DEBUG LIKES: Recibida solicitud UNLIKE para publicacion_id: {publicacion_id}", file=sys.stderr)
+    logger.debug("Recibida solicitud UNLIKE para publicacion_id: %s", publicacion_id)
 
     conn = None
     cursor = None
@@ -972,29 +1177,38 @@ def unlike_publicacion(publicacion_id):
         # ✅ CAMBIO 2: Crear el cursor
         cursor = conn.cursor()
         
-        cursor.execute("SELECT id FROM publicaciones WHERE id = %s", (publicacion_id,))
-        if not cursor.fetchone():
+        cursor.execute("SELECT autor_id, categoria_id FROM publicaciones WHERE id = %s", (publicacion_id,))
+        publicacion = cursor.fetchone()
+        if not publicacion:
             return jsonify({"error": "Publicación no encontrada."}), 404
 
+        # Instante del like, para restarle a trending exactamente lo que sumó
+        cursor.execute(
+            "SELECT UNIX_TIMESTAMP(created_at) AS creado FROM likes WHERE publicacion_id = %s AND user_id = %s FOR UPDATE",
+            (publicacion_id, current_user_id)
+        )
+        like_previo = cursor.fetchone()
         cursor.execute("DELETE FROM likes WHERE publicacion_id = %s AND user_id = %s", (publicacion_id, current_user_id))
         
         if cursor.rowcount > 0:
             cursor.execute("UPDATE publicaciones SET likes_count = likes_count - 1 WHERE id = %s", (publicacion_id,))
+            author_timeline.sumar(cursor, publicacion['autor_id'], likes=-1)
             # ✅ CAMBIO 3: Usar conn.commit()
             conn.commit()
 
             cursor.execute("SELECT likes_count FROM publicaciones WHERE id = %s", (publicacion_id,))
-            new_likes_count = cursor.fetchone()[0]
+            new_likes_count = cursor.fetchone()['likes_count']
+            trending.unlike(publicacion_id, publicacion['categoria_id'], like_previo['creado'] if like_previo else None)
+            _publicacion_cambiada(publicacion_id)
             
-            socketio.emit('like_update', {'publicacion_id': publicacion_id, 'likes': new_likes_count, 'user_id': current_user_id, 'user_has_liked': False}, namespace='/', room=f'publicacion_{publicacion_id}')
-            print(f"DEBUG LIKES: Publicación {publicacion_id} - Like eliminado por user {current_user_id}. Total: {new_likes_count}", file=sys.stderr)
+            emit_like_update(publicacion_id, {'publicacion_id': publicacion_id, 'likes': new_likes_count, 'user_id': current_user_id, 'user_has_liked': False})
+            logger.debug("Publicación %s - Like eliminado por user %s. Total: %s", publicacion_id, current_user_id, new_likes_count)
 
             return jsonify({"message": "Me gusta eliminado exitosamente.", "new_likes_count": new_likes_count, "user_has_liked": False}), 200
         else:
             return jsonify({"message": "No habías dado 'me gusta' a esta publicación."}), 200
     except Exception as e:
-        print(f"ERROR UNLIKE: Fallo al eliminar like de pub {publicacion_id} por user {current_user_id}: {e}", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo al eliminar like de pub %s por user %s: %s", publicacion_id, current_user_id, e)
         # ✅ CAMBIO 4: Usar conn.rollback()
         if conn:
             conn.rollback()
@@ -1,18 +1,25 @@
+import logging
 from flask import Blueprint, request, jsonify, current_app
 from werkzeug.utils import secure_filename
 import os
-import sys
-import traceback
 import jwt
 from flask_jwt_extended import get_jwt, get_jwt_identity, jwt_required
 
 # ✅ Import directo desde la raíz
-from utils import upload_image_to_cloudinary
+import image_pipeline
+from image_pipeline import ImagenInvalida
+import upload_ingest
+from upload_ingest import SubidaRechazada, limitar_subida
+import author_timeline
+import http_cache
+import reference_data
 # ❌ Reemplazar: from db import get_db_connection
 # ✅ Nuevas importaciones:
 from extensions import get_db, close_db
 import pymysql.cursors # Para DictCursor
 
+logger = logging.getLogger(__name__)
+
 user_bp = Blueprint('user', __name__)
 
 def get_user_from_jwt(auth_header):
@@ -35,12 +42,12 @@ def get_user_from_jwt(auth_header):
     except Exception:
         return None
 
-def get_user_details(user_id):
+def get_user_details(user_id, lectura=False):
     conn = None
     cursor = None
     try:
         # ✅ CAMBIO 1: Usar get_db()
-        conn = get_db()
+        conn = get_db(lectura=lectura)
         # ✅ CAMBIO 2: Usar pymysql.cursors.DictCursor
         cursor = conn.cursor(pymysql.cursors.DictCursor)
         cursor.execute("SELECT id, username, email, DescripUsuario, verificado, foto_perfil FROM users WHERE id = %s", (user_id,))
@@ -62,7 +69,7 @@ def get_user_details(user_id):
 
         return user
     except Exception as e:
-        print(f"❌ Error en get_user_details para ID {user_id}: {e}", file=sys.stderr)
+        logger.error("Error en get_user_details para ID %s: %s", user_id, e)
         return None
     finally:
         # ✅ CAMBIO 3: Asegurar el cierre de la conexión (y cursor)
@@ -81,7 +88,7 @@ def logeado():
 
     current_user_id = user_payload.get('user_id')
     # get_user_details ya usa la nueva conexión
-    user_details_from_db = get_user_details(current_user_id)
+    user_details_from_db = get_user_details(current_user_id, lectura=True)
 
     if not user_details_from_db:
         return jsonify({"logeado": 0, "error": "Usuario no encontrado"}), 404
@@ -101,6 +108,9 @@ def logeado():
 
 @user_bp.route('/perfil', methods=['GET', 'PUT'])
 @jwt_required()
+# Los contadores del perfil cambian con cualquier like/comentario/publicación: dependen del feed
+@http_cache.condicional(lambda: [f'perfil:{get_jwt_identity()}', 'publicaciones'],
+                        cache_control='private, no-cache', vary=('Authorization',))
 def perfil():
     current_user_id = int(get_jwt_identity())
     claims = get_jwt()
@@ -109,7 +119,8 @@ def perfil():
         return jsonify({"error": "Usuario no verificado"}), 403
 
     # get_user_details ya usa la nueva conexión
-    user_details_from_db = get_user_details(current_user_id)
+    lectura = request.method == 'GET'
+    user_details_from_db = get_user_details(current_user_id, lectura=lectura)
     if not user_details_from_db:
         return jsonify({"error": "Usuario no encontrado"}), 404
 
@@ -117,7 +128,7 @@ def perfil():
     cursor = None
     try:
         # ✅ CAMBIO 1: Usar get_db()
-        conn = get_db()
+        conn = get_db(lectura=lectura)
         # ✅ CAMBIO 2: Usar pymysql.cursors.DictCursor
         cursor = conn.cursor(pymysql.cursors.DictCursor)
 
@@ -131,7 +142,11 @@ def perfil():
                 "descripcion": user_details_from_db.get('DescripUsuario'),
                 "foto_perfil": user_details_from_db.get('foto_perfil_url'),
                 "verificado": user_details_from_db.get('verificado'),
-                "puntajes": [{"dificultad": p['dificultad_id'], "puntaje": p['puntaje_actual']} for p in puntajes]
+                "puntajes": [{"dificultad": p['dificultad_id'],
+                              "dificultad_nombre": reference_data.nombre_dificultad(p['dificultad_id']),
+                              "puntaje": p['puntaje_actual']} for p in puntajes],
+                # Una lectura por clave primaria de autores_contadores (se mantienen al escribir)
+                "contadores": author_timeline.contadores(cursor, current_user_id)
             }), 200
 
         elif request.method == 'PUT':
@@ -155,14 +170,14 @@ def perfil():
             cursor_update.close()
             # ✅ CAMBIO 4: Usar conn.commit()
             conn.commit()
+            http_cache.invalidar(f'perfil:{current_user_id}', 'usuarios')
 
             return jsonify({"mensaje": "Perfil actualizado correctamente"}), 200
     except Exception as e:
         if conn:
             # ✅ CAMBIO 5: Usar conn.rollback()
             conn.rollback()
-        print("❌ Error en /perfil:", e, file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Error en /perfil: %s", e)
         return jsonify({"error": "Error interno al actualizar perfil"}), 500
     finally:
         # ✅ CAMBIO 6: Asegurar el cierre de la conexión (y cursor)
@@ -173,29 +188,38 @@ def perfil():
 
 @user_bp.route("/perfil/foto", methods=["PUT"])
 @jwt_required()
+@limitar_subida('perfil')
 def actualizar_foto_perfil():
     user_id = get_jwt_identity()
-    print("📌 [DEBUG] Usuario autenticado:", user_id)
+    logger.debug("Usuario autenticado: %s", user_id)
 
     if "profile_picture" not in request.files:
         return jsonify({"error": "No se envió ninguna imagen"}), 400
 
     file = request.files["profile_picture"]
-    print("📌 [DEBUG] Archivo recibido:", file.filename, "Content-Type:", file.content_type)
+    logger.debug("Archivo recibido: %s Content-Type: %s", file.filename, file.content_type)
 
     conn = None
     cursor = None
     try:
         public_id = f"fotos_perfil/{user_id}/profile_picture"
 
-        upload_result = upload_image_to_cloudinary(
-            file=file,
-            folder=f"fotos_perfil/{user_id}",
-            public_id="profile_picture"
-        )
-
-        foto_url = upload_result.get("secure_url")
-        version = upload_result.get("version")
+        # Variantes de la foto (64-512 px, WebP/JPEG) generadas fuera del hub de eventlet
+        try:
+            with upload_ingest.ingerir(file, 'perfil') as subida:
+                principal, variantes = image_pipeline.procesar_y_subir(
+                    subida,
+                    folder=f"fotos_perfil/{user_id}",
+                    anchos=image_pipeline.ANCHOS_PERFIL,
+                    token="profile_picture"
+                )
+        except SubidaRechazada as e:
+            return jsonify({"error": str(e)}), e.status
+        except ImagenInvalida:
+            return jsonify({"error": "El archivo no es una imagen válida."}), 400
+
+        foto_url = principal.get("url")
+        version = principal.get("version")
 
         if not foto_url:
             return jsonify({"error": "Error al obtener URL de Cloudinary"}), 500
@@ -211,17 +235,19 @@ def actualizar_foto_perfil():
         )
         # ✅ CAMBIO 3: Usar conn.commit()
         conn.commit()
+        http_cache.invalidar(f'perfil:{user_id}', 'usuarios')
         # cursor.close() se hace en el finally
         # conn.close() se hace en el finally
 
         return jsonify({
             "message": "Foto de perfil actualizada correctamente",
             "foto_perfil_url": foto_url,
+            "foto_perfil_srcset": image_pipeline.srcset_de(variantes),
             "version": version
         }), 200
 
     except Exception as e:
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo al actualizar la foto de perfil: %s", e)
         # ✅ CAMBIO 4: Usar conn.rollback()
         if conn:
             conn.rollback()
@@ -0,0 +1,428 @@
+import base64
+import hashlib
+import json
+import logging
+import math
+import re
+import time
+import unicodedata
+from collections import Counter
+
+import click
+import pymysql.cursors
+from flask.cli import with_appcontext
+
+import image_pipeline
+import json_provider
+import redis_store
+from extensions import get_db
+from redis_store import RedisNoDisponible
+
+logger = logging.getLogger(__name__)
+
+# ====================================================================================================
+# Búsqueda de texto completo en publicaciones (GET /blog/buscar)
+# ====================================================================================================
+# Dos motores, elegidos con SEARCH_ENGINE:
+#   'mysql'  Índice FULLTEXT(titulo, texto) de InnoDB (flask.sql / migrations/004). MySQL lo
+#            mantiene solo; la relevancia es la de MATCH ... AGAINST en modo lenguaje natural.
+#   'redis'  Índice invertido propio: texto pasado a minúsculas y sin tildes, sin palabras vacías
+#            del español; por término un sorted set
+#              <ns>:busqueda:t:<termino>  ->  publicacion_id con score = apariciones (título x3)
+#            y la relevancia es la suma de esos pesos por el idf de cada término (log(1 + N/df)).
+#            crear / editar / eliminar publicación lo actualizan al confirmar la transacción; si
+#            Redis no responde en ese momento el índice queda atrasado hasta 'flask reindexar-busqueda'.
+#
+# Resultados por relevancia descendente (desempate por id) con paginación por cursor: el cursor es
+# (relevancia, id) del último resultado, así una página no depende de cuántas se pidieron antes.
+# En Redis el conjunto de resultados de una consulta se guarda TTL_RESULTADOS segundos para que
+# las páginas siguientes no lo recalculen.
+
+MOTORES = ('mysql', 'redis')
+PESO_TITULO = 3
+LIMITE_MAX = 50
+MAX_CONSULTA = 200
+TTL_RESULTADOS = 30
+LARGO_EXTRACTO = 280
+
+# Palabras vacías del español (ya sin tildes, como quedan tras normalizar)
+PALABRAS_VACIAS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes como con contra cual cuando de del desde
+donde durante e el ella ellas ellos en entre era es esa esas ese eso esos esta estas este esto estos
+fue ha hasta hay la las le les lo los mas me mi mis muy nada ni no nos o os otra otro para pero poco
+por porque que quien se sea segun ser si sin sino sobre son su sus tambien te tiene tu tus u un una
+uno unos y ya yo
+""".split())
+
+_RE_TERMINO = re.compile(r"[a-z0-9]+")
+
+_config = {
+    'motor': 'mysql',
+    'limite': 20,
+}
+
+
+class CursorInvalido(ValueError):
+    """El parámetro 'cursor' no es uno devuelto por esta API."""
+
+
+def init_app(app):
+    motor = app.config.get('SEARCH_ENGINE', 'mysql')
+    if motor not in MOTORES:
+        logger.warning("SEARCH_ENGINE '%s' no reconocido; se usará 'mysql'.", motor)
+        motor = 'mysql'
+    _config.update({
+        'motor': motor,
+        'limite': min(int(app.config.get('SEARCH_PAGE_SIZE', 20)), LIMITE_MAX),
+    })
+    app.cli.add_command(reindexar_comando)
+
+
+def motor():
+    return _config['motor']
+
+
+# ================== TOKENIZACIÓN ==================
+
+def normalizar(texto):
+    """Minúsculas y sin tildes ni diéresis: 'Canción Pingüino' -> 'cancion pinguino'."""
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).lower()
+
+
+def terminos(texto):
+    return [t for t in _RE_TERMINO.findall(normalizar(texto)) if len(t) > 1 and t not in PALABRAS_VACIAS]
+
+
+def pesos_documento(titulo, texto):
+    pesos = Counter()
+    for termino in terminos(titulo):
+        pesos[termino] += PESO_TITULO
+    for termino in terminos(texto):
+        pesos[termino] += 1
+    return pesos
+
+
+# ================== CURSOR ==================
+
+def codificar_cursor(relevancia, publicacion_id):
+    crudo = json.dumps([relevancia, publicacion_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        relevancia, publicacion_id = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        return float(relevancia), int(publicacion_id)
+    except (ValueError, TypeError) as e:
+        raise CursorInvalido("Cursor de búsqueda inválido.") from e
+
+
+# ================== ÍNDICE EN REDIS ==================
+
+def _clave_termino(termino):
+    return redis_store.key('busqueda', 't', termino)
+
+
+def _clave_documento(publicacion_id):
+    return redis_store.key('busqueda', 'doc', publicacion_id)
+
+
+def _clave_documentos():
+    return redis_store.key('busqueda', 'docs')
+
+
+def _clave_categoria(categoria_id):
+    return redis_store.key('busqueda', 'cat', categoria_id)
+
+
+def _indexar_en(pipe, publicacion_id, titulo, texto, categoria_id, anterior=None):
+    """Encola en el pipeline los cambios del documento; 'anterior' es su hash previo en Redis."""
+    pesos = pesos_documento(titulo, texto)
+    anterior = anterior or {}
+    for termino in set((anterior.get('terminos') or '').split()) - set(pesos):
+        pipe.zrem(_clave_termino(termino), publicacion_id)
+    for termino, peso in pesos.items():
+        pipe.zadd(_clave_termino(termino), {publicacion_id: peso})
+    if anterior.get('categoria') and anterior['categoria'] != str(categoria_id or ''):
+        pipe.srem(_clave_categoria(anterior['categoria']), publicacion_id)
+    if categoria_id:
+        pipe.sadd(_clave_categoria(categoria_id), publicacion_id)
+    pipe.hset(_clave_documento(publicacion_id), mapping={
+        'terminos': ' '.join(pesos),
+        'categoria': str(categoria_id or ''),
+    })
+    pipe.sadd(_clave_documentos(), publicacion_id)
+    return len(pesos)
+
+
+def _documento(publicacion_id):
+    with redis_store.pipeline() as pipe:
+        pipe.hgetall(_clave_documento(publicacion_id))
+    return pipe.resultados[0]
+
+
+def indexar(publicacion_id, titulo, texto, categoria_id):
+    """Alta o actualización de una publicación en el índice de Redis (no-op con el motor 'mysql')."""
+    if motor() != 'redis':
+        return
+    try:
+        anterior = _documento(publicacion_id)
+        with redis_store.pipeline() as pipe:
+            _indexar_en(pipe, publicacion_id, titulo, texto, categoria_id, anterior)
+    except RedisNoDisponible as e:
+        logger.warning("No se indexó la publicación %s (Redis no disponible): %s", publicacion_id, e)
+
+
+def publicacion_cambiada(conn, publicacion_id):
+    """Reindexa la publicación tal como quedó en la base (tras editarla)."""
+    if motor() != 'redis':
+        return
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        cursor.execute("SELECT titulo, texto, categoria_id FROM publicaciones WHERE id = %s", (publicacion_id,))
+        fila = cursor.fetchone()
+    finally:
+        cursor.close()
+    if fila:
+        indexar(publicacion_id, fila['titulo'], fila['texto'], fila['categoria_id'])
+
+
+def eliminar(publicacion_id):
+    if motor() != 'redis':
+        return
+    try:
+        anterior = _documento(publicacion_id)
+        with redis_store.pipeline() as pipe:
+            for termino in (anterior.get('terminos') or '').split():
+                pipe.zrem(_clave_termino(termino), publicacion_id)
+            if anterior.get('categoria'):
+                pipe.srem(_clave_categoria(anterior['categoria']), publicacion_id)
+            pipe.srem(_clave_documentos(), publicacion_id)
+            pipe.delete(_clave_documento(publicacion_id))
+    except RedisNoDisponible as e:
+        logger.warning("No se quitó la publicación %s del índice (Redis no disponible): %s", publicacion_id, e)
+
+
+def reindexar(conn, lote=500):
+    """
+    Borra el índice de Redis y lo reconstruye desde MySQL recorriendo publicaciones por id.
+    Mientras dura, las búsquedas con el motor 'redis' ven un índice parcial.
+    """
+    cliente = redis_store.require_client()
+    inicio = time.perf_counter()
+    borradas = 0
+    pendientes = []
+    for clave in cliente.scan_iter(match=redis_store.key('busqueda', '*'), count=1000):
+        pendientes.append(clave)
+        if len(pendientes) >= 1000:
+            borradas += cliente.delete(*pendientes)
+            pendientes = []
+    if pendientes:
+        borradas += cliente.delete(*pendientes)
+
+    publicaciones = terminos_totales = 0
+    ultimo_id = 0
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        while True:
+            cursor.execute(
+                "SELECT id, titulo, texto, categoria_id FROM publicaciones WHERE id > %s ORDER BY id LIMIT %s",
+                (ultimo_id, lote)
+            )
+            filas = cursor.fetchall()
+            if not filas:
+                break
+            with redis_store.pipeline() as pipe:
+                for fila in filas:
+                    terminos_totales += _indexar_en(pipe, fila['id'], fila['titulo'], fila['texto'], fila['categoria_id'])
+            publicaciones += len(filas)
+            ultimo_id = filas[-1]['id']
+    finally:
+        cursor.close()
+
+    segundos = time.perf_counter() - inicio
+    return {
+        'publicaciones': publicaciones,
+        'terminos': terminos_totales,
+        'claves_borradas': borradas,
+        'segundos': round(segundos, 3),
+        'por_segundo': round(publicaciones / segundos, 1) if segundos else 0.0,
+    }
+
+
+@click.command('reindexar-busqueda')
+@click.option('--lote', default=500, show_default=True, help="Publicaciones leídas de MySQL por pipeline.")
+@with_appcontext
+def reindexar_comando(lote):
+    """Reconstruye el índice de búsqueda de Redis desde MySQL."""
+    if motor() != 'redis':
+        click.echo("SEARCH_ENGINE=mysql: las búsquedas usan el índice FULLTEXT; se reconstruye igualmente "
+                   "el de Redis.")
+    resumen = reindexar(get_db(), lote)
+    click.echo(
+        f"{resumen['publicaciones']} publicaciones ({resumen['terminos']} términos) indexadas en "
+        f"{resumen['segundos']} s: {resumen['por_segundo']} publicaciones/s."
+    )
+
+
+# ================== CONSULTA ==================
+
+_COLUMNAS = """
+    p.id, p.autor_id, p.titulo, p.texto, p.created_at, p.likes_count AS likes,
+    p.comments_count, p.images_count,
+    p.categoria_id, c.nombre AS categoria_nombre,
+    u.username AS autor_username, NULLIF(u.foto_perfil, '') AS autor_foto_perfil_url,
+    u.verificado AS autor_verificado
+"""
+
+
+def _buscar_mysql(cursor, consulta, categoria_id, despues, limite):
+    sql = f"""
+        SELECT {_COLUMNAS},
+            MATCH(p.titulo, p.texto) AGAINST (%s IN NATURAL LANGUAGE MODE) AS relevancia
+        FROM publicaciones p
+        JOIN users u ON p.autor_id = u.id
+        LEFT JOIN categorias c ON p.categoria_id = c.id
+        WHERE MATCH(p.titulo, p.texto) AGAINST (%s IN NATURAL LANGUAGE MODE)
+    """
+    valores = [consulta, consulta]
+    if categoria_id:
+        sql += " AND p.categoria_id = %s"
+        valores.append(categoria_id)
+    if despues:
+        sql += " HAVING relevancia < %s OR (relevancia = %s AND id < %s)"
+        valores += [despues[0], despues[0], despues[1]]
+    sql += " ORDER BY relevancia DESC, p.id DESC LIMIT %s"
+    valores.append(limite + 1)
+    cursor.execute(sql, tuple(valores))
+    filas = cursor.fetchall()
+    for fila in filas:
+        fila['relevancia'] = float(fila['relevancia'])
+    return filas
+
+
+def _resultados_redis(consulta, categoria_id):
+    """Clave del sorted set id -> relevancia de la consulta (None si ningún término aparece)."""
+    lista = sorted(set(terminos(consulta)))
+    if not lista:
+        return None
+    huella = hashlib.sha1(json.dumps([lista, categoria_id]).encode()).hexdigest()
+    clave = redis_store.key('busqueda', 'res', huella)
+    with redis_store.pipeline() as pipe:
+        pipe.exists(clave)
+        pipe.scard(_clave_documentos())
+        for termino in lista:
+            pipe.zcard(_clave_termino(termino))
+    existe, total, *frecuencias = pipe.resultados
+    if existe:
+        return clave
+    pesos = {
+        _clave_termino(termino): math.log(1 + max(total, 1) / df)
+        for termino, df in zip(lista, frecuencias) if df
+    }
+    if not pesos:
+        return None
+    with redis_store.pipeline() as pipe:
+        if categoria_id:
+            temporal = clave + ':union'
+            pipe.zunionstore(temporal, pesos)
+            # Un SET dentro de ZINTERSTORE cuenta con score 1; peso 0 para no alterar la relevancia
+            pipe.zinterstore(clave, {temporal: 1, _clave_categoria(categoria_id): 0})
+            pipe.delete(temporal)
+        else:
+            pipe.zunionstore(clave, pesos)
+        pipe.expire(clave, TTL_RESULTADOS)
+    return clave
+
+
+def _buscar_redis(consulta, categoria_id, despues, limite):
+    """[(id, relevancia)] en el orden de ZREVRANGEBYSCORE: relevancia desc y, a igualdad, id como texto desc."""
+    clave = _resultados_redis(consulta, categoria_id)
+    if clave is None:
+        return []
+    if despues:
+        relevancia, ultimo = despues[0], str(despues[1])
+        with redis_store.pipeline() as pipe:
+            pipe.zcount(clave, relevancia, relevancia)
+        empates = pipe.resultados[0]
+        with redis_store.pipeline() as pipe:
+            pipe.zrevrangebyscore(clave, relevancia, '-inf', start=0, num=limite + 1 + empates, withscores=True)
+        # Los empates con el cursor vienen primero; se saltan los que ya salieron (id como texto >= ultimo)
+        filas = [(m, s) for m, s in pipe.resultados[0] if s < relevancia or m < ultimo]
+    else:
+        with redis_store.pipeline() as pipe:
+            pipe.zrevrangebyscore(clave, '+inf', '-inf', start=0, num=limite + 1, withscores=True)
+        filas = pipe.resultados[0]
+    return [(int(m), s) for m, s in filas[:limite + 1]]
+
+
+def _hidratar(cursor, ids_relevancia):
+    if not ids_relevancia:
+        return []
+    marcadores = ', '.join(['%s'] * len(ids_relevancia))
+    cursor.execute(f"""
+        SELECT {_COLUMNAS}
+        FROM publicaciones p
+        JOIN users u ON p.autor_id = u.id
+        LEFT JOIN categorias c ON p.categoria_id = c.id
+        WHERE p.id IN ({marcadores})
+    """, tuple(i for i, _ in ids_relevancia))
+    por_id = {fila['id']: fila for fila in cursor.fetchall()}
+    filas = []
+    for publicacion_id, relevancia in ids_relevancia:
+        fila = por_id.get(publicacion_id)
+        if fila:  # borrada después de indexarse
+            fila['relevancia'] = relevancia
+            filas.append(fila)
+    return filas
+
+
+def buscar(conn, consulta, categoria_id=None, despues=None, limite=None):
+    """
+    Devuelve (resultados, siguiente_cursor); 'despues' es decodificar_cursor() del cursor recibido.
+    siguiente_cursor es None en la última página.
+    """
+    consulta = (consulta or '')[:MAX_CONSULTA]
+    limite = max(1, min(limite or _config['limite'], LIMITE_MAX))
+
+    cur = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        if motor() == 'redis':
+            ids_relevancia = _buscar_redis(consulta, categoria_id, despues, limite)
+            hay_mas = len(ids_relevancia) > limite
+            ultimo = ids_relevancia[limite - 1] if hay_mas else None
+            filas = _hidratar(cur, ids_relevancia[:limite])
+        else:
+            filas = _buscar_mysql(cur, consulta, categoria_id, despues, limite)
+            hay_mas = len(filas) > limite
+            filas = filas[:limite]
+            ultimo = (filas[-1]['id'], filas[-1]['relevancia']) if hay_mas else None
+
+        imagenes = {}
+        if filas:
+            marcadores = ', '.join(['%s'] * len(filas))
+            cur.execute(
+                f"SELECT id, publicacion_id, url FROM imagenes_publicacion "
+                f"WHERE publicacion_id IN ({marcadores}) ORDER BY id",
+                tuple(fila['id'] for fila in filas)
+            )
+            for img in cur.fetchall():
+                imagenes.setdefault(img['publicacion_id'], img)
+        srcsets = image_pipeline.srcsets_por_imagen(cur, [img['id'] for img in imagenes.values()])
+    finally:
+        cur.close()
+
+    resultados = []
+    for fila in json_provider.como_bool(filas, ('autor_verificado',)):
+        texto = fila.pop('texto') or ''
+        img = imagenes.get(fila['id'])
+        fila['extracto'] = texto if len(texto) <= LARGO_EXTRACTO else texto[:LARGO_EXTRACTO].rsplit(' ', 1)[0] + '…'
+        fila['imageUrl'] = img['url'] if img else None
+        fila['imageSrcset'] = srcsets.get(img['id'], {}) if img else {}
+        fila['relevancia'] = round(fila['relevancia'], 6)
+        resultados.append(fila)
+
+    siguiente = codificar_cursor(ultimo[1], ultimo[0]) if ultimo else None
+    return resultados, siguiente
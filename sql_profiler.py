@@ -0,0 +1,212 @@
+import logging
+import re
+import time
+import traceback
+import uuid
+from collections import deque
+from contextvars import ContextVar
+from threading import Lock
+
+from flask import abort, jsonify, request
+
+logger = logging.getLogger(__name__)
+
+# ====================================================================================================
+# Perfilador de SQL por petición
+# ====================================================================================================
+# Se engancha a las conexiones de extensions.get_db (agregar_observador_sql) y, por cada
+# sentencia, guarda su huella normalizada (literales -> '?', listas IN colapsadas), duración y filas.
+#
+# - N+1: si una misma huella se ejecuta más de SQL_N1_THRESHOLD veces en una petición,
+#   SQL_N1_MODE decide: 'warn' (aviso en stderr con el punto del código que la repite),
+#   'raise' (la petición termina en 500 con ConsultasRepetidas; para desarrollo) u 'off'.
+# - Consultas lentas: las que superan SQL_SLOW_MS se registran con el método y la ruta.
+# - SQL_PROFILER_DEBUG=1: cada respuesta lleva X-SQL-Count, X-SQL-Time-Ms y X-SQL-Trace; la línea
+#   de tiempo completa se consulta en /debug/sql/<trace> (y las últimas en /debug/sql).
+#   No activarlo en producción: expone el SQL de las peticiones.
+
+_RE_COMENTARIOS = re.compile(r"/\*.*?\*/|--[^\n]*|#[^\n]*", re.S)
+_RE_CADENAS = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_RE_NUMEROS = re.compile(r"\b(?:0x[0-9a-fA-F]+|\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)\b")
+_RE_LISTAS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_RE_VALUES = re.compile(r"(values\s*\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+")
+_RE_ESPACIOS = re.compile(r"\s+")
+
+MAX_ENTRADAS = 500  # por petición: la línea de tiempo no crece sin límite en bucles enormes
+MAX_SQL = 400
+
+
+class ConsultasRepetidas(RuntimeError):
+    """Una petición ejecutó la misma consulta más veces que SQL_N1_THRESHOLD (modo 'raise')."""
+
+
+_config = {
+    'activo': True,
+    'umbral_n1': 10,
+    'modo_n1': 'warn',
+    'lento_ms': 500.0,
+    'debug': False,
+}
+
+_actual = ContextVar('sql_profiler_peticion', default=None)
+_recientes = deque(maxlen=100)
+_recientes_lock = Lock()
+
+
+def init_app(app):
+    import extensions
+
+    modo = app.config.get('SQL_N1_MODE', 'warn')
+    if modo not in ('off', 'warn', 'raise'):
+        logger.warning("SQL_N1_MODE '%s' no reconocido; se usará 'warn'.", modo)
+        modo = 'warn'
+    _config.update({
+        'activo': bool(app.config.get('SQL_PROFILER_ENABLED', True)),
+        'umbral_n1': int(app.config.get('SQL_N1_THRESHOLD', 10)),
+        'modo_n1': modo,
+        'lento_ms': float(app.config.get('SQL_SLOW_MS', 500)),
+        'debug': bool(app.config.get('SQL_PROFILER_DEBUG', False)),
+    })
+    if not _config['activo']:
+        return
+
+    app.before_request_funcs.setdefault(None, []).insert(0, _inicio_peticion)
+    app.after_request(_despues_peticion)
+    app.teardown_request(_fin_peticion)
+    extensions.agregar_observador_sql(_observar)
+
+    if _config['debug']:
+        app.add_url_rule('/debug/sql', 'debug_sql', _vista_recientes)
+        app.add_url_rule('/debug/sql/<traza>', 'debug_sql_traza', _vista_traza)
+        logger.warning("SQL_PROFILER_DEBUG activo; /debug/sql expone el SQL de las peticiones.")
+
+
+def huella(sql):
+    """Forma normalizada de la sentencia: misma consulta con otros valores -> misma huella."""
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', errors='replace')
+    texto = _RE_CADENAS.sub('?', sql)  # antes que los comentarios: '#' o '--' dentro de una cadena
+    texto = _RE_COMENTARIOS.sub(' ', texto)
+    texto = _RE_NUMEROS.sub('?', texto)
+    texto = _RE_ESPACIOS.sub(' ', texto).strip().lower()
+    texto = _RE_LISTAS.sub('(...)', texto)
+    return _RE_VALUES.sub(r'\1', texto)
+
+
+def _punto_de_llamada():
+    """Primer marco de la pila que es código de la app (no PyMySQL, Flask ni este módulo)."""
+    for marco in reversed(traceback.extract_stack()[:-1]):
+        ruta = marco.filename.replace('\\', '/')
+        if 'site-packages' in ruta or ruta.endswith(('/extensions.py', '/sql_profiler.py', '/metrics.py')):
+            continue
+        return f"{marco.filename}:{marco.lineno} ({marco.name})"
+    return 'desconocido'
+
+
+# ================== REGISTRO ==================
+
+def _observar(sql, duracion, filas, error):
+    actual = _actual.get()
+    ms = duracion * 1000
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', errors='replace')
+
+    if ms >= _config['lento_ms']:
+        donde = f"{actual['metodo']} {actual['ruta']}" if actual else 'fuera de petición'
+        logger.warning("consulta lenta (%.1f ms, %s filas) en %s: %s", ms, filas, donde, sql[:MAX_SQL])
+
+    if actual is None:
+        return
+    clave = huella(sql)
+    veces = actual['conteo'][clave] = actual['conteo'].get(clave, 0) + 1
+    actual['total_ms'] += ms
+    actual['n'] += 1
+    if len(actual['entradas']) < MAX_ENTRADAS:
+        actual['entradas'].append({
+            't_ms': round((time.perf_counter() - actual['inicio']) * 1000 - ms, 3),
+            'ms': round(ms, 3),
+            'filas': filas,
+            'error': error,
+            'huella': clave,
+            'sql': sql[:MAX_SQL],
+        })
+    if veces == _config['umbral_n1'] + 1 and _config['modo_n1'] != 'off':
+        actual['repetidas'].append((clave, _punto_de_llamada()))
+
+
+# ================== HOOKS DE FLASK ==================
+
+def _inicio_peticion():
+    _actual.set({
+        'id': uuid.uuid4().hex[:12],
+        'inicio': time.perf_counter(),
+        'metodo': request.method,
+        'ruta': request.path,
+        'conteo': {},
+        'entradas': [],
+        'repetidas': [],
+        'total_ms': 0.0,
+        'n': 0,
+    })
+
+
+def _despues_peticion(respuesta):
+    actual = _actual.get()
+    if actual is None:
+        return respuesta
+    if actual['repetidas']:
+        detalle = '; '.join(
+            f"{actual['conteo'][clave]}x '{clave[:200]}' desde {donde}" for clave, donde in actual['repetidas']
+        )
+        mensaje = f"posible N+1 en {actual['metodo']} {actual['ruta']}: {detalle}"
+        if _config['modo_n1'] == 'raise':
+            actual['repetidas'] = []
+            raise ConsultasRepetidas(mensaje)
+        logger.warning("%s", mensaje)
+    if _config['debug']:
+        respuesta.headers['X-SQL-Count'] = str(actual['n'])
+        respuesta.headers['X-SQL-Time-Ms'] = f"{actual['total_ms']:.1f}"
+        respuesta.headers['X-SQL-Trace'] = actual['id']
+    return respuesta
+
+
+def _fin_peticion(exc=None):
+    actual = _actual.get()
+    if actual is None:
+        return
+    _actual.set(None)
+    if _config['debug'] and request.endpoint not in ('debug_sql', 'debug_sql_traza'):
+        with _recientes_lock:
+            _recientes.append(resumen(actual))
+
+
+def resumen(actual):
+    return {
+        'id': actual['id'],
+        'metodo': actual['metodo'],
+        'ruta': actual['ruta'],
+        'consultas': actual['n'],
+        'total_ms': round(actual['total_ms'], 3),
+        'duracion_ms': round((time.perf_counter() - actual['inicio']) * 1000, 3),
+        'repetidas': {clave: veces for clave, veces in actual['conteo'].items() if veces > 1},
+        'linea_de_tiempo': actual['entradas'],
+    }
+
+
+# ================== VISTAS DE DEPURACIÓN ==================
+
+def _vista_recientes():
+    with _recientes_lock:
+        trazas = list(_recientes)
+    return jsonify([
+        {k: t[k] for k in ('id', 'metodo', 'ruta', 'consultas', 'total_ms', 'duracion_ms')}
+        for t in reversed(trazas)
+    ])
+
+
+def _vista_traza(traza):
+    with _recientes_lock:
+        for t in _recientes:
+            if t['id'] == traza:
+                return jsonify(t)
+    abort(404)
@@ -0,0 +1,150 @@
+import hashlib
+import logging
+import mimetypes
+import os
+from collections import OrderedDict
+from threading import Lock
+
+from flask import Response, abort, request, send_file
+from werkzeug.http import http_date
+from werkzeug.security import safe_join
+
+logger = logging.getLogger(__name__)
+
+# ====================================================================================================
+# Entrega de archivos estáticos (/uploads y /pdfs)
+# ====================================================================================================
+# - ETag fuerte = SHA-256 del contenido, calculado una sola vez por (ruta, mtime, tamaño) y
+#   cacheado en memoria del worker: LRU de como mucho STATIC_ETAG_CACHE_SIZE rutas.
+# - Cache-Control: solo lo que la ruta sabe direccionado por contenido (inmutable=True: objetos
+#   '<sha256>.<ext>' del almacén local, PDFs exportados) se sirve 'immutable' con un max-age de un
+#   año. El resto (fotos de perfil, uploads legados) puede reemplazarse bajo el mismo nombre, así
+#   que va con 'no-cache' y se revalida en cada uso con If-None-Match / If-Modified-Since (304).
+# - Range: send_file(conditional=True) responde 206 / 416 sin leer el archivo completo.
+# - STATIC_DELIVERY_MODE:
+#     'python'     -> Flask envía los bytes (por defecto, desarrollo).
+#     'x-accel'    -> Flask solo autoriza y responde con X-Accel-Redirect; nginx sirve los bytes
+#                     desde una location 'internal' (ver nginx/goe.conf).
+#     'x-sendfile' -> igual, con la cabecera X-Sendfile (Apache / lighttpd).
+#   En los modos proxy las cabeceras de caché y la validación 304 las sigue resolviendo Flask;
+#   los Range los resuelve el proxy.
+
+MODO_PYTHON = 'python'
+MODO_X_ACCEL = 'x-accel'
+MODO_X_SENDFILE = 'x-sendfile'
+MODOS = (MODO_PYTHON, MODO_X_ACCEL, MODO_X_SENDFILE)
+
+MAX_AGE_INMUTABLE = 365 * 24 * 3600
+
+_BLOQUE_HASH = 1024 * 1024
+
+_config = {
+    'modo': MODO_PYTHON,
+    'prefijo_interno': '/_protegido',
+    'raices': {},  # zona -> directorio absoluto
+    'max_etags': 10000,
+}
+
+_etags = OrderedDict()  # ruta -> (mtime_ns, tamaño, etag), de la menos a la más usada
+_etags_lock = Lock()
+
+
+def init_app(app, raices_extra=None):
+    modo = app.config.get('STATIC_DELIVERY_MODE', MODO_PYTHON)
+    if modo not in MODOS:
+        logger.warning("STATIC_DELIVERY_MODE '%s' no reconocido; se usará '%s'.", modo, MODO_PYTHON)
+        modo = MODO_PYTHON
+    _config.update({
+        'modo': modo,
+        'prefijo_interno': app.config.get('STATIC_ACCEL_PREFIX', '/_protegido').rstrip('/'),
+        'max_etags': int(app.config.get('STATIC_ETAG_CACHE_SIZE', 10000)),
+        'raices': {
+            'uploads': app.config['UPLOAD_FOLDER'],
+            'pdfs': app.config['PDF_FOLDER'],
+            **(raices_extra or {}),
+        },
+    })
+
+
+def etag_de(ruta, stat=None):
+    """SHA-256 del archivo, recalculado solo si cambió su mtime o su tamaño."""
+    stat = stat or os.stat(ruta)
+    with _etags_lock:
+        cacheado = _etags.get(ruta)
+        if cacheado:
+            _etags.move_to_end(ruta)
+    if cacheado and cacheado[0] == stat.st_mtime_ns and cacheado[1] == stat.st_size:
+        return cacheado[2]
+
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as fh:
+        for bloque in iter(lambda: fh.read(_BLOQUE_HASH), b''):
+            sha.update(bloque)
+    etag = sha.hexdigest()
+    with _etags_lock:
+        _etags[ruta] = (stat.st_mtime_ns, stat.st_size, etag)
+        _etags.move_to_end(ruta)
+        while len(_etags) > _config['max_etags']:
+            _etags.popitem(last=False)
+    return etag
+
+
+def olvidar_etag(ruta):
+    """Descarta el ETag cacheado (llamar al sobrescribir o borrar un archivo servido)."""
+    with _etags_lock:
+        _etags.pop(os.path.abspath(ruta), None)
+
+
+def _cache_control(respuesta, inmutable):
+    if inmutable:
+        respuesta.headers['Cache-Control'] = f'public, max-age={MAX_AGE_INMUTABLE}, immutable'
+    else:
+        respuesta.headers['Cache-Control'] = 'public, no-cache'
+    return respuesta
+
+
+def servir_archivo(zona, *partes, inmutable=False):
+    """
+    Sirve '<raíz de la zona>/<partes...>' con ETag, Cache-Control, 304 y Range.
+    'zona' es 'uploads', 'pdfs' o una de las raíces extra registradas en init_app. Responde 404 si la ruta sale de la raíz o no existe.
+    'inmutable' solo si el nombre es el hash del contenido (nunca se reemplaza bajo el mismo nombre).
+    """
+    raiz = _config['raices'].get(zona)
+    if raiz is None:
+        abort(404)
+    relativa = '/'.join(str(p) for p in partes)
+    ruta = safe_join(raiz, relativa)
+    if ruta is None:
+        abort(404)
+    ruta = os.path.abspath(ruta)
+    try:
+        stat = os.stat(ruta)
+    except OSError:
+        abort(404)
+    if not os.path.isfile(ruta):
+        abort(404)
+
+    etag = etag_de(ruta, stat)
+    modo = _config['modo']
+
+    if modo == MODO_PYTHON:
+        respuesta = send_file(ruta, conditional=True, etag=etag, last_modified=stat.st_mtime)
+        return _cache_control(respuesta, inmutable)
+
+    # Modos proxy: cuerpo vacío, el servidor de delante lee el archivo.
+    tipo, _ = mimetypes.guess_type(ruta)
+    respuesta = Response(status=200, mimetype=tipo or 'application/octet-stream')
+    respuesta.set_etag(etag)
+    respuesta.headers['Last-Modified'] = http_date(stat.st_mtime)
+    _cache_control(respuesta, inmutable)
+    respuesta = respuesta.make_conditional(request)
+    if respuesta.status_code == 304:
+        return respuesta
+
+    if modo == MODO_X_ACCEL:
+        respuesta.headers['X-Accel-Redirect'] = f"{_config['prefijo_interno']}/{zona}/{relativa}"
+    else:
+        respuesta.headers['X-Sendfile'] = ruta
+    # Que el proxy no sobrescriba el Content-Length con el del cuerpo vacío
+    respuesta.headers.pop('Content-Length', None)
+    return respuesta
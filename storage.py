@@ -0,0 +1,529 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from threading import Lock
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo exclusión entre hilos del mismo proceso
+    fcntl = None
+
+# ====================================================================================================
+# Almacenamiento de archivos (imágenes y JSON de cursos/preguntas)
+# ====================================================================================================
+# STORAGE_BACKEND selecciona dónde se guardan los objetos:
+#   'cloudinary' -> comportamiento de siempre (utils.upload_image_to_cloudinary / upload_json_...).
+#   'local'      -> almacén en disco direccionado por contenido, sin red (desarrollo, benchmarks):
+#
+#     <STORAGE_LOCAL_ROOT>/objetos/ab/cd/<sha256>.<ext>         contenido (inmutable)
+#     <STORAGE_LOCAL_ROOT>/objetos/ab/cd/<sha256>.<ext>.refs    nombres lógicos que lo usan
+#     <STORAGE_LOCAL_ROOT>/refs/<carpeta>/<nombre>               '<sha256>.<ext>' al que apunta
+#
+#   Dos subidas con el mismo contenido (el mismo avatar, una imagen re-subida) son un solo
+#   objeto con dos referencias. Escribir un nombre existente (p. ej. 'preguntas' o
+#   'profile_picture') lo re-apunta y suelta la referencia anterior. El archivo se borra cuando
+#   se queda sin referencias. Las escrituras van a un temporal del mismo disco + os.replace
+#   (atómico) y el índice de referencias se protege con un flock compartido entre workers.
+#
+# Las URLs locales son /uploads/objetos/ab/cd/<sha256>.<ext>, servidas por static_delivery
+# (zona 'objetos') con caché 'immutable': el nombre es el hash del contenido.
+
+BACKEND_CLOUDINARY = 'cloudinary'
+BACKEND_LOCAL = 'local'
+
+TAM_BLOQUE = 64 * 1024
+
+# Máximo de public_ids por llamada a cloudinary.api.delete_resources
+LOTE_CLOUDINARY = 100
+
+# Sufijo de las variantes de image_pipeline: '<token>_<ancho>w_<formato>'
+_PATRON_VARIANTE = re.compile(r"_\d+w_(?:webp|jpeg)$")
+
+_backend = None
+
+
+class ErrorAlmacenamiento(RuntimeError):
+    """No se pudo guardar, leer o borrar un objeto en el backend configurado."""
+
+
+def _leer_origen(origen):
+    """Iterador de bloques de bytes para una ruta, bytes o un objeto tipo archivo."""
+    if isinstance(origen, (bytes, bytearray)):
+        yield bytes(origen)
+        return
+    if isinstance(origen, str):
+        with open(origen, 'rb') as fh:
+            yield from iter(lambda: fh.read(TAM_BLOQUE), b'')
+        return
+    if hasattr(origen, 'seek'):
+        origen.seek(0)
+    yield from iter(lambda: origen.read(TAM_BLOQUE), b'')
+
+
+def familia(nombre_logico):
+    """
+    Nombre lógico sin el sufijo de variante: todas las variantes de una misma imagen
+    ('.../tok_320w_webp', '.../tok_1600w_jpeg') comparten familia ('.../tok').
+    """
+    return _PATRON_VARIANTE.sub('', nombre_logico or '')
+
+
+# ================== CLOUDINARY ==================
+
+def extract_public_id_from_url(url):
+    """
+    Extrae el public_id de una URL de Cloudinary.
+    Ejemplo:
+        https://res.cloudinary.com/demo/image/upload/v1234567/publicaciones/5/10/imagen.jpg
+    Retorna:
+        publicaciones/5/10/imagen  (sin la extensión .jpg)
+    """
+    if not url:
+        return None
+
+    try:
+        # Quita los parámetros después del ?
+        url = url.split("?")[0]
+        # Quita la extensión (jpg, png, etc.)
+        url_no_ext = re.sub(r"\.[a-zA-Z0-9]+$", "", url)
+        # Busca la parte después de /upload/
+        match = re.search(r"/upload/(?:v\d+/)?(.+)", url_no_ext)
+        if match:
+            return match.group(1)
+    except Exception as e:
+        logger.debug("Error extrayendo public_id de URL %s: %s", url, e)
+
+    return None
+
+
+class AlmacenCloudinary:
+    nombre = BACKEND_CLOUDINARY
+
+    def subir_imagen(self, origen, carpeta, nombre=None, extension=None):
+        from utils import upload_image_to_cloudinary
+
+        archivo = origen if isinstance(origen, str) or hasattr(origen, 'read') else io.BytesIO(origen)
+        resultado = upload_image_to_cloudinary(archivo, folder=carpeta, public_id=nombre)
+        url = resultado.get('secure_url') if isinstance(resultado, dict) else None
+        if not url:
+            raise ErrorAlmacenamiento(f"Fallo subiendo imagen a Cloudinary ({carpeta}/{nombre})")
+        return {'url': url, 'version': resultado.get('version')}
+
+    def subir_json(self, datos, carpeta, nombre):
+        from utils import upload_json_to_cloudinary
+
+        return upload_json_to_cloudinary(datos, folder=carpeta, public_id=nombre)
+
+    def leer_json(self, url):
+        from utils import download_json_from_cloudinary
+
+        return download_json_from_cloudinary(url)
+
+    def eliminar(self, url, carpeta=None):
+        import cloudinary.uploader
+
+        public_id = extract_public_id_from_url(url)
+        if not public_id:
+            return False
+        with metrics.salida('cloudinary'):
+            cloudinary.uploader.destroy(public_id)
+        return True
+
+    def eliminar_lote(self, entradas):
+        """
+        Borra [(url, carpeta), ...] con delete_resources en lotes de LOTE_CLOUDINARY.
+        Devuelve {url: None si se borró (o ya no existía) | mensaje de error}.
+        """
+        import cloudinary.api
+
+        resultado = {}
+        por_public_id = {}
+        for url, _ in entradas:
+            public_id = extract_public_id_from_url(url)
+            if public_id:
+                por_public_id.setdefault(public_id, []).append(url)
+            else:
+                resultado[url] = None  # no es de Cloudinary: nada que borrar
+        ids = list(por_public_id)
+        for i in range(0, len(ids), LOTE_CLOUDINARY):
+            lote = ids[i:i + LOTE_CLOUDINARY]
+            try:
+                with metrics.salida('cloudinary'):
+                    respuesta = cloudinary.api.delete_resources(lote, resource_type='image')
+                estados = respuesta.get('deleted', {})
+                for public_id in lote:
+                    estado = estados.get(public_id)
+                    error = None if estado in ('deleted', 'not_found') else f"estado '{estado}'"
+                    for url in por_public_id[public_id]:
+                        resultado[url] = error
+            except Exception as e:
+                for public_id in lote:
+                    for url in por_public_id[public_id]:
+                        resultado[url] = str(e)
+        return resultado
+
+    def eliminar_carpeta(self, carpeta):
+        import cloudinary.api
+
+        carpeta = carpeta.strip('/')
+        # Con '/' final: 'publicaciones/5/1' no debe arrastrar 'publicaciones/5/10'
+        with metrics.salida('cloudinary'):
+            cloudinary.api.delete_resources_by_prefix(carpeta + '/')
+            cloudinary.api.delete_folder(carpeta)
+
+    def listar(self, prefijo):
+        """Recorre las imágenes bajo 'prefijo': {'url', 'nombre', 'creado' (epoch)}."""
+        import cloudinary.api
+
+        cursor = None
+        while True:
+            opciones = {'type': 'upload', 'resource_type': 'image', 'prefix': prefijo, 'max_results': 500}
+            if cursor:
+                opciones['next_cursor'] = cursor
+            with metrics.salida('cloudinary'):
+                respuesta = cloudinary.api.resources(**opciones)
+            for recurso in respuesta.get('resources', []):
+                creado = recurso.get('created_at')
+                try:
+                    creado = datetime.strptime(creado, '%Y-%m-%dT%H:%M:%SZ').timestamp() if creado else None
+                except ValueError:
+                    creado = None
+                yield {
+                    'url': recurso.get('secure_url') or recurso.get('url'),
+                    'nombre': recurso['public_id'],
+                    'creado': creado,
+                }
+            cursor = respuesta.get('next_cursor')
+            if not cursor:
+                return
+
+    def nombres_de_url(self, url):
+        public_id = extract_public_id_from_url(url)
+        return [public_id] if public_id else []
+
+
+# ================== LOCAL (DIRECCIONADO POR CONTENIDO) ==================
+
+class AlmacenLocal:
+    nombre = BACKEND_LOCAL
+
+    def __init__(self, raiz, url_base):
+        self.raiz = os.path.abspath(raiz)
+        self.url_base = url_base.rstrip('/')
+        self._dir_objetos = os.path.join(self.raiz, 'objetos')
+        self._dir_refs = os.path.join(self.raiz, 'refs')
+        self._dir_tmp = os.path.join(self.raiz, 'tmp')
+        for directorio in (self._dir_objetos, self._dir_refs, self._dir_tmp):
+            os.makedirs(directorio, exist_ok=True)
+        self._ruta_lock = os.path.join(self.raiz, '.lock')
+        self._lock_hilos = Lock()
+
+    # ---- rutas ----
+
+    def _ruta_objeto(self, objeto):
+        return os.path.join(self._dir_objetos, objeto[0:2], objeto[2:4], objeto)
+
+    def _ruta_ref(self, carpeta, nombre):
+        ruta = os.path.normpath(os.path.join(self._dir_refs, carpeta.strip('/'), nombre))
+        if not ruta.startswith(self._dir_refs + os.sep):
+            raise ErrorAlmacenamiento(f"Nombre de objeto inválido: {carpeta}/{nombre}")
+        return ruta
+
+    def url_de(self, objeto):
+        return f"{self.url_base}/{objeto[0:2]}/{objeto[2:4]}/{objeto}"
+
+    def objeto_de_url(self, url):
+        """'<sha256>.<ext>' a partir de una URL local, o None si no es de este almacén."""
+        if not url:
+            return None
+        match = re.search(r"/([0-9a-f]{64}\.[A-Za-z0-9]+)(?:\?.*)?$", url)
+        return match.group(1) if match else None
+
+    # ---- escritura atómica ----
+
+    @contextmanager
+    def _bloqueo(self):
+        with self._lock_hilos:
+            if fcntl is None:
+                yield
+                return
+            with open(self._ruta_lock, 'a+') as fh:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _escribir_atomico(self, ruta, contenido):
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        fd, temporal = tempfile.mkstemp(dir=self._dir_tmp)
+        with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+            fh.write(contenido)
+        os.replace(temporal, ruta)
+
+    def _leer_refs(self, objeto):
+        try:
+            with open(self._ruta_objeto(objeto) + '.refs', encoding='utf-8') as fh:
+                return [linea for linea in fh.read().splitlines() if linea]
+        except FileNotFoundError:
+            return []
+
+    def _guardar_refs(self, objeto, refs):
+        ruta = self._ruta_objeto(objeto)
+        if refs:
+            self._escribir_atomico(ruta + '.refs', '\n'.join(refs) + '\n')
+            return
+        # Sin referencias: se borra el contenido y el índice
+        for sobrante in (ruta, ruta + '.refs'):
+            try:
+                os.remove(sobrante)
+            except FileNotFoundError:
+                pass
+
+    def _soltar_ref(self, objeto, nombre_logico):
+        refs = self._leer_refs(objeto)
+        if nombre_logico in refs:
+            refs.remove(nombre_logico)
+            self._guardar_refs(objeto, refs)
+
+    # ---- API ----
+
+    def _guardar(self, origen, carpeta, nombre, extension):
+        nombre = nombre or uuid.uuid4().hex
+        extension = (extension or 'bin').lower().lstrip('.')
+        if extension == 'jpeg':
+            extension = 'jpg'
+
+        # 1. Volcar a un temporal del mismo disco calculando el SHA-256 por bloques
+        sha = hashlib.sha256()
+        fd, temporal = tempfile.mkstemp(dir=self._dir_tmp)
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                for bloque in _leer_origen(origen):
+                    sha.update(bloque)
+                    fh.write(bloque)
+            objeto = f"{sha.hexdigest()}.{extension}"
+            destino = self._ruta_objeto(objeto)
+            nombre_logico = f"{carpeta.strip('/')}/{nombre}"
+            ruta_ref = self._ruta_ref(carpeta, nombre)
+
+            with self._bloqueo():
+                # 2. Dedup: si el contenido ya existe, el temporal sobra
+                if os.path.exists(destino):
+                    os.remove(temporal)
+                else:
+                    os.makedirs(os.path.dirname(destino), exist_ok=True)
+                    os.replace(temporal, destino)
+                temporal = None
+
+                # 3. Re-apuntar el nombre lógico y ajustar las referencias
+                try:
+                    with open(ruta_ref, encoding='utf-8') as fh:
+                        anterior = fh.read().strip()
+                except FileNotFoundError:
+                    anterior = None
+                if anterior != objeto:
+                    if anterior:
+                        self._soltar_ref(anterior, nombre_logico)
+                    refs = self._leer_refs(objeto)
+                    refs.append(nombre_logico)
+                    self._guardar_refs(objeto, refs)
+                    self._escribir_atomico(ruta_ref, objeto)
+        finally:
+            if temporal:
+                try:
+                    os.remove(temporal)
+                except FileNotFoundError:
+                    pass
+        return objeto
+
+    def subir_imagen(self, origen, carpeta, nombre=None, extension=None):
+        objeto = self._guardar(origen, carpeta, nombre, extension or 'jpg')
+        return {'url': self.url_de(objeto), 'version': None}
+
+    def subir_json(self, datos, carpeta, nombre):
+        contenido = json.dumps(datos, indent=4, ensure_ascii=False).encode('utf-8')
+        return self.url_de(self._guardar(contenido, carpeta, nombre, 'json'))
+
+    def leer_json(self, url):
+        objeto = self.objeto_de_url(url)
+        if not objeto:
+            return None
+        try:
+            with open(self._ruta_objeto(objeto), encoding='utf-8') as fh:
+                return json.load(fh)
+        except (OSError, ValueError) as e:
+            logger.error("No se pudo leer %s: %s", objeto, e)
+            return None
+
+    def eliminar(self, url, carpeta=None):
+        """
+        Suelta una referencia al objeto de 'url'. Con 'carpeta' solo se suelta un nombre de esa
+        carpeta (varias publicaciones pueden compartir objeto); si no queda ninguno no hace nada,
+        así repetir el borrado (reintentos del colector) es inocuo.
+        """
+        objeto = self.objeto_de_url(url)
+        if not objeto:
+            return False
+        with self._bloqueo():
+            refs = self._leer_refs(objeto)
+            if carpeta:
+                prefijo = carpeta.strip('/') + '/'
+                refs_carpeta = [r for r in refs if r.startswith(prefijo)]
+                if not refs_carpeta:
+                    return False
+                nombre_logico = refs_carpeta[-1]
+            elif refs:
+                nombre_logico = refs[-1]
+            else:
+                return False
+            refs.remove(nombre_logico)
+            self._guardar_refs(objeto, refs)
+            carpeta_ref, _, nombre = nombre_logico.rpartition('/')
+            try:
+                os.remove(self._ruta_ref(carpeta_ref, nombre))
+            except FileNotFoundError:
+                pass
+        return True
+
+    def eliminar_lote(self, entradas):
+        resultado = {}
+        for url, carpeta in entradas:
+            try:
+                self.eliminar(url, carpeta=carpeta)
+                resultado[url] = None
+            except Exception as e:
+                resultado[url] = str(e)
+        return resultado
+
+    def listar(self, prefijo):
+        base = self._ruta_ref(prefijo, '')
+        for directorio, _, archivos in os.walk(base):
+            for archivo in archivos:
+                ruta_ref = os.path.join(directorio, archivo)
+                try:
+                    with open(ruta_ref, encoding='utf-8') as fh:
+                        objeto = fh.read().strip()
+                    creado = os.path.getmtime(ruta_ref)
+                except FileNotFoundError:
+                    continue
+                yield {
+                    'url': self.url_de(objeto),
+                    'nombre': os.path.relpath(ruta_ref, self._dir_refs).replace(os.sep, '/'),
+                    'creado': creado,
+                }
+
+    def nombres_de_url(self, url):
+        objeto = self.objeto_de_url(url)
+        return self._leer_refs(objeto) if objeto else []
+
+    def eliminar_carpeta(self, carpeta):
+        base = self._ruta_ref(carpeta, '')
+        if not os.path.isdir(base):
+            return
+        with self._bloqueo():
+            for directorio, _, archivos in os.walk(base):
+                for archivo in archivos:
+                    ruta_ref = os.path.join(directorio, archivo)
+                    with open(ruta_ref, encoding='utf-8') as fh:
+                        objeto = fh.read().strip()
+                    nombre_logico = os.path.relpath(ruta_ref, self._dir_refs).replace(os.sep, '/')
+                    self._soltar_ref(objeto, nombre_logico)
+            shutil.rmtree(base, ignore_errors=True)
+
+    def estadisticas(self):
+        """Objetos físicos, referencias lógicas y bytes en disco."""
+        objetos = referencias = total = 0
+        for directorio, _, archivos in os.walk(self._dir_objetos):
+            for archivo in archivos:
+                ruta = os.path.join(directorio, archivo)
+                if archivo.endswith('.refs'):
+                    referencias += len(self._leer_refs(archivo[:-5]))
+                else:
+                    objetos += 1
+                    total += os.path.getsize(ruta)
+        return {'objetos': objetos, 'referencias': referencias, 'bytes': total}
+
+
+# ================== SELECCIÓN POR CONFIGURACIÓN ==================
+
+def init_app(app):
+    global _backend
+    tipo = app.config.get('STORAGE_BACKEND', BACKEND_CLOUDINARY)
+    if tipo == BACKEND_LOCAL:
+        raiz = app.config.get('STORAGE_LOCAL_ROOT') or os.path.join(app.root_path, 'almacen')
+        url_base = f"{app.config.get('API_BASE_URL', '').rstrip('/')}/uploads/objetos"
+        _backend = AlmacenLocal(raiz, url_base)
+    elif tipo == BACKEND_CLOUDINARY:
+        _backend = AlmacenCloudinary()
+    else:
+        raise ValueError(f"STORAGE_BACKEND desconocido: {tipo}")
+    logger.info("Almacenamiento de archivos: %s", _backend.nombre)
+
+
+_PATRON_OBJETO = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]+$")
+
+
+def es_objeto(nombre_archivo):
+    """True si el nombre es el de un objeto servible ('<sha256>.<ext>'); excluye los '.refs'."""
+    return bool(_PATRON_OBJETO.match(nombre_archivo))
+
+
+def directorio_objetos():
+    """Carpeta con el contenido servible del almacén local (None con Cloudinary)."""
+    return getattr(backend(), '_dir_objetos', None)
+
+
+def backend():
+    global _backend
+    if _backend is None:
+        _backend = AlmacenCloudinary()
+    return _backend
+
+
+def subir_imagen(origen, carpeta, nombre=None, extension=None):
+    """Guarda una imagen (ruta, bytes o archivo). Devuelve {'url', 'version'}."""
+    return backend().subir_imagen(origen, carpeta, nombre=nombre, extension=extension)
+
+
+def subir_json(datos, carpeta, nombre):
+    """Guarda datos como JSON con nombre fijo (se sobrescribe). Devuelve la URL o None."""
+    return backend().subir_json(datos, carpeta, nombre)
+
+
+def leer_json(url):
+    return backend().leer_json(url)
+
+
+def eliminar(url, carpeta=None):
+    return backend().eliminar(url, carpeta=carpeta)
+
+
+def eliminar_carpeta(carpeta):
+    return backend().eliminar_carpeta(carpeta)
+
+
+def eliminar_lote(entradas):
+    """[(url, carpeta), ...] -> {url: None | error}. Usado por el colector de asset_gc."""
+    return backend().eliminar_lote(entradas)
+
+
+def listar(prefijo):
+    return backend().listar(prefijo)
+
+
+def nombres_de_url(url):
+    """Nombres lógicos (public_id / refs locales) bajo los que está guardada 'url'."""
+    return backend().nombres_de_url(url)
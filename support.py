@@ -1,12 +1,14 @@
+import logging
 from flask import Blueprint, request, jsonify
 from email.mime.text import MIMEText
 from email.header import Header
 import smtplib
 import os
-import sys
-import traceback
+import metrics
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
 load_dotenv()
 
 support_bp = Blueprint('support', __name__)
@@ -23,7 +25,7 @@ def enviar_correo_soporte(nombre, email_usuario, asunto, mensaje):
     Función que envía el mensaje de soporte al correo de la aplicación.
     """
     if not MAIL_USER or not MAIL_PASS:
-        print("ERROR-SUPPORT: MAIL_USER o MAIL_PASS no configurados.", file=sys.stderr)
+        logger.error("MAIL_USER o MAIL_PASS no configurados.")
         return False
         
     remitente = MAIL_USER # El correo de la aplicación
@@ -51,21 +53,19 @@ def enviar_correo_soporte(nombre, email_usuario, asunto, mensaje):
 
     try:
         # 🚀 [CAMBIO 2] Conexión SMTP con smtplib.SMTP y STARTTLS para SendGrid
-        print(f"DEBUG-SUPPORT: Conectando a {SMTP_SERVER}:{SMTP_PORT} con STARTTLS...", file=sys.stderr)
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
+        logger.debug("Conectando a %s:%s con STARTTLS...", SMTP_SERVER, SMTP_PORT)
+        with metrics.salida('smtp'), smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
             server.starttls() # ¡Obligatorio para el puerto 587!
             server.login(MAIL_USER, MAIL_PASS)
-            print(f"DEBUG-SUPPORT: Login SMTP exitoso.", file=sys.stderr)
+            logger.debug("Login SMTP exitoso.")
             server.send_message(msg)
-        print("DEBUG-SUPPORT: Correo de soporte enviado exitosamente.", file=sys.stderr)
+        logger.info("Correo de soporte enviado exitosamente.")
         return True
     except smtplib.SMTPAuthenticationError:
-        print("ERROR-SUPPORT: Fallo de autenticación SMTP. Revisa tus credenciales de SendGrid.", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo de autenticación SMTP. Revisa tus credenciales de SendGrid.")
         return False
     except Exception as e:
-        print(f"ERROR-SUPPORT: Fallo general al enviar correo de soporte: {str(e)}", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Fallo general al enviar correo de soporte: %s", str(e))
         return False
 
 
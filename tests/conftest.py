@@ -0,0 +1,92 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import redis_store  # noqa: E402
+from benchmarks.standins import RedisLocal  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def redis_local():
+    """redis-server (o fakeredis por TCP) para toda la sesión, con redis_store apuntando a él."""
+    servidor = RedisLocal().iniciar()
+    app = Flask('tests')
+    app.config['REDIS_URL'] = servidor.url
+    redis_store.init_app(app)
+    redis_store.reset()
+    assert redis_store.conectar()
+    yield servidor
+    redis_store.reset()
+    servidor.detener()
+
+
+@pytest.fixture
+def redis_limpio(redis_local):
+    redis_store.require_client().flushdb()
+    yield redis_store.require_client()
+
+
+class _CursorSQLite:
+    """Cursor con la interfaz de DictCursor de PyMySQL sobre sqlite3 (mismo SQL salvo el marcador %s)."""
+
+    def __init__(self, conexion):
+        self._conexion = conexion
+        self._cursor = conexion.db.cursor()
+        self._sql = None
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, sql, valores=()):
+        self._sql = sql
+        self._cursor.execute(sql.replace('%s', '?'), valores)
+
+    def executemany(self, sql, filas):
+        self._cursor.executemany(sql.replace('%s', '?'), filas)
+
+    def fetchone(self):
+        fila = self._cursor.fetchone()
+        return dict(fila) if fila else None
+
+    def fetchall(self):
+        filas = [dict(fila) for fila in self._cursor.fetchall()]
+        if self._conexion.al_leer:
+            # Lo que otra transacción confirme justo después de esta lectura
+            self._conexion.al_leer(self._sql, self._conexion.db)
+        return filas
+
+    def close(self):
+        self._cursor.close()
+
+
+class ConexionSQLite:
+    """Conexión de PyMySQL simulada con sqlite3 en memoria, para probar SQL portable sin MySQL."""
+
+    def __init__(self, esquema):
+        self.db = sqlite3.connect(':memory:')
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(esquema)
+        self.al_leer = None  # fn(sql, db) tras cada fetchall
+
+    def cursor(self, *args):
+        return _CursorSQLite(self)
+
+    def commit(self):
+        self.db.commit()
+
+    def rollback(self):
+        self.db.rollback()
+
+    def close(self):
+        pass  # la base en memoria vive lo que el test
+
+
+@pytest.fixture
+def sqlite_mysql():
+    return ConexionSQLite
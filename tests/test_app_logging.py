@@ -0,0 +1,40 @@
+import logging
+
+import pytest
+
+import app_logging
+
+
+def _hilos_listener():
+    # Hilos del threading original de eventlet, el que usa el listener
+    return [h for h in app_logging._threading.enumerate() if h.name == 'log-listener' and h.is_alive()]
+
+
+@pytest.fixture
+def logging_limpio():
+    app_logging.detener()
+    yield
+    app_logging.detener()
+
+
+def test_configurar_no_arranca_hilos(logging_limpio, capsys):
+    antes = len(_hilos_listener())
+    app_logging.configurar(formato='json', nivel='INFO')
+
+    logging.getLogger('tests').warning("sin hilo")
+
+    assert len(_hilos_listener()) == antes
+    assert '"msg": "sin hilo"' in capsys.readouterr().err
+
+
+def test_iniciar_arranca_el_listener_una_vez(logging_limpio, capsys):
+    app_logging.configurar(formato='json', nivel='INFO')
+    antes = len(_hilos_listener())
+
+    app_logging.iniciar()
+    app_logging.iniciar()
+    logging.getLogger('tests').warning("por la cola")
+
+    assert len(_hilos_listener()) == antes + 1
+    app_logging.detener()
+    assert '"msg": "por la cola"' in capsys.readouterr().err
@@ -0,0 +1,130 @@
+import pytest
+from flask_jwt_extended import create_access_token
+
+import asset_gc
+import author_timeline
+import http_cache
+import search
+import trending
+from routes import blog
+
+
+class _CursorGuionado:
+    """Cursor que responde a cada SELECT según un guion y deja el rowcount de los DELETE fijado por el test."""
+
+    def __init__(self, conexion):
+        self._conexion = conexion
+        self._fila = None
+        self.rowcount = 0
+
+    def execute(self, sql, valores=()):
+        self._conexion.sentencias.append(' '.join(sql.split()))
+        self._fila = None
+        for prefijo, fila in self._conexion.guion.items():
+            if sql.lstrip().startswith(prefijo):
+                self._fila = fila
+        self.rowcount = self._conexion.borradas if sql.lstrip().startswith('DELETE') else 1
+
+    def fetchone(self):
+        return self._fila
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class _ConexionGuionada:
+    def __init__(self, guion, borradas):
+        self.guion, self.borradas = guion, borradas
+        self.sentencias, self.confirmada = [], False
+
+    def cursor(self, *args):
+        return _CursorGuionado(self)
+
+    def commit(self):
+        self.confirmada = True
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(scope='module')
+def aplicacion(redis_local):
+    import app as modulo_app
+
+    return modulo_app.create_app({'TESTING': True, 'REDIS_URL': redis_local.url,
+                                  'JWT_SECRET_KEY': 'clave-de-pruebas-con-32-bytes-o-mas'})
+
+
+@pytest.fixture
+def cliente(aplicacion):
+    with aplicacion.app_context():
+        token = create_access_token(identity='1', additional_claims={'verificado': True})
+    cliente = aplicacion.test_client()
+    cliente.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    return cliente
+
+
+@pytest.fixture
+def efectos(monkeypatch):
+    """Registra los efectos fuera de la transacción (trending, cachés, eventos)."""
+    llamadas = []
+    monkeypatch.setattr(author_timeline, 'sumar', lambda *a, **k: llamadas.append(('sumar', k)))
+    monkeypatch.setattr(trending, 'comentario', lambda *a, **k: llamadas.append(('trending', k)))
+    monkeypatch.setattr(blog, '_publicacion_cambiada', lambda *a: llamadas.append(('cambiada', a)))
+    monkeypatch.setattr(blog, 'emit_comment_event', lambda *a: llamadas.append(('emit', a)))
+    return llamadas
+
+
+def _conexion_comentario(monkeypatch, borradas):
+    conexion = _ConexionGuionada({
+        'SELECT autor_id, publicacion_id': {'autor_id': 1, 'publicacion_id': 7, 'creado': 1700000000},
+        'SELECT autor_id, categoria_id': {'autor_id': 2, 'categoria_id': 3},
+    }, borradas)
+    monkeypatch.setattr(blog, 'get_db', lambda **k: conexion)
+    return conexion
+
+
+def test_borrar_comentario_resta_una_vez(cliente, efectos, monkeypatch):
+    conexion = _conexion_comentario(monkeypatch, borradas=1)
+
+    respuesta = cliente.delete('/blog/eliminar-comentario/5')
+
+    assert respuesta.status_code == 200
+    assert 'FOR UPDATE' in conexion.sentencias[0]
+    assert any(s.startswith('UPDATE publicaciones SET comments_count') for s in conexion.sentencias)
+    assert [nombre for nombre, _ in efectos] == ['sumar', 'trending', 'cambiada', 'emit']
+
+
+def test_borrado_concurrente_del_mismo_comentario_no_resta_otra_vez(cliente, efectos, monkeypatch):
+    conexion = _conexion_comentario(monkeypatch, borradas=0)
+
+    respuesta = cliente.delete('/blog/eliminar-comentario/5')
+
+    assert respuesta.status_code == 404
+    assert not any(s.startswith('UPDATE') for s in conexion.sentencias)
+    assert not conexion.confirmada
+    assert efectos == []
+
+
+def test_borrar_publicacion_bloquea_la_fila_antes_de_restar_al_autor(cliente, efectos, monkeypatch):
+    conexion = _ConexionGuionada({
+        'SELECT autor_id, categoria_id, likes_count': {'autor_id': 1, 'categoria_id': 3,
+                                                       'likes_count': 4, 'comments_count': 2},
+    }, borradas=1)
+    monkeypatch.setattr(blog, 'get_db', lambda **k: conexion)
+    for modulo, nombre in ((asset_gc, 'encolar_urls'), (asset_gc, 'encolar_carpeta'), (search, 'eliminar'),
+                           (trending, 'publicacion_eliminada'), (http_cache, 'invalidar'),
+                           (blog, 'emit_broadcast')):
+        monkeypatch.setattr(modulo, nombre, lambda *a, **k: None)
+
+    respuesta = cliente.delete('/blog/eliminar-publicacion/7')
+
+    assert respuesta.status_code == 200
+    assert conexion.sentencias[0].endswith('FOR UPDATE')
+    assert ('sumar', {'publicaciones': -1, 'likes': -4, 'comentarios': -2}) in efectos
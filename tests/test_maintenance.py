@@ -0,0 +1,52 @@
+import json
+import time
+from datetime import datetime
+
+import maintenance
+
+
+def _interrumpir(ruta, corte, ultimo_id=500):
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump({'tabla': 'comentarios', 'corte': corte.isoformat(), 'ultimo_id': ultimo_id, 'filas': 42,
+                   'rangos': 1, 'archivo': 'archivo/comentarios.ndjson.gz', 'segundos': 3.0}, f)
+
+
+def test_corte_relativo_reanuda_desde_su_checkpoint(tmp_path):
+    ruta, corte, previo = maintenance.preparar_checkpoint(str(tmp_path), 'comentarios', '90d')
+    assert previo is None
+    _interrumpir(ruta, corte)
+
+    time.sleep(1.1)  # '90d' resuelto ahora daría otro corte
+    ruta2, corte2, previo2 = maintenance.preparar_checkpoint(str(tmp_path), 'comentarios', '90d')
+
+    assert ruta2 == ruta
+    assert corte2 == corte
+    assert previo2['ultimo_id'] == 500
+
+
+def test_purga_terminada_calcula_un_corte_nuevo(tmp_path):
+    ruta, corte, _ = maintenance.preparar_checkpoint(str(tmp_path), 'comentarios', '90d')
+    _interrumpir(ruta, datetime(2020, 1, 1))
+    with open(ruta, encoding='utf-8') as f:
+        datos = json.load(f)
+    datos['completado'] = True
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(datos, f)
+
+    ruta2, corte2, previo2 = maintenance.preparar_checkpoint(str(tmp_path), 'comentarios', '90d')
+
+    assert ruta2 == ruta and previo2 is None
+    assert corte2 > datetime(2020, 1, 1)
+    assert not (tmp_path / ruta2.split('/')[-1]).exists()
+
+
+def test_desde_cero_descarta_el_checkpoint(tmp_path):
+    ruta, corte, _ = maintenance.preparar_checkpoint(str(tmp_path), 'users', '30d')
+    _interrumpir(ruta, datetime(2020, 1, 1))
+    _, corte2, previo2 = maintenance.preparar_checkpoint(str(tmp_path), 'users', '30d', desde_cero=True)
+    assert previo2 is None and corte2 > datetime(2020, 1, 1)
+
+
+def test_users_solo_purga_cuentas_sin_verificar():
+    assert 'partidas' not in maintenance.TABLAS
+    assert maintenance.TABLAS['users'].condicion == "verificado = 0"
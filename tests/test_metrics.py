@@ -0,0 +1,34 @@
+import pytest
+from flask import Flask
+
+import metrics
+
+
+@pytest.fixture
+def token(monkeypatch):
+    monkeypatch.setitem(metrics._config, 'token', 'secreto-del-scraper')
+    return 'secreto-del-scraper'
+
+
+def _pedir(cabeceras=None):
+    app = Flask('tests')
+    with app.test_request_context('/metrics', headers=cabeceras or {}):
+        return app.make_response(metrics.exportar_respuesta())
+
+
+@pytest.mark.parametrize('cabeceras', [None, {'Authorization': 'Bearer otro'}, {'Authorization': 'secreto-del-scraper'}])
+def test_metrics_con_token_rechaza_sin_credencial_valida(token, cabeceras):
+    respuesta = _pedir(cabeceras)
+    assert respuesta.status_code == 401
+    assert respuesta.headers['WWW-Authenticate'] == 'Bearer'
+
+
+def test_metrics_con_token_valido(token):
+    respuesta = _pedir({'Authorization': f'Bearer {token}'})
+    assert respuesta.status_code == 200
+    assert respuesta.content_type.startswith('text/plain')
+
+
+def test_metrics_sin_token_configurado_queda_abierto(monkeypatch):
+    monkeypatch.setitem(metrics._config, 'token', None)
+    assert _pedir().status_code == 200
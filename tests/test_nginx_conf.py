@@ -0,0 +1,114 @@
+import os
+import re
+
+import pytest
+
+import upload_ingest
+
+CONF = os.path.join(os.path.dirname(__file__), '..', 'nginx', 'goe.conf')
+
+_UNIDADES = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+
+
+def _bytes(valor):
+    numero, unidad = re.fullmatch(r'(\d+)([kmg]?)', valor.lower()).groups()
+    return int(numero) * _UNIDADES[unidad]
+
+
+def _bloques(texto):
+    """[(cabecera, directivas)] de cada bloque '{...}' del nivel superior de 'texto'."""
+    bloques, cabecera, actual, profundidad, comilla = [], '', '', 0, None
+    for caracter in re.sub(r'#[^\n]*', '', texto):
+        if comilla:
+            comilla = None if caracter == comilla else comilla
+        elif caracter in '\'"':
+            comilla = caracter
+        elif caracter == '{':
+            profundidad += 1
+            if profundidad == 1:
+                cabecera, actual = actual.split(';')[-1].strip(), ''
+                continue
+        elif caracter == '}':
+            profundidad -= 1
+            if profundidad == 0:
+                bloques.append((cabecera, actual))
+                actual = ''
+                continue
+        actual += caracter
+    return bloques
+
+
+def _servidor():
+    with open(CONF, encoding='utf-8') as fh:
+        servidor = dict(_bloques(fh.read()))['server']
+    locations = []
+    for cabecera, cuerpo in _bloques(servidor):
+        partes = cabecera.split()
+        modificador, patron = (partes[1], partes[2]) if len(partes) == 3 else ('', partes[1])
+        directivas = dict(re.findall(r'^\s*(\w+)\s+([^;]*);', cuerpo, re.M))
+        locations.append((modificador, patron, directivas))
+    nivel_servidor = re.sub(r'location[^{]*\{(?:[^{}]|\{[^{}]*\})*\}', '', servidor)
+    return dict(re.findall(r'^\s*(\w+)\s+([^;]*);', nivel_servidor, re.M)), locations
+
+
+def _location(locations, uri):
+    """La location que elige nginx para 'uri': '=', luego regex en orden, luego el prefijo más largo."""
+    for modificador, patron, directivas in locations:
+        if modificador == '=' and patron == uri:
+            return directivas
+    prefijos = [(p, d, m) for m, p, d in locations if m in ('', '^~') and uri.startswith(p)]
+    prefijo = max(prefijos, key=lambda x: len(x[0]), default=None)
+    if prefijo and prefijo[2] == '^~':
+        return prefijo[1]
+    for modificador, patron, directivas in locations:
+        if modificador in ('~', '~*') and re.search(patron, uri, re.I if modificador == '~*' else 0):
+            return directivas
+    return prefijo[1] if prefijo else None
+
+
+def _rutas_de_subida():
+    import app as modulo_app
+
+    app = modulo_app.create_app({'TESTING': True})
+    rutas = []
+    for regla in app.url_map.iter_rules():
+        tipo = getattr(app.view_functions[regla.endpoint], 'tipo_subida', None)
+        if tipo:
+            uri = re.sub(r'<(?:[^:>]+:)?[^>]+>', '7', regla.rule)
+            rutas.append(pytest.param(uri, tipo, id=uri))
+    return rutas
+
+
+@pytest.mark.parametrize('uri, tipo', _rutas_de_subida())
+def test_nginx_admite_el_limite_de_cada_ruta_de_subida(uri, tipo):
+    servidor, locations = _servidor()
+    location = _location(locations, uri)
+
+    assert location is not None and 'proxy_pass' in location, uri
+    limite = _bytes(location.get('client_max_body_size', servidor['client_max_body_size']))
+    assert limite >= upload_ingest.LIMITES[tipo]['max_bytes'] + upload_ingest.MARGEN_FORMULARIO
+
+
+def test_el_resto_de_rutas_se_queda_en_el_limite_del_servidor():
+    servidor, locations = _servidor()
+
+    assert _bytes(servidor['client_max_body_size']) <= 1024 ** 2
+    for uri in ('/blog/comentar-publicacion', '/login', '/blog/publicaciones/7/like'):
+        assert 'client_max_body_size' not in _location(locations, uri), uri
+
+
+def test_static_lo_sirve_nginx_desde_la_carpeta_de_flask():
+    _, locations = _servidor()
+
+    location = _location(locations, '/static/app.css')
+    assert 'proxy_pass' not in location
+    assert location['alias'].rstrip('/').endswith('/static')
+    assert 'expires' in location
+
+
+def test_metrics_solo_desde_redes_internas():
+    _, locations = _servidor()
+
+    location = _location(locations, '/metrics')
+    assert location.get('deny') == 'all'
+    assert 'allow' in location and 'proxy_pass' in location
@@ -0,0 +1,84 @@
+import os
+import time
+from concurrent.futures import Future
+
+import pytest
+
+import pdf_export
+import pdf_routes
+import storage
+
+
+@pytest.fixture
+def carpeta(tmp_path, monkeypatch):
+    monkeypatch.setitem(pdf_export._config, 'carpeta', str(tmp_path))
+    monkeypatch.setitem(pdf_export._config, 'timeout', 20.0)
+    return tmp_path
+
+
+def _exportado(carpeta, tipo, datos, edad):
+    nombre = pdf_export.nombre_de(tipo, datos)
+    ruta = carpeta / nombre
+    ruta.write_bytes(b'%PDF-1.4\n' + b'x' * 1000)
+    hace = time.time() - edad
+    os.utime(ruta, (hace, hace))
+    return nombre
+
+
+def test_volver_a_pedir_un_pdf_lo_protege_de_la_expulsion(carpeta, monkeypatch):
+    pedido = _exportado(carpeta, pdf_export.TIPO_CURSO, {'usuario': 'ana', 'curso': {}}, edad=3600)
+    otro = _exportado(carpeta, pdf_export.TIPO_CURSO, {'usuario': 'luis', 'curso': {}}, edad=60)
+
+    assert pdf_export.solicitar(pdf_export.TIPO_CURSO, {'usuario': 'ana', 'curso': {}}) == (pedido, True)
+
+    monkeypatch.setitem(pdf_export._config, 'max_bytes', 1500)
+    assert pdf_export.expulsar() == 1
+    assert (carpeta / pedido).exists()
+    assert not (carpeta / otro).exists()
+
+
+def test_la_marca_en_curso_caduca_con_el_timeout(carpeta, redis_limpio):
+    assert pdf_export._marcar_en_curso('curso_x.pdf')
+    assert not pdf_export._marcar_en_curso('curso_x.pdf')
+
+    ttl = redis_limpio.ttl(pdf_export._clave_en_curso('curso_x.pdf'))
+    assert 20 < ttl <= 20 + pdf_export.MARGEN_MARCA
+
+
+def test_trabajo_local_vencido_no_cuenta_como_en_curso(carpeta, redis_limpio, monkeypatch):
+    monkeypatch.setitem(pdf_export._en_curso, 'curso_viejo.pdf', (Future(), time.monotonic() - 21))
+    monkeypatch.setitem(pdf_export._en_curso, 'curso_nuevo.pdf', (Future(), time.monotonic()))
+
+    assert not pdf_export.en_curso('curso_viejo.pdf')
+    assert pdf_export.en_curso('curso_nuevo.pdf')
+
+
+class _ConexionUsuario:
+    """get_db() de pdf_routes con un usuario que tiene curso asignado."""
+
+    def cursor(self, *args):
+        return self
+
+    def execute(self, sql, valores=()):
+        pass
+
+    def fetchone(self):
+        return {'curso_url': 'https://almacen/cursos/ana.json'}
+
+    def close(self):
+        pass
+
+
+@pytest.mark.parametrize('directorio, estado', [(None, 502), ('/datos/objetos', 404)])
+def test_curso_ilegible_no_encola_un_pdf_vacio(redis_local, monkeypatch, directorio, estado):
+    import app as modulo_app
+
+    monkeypatch.setattr(pdf_routes, 'get_db', _ConexionUsuario)
+    monkeypatch.setattr(storage, 'leer_json', lambda url: None)
+    monkeypatch.setattr(storage, 'directorio_objetos', lambda: directorio)
+    monkeypatch.setattr(pdf_export, 'solicitar', lambda *a: pytest.fail("no debe encolar"))
+
+    respuesta = modulo_app.create_app({'TESTING': True, 'REDIS_URL': redis_local.url}).test_client().post('/pdfs/curso/ana')
+
+    assert respuesta.status_code == estado
+    assert 'message' in respuesta.get_json()
@@ -0,0 +1,108 @@
+import post_counters
+
+ESQUEMA = """
+    CREATE TABLE users (id INTEGER PRIMARY KEY);
+    CREATE TABLE publicaciones (
+        id INTEGER PRIMARY KEY, autor_id INT DEFAULT 1, likes_count INT, comments_count INT, images_count INT
+    );
+    CREATE TABLE likes (publicacion_id INT, user_id INT);
+    CREATE TABLE comentarios (publicacion_id INT);
+    CREATE TABLE imagenes_publicacion (publicacion_id INT);
+    CREATE TABLE autores_contadores (
+        autor_id INTEGER PRIMARY KEY, publicaciones INT, likes_recibidos INT, comentarios_recibidos INT
+    );
+    INSERT INTO users VALUES (1), (2), (3);
+"""
+
+
+def _contadores(conn, publicacion_id):
+    return tuple(conn.db.execute(
+        "SELECT likes_count, comments_count, images_count FROM publicaciones WHERE id = ?", (publicacion_id,)
+    ).fetchone())
+
+
+def _contadores_autor(conn, autor_id):
+    return tuple(conn.db.execute(
+        "SELECT publicaciones, likes_recibidos, comentarios_recibidos FROM autores_contadores WHERE autor_id = ?",
+        (autor_id,)
+    ).fetchone())
+
+
+def _sembrar(conn, autores=((1, 3, 4, 2),)):
+    conn.db.executemany("INSERT INTO publicaciones (id, likes_count, comments_count, images_count) VALUES (?, ?, ?, ?)",
+                        [(1, 5, 0, 0), (2, 9, 2, 0), (3, 1, 0, 0)])
+    conn.db.executemany("INSERT INTO likes VALUES (?, ?)", [(2, u) for u in range(3)] + [(3, 1)])
+    conn.db.executemany("INSERT INTO comentarios VALUES (?)", [(2,), (2,)])
+    conn.db.execute("INSERT INTO imagenes_publicacion VALUES (1)")
+    conn.db.executemany("INSERT INTO autores_contadores VALUES (?, ?, ?, ?)", autores)
+    conn.db.commit()
+
+
+def test_corrige_los_contadores_desviados(sqlite_mysql):
+    conn = sqlite_mysql(ESQUEMA)
+    _sembrar(conn)
+
+    resumen = post_counters.conciliar(conn, lote=2)
+
+    assert resumen['corregidas'] == 2 and resumen['autores'] == []
+    assert resumen['rangos'] == 2 + 2
+    assert _contadores(conn, 1) == (0, 0, 1)
+    assert _contadores(conn, 2) == (3, 2, 0)
+    assert _contadores(conn, 3) == (1, 0, 0)
+
+
+def test_no_pisa_un_like_confirmado_despues_de_contar(sqlite_mysql):
+    conn = sqlite_mysql(ESQUEMA)
+    _sembrar(conn)
+
+    def like_concurrente(sql, db):
+        if sql is post_counters._SQL_DESVIADAS:
+            db.execute("INSERT INTO likes VALUES (2, 99)")
+            db.execute("UPDATE publicaciones SET likes_count = likes_count + 1 WHERE id = 2")
+            db.execute("UPDATE autores_contadores SET likes_recibidos = likes_recibidos + 1 WHERE autor_id = 1")
+            conn.al_leer = None
+
+    conn.al_leer = like_concurrente
+    resumen = post_counters.conciliar(conn, lote=10)
+
+    # La 1 se corrige; la 2 cambió tras la lectura y queda para el siguiente ciclo
+    assert resumen['corregidas'] == 1
+    assert _contadores(conn, 1) == (0, 0, 1)
+    assert _contadores(conn, 2) == (10, 2, 0)
+
+    post_counters.conciliar(conn, lote=10)
+    assert _contadores(conn, 2) == (4, 2, 0)
+
+
+def test_corrige_los_contadores_de_autor(sqlite_mysql):
+    conn = sqlite_mysql(ESQUEMA)
+    # El 1 perdió un like y un comentario (p. ej. un borrado que no restó); el 2 no tiene publicaciones
+    _sembrar(conn, autores=[(1, 3, 9, 5), (2, 1, 1, 1), (3, 0, 0, 0)])
+
+    resumen = post_counters.conciliar(conn, lote=2)
+
+    assert sorted(resumen['autores']) == [1, 2]
+    assert _contadores_autor(conn, 1) == (3, 4, 2)
+    assert _contadores_autor(conn, 2) == (0, 0, 0)
+    assert _contadores_autor(conn, 3) == (0, 0, 0)
+
+
+def test_no_pisa_un_comentario_al_autor_confirmado_despues_de_contar(sqlite_mysql):
+    conn = sqlite_mysql(ESQUEMA)
+    _sembrar(conn, autores=[(1, 3, 9, 2)])
+
+    def comentario_concurrente(sql, db):
+        if sql is post_counters._SQL_AUTORES_DESVIADOS:
+            db.execute("INSERT INTO comentarios VALUES (3)")
+            db.execute("UPDATE autores_contadores SET comentarios_recibidos = comentarios_recibidos + 1 "
+                       "WHERE autor_id = 1")
+            conn.al_leer = None
+
+    conn.al_leer = comentario_concurrente
+    resumen = post_counters.conciliar(conn, lote=10)
+
+    assert resumen['autores'] == []
+    assert _contadores_autor(conn, 1) == (3, 9, 3)
+
+    assert post_counters.conciliar(conn, lote=10)['autores'] == [1]
+    assert _contadores_autor(conn, 1) == (3, 4, 3)
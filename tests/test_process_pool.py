@@ -0,0 +1,61 @@
+import io
+import sys
+import types
+
+import pytest
+
+import image_pipeline
+import pdf_export
+
+
+@pytest.fixture
+def main_pesado(tmp_path, monkeypatch):
+    """__main__ como el de 'python app.py': un script con efectos al importarse (deja una marca)."""
+    marca = tmp_path / 'main_importado'
+    script = tmp_path / 'main_pesado.py'
+    script.write_text(f"open({str(marca)!r}, 'w').close()\n")
+    principal = types.ModuleType('__main__')
+    principal.__file__ = str(script)
+    principal.__spec__ = None
+    monkeypatch.setitem(sys.modules, '__main__', principal)
+    image_pipeline._reiniciar_pool()
+    pdf_export._reiniciar_pool()
+    yield marca
+    image_pipeline._reiniciar_pool()
+    pdf_export._reiniciar_pool()
+
+
+def _png(ancho, alto):
+    from PIL import Image
+
+    salida = io.BytesIO()
+    Image.new('RGBA', (ancho, alto), (200, 30, 30, 128)).save(salida, 'PNG')
+    return salida.getvalue()
+
+
+def test_los_hijos_no_ejecutan_el_main_del_padre(main_pesado):
+    ancho, alto, variantes = image_pipeline.procesar(_png(800, 400), (320, 1600))
+
+    assert (ancho, alto) == (800, 400)
+    assert sorted({(v['ancho'], v['formato']) for v in variantes}) == [
+        (320, 'jpeg'), (320, 'webp'), (800, 'jpeg'), (800, 'webp'),
+    ]
+    assert not main_pesado.exists()
+    assert sys.modules['__main__'].__file__.endswith('main_pesado.py')
+
+
+def test_imagen_invalida_llega_al_padre(main_pesado):
+    with pytest.raises(image_pipeline.ImagenInvalida):
+        image_pipeline.procesar(b'esto no es una imagen', (320,))
+
+
+def test_pdf_en_hijo_ligero(main_pesado, tmp_path, monkeypatch):
+    monkeypatch.setitem(pdf_export._config, 'carpeta', str(tmp_path))
+    datos = {'usuario': 'ana', 'curso': {'modulos': ['Introducción', 'Práctica']}}
+
+    nombre, listo = pdf_export.solicitar(pdf_export.TIPO_CURSO, datos)
+
+    assert not listo
+    assert pdf_export.esperar(nombre)
+    assert (tmp_path / nombre).read_bytes().startswith(b'%PDF-1.4')
+    assert not main_pesado.exists()
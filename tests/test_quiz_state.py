@@ -0,0 +1,70 @@
+import pytest
+import redis
+
+import quiz_state
+import redis_store
+from benchmarks.standins import puerto_libre
+
+PREGUNTA = {"pregunta": "¿Capital de Francia?", "respuesta": "París", "explicacion": "Es París."}
+
+
+@pytest.fixture
+def redis_caido(redis_local):
+    """Clientes de redis_store apuntando a un puerto sin servidor: cada comando da ConnectionError."""
+    url = f"redis://127.0.0.1:{puerto_libre()}/0"
+    redis_store._clientes['text'] = redis.StrictRedis.from_url(url)
+    redis_store._clientes['binary'] = redis.StrictRedis.from_url(url)
+    yield
+    redis_store.reset()
+    assert redis_store.conectar()
+
+
+def test_sesion_de_preguntas(redis_limpio):
+    quiz_state.guardar_pregunta('ana', PREGUNTA)
+    assert quiz_state.obtener_pregunta('ana') == PREGUNTA
+    assert quiz_state.obtener_estado('ana') == ('no_respondio', 0)
+
+    assert quiz_state.registrar_respuesta('ana', 'correcto') == 1
+    assert quiz_state.obtener_pregunta('ana') is None
+    assert quiz_state.obtener_estado('ana') == ('correcto', 1)
+
+
+@pytest.mark.parametrize("llamada", [
+    lambda: quiz_state.obtener_pregunta('ana'),
+    lambda: quiz_state.guardar_pregunta('ana', PREGUNTA),
+    lambda: quiz_state.registrar_respuesta('ana', 'incorrecto'),
+    lambda: quiz_state.actualizar_estado('ana', 'correcto'),
+    lambda: quiz_state.obtener_estado('ana'),
+    lambda: quiz_state.cachear_estado('ana', 'correcto'),
+    lambda: quiz_state.flush_pendientes(conn=None),
+], ids=['obtener_pregunta', 'guardar_pregunta', 'registrar_respuesta', 'actualizar_estado',
+        'obtener_estado', 'cachear_estado', 'flush_pendientes'])
+def test_sin_conexion_lanza_redis_no_disponible(redis_caido, llamada):
+    with pytest.raises(redis_store.RedisNoDisponible):
+        llamada()
+
+
+@pytest.fixture
+def cliente(redis_limpio, redis_local, sqlite_mysql, monkeypatch):
+    import app as modulo_app
+    from routes import auth_juego
+
+    conn = sqlite_mysql("CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT, estado_pregunta TEXT);"
+                        "INSERT INTO users VALUES (1, 'ana', NULL);")
+    monkeypatch.setattr(auth_juego, 'get_db', lambda **k: conn)
+    return modulo_app.create_app({'TESTING': True, 'REDIS_URL': redis_local.url}).test_client()
+
+
+def test_actualizar_estado_de_usuario_inexistente_no_crea_sesion(cliente):
+    respuesta = cliente.post('/auth_juego/update-last-answer-status/nadie', json={'estado': 'correcto'})
+
+    assert respuesta.status_code == 404
+    assert quiz_state.obtener_estado('nadie') == (None, 0)
+    assert cliente.get('/auth_juego/get-last-answer-status/nadie').status_code == 404
+
+
+def test_actualizar_estado_de_usuario_existente(cliente):
+    respuesta = cliente.post('/auth_juego/update-last-answer-status/ana', json={'estado': 'incorrecto'})
+
+    assert respuesta.status_code == 200
+    assert cliente.get('/auth_juego/get-last-answer-status/ana').get_json()['estado_pregunta'] == 'incorrecto'
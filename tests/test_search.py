@@ -0,0 +1,74 @@
+import pytest
+from flask import Flask
+
+import search
+
+ESQUEMA = """
+    CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT, foto_perfil TEXT, verificado INT);
+    CREATE TABLE categorias (id INTEGER PRIMARY KEY, nombre TEXT);
+    CREATE TABLE publicaciones (
+        id INTEGER PRIMARY KEY, autor_id INT, titulo TEXT, texto TEXT, created_at TEXT,
+        likes_count INT DEFAULT 0, comments_count INT DEFAULT 0, images_count INT DEFAULT 0, categoria_id INT
+    );
+    CREATE TABLE imagenes_publicacion (id INTEGER PRIMARY KEY, publicacion_id INT, url TEXT);
+    INSERT INTO users VALUES (1, 'ana', '', 1);
+    INSERT INTO categorias VALUES (1, 'Torneos'), (2, 'Tutoriales');
+"""
+
+
+@pytest.fixture
+def indice(redis_limpio, sqlite_mysql):
+    app = Flask('tests')
+    app.config['SEARCH_ENGINE'] = 'redis'
+    search.init_app(app)
+    conn = sqlite_mysql(ESQUEMA)
+    # 23 publicaciones con el mismo título (empates de relevancia, ids de 1 y 2 cifras) y 7 con más peso
+    for i in range(1, 31):
+        titulo = "Torneo de ajedrez" if i <= 23 else "Ajedrez: torneo de ajedrez rápido"
+        texto = "Apertura, medio juego y final." if i % 2 else "Reglas del torneo."
+        categoria = 1 + i % 2
+        conn.db.execute("INSERT INTO publicaciones (id, autor_id, titulo, texto, created_at, categoria_id) "
+                        "VALUES (?, 1, ?, ?, '2025-05-01', ?)", (i, titulo, texto, categoria))
+    conn.commit()
+    assert search.reindexar(conn)['publicaciones'] == 30
+    yield conn
+    search.init_app(Flask('tests'))
+
+
+def _paginar(conn, consulta, limite, categoria_id=None):
+    vistos, despues = [], None
+    for _ in range(100):
+        resultados, siguiente = search.buscar(conn, consulta, categoria_id, despues, limite)
+        vistos += [(r['id'], r['relevancia']) for r in resultados]
+        if siguiente is None:
+            return vistos
+        despues = search.decodificar_cursor(siguiente)
+    raise AssertionError("la paginación no termina")
+
+
+@pytest.mark.parametrize('limite', [1, 4, 7, 50])
+def test_paginas_sin_repetidos_ni_huecos(indice, limite):
+    vistos = _paginar(indice, "torneo ajedrez", limite)
+
+    ids = [i for i, _ in vistos]
+    assert len(ids) == len(set(ids))
+    assert set(ids) == set(range(1, 31))
+    relevancias = [r for _, r in vistos]
+    assert relevancias == sorted(relevancias, reverse=True)
+    assert set(ids[:7]) == set(range(24, 31))
+
+
+def test_paginas_por_categoria(indice):
+    ids = [i for i, _ in _paginar(indice, "ajedrez", 3, categoria_id=2)]
+
+    assert len(ids) == len(set(ids))
+    assert set(ids) == {i for i in range(1, 31) if i % 2}
+
+
+def test_publicacion_borrada_no_repite_ni_corta_la_paginacion(indice):
+    indice.db.execute("DELETE FROM publicaciones WHERE id IN (5, 12)")
+
+    ids = [i for i, _ in _paginar(indice, "torneo ajedrez", 4)]
+
+    assert len(ids) == len(set(ids))
+    assert set(ids) == set(range(1, 31)) - {5, 12}
@@ -0,0 +1,66 @@
+import pytest
+from flask import Flask
+
+import static_delivery
+
+
+@pytest.fixture
+def etags(monkeypatch):
+    monkeypatch.setitem(static_delivery._config, 'max_etags', 3)
+    monkeypatch.setattr(static_delivery, '_etags', static_delivery.OrderedDict())
+    return static_delivery._etags
+
+
+def _archivos(tmp_path, n):
+    rutas = []
+    for i in range(n):
+        ruta = tmp_path / f'archivo_{i}.txt'
+        ruta.write_text(f'contenido {i}')
+        rutas.append(str(ruta))
+    return rutas
+
+
+def test_cache_de_etags_acotada(etags, tmp_path):
+    rutas = _archivos(tmp_path, 10)
+    for ruta in rutas:
+        static_delivery.etag_de(ruta)
+
+    assert list(etags) == rutas[-3:]
+
+
+def test_expulsa_el_menos_usado(etags, tmp_path):
+    a, b, c, d = _archivos(tmp_path, 4)
+    for ruta in (a, b, c):
+        static_delivery.etag_de(ruta)
+
+    static_delivery.etag_de(a)
+    static_delivery.etag_de(d)
+
+    assert list(etags) == [c, a, d]
+
+
+@pytest.fixture
+def raices(tmp_path, monkeypatch):
+    monkeypatch.setitem(static_delivery._config, 'modo', static_delivery.MODO_PYTHON)
+    monkeypatch.setitem(static_delivery._config, 'raices', {'uploads': str(tmp_path)})
+    return tmp_path
+
+
+@pytest.mark.parametrize('nombre', ['1700000000123456789.jpg', 'foto.3f9a0c1e2b4d5a6f.jpg', 'a' * 64 + '.webp'])
+def test_nombre_con_pinta_de_hash_no_es_inmutable_por_si_solo(raices, nombre):
+    (raices / nombre).write_bytes(b'imagen')
+
+    with Flask('tests').test_request_context():
+        respuesta = static_delivery.servir_archivo('uploads', nombre)
+
+    assert respuesta.headers['Cache-Control'] == 'public, no-cache'
+    assert respuesta.headers['ETag']
+
+
+def test_inmutable_solo_si_la_ruta_lo_indica(raices):
+    (raices / 'objeto.webp').write_bytes(b'imagen')
+
+    with Flask('tests').test_request_context():
+        respuesta = static_delivery.servir_archivo('uploads', 'objeto.webp', inmutable=True)
+
+    assert 'immutable' in respuesta.headers['Cache-Control']
@@ -0,0 +1,66 @@
+import time
+
+import pytest
+from flask import Flask
+
+import trending
+
+HORA = 3600
+
+
+@pytest.fixture
+def tendencias(redis_limpio):
+    app = Flask('tests')
+    app.config.update(TRENDING_HALF_LIFE=24, TRENDING_RENORM_INTERVAL=60, TRENDING_MAX=100)
+    trending.init_app(app)
+    return redis_limpio
+
+
+def _puntuacion(publicacion_id, categoria_id=None):
+    return dict(trending.pagina(categoria_id, 0, 100)).get(publicacion_id)
+
+
+def test_borrar_comentario_viejo_resta_solo_su_peso(tendencias):
+    hace_72h = time.time() - 72 * HORA
+    trending.publicacion_creada(1, 3)
+    trending.sumar(1, trending.PESO_COMENTARIO, 3, instante=hace_72h)
+    trending.like(1, 3)
+    antes = _puntuacion(1)
+
+    trending.comentario(1, 3, eliminado=True, instante=hace_72h)
+
+    despues = _puntuacion(1)
+    assert despues == pytest.approx(antes - trending.PESO_COMENTARIO * 0.125, rel=1e-3)
+    assert despues == pytest.approx(trending.PESO_PUBLICACION + trending.PESO_LIKE, rel=1e-3)
+    assert _puntuacion(1, 3) == pytest.approx(despues)
+
+
+def test_unlike_tardio_no_deja_puntuacion_negativa(tendencias):
+    trending.sumar(1, trending.PESO_LIKE, instante=time.time() - 48 * HORA)
+    # Sin instante se resta el peso de un like de ahora, más de lo que sumó el de hace 48 h
+    trending.unlike(1)
+    assert _puntuacion(1) == 0
+
+
+def test_deshacer_en_publicacion_fuera_del_set_no_la_agrega(tendencias):
+    trending.unlike(7, 2, instante_like=time.time())
+    trending.comentario(7, 2, eliminado=True, instante=time.time())
+    assert _puntuacion(7) is None
+    assert _puntuacion(7, 2) is None
+
+
+def test_renormalizar_conserva_las_publicaciones_con_interaccion(tendencias):
+    hace_72h = time.time() - 72 * HORA
+    trending.publicacion_creada(1)
+    trending.sumar(1, trending.PESO_COMENTARIO, instante=hace_72h)
+    trending.comentario(1, eliminado=True, instante=hace_72h)
+    trending.publicacion_creada(2)
+    # Base vieja para que toque renormalizar
+    tendencias.set(trending._clave('base'), time.time() - 2 * HORA)
+
+    assert trending.renormalizar() == 1
+
+    ranking = dict(trending.pagina())
+    assert set(ranking) == {1, 2}
+    assert ranking[1] > 0
+    assert ranking[1] == pytest.approx(ranking[2], rel=1e-3)
@@ -0,0 +1,41 @@
+import io
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+import upload_ingest
+
+
+@pytest.fixture(scope='module')
+def cliente():
+    import app as modulo_app
+
+    aplicacion = modulo_app.create_app({'TESTING': True, 'JWT_SECRET_KEY': 'clave-de-pruebas-con-32-bytes-o-mas'})
+    with aplicacion.app_context():
+        token = create_access_token(identity='1', additional_claims={'verificado': True})
+    cliente = aplicacion.test_client()
+    cliente.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    return cliente
+
+
+def _imagen_grande(tipo):
+    return io.BytesIO(b'\xff\xd8\xff' + b'\0' * (upload_ingest.LIMITES[tipo]['max_bytes'] + 1024 * 1024))
+
+
+@pytest.mark.parametrize('metodo, ruta, campo', [
+    ('post', '/blog/crear-publicacion', 'imagen'),
+    ('put', '/blog/editar-publicacion/1', 'imagen'),
+    ('post', '/blog/publicaciones/1/upload_imagen', 'file'),
+])
+def test_subida_demasiado_grande_responde_413_json(cliente, metodo, ruta, campo):
+    datos = {'titulo': 't', 'texto': 'x', 'categoria_id': '1', campo: (_imagen_grande('publicacion'), 'a.jpg')}
+    respuesta = getattr(cliente, metodo)(ruta, data=datos, content_type='multipart/form-data')
+    assert respuesta.status_code == 413
+    assert 'error' in respuesta.get_json()
+
+
+def test_foto_de_perfil_demasiado_grande_responde_413_json(cliente):
+    respuesta = cliente.put('/user/perfil/foto', data={'foto': (_imagen_grande('perfil'), 'a.jpg')},
+                            content_type='multipart/form-data')
+    assert respuesta.status_code == 413
+    assert 'error' in respuesta.get_json()
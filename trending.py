@@ -0,0 +1,217 @@
+import logging
+import math
+import time
+from threading import Timer
+
+import redis_store
+from redis_store import RedisNoDisponible
+
+logger = logging.getLogger(__name__)
+
+# ====================================================================================================
+# Feed "trending" (GET /blog/publicaciones?orden=trending)
+# ====================================================================================================
+# Puntuación = suma de los eventos de la publicación, cada uno con un peso (like, comentario,
+# publicarla) que decae exponencialmente con su antigüedad (vida media TRENDING_HALF_LIFE horas).
+# Se usa decaimiento "hacia adelante": en lugar de envejecer todas las puntuaciones, cada evento
+# suma peso * exp((t - base) / tau), con 'base' un instante de referencia común guardado en Redis.
+# El orden relativo es el mismo y cada evento es un solo ZINCRBY, sin recorrer tablas.
+# Deshacer un evento (unlike, borrar un comentario) resta su peso con el instante en que ocurrió,
+# no con el actual: así se quita exactamente lo que sumó. La puntuación nunca baja de 0 y no se
+# resta a publicaciones que ya no están en el set.
+#
+#   <ns>:trending:base          instante de referencia (epoch, segundos)
+#   <ns>:trending:global        sorted set publicacion_id -> puntuación
+#   <ns>:trending:cat:<id>      lo mismo por categoría
+#   <ns>:trending:claves        set con los sorted sets anteriores (para renormalizarlos)
+#
+# Como exp((t - base) / tau) crece sin límite, cada TRENDING_RENORM_INTERVAL segundos un worker
+# mueve 'base' a ahora y multiplica todas las puntuaciones por exp(-(ahora - base) / tau)
+# (ZUNIONSTORE con WEIGHTS) y recorta cada set a las TRENDING_MAX mejores. Incrementos y
+# renormalización son scripts Lua, así que nunca se mezclan bases.
+
+PESO_LIKE = 1.0
+PESO_COMENTARIO = 2.0
+PESO_PUBLICACION = 1.0
+
+# KEYS: base, claves, set1, set2...   ARGV: miembro, peso, ahora, tau, instante del evento
+LUA_SUMAR = """
+local base = tonumber(redis.call('GET', KEYS[1]))
+local ahora = tonumber(ARGV[3])
+if not base then
+    base = ahora
+    redis.call('SET', KEYS[1], ahora)
+end
+local delta = tonumber(ARGV[2]) * math.exp((tonumber(ARGV[5]) - base) / tonumber(ARGV[4]))
+for i = 3, #KEYS do
+    if delta >= 0 then
+        redis.call('ZINCRBY', KEYS[i], delta, ARGV[1])
+        redis.call('SADD', KEYS[2], KEYS[i])
+    elseif redis.call('ZSCORE', KEYS[i], ARGV[1]) then
+        local nueva = tonumber(redis.call('ZINCRBY', KEYS[i], delta, ARGV[1]))
+        if nueva < 0 then
+            redis.call('ZADD', KEYS[i], 0, ARGV[1])
+        end
+    end
+end
+return tostring(delta)
+"""
+
+# KEYS: base, claves   ARGV: ahora, tau, intervalo_minimo, maximo
+LUA_RENORMALIZAR = """
+local base = tonumber(redis.call('GET', KEYS[1]))
+local ahora = tonumber(ARGV[1])
+if not base or ahora - base < tonumber(ARGV[3]) then
+    return 0
+end
+local factor = math.exp(-(ahora - base) / tonumber(ARGV[2]))
+local claves = redis.call('SMEMBERS', KEYS[2])
+for _, clave in ipairs(claves) do
+    redis.call('ZUNIONSTORE', clave, 1, clave, 'WEIGHTS', tostring(factor))
+    redis.call('ZREMRANGEBYRANK', clave, 0, -(tonumber(ARGV[4]) + 1))
+end
+redis.call('SET', KEYS[1], ahora)
+return #claves
+"""
+
+_config = {
+    'tau': 24 * 3600 / math.log(2),
+    'intervalo': 3600.0,
+    'maximo': 5000,
+}
+
+_timer = None
+
+redis_store.registrar_script('trending_sumar', LUA_SUMAR)
+redis_store.registrar_script('trending_renormalizar', LUA_RENORMALIZAR)
+
+
+def init_app(app):
+    vida_media = float(app.config.get('TRENDING_HALF_LIFE', 24)) * 3600
+    _config.update({
+        'tau': vida_media / math.log(2),
+        'intervalo': float(app.config.get('TRENDING_RENORM_INTERVAL', 3600)),
+        'maximo': int(app.config.get('TRENDING_MAX', 5000)),
+    })
+
+
+def _clave(tipo, *partes):
+    return redis_store.key('trending', tipo, *partes)
+
+
+def _clave_set(categoria_id=None):
+    return _clave('cat', categoria_id) if categoria_id else _clave('global')
+
+
+# ================== EVENTOS ==================
+
+def sumar(publicacion_id, peso, categoria_id=None, instante=None):
+    """
+    Suma 'peso' decaído desde 'instante' (epoch del evento; por defecto ahora) a la publicación.
+    Con peso negativo deshace un evento anterior. Sin Redis el evento se pierde.
+    """
+    claves = [_clave('base'), _clave('claves'), _clave_set()]
+    if categoria_id:
+        claves.append(_clave_set(categoria_id))
+    ahora = time.time()
+    instante = min(float(instante), ahora) if instante is not None else ahora
+    try:
+        script = redis_store.script('trending_sumar')
+        with redis_store.pipeline() as pipe:
+            script(keys=claves, args=[publicacion_id, peso, ahora, _config['tau'], instante], client=pipe)
+    except RedisNoDisponible as e:
+        logger.warning("Evento trending perdido para la publicación %s: %s", publicacion_id, e)
+
+
+def like(publicacion_id, categoria_id=None):
+    sumar(publicacion_id, PESO_LIKE, categoria_id)
+
+
+def unlike(publicacion_id, categoria_id=None, instante_like=None):
+    """'instante_like': epoch en que se dio el like (UNIX_TIMESTAMP(likes.created_at))."""
+    sumar(publicacion_id, -PESO_LIKE, categoria_id, instante_like)
+
+
+def comentario(publicacion_id, categoria_id=None, eliminado=False, instante=None):
+    """Al eliminar, 'instante' es el epoch en que se creó el comentario."""
+    sumar(publicacion_id, -PESO_COMENTARIO if eliminado else PESO_COMENTARIO, categoria_id, instante)
+
+
+def publicacion_creada(publicacion_id, categoria_id=None):
+    sumar(publicacion_id, PESO_PUBLICACION, categoria_id)
+
+
+def publicacion_eliminada(publicacion_id, categoria_id=None):
+    try:
+        with redis_store.pipeline() as pipe:
+            pipe.zrem(_clave_set(), publicacion_id)
+            if categoria_id:
+                pipe.zrem(_clave_set(categoria_id), publicacion_id)
+    except RedisNoDisponible as e:
+        logger.warning("No se quitó la publicación %s de trending: %s", publicacion_id, e)
+
+
+def categoria_cambiada(publicacion_id, anterior, nueva):
+    """Mueve la puntuación de la publicación del set de una categoría al de otra."""
+    if not anterior or anterior == nueva:
+        return
+    try:
+        with redis_store.pipeline() as pipe:
+            pipe.zscore(_clave_set(anterior), publicacion_id)
+            pipe.zrem(_clave_set(anterior), publicacion_id)
+        puntuacion = pipe.resultados[0]
+        if puntuacion is not None and nueva:
+            with redis_store.pipeline() as pipe:
+                pipe.zadd(_clave_set(nueva), {publicacion_id: puntuacion})
+                pipe.sadd(_clave('claves'), _clave_set(nueva))
+    except RedisNoDisponible as e:
+        logger.warning("No se movió la publicación %s de categoría en trending: %s", publicacion_id, e)
+
+
+# ================== LECTURA ==================
+
+def pagina(categoria_id=None, desde=0, limite=20):
+    """[(publicacion_id, puntuacion)] de la página pedida, de más a menos trending (un ZREVRANGE)."""
+    with redis_store.pipeline() as pipe:
+        pipe.zrevrange(_clave_set(categoria_id), desde, desde + limite - 1, withscores=True)
+    return [(int(miembro), puntuacion) for miembro, puntuacion in pipe.resultados[0]]
+
+
+# ================== RENORMALIZACIÓN PERIÓDICA ==================
+
+def renormalizar():
+    """Devuelve cuántos sets se reescalaron (0 si aún no tocaba)."""
+    script = redis_store.script('trending_renormalizar')
+    with redis_store.pipeline() as pipe:
+        script(
+            keys=[_clave('base'), _clave('claves')],
+            args=[time.time(), _config['tau'], _config['intervalo'], _config['maximo']],
+            client=pipe,
+        )
+    return pipe.resultados[0]
+
+
+def _ciclo():
+    global _timer
+    try:
+        reescalados = renormalizar()
+        if reescalados:
+            logger.info("Trending renormalizado (%s sets).", reescalados)
+    except RedisNoDisponible:
+        pass
+    except Exception as e:
+        logger.exception("Fallo renormalizando trending: %s", e)
+    finally:
+        _timer = Timer(_config['intervalo'] / 4, _ciclo)
+        _timer.daemon = True
+        _timer.start()
+
+
+def iniciar_renormalizador():
+    global _timer
+    if _timer is not None:
+        return
+    # Cada worker lo comprueba cada intervalo / 4; el script solo actúa si la base ya es vieja
+    _timer = Timer(_config['intervalo'] / 4, _ciclo)
+    _timer.daemon = True
+    _timer.start()
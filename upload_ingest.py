@@ -0,0 +1,186 @@
+import logging
+import os
+import shutil
+import tempfile
+from functools import wraps
+
+from flask import Request, current_app, request
+
+logger = logging.getLogger(__name__)
+
+_magic = False  # False: sin importar todavía; None: libmagic no instalado (se usan las firmas de abajo)
+
+# ====================================================================================================
+# Ingesta de subidas de imágenes
+# ====================================================================================================
+# 1. @limitar_subida(tipo) fija request.max_content_length para la vista ANTES de leer el
+#    formulario, así Werkzeug corta con 413 en cuanto el cuerpo supera el límite del endpoint
+#    (sin esperar a MAX_CONTENT_LENGTH = 16 MB).
+# 2. RequestConSpool hace que Werkzeug escriba cada archivo del multipart directamente en un
+#    temporal en disco (UPLOAD_SPOOL_DIR) en lugar de un SpooledTemporaryFile en memoria.
+# 3. ingerir() valida sin decodificar la imagen completa: tipo real por los primeros KB
+#    (python-magic / firmas), tamaño en bytes y dimensiones leídas de la cabecera con Pillow.
+#    Devuelve la ruta del temporal, que image_pipeline pasa al proceso hijo sin cargarla en el worker.
+
+TAM_CABECERA = 4096
+TAM_BLOQUE = 64 * 1024
+MARGEN_FORMULARIO = 64 * 1024  # campos de texto y delimitadores del multipart
+
+MIME_PERMITIDOS = {'image/jpeg', 'image/png', 'image/gif', 'image/webp'}
+
+# Límites por endpoint: bytes del archivo, lado máximo y megapíxeles (antes de decodificar)
+LIMITES = {
+    'publicacion': {'max_bytes': 10 * 1024 * 1024, 'max_lado': 8000, 'max_pixeles': 40_000_000},
+    'perfil': {'max_bytes': 5 * 1024 * 1024, 'max_lado': 4096, 'max_pixeles': 16_000_000},
+}
+
+_FIRMAS = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+
+class SubidaRechazada(ValueError):
+    """El archivo no pasa la validación; 'status' es el código HTTP a devolver."""
+
+    def __init__(self, mensaje, status=400):
+        super().__init__(mensaje)
+        self.status = status
+
+
+def init_app(app):
+    for tipo, limites in LIMITES.items():
+        prefijo = f"UPLOAD_{tipo.upper()}_"
+        limites['max_bytes'] = int(app.config.get(prefijo + 'MAX_BYTES', limites['max_bytes']))
+        limites['max_lado'] = int(app.config.get(prefijo + 'MAX_LADO', limites['max_lado']))
+        limites['max_pixeles'] = int(app.config.get(prefijo + 'MAX_PIXELES', limites['max_pixeles']))
+    spool = app.config.get('UPLOAD_SPOOL_DIR')
+    if spool:
+        os.makedirs(spool, exist_ok=True)
+    app.request_class = RequestConSpool
+
+
+class RequestConSpool(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        directorio = current_app.config.get('UPLOAD_SPOOL_DIR') if current_app else None
+        return tempfile.NamedTemporaryFile(mode='w+b', dir=directorio, prefix='subida_')
+
+
+def limitar_subida(tipo):
+    """Aplica el límite de bytes del tipo de subida a la petición antes de parsear el formulario."""
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            request.max_content_length = LIMITES[tipo]['max_bytes'] + MARGEN_FORMULARIO
+            return vista(*args, **kwargs)
+        # Para localizar las rutas de subida (límites del proxy: ver nginx/goe.conf)
+        envoltura.tipo_subida = tipo
+        return envoltura
+    return decorador
+
+
+def _cargar_magic():
+    global _magic
+    if _magic is False:
+        try:
+            import magic as _magic
+        except ImportError:
+            _magic = None
+    return _magic
+
+
+def detectar_mime(cabecera):
+    magic = _cargar_magic()
+    if magic is not None:
+        try:
+            return magic.from_buffer(cabecera, mime=True)
+        except Exception as e:
+            logger.warning("python-magic falló, se usan firmas: %s", e)
+    for firma, mime in _FIRMAS:
+        if cabecera.startswith(firma):
+            return mime
+    if cabecera[:4] == b'RIFF' and cabecera[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'application/octet-stream'
+
+
+class ArchivoSubido:
+    """Subida validada, respaldada por un archivo en disco. Usar como context manager."""
+
+    def __init__(self, ruta, mime, ancho, alto, tamano, temporal_propio):
+        self.ruta = ruta
+        self.mime = mime
+        self.ancho = ancho
+        self.alto = alto
+        self.tamano = tamano
+        self._temporal_propio = temporal_propio
+
+    def cerrar(self):
+        if self._temporal_propio:
+            try:
+                os.remove(self.ruta)
+            except OSError:
+                pass
+            self._temporal_propio = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+        return False
+
+
+def _ruta_en_disco(stream):
+    nombre = getattr(stream, 'name', None)
+    if isinstance(nombre, str) and os.path.isfile(nombre):
+        stream.flush()
+        return nombre, False
+    # Stream en memoria (otra request_class, tests): se copia por bloques a un temporal.
+    directorio = current_app.config.get('UPLOAD_SPOOL_DIR') if current_app else None
+    destino = tempfile.NamedTemporaryFile(mode='wb', dir=directorio, prefix='subida_', delete=False)
+    with destino:
+        shutil.copyfileobj(stream, destino, TAM_BLOQUE)
+    return destino.name, True
+
+
+def ingerir(archivo, tipo):
+    """
+    Valida el FileStorage 'archivo' con los límites de 'tipo' y devuelve un ArchivoSubido.
+    Lanza SubidaRechazada (400 / 413 / 415) sin decodificar los píxeles.
+    """
+    from PIL import Image
+
+    limites = LIMITES[tipo]
+    if archivo is None or not (archivo.filename or '').strip():
+        raise SubidaRechazada("No se envió ninguna imagen.")
+
+    stream = archivo.stream
+    stream.seek(0)
+    cabecera = stream.read(TAM_CABECERA)
+    mime = detectar_mime(cabecera)
+    if mime not in MIME_PERMITIDOS:
+        raise SubidaRechazada(f"Tipo de archivo no permitido ({mime}).", 415)
+
+    stream.seek(0, os.SEEK_END)
+    tamano = stream.tell()
+    if tamano > limites['max_bytes']:
+        raise SubidaRechazada(
+            f"La imagen supera el máximo de {limites['max_bytes'] // (1024 * 1024)} MB.", 413
+        )
+
+    # Image.open solo lee la cabecera; los píxeles no se decodifican aquí.
+    stream.seek(0)
+    try:
+        with Image.open(stream) as imagen:
+            ancho, alto = imagen.size
+    except Exception:
+        raise SubidaRechazada("El archivo no es una imagen válida.")
+    if max(ancho, alto) > limites['max_lado'] or ancho * alto > limites['max_pixeles']:
+        raise SubidaRechazada(f"La imagen es demasiado grande ({ancho}x{alto} px).", 413)
+
+    stream.seek(0)
+    ruta, temporal_propio = _ruta_en_disco(stream)
+    return ArchivoSubido(ruta, mime, ancho, alto, tamano, temporal_propio)
@@ -1,15 +1,18 @@
+import logging
 import random
 import string
 from email.mime.text import MIMEText
 from email.header import Header
 import smtplib
+import metrics
 import os
-import sys # Añadido para imprimir errores a stderr
 from dotenv import load_dotenv
 
 import cloudinary
 import cloudinary.uploader
 
+logger = logging.getLogger(__name__)
+
 load_dotenv()
 
 MAIL_USER = os.getenv('MAIL_USER')
@@ -34,15 +37,15 @@ def enviar_correo_verificacion(destinatario, codigo):
 
     try:
         # 🚀 [CAMBIO 2] Conexión SMTP con smtplib.SMTP y STARTTLS para SendGrid
-        print(f"DEBUG-UTILS: Conectando a {SMTP_SERVER}:{SMTP_PORT} con STARTTLS...", file=sys.stderr)
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
+        logger.debug("Conectando a %s:%s con STARTTLS...", SMTP_SERVER, SMTP_PORT)
+        with metrics.salida('smtp'), smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
             server.starttls() # ¡Obligatorio para el puerto 587!
             server.login(MAIL_USER, MAIL_PASS)
             server.send_message(msg)
-        print(f"DEBUG-UTILS: Correo enviado exitosamente a: {destinatario}", file=sys.stderr)
+        logger.debug("Correo enviado exitosamente a: %s", destinatario)
         return True
     except Exception as e:
-        print(f"ERROR-UTILS: Fallo al enviar correo a {destinatario}: {str(e)}", file=sys.stderr)
+        logger.error("Fallo al enviar correo a %s: %s", destinatario, str(e))
         return False
 
 
@@ -58,26 +61,27 @@ def upload_image_to_cloudinary(file, folder="general", public_id=None, overwrite
     Sube un archivo a Cloudinary y devuelve la URL segura y la versión.
     """
     try:
-        print(f"📌 [DEBUG-utils] Subiendo imagen a Cloudinary (folder={folder}, public_id={public_id})...")
-        result = cloudinary.uploader.upload(
-            file,
-            folder=folder,
-            public_id=public_id,
-            overwrite=overwrite,
-            invalidate=invalidate,
-            resource_type="image"
-        )
+        logger.debug("Subiendo imagen a Cloudinary (folder=%s, public_id=%s)...", folder, public_id)
+        with metrics.salida('cloudinary'):
+            result = cloudinary.uploader.upload(
+                file,
+                folder=folder,
+                public_id=public_id,
+                overwrite=overwrite,
+                invalidate=invalidate,
+                resource_type="image"
+            )
         secure_url = result.get("secure_url") or result.get("url")
         version = result.get("version")
 
-        print(f"✅ [DEBUG-utils] Subida correcta: secure_url={secure_url}, version={version}")
+        logger.debug("Subida correcta: secure_url=%s, version=%s", secure_url, version)
 
         return {
             "secure_url": secure_url,
             "version": version
         }
     except Exception as e:
-        print(f"❌ [DEBUG-utils] Error en subida Cloudinary: {e}")
+        logger.error("Error en subida Cloudinary: %s", e)
         return None
 
 # utils.py (agregar al final)
@@ -96,19 +100,20 @@ def upload_json_to_cloudinary(data, folder="users_data", public_id=None):
             json.dump(data, tmp, indent=4, ensure_ascii=False)
             tmp_path = tmp.name
 
-        result = cloudinary.uploader.upload(
-            tmp_path,
-            folder=folder,
-            public_id=public_id,
-            overwrite=True,
-            invalidate=True,
-            resource_type="raw"  # 👈 clave: subir como archivo crudo
-        )
+        with metrics.salida('cloudinary'):
+            result = cloudinary.uploader.upload(
+                tmp_path,
+                folder=folder,
+                public_id=public_id,
+                overwrite=True,
+                invalidate=True,
+                resource_type="raw"  # 👈 clave: subir como archivo crudo
+            )
         os.remove(tmp_path)
 
         return result.get("secure_url")
     except Exception as e:
-        print(f"❌ [DEBUG-utils] Error subiendo JSON a Cloudinary: {e}")
+        logger.error("Error subiendo JSON a Cloudinary: %s", e)
         return None
 
 
@@ -118,9 +123,10 @@ def download_json_from_cloudinary(url):
     """
     try:
         # import requests # Se movió al principio del bloque, pero se debe asegurar que está instalado
-        resp = requests.get(url)
+        with metrics.salida('cloudinary'):
+            resp = requests.get(url)
         resp.raise_for_status()
         return resp.json()
     except Exception as e:
-        print(f"❌ [DEBUG-utils] Error descargando JSON desde Cloudinary: {e}")
+        logger.error("Error descargando JSON desde Cloudinary: %s", e)
         return None
\ No newline at end of file